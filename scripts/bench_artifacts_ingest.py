@@ -0,0 +1,140 @@
+"""Benchmark artifact ingest for one response that emits many fenced files.
+
+Ingests a synthetic ``--files`` block response twice into a throw-away
+project (first creating every file, then updating every file with history
+backups), once with the previous per-block path (one manifest rewrite and
+one full read per file, backups copied byte for byte) and once with
+``ingest_artifacts``. Reports wall time and manifest rewrites per round, e.g.::
+
+    python scripts/bench_artifacts_ingest.py --files 500 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from amon.artifacts import (
+    ensure_manifest,
+    parse_artifact_blocks,
+    resolve_workspace_target,
+    run_validators,
+    update_manifest_for_file,
+)
+from amon.artifacts.store import _history_backup_path, ingest_artifacts
+
+REPORT_VERSION = 1
+
+_manifest_rewrites = 0
+
+
+def _count_manifest_rewrites(event: str, args: tuple[Any, ...]) -> None:
+    global _manifest_rewrites
+    if event == "os.rename" and len(args) >= 2 and os.fsdecode(args[1]).endswith("manifest.json"):
+        _manifest_rewrites += 1
+
+
+def build_response(files: int, size: int, suffix: str, round_index: int) -> str:
+    blocks = []
+    for index in range(files):
+        line = f"- round {round_index} item {index}: 產出內容 content\n"
+        body = line * max(1, size // len(line.encode("utf-8")))
+        blocks.append(f"```text file=workspace/out/{index // 50:02d}/file-{index:04d}{suffix}\n{body}```\n")
+    return "".join(blocks)
+
+
+def _legacy_ingest(response_text: str, project_path: Path) -> None:
+    """The per-block loop ``ingest_artifacts`` used before batching."""
+    ensure_manifest(project_path)
+    for block in parse_artifact_blocks(response_text):
+        target = resolve_workspace_target(project_path, block.file_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists() and target.is_file():
+            backup = _history_backup_path(project_path, target)
+            backup.parent.mkdir(parents=True, exist_ok=True)
+            backup.write_bytes(target.read_bytes())
+            status = "updated"
+        else:
+            status = "created"
+        target.write_text(block.content, encoding="utf-8")
+        checks = run_validators(target)
+        update_manifest_for_file(project_path=project_path, target_path=target, write_status=status, checks=checks)
+
+
+def _batched_ingest(response_text: str, project_path: Path) -> None:
+    ingest_artifacts(response_text=response_text, project_path=project_path)
+
+
+def _run(ingest: Callable[[str, Path], None], project_path: Path, responses: list[str]) -> list[dict[str, Any]]:
+    global _manifest_rewrites
+    rounds = []
+    for response in responses:
+        _manifest_rewrites = 0
+        started = time.perf_counter()
+        ingest(response, project_path)
+        rounds.append(
+            {
+                "wall_ms": round((time.perf_counter() - started) * 1000, 3),
+                "manifest_rewrites": _manifest_rewrites,
+            }
+        )
+    return rounds
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    sys.addaudithook(_count_manifest_rewrites)
+    responses = [build_response(args.files, args.size, args.suffix, round_index) for round_index in (1, 2)]
+    report: dict[str, Any] = {
+        "version": REPORT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"files": args.files, "size": args.size, "suffix": args.suffix},
+        "modes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="amon-bench-artifacts-") as temp_dir:
+        for mode, ingest in (("per_block", _legacy_ingest), ("batched", _batched_ingest)):
+            create, update = _run(ingest, Path(temp_dir) / mode, responses)
+            report["modes"][mode] = {"create": create, "update": update}
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-block versus batched artifact ingest.")
+    parser.add_argument("--files", type=int, default=500, help="Fenced file blocks in the response.")
+    parser.add_argument("--size", type=int, default=4096, help="Approximate bytes per file.")
+    parser.add_argument("--suffix", default=".md", help="File suffix; .py/.js/.ts also run their validators.")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(payload + "\n", encoding="utf-8")
+        print(f"[bench_artifacts_ingest] wrote {args.output}")
+    else:
+        print(payload)
+    for mode, rounds in report["modes"].items():
+        for name, result in rounds.items():
+            print(
+                f"[bench_artifacts_ingest] {mode} {name}: {result['wall_ms']} ms, "
+                f"{result['manifest_rewrites']} manifest rewrites",
+                file=sys.stderr,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,368 @@
+"""Benchmark the memory subsystem end to end on a synthetic zh-TW/en corpus.
+
+Drives ``ingest_session_memory``, ``run_memory_ingest_pipeline``,
+``generate_memory_tags``, ``compact_memory`` and ``search_memory`` against a
+throw-away ``AMON_HOME`` and writes one JSON report, e.g.::
+
+    python scripts/bench_memory.py --sessions 40 --turns 60 --output bench.json
+    python scripts/bench_memory.py --output new.json --compare bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from amon.core import AmonCore
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+REPORT_VERSION = 1
+PROJECT_ID = "bench-memory"
+
+_SURNAMES = "王李張劉陳楊黃林吳周"
+_GIVEN_NAMES = ("小明", "美華", "大文", "志強", "淑芬", "家豪", "雅婷", "俊傑")
+_ORGS = ("星河公司", "晨光工作室", "北辰大學", "海峽協會", "青木基金會")
+_ZH_TIMES = ("昨天", "今天", "明天", "前天", "後天", "下週一", "下週三", "下週五")
+_ZH_PLACES = ("台北", "臺北", "新竹", "台中")
+_ZH_PRONOUNS = ("他", "她", "他們", "該公司", "這家公司")
+_ZH_FILLER = (
+    "我們討論了預算與時程。",
+    "需要補上測試報告。",
+    "會議紀錄已經上傳。",
+    "先確認需求再開工。",
+    "這個版本的效能要再優化。",
+)
+_EN_NAMES = ("Alice", "Bob", "Carol", "Dave", "Erin")
+_EN_TIMES = ("yesterday", "tomorrow", "next Monday", "last Friday")
+_EN_FILLER = (
+    "We reviewed the deployment plan.",
+    "The latency budget is still too tight.",
+    "Please update the migration notes.",
+    "Let's sync on the roadmap.",
+    "The cache hit rate dropped after the release.",
+)
+_QUERIES = (
+    "預算 時程",
+    "台北 開會",
+    "測試報告",
+    "效能 優化",
+    "deployment plan",
+    "latency budget",
+    "migration notes",
+    "roadmap",
+)
+
+
+def build_corpus(
+    rng: random.Random,
+    *,
+    sessions: int,
+    turns: int,
+    zh_ratio: float,
+    entity_density: float,
+    time_density: float,
+    pronoun_density: float,
+) -> list[list[dict[str, str]]]:
+    """Sessions of prompt/final events; densities are per-event probabilities."""
+    people = [surname + given for surname in _SURNAMES for given in _GIVEN_NAMES]
+    corpus = []
+    for _ in range(sessions):
+        events = []
+        for turn in range(turns):
+            parts: list[str] = []
+            if rng.random() < zh_ratio:
+                if rng.random() < entity_density:
+                    entity = rng.choice(people) if rng.random() < 0.7 else rng.choice(_ORGS)
+                    parts.append(f"{entity}說")
+                if rng.random() < time_density:
+                    parts.append(f"{rng.choice(_ZH_TIMES)}在{rng.choice(_ZH_PLACES)}")
+                parts.append(rng.choice(_ZH_FILLER))
+                if rng.random() < pronoun_density:
+                    parts.append(f"{rng.choice(_ZH_PRONOUNS)}會負責後續。")
+                text = "".join(parts)
+            else:
+                if rng.random() < entity_density:
+                    parts.append(f"{rng.choice(_EN_NAMES)} said")
+                if rng.random() < time_density:
+                    parts.append(f"{rng.choice(_EN_TIMES)} in Taipei")
+                parts.append(rng.choice(_EN_FILLER))
+                if rng.random() < pronoun_density:
+                    parts.append("They will follow up.")
+                text = " ".join(parts)
+            events.append({"event": "prompt" if turn % 2 == 0 else "final", "content": text})
+        corpus.append(events)
+    return corpus
+
+
+class _InstrumentedCore(AmonCore):
+    """Keeps the throughput metrics of every pipeline run, including those made inside ``ingest_session_memory``."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.pipeline_runs: list[dict[str, Any]] = []
+
+    def run_memory_ingest_pipeline(self, project_path: Path, **kwargs: Any) -> dict[str, Any]:
+        result = super().run_memory_ingest_pipeline(project_path, **kwargs)
+        self.pipeline_runs.append(result)
+        return result
+
+
+def _peak_rss_kb() -> int | None:
+    if resource is None:
+        return None
+    scale = 1024 if sys.platform == "darwin" else 1  # macOS reports bytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return max(own, children)
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+
+def _stage_totals(runs: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    totals: dict[str, dict[str, Any]] = {}
+    for run in runs:
+        for stage, metrics in (run.get("throughput") or {}).items():
+            entry = totals.setdefault(stage, {"records": 0, "busy_s": 0.0, "wait_s": 0.0})
+            entry["records"] += metrics["records"]
+            entry["busy_s"] += metrics["busy_s"]
+            entry["wait_s"] += metrics["wait_s"]
+    for entry in totals.values():
+        entry["chunks_per_s"] = _rate(entry["records"], entry["busy_s"])
+        entry["busy_s"] = round(entry["busy_s"], 4)
+        entry["wait_s"] = round(entry["wait_s"], 4)
+    return totals
+
+
+def _time_search(
+    core: AmonCore,
+    project_path: Path,
+    queries: list[tuple[str, dict[str, str] | None]],
+    top_k: int,
+) -> dict[str, Any]:
+    latencies_ms = []
+    for query, time_range in queries:
+        started_at = time.perf_counter()
+        core.search_memory(project_path, query, time_range=time_range, top_k=top_k)
+        latencies_ms.append((time.perf_counter() - started_at) * 1000)
+    return {
+        "queries": len(latencies_ms),
+        "p50_ms": round(_percentile(latencies_ms, 0.50), 3),
+        "p95_ms": round(_percentile(latencies_ms, 0.95), 3),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    corpus = build_corpus(
+        rng,
+        sessions=args.sessions,
+        turns=args.turns,
+        zh_ratio=args.zh_ratio,
+        entity_density=args.entity_density,
+        time_density=args.time_density,
+        pronoun_density=args.pronoun_density,
+    )
+    today = datetime.now().date()
+    queries = []
+    for index in range(args.queries):
+        time_range = None
+        if index % 3 == 2:
+            start = today.toordinal() - rng.randint(0, 3)
+            time_range = {
+                "start": today.fromordinal(start).isoformat(),
+                "end": today.fromordinal(start + rng.randint(0, 3)).isoformat(),
+            }
+        queries.append((rng.choice(_QUERIES), time_range))
+
+    report: dict[str, Any] = {
+        "version": REPORT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "sessions",
+                "turns",
+                "zh_ratio",
+                "entity_density",
+                "time_density",
+                "pronoun_density",
+                "queries",
+                "top_k",
+                "seed",
+            )
+        },
+        "phases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="amon-bench-memory-") as temp_dir:
+        home = Path(temp_dir) / "home"
+        project_path = Path(temp_dir) / "project"
+        sessions_dir = project_path / "sessions"
+        sessions_dir.mkdir(parents=True)
+        for index, events in enumerate(corpus):
+            with (sessions_dir / f"bench-{index:05d}.jsonl").open("w", encoding="utf-8") as handle:
+                for event in events:
+                    handle.write(json.dumps(event, ensure_ascii=False))
+                    handle.write("\n")
+
+        previous_home = os.environ.get("AMON_HOME")
+        os.environ["AMON_HOME"] = str(home)
+        try:
+            core = _InstrumentedCore(data_dir=home)
+            phases = report["phases"]
+
+            # Each session is ingested and caught up before the next one
+            # arrives, so backpressure never hands work to the background
+            # service and every stage is timed in this thread.
+            chunks = 0
+            started_at = time.perf_counter()
+            for index in range(len(corpus)):
+                chunks += core.ingest_session_memory(project_path, f"bench-{index:05d}", project_id=PROJECT_ID)
+                while any(core.run_memory_ingest_pipeline(project_path, max_queue_size=None)["processed"].values()):
+                    pass
+            elapsed = time.perf_counter() - started_at
+            phases["ingest"] = {
+                "chunks": chunks,
+                "wall_s": round(elapsed, 4),
+                "chunks_per_s": _rate(chunks, elapsed),
+                "pipeline_runs": len(core.pipeline_runs),
+                "stages": _stage_totals(core.pipeline_runs),
+                "peak_rss_kb": _peak_rss_kb(),
+            }
+
+            tags_path = project_path / "memory" / "tags.jsonl"
+            started_at = time.perf_counter()
+            core.generate_memory_tags(project_path)
+            elapsed = time.perf_counter() - started_at
+            phases["tags_incremental"] = {"wall_s": round(elapsed, 4), "chunks_per_s": _rate(chunks, elapsed)}
+            tags_path.unlink()
+            started_at = time.perf_counter()
+            core.generate_memory_tags(project_path)
+            elapsed = time.perf_counter() - started_at
+            phases["tags_rebuild"] = {
+                "wall_s": round(elapsed, 4),
+                "chunks_per_s": _rate(chunks, elapsed),
+                "peak_rss_kb": _peak_rss_kb(),
+            }
+
+            phases["search_jsonl"] = _time_search(core, project_path, queries, args.top_k)
+
+            started_at = time.perf_counter()
+            compaction = core.compact_memory(project_path)
+            elapsed = time.perf_counter() - started_at
+            phases["compact"] = {
+                "rows": compaction["rows"],
+                "wall_s": round(elapsed, 4),
+                "chunks_per_s": _rate(compaction["rows"], elapsed),
+                "peak_rss_kb": _peak_rss_kb(),
+            }
+            phases["search_segments"] = _time_search(core, project_path, queries, args.top_k)
+        finally:
+            if previous_home is None:
+                os.environ.pop("AMON_HOME", None)
+            else:
+                os.environ["AMON_HOME"] = previous_home
+    report["peak_rss_kb"] = _peak_rss_kb()
+    return report
+
+
+def compare_reports(baseline: dict[str, Any], current: dict[str, Any]) -> list[str]:
+    """One line per rate or latency metric present in both reports."""
+    lines = []
+
+    def walk(path: str, old: Any, new: Any) -> None:
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old:
+                if key in new:
+                    walk(f"{path}.{key}" if path else key, old[key], new[key])
+            return
+        name = path.rsplit(".", 1)[-1]
+        if not (name.endswith("_per_s") or name.endswith("_ms") or name == "peak_rss_kb"):
+            return
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            return
+        lines.append(f"{path}: {old} -> {new} ({new / old:.2f}x)")
+
+    walk("", baseline.get("phases", {}), current.get("phases", {}))
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark memory ingest, tagging and search on a synthetic corpus.")
+    parser.add_argument("--sessions", type=int, default=20, help="Number of sessions.")
+    parser.add_argument("--turns", type=int, default=50, help="Prompt/final events per session (keep below 1000 to avoid backpressure).")
+    parser.add_argument("--zh-ratio", type=float, default=0.7, help="Share of zh-TW events; the rest are English.")
+    parser.add_argument("--entity-density", type=float, default=0.4, help="Probability an event names an entity.")
+    parser.add_argument("--time-density", type=float, default=0.3, help="Probability an event mentions a time and place.")
+    parser.add_argument("--pronoun-density", type=float, default=0.3, help="Probability an event ends with a pronoun.")
+    parser.add_argument("--queries", type=int, default=50, help="Number of search queries.")
+    parser.add_argument("--top-k", type=int, default=5, help="top_k passed to search_memory.")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus and query seed.")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--compare", type=Path, help="Earlier report to print ratios against.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(payload + "\n", encoding="utf-8")
+        print(f"[bench_memory] wrote {args.output}")
+    else:
+        print(payload)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        for line in compare_reports(baseline, report):
+            print(f"[bench_memory] {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+"""Benchmark session event writes for one long streamed LLM reply.
+
+Streams ``--tokens`` synthetic tokens through ``AmonCore._stream_and_collect``
+twice against a throw-away data dir: once with the previous behaviour (one
+``_append_session_event`` open/append/close per event) and once with the
+buffered ``SessionEventWriter``. Reports wall time, opens of the session
+file, write syscalls and bytes written for each, and checks both produce the
+same session file, e.g.::
+
+    python scripts/bench_session_events.py --tokens 50000 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from amon.core import AmonCore
+from amon.models import encode_reasoning_chunk
+
+REPORT_VERSION = 1
+_TOKENS = ("我們", "討論", "了", "預算", "與", "時程", "。", " the", " latency", " budget", ",", "\n")
+_FIXED_NOW = "2026-02-01T10:00:00"
+
+_session_opens: dict[str, int] = {}
+
+
+def _count_opens(event: str, args: tuple[Any, ...]) -> None:
+    if event == "open" and args and isinstance(args[0], (str, bytes, os.PathLike)):
+        path = os.fsdecode(args[0])
+        if path in _session_opens:
+            _session_opens[path] += 1
+
+
+class _SyntheticProvider:
+    def __init__(self, tokens: int, reasoning_every: int) -> None:
+        self.tokens = tokens
+        self.reasoning_every = reasoning_every
+
+    def generate_stream(self, messages: list[dict[str, str]], model: str | None = None) -> Iterator[str]:
+        for index in range(self.tokens):
+            if self.reasoning_every and index % self.reasoning_every == 0:
+                yield encode_reasoning_chunk(f"步驟 {index}")
+            yield _TOKENS[index % len(_TOKENS)]
+
+
+class _BenchCore(AmonCore):
+    @staticmethod
+    def _now() -> str:
+        # A fixed clock keeps the two session files byte-comparable.
+        return _FIXED_NOW
+
+
+class _PerEventCore(_BenchCore):
+    """The previous behaviour: every event reopens and appends to the session file."""
+
+    @contextmanager
+    def _session_events(self, session_path: Path, session_id: str) -> Iterator[Any]:
+        yield SimpleNamespace(append=partial(self._append_session_event, session_path, session_id=session_id))
+
+
+def _write_syscalls() -> int | None:
+    try:
+        for line in Path("/proc/self/io").read_text(encoding="ascii").splitlines():
+            key, _, value = line.partition(":")
+            if key == "syscw":
+                return int(value)
+    except OSError:
+        return None
+    return None
+
+
+def _run(core: AmonCore, session_path: Path, provider: _SyntheticProvider) -> dict[str, Any]:
+    session_path.parent.mkdir(parents=True, exist_ok=True)
+    _session_opens[str(session_path)] = 0
+    writes_before = _write_syscalls()
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        reply = core._stream_and_collect(
+            provider,
+            "bench",
+            "bench-model",
+            [{"role": "user", "content": "bench"}],
+            session_path,
+            "bench-session",
+            "bench",
+            {"billing": {"enabled": False}},
+            "bench",
+            None,
+        )
+    elapsed = time.perf_counter() - started
+    writes_after = _write_syscalls()
+    return {
+        "wall_ms": round(elapsed * 1000, 3),
+        "session_opens": _session_opens.pop(str(session_path)),
+        "write_syscalls": writes_after - writes_before if writes_before is not None and writes_after is not None else None,
+        "bytes": session_path.stat().st_size,
+        "reply_chars": len(reply),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    sys.addaudithook(_count_opens)
+    provider = _SyntheticProvider(args.tokens, args.reasoning_every)
+    report: dict[str, Any] = {
+        "version": REPORT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"tokens": args.tokens, "reasoning_every": args.reasoning_every},
+        "modes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="amon-bench-session-") as temp_dir:
+        root = Path(temp_dir)
+        paths = {}
+        for mode, core_class in (("per_event", _PerEventCore), ("buffered", _BenchCore)):
+            paths[mode] = root / mode / "sessions" / "bench-session.jsonl"
+            core = core_class(data_dir=root / "data")
+            report["modes"][mode] = _run(core, paths[mode], provider)
+        report["identical_output"] = paths["per_event"].read_bytes() == paths["buffered"].read_bytes()
+    before, after = report["modes"]["per_event"], report["modes"]["buffered"]
+    report["speedup"] = round(before["wall_ms"] / after["wall_ms"], 2) if after["wall_ms"] else None
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-event versus buffered session event writes.")
+    parser.add_argument("--tokens", type=int, default=50_000, help="Streamed reply tokens.")
+    parser.add_argument("--reasoning-every", type=int, default=100, help="Emit a reasoning chunk every N tokens (0 disables).")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(payload + "\n", encoding="utf-8")
+        print(f"[bench_session_events] wrote {args.output}")
+    else:
+        print(payload)
+    for mode, result in report["modes"].items():
+        print(
+            f"[bench_session_events] {mode}: {result['wall_ms']} ms, "
+            f"{result['session_opens']} opens, {result['write_syscalls']} write syscalls",
+            file=sys.stderr,
+        )
+    return 0 if report["identical_output"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
 """Artifacts ingest helpers."""
 
-from .manifest import ensure_manifest, update_manifest_for_file
+from .manifest import ManifestTransaction, ensure_manifest, file_sha256, manifest_transaction, update_manifest_for_file
 from .parser import ArtifactBlock, parse_artifact_blocks
 from .safety import resolve_workspace_target
 from .store import ArtifactWriteResult, ingest_artifacts, ingest_response_artifacts
@@ -9,9 +9,12 @@ from .validators import run_validators
 __all__ = [
     "ArtifactBlock",
     "ArtifactWriteResult",
+    "ManifestTransaction",
     "ensure_manifest",
+    "file_sha256",
     "ingest_artifacts",
     "ingest_response_artifacts",
+    "manifest_transaction",
     "parse_artifact_blocks",
     "resolve_workspace_target",
     "run_validators",
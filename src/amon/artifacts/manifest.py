@@ -4,13 +4,17 @@ from __future__ import annotations
 
 import hashlib
 import json
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
-from amon.fs.atomic import atomic_write_text
+from amon.fs.atomic import atomic_write_text, file_lock
 
 _MANIFEST_REL_PATH = Path(".amon") / "artifacts" / "manifest.json"
+# Held for a whole transaction; atomic_write_text takes manifest.json.lock itself.
+_TRANSACTION_LOCK_REL_PATH = Path(".amon") / "artifacts" / ".manifest.txn.lock"
+_HASH_CHUNK = 1024 * 1024
 
 
 def _manifest_path(project_path: Path) -> Path:
@@ -25,13 +29,17 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+def _read_manifest(manifest_path: Path) -> dict[str, Any]:
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return _default_manifest()
+
+
 def ensure_manifest(project_path: Path) -> dict[str, Any]:
     manifest_path = _manifest_path(project_path)
     if manifest_path.exists():
-        try:
-            return json.loads(manifest_path.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            return _default_manifest()
+        return _read_manifest(manifest_path)
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
     payload = _default_manifest()
     payload["updated_at"] = _now_iso()
@@ -48,6 +56,76 @@ def _status_from_checks(checks: list[dict[str, Any]]) -> str:
     return "skipped"
 
 
+def file_sha256(path: Path) -> str:
+    """SHA-256 of ``path`` read in chunks; ``""`` for an empty or missing file, as the manifest records it."""
+    if not path.is_file():
+        return ""
+    digest = hashlib.sha256()
+    size = 0
+    with path.open("rb") as handle:
+        while chunk := handle.read(_HASH_CHUNK):
+            size += len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest() if size else ""
+
+
+class ManifestTransaction:
+    """Manifest changes collected in memory and written back in one atomic rewrite."""
+
+    def __init__(self, project_path: Path) -> None:
+        self.project_path = project_path
+        manifest_path = _manifest_path(project_path)
+        self.manifest = _read_manifest(manifest_path) if manifest_path.exists() else _default_manifest()
+        if not isinstance(self.manifest.get("files"), dict):
+            self.manifest["files"] = {}
+        self._changed = not manifest_path.exists()
+
+    def record(
+        self,
+        target_path: Path,
+        write_status: str,
+        checks: list[dict[str, Any]],
+        error: str = "",
+        sha256: str | None = None,
+    ) -> dict[str, Any]:
+        """Stage the entry for ``target_path``; ``sha256`` skips re-reading a file whose hash is known."""
+        target_rel = target_path.resolve().relative_to(self.project_path.resolve()).as_posix()
+        entry = {
+            "path": target_rel,
+            "sha256": file_sha256(target_path) if sha256 is None else sha256,
+            "updated_at": _now_iso(),
+            "write_status": write_status,
+            "status": _status_from_checks(checks),
+            "checks": checks,
+            "error": error,
+        }
+        self.manifest["files"][target_rel] = entry
+        self._changed = True
+        return entry
+
+    def commit(self) -> None:
+        if not self._changed:
+            return
+        self.manifest["updated_at"] = _now_iso()
+        manifest_path = _manifest_path(self.project_path)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(manifest_path, json.dumps(self.manifest, ensure_ascii=False, indent=2))
+        self._changed = False
+
+
+@contextmanager
+def manifest_transaction(project_path: Path) -> Iterator[ManifestTransaction]:
+    """Hold the manifest for a batch of updates and write it once when the block succeeds.
+
+    Concurrent transactions on the same project are serialized, so two
+    ingests no longer drop each other's entries.
+    """
+    with file_lock(project_path / _TRANSACTION_LOCK_REL_PATH):
+        transaction = ManifestTransaction(project_path)
+        yield transaction
+        transaction.commit()
+
+
 def update_manifest_for_file(
     project_path: Path,
     target_path: Path,
@@ -55,23 +133,5 @@ def update_manifest_for_file(
     checks: list[dict[str, Any]],
     error: str = "",
 ) -> dict[str, Any]:
-    manifest = ensure_manifest(project_path)
-    manifest_path = _manifest_path(project_path)
-    target_rel = target_path.resolve().relative_to(project_path.resolve()).as_posix()
-    content = target_path.read_bytes() if target_path.exists() and target_path.is_file() else b""
-    sha256 = hashlib.sha256(content).hexdigest() if content else ""
-
-    files = manifest.setdefault("files", {})
-    files[target_rel] = {
-        "path": target_rel,
-        "sha256": sha256,
-        "updated_at": _now_iso(),
-        "write_status": write_status,
-        "status": _status_from_checks(checks),
-        "checks": checks,
-        "error": error,
-    }
-    manifest["updated_at"] = _now_iso()
-    manifest_path.parent.mkdir(parents=True, exist_ok=True)
-    atomic_write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
-    return files[target_rel]
+    with manifest_transaction(project_path) as transaction:
+        return transaction.record(target_path, write_status, checks, error)
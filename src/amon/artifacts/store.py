@@ -4,15 +4,21 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timezone
+import hashlib
 import mimetypes
+import os
 from pathlib import Path
+import shutil
+import tempfile
 from typing import Any
 
-from .manifest import ensure_manifest, update_manifest_for_file
+from .manifest import manifest_transaction
 from .parser import parse_artifact_blocks
 from .safety import resolve_workspace_target
 from .validators import run_validators
 
+_WRITE_CHUNK_CHARS = 256 * 1024
+
 
 @dataclass(frozen=True)
 class ArtifactWriteResult:
@@ -32,57 +38,109 @@ def _history_backup_path(project_path: Path, target_path: Path) -> Path:
     return history_root / relative.parent / f"{relative.name}.{stamp}.bak"
 
 
+def _snapshot_to_history(target: Path, backup: Path) -> None:
+    """Keep the current ``target`` as ``backup`` without copying its bytes where possible.
+
+    A hard link is safe because ``_write_artifact`` replaces updated files
+    with a new inode instead of rewriting them in place. Filesystems without
+    hard links fall back to ``shutil.copy2``, which copies in the kernel
+    where the platform supports it.
+    """
+    try:
+        os.link(target, backup)
+    except OSError:
+        shutil.copy2(target, backup)
+
+
+def _write_hashed(handle: Any, content: str) -> str:
+    digest = hashlib.sha256()
+    written = 0
+    for start in range(0, len(content), _WRITE_CHUNK_CHARS):
+        chunk = content[start : start + _WRITE_CHUNK_CHARS]
+        if os.linesep != "\n":
+            chunk = chunk.replace("\n", os.linesep)
+        data = chunk.encode("utf-8")
+        digest.update(data)
+        handle.write(data)
+        written += len(data)
+    return digest.hexdigest() if written else ""
+
+
+def _write_artifact(target: Path, content: str, *, replace: bool) -> str:
+    """Write ``content`` as ``write_text`` would and return its SHA-256 (``""`` when empty).
+
+    The hash is taken chunk by chunk from the bytes as they are written. With
+    ``replace`` the file is written next to ``target`` and renamed over it,
+    leaving the old inode (and any history link to it) untouched.
+    """
+    if not replace:
+        with target.open("wb") as handle:
+            return _write_hashed(handle, content)
+    handle = tempfile.NamedTemporaryFile(
+        mode="wb",
+        dir=str(target.parent),
+        prefix=f".{target.name}.",
+        suffix=".tmp",
+        delete=False,
+    )
+    try:
+        with handle:
+            sha256 = _write_hashed(handle, content)
+        shutil.copymode(target, handle.name)
+        os.replace(handle.name, target)
+    except BaseException:
+        Path(handle.name).unlink(missing_ok=True)
+        raise
+    return sha256
+
+
 def ingest_artifacts(response_text: str, project_path: Path, source: dict[str, Any] | None = None) -> dict[str, Any]:
     """Parse fenced artifacts from response and write under workspace."""
 
     results: list[ArtifactWriteResult] = []
-    ensure_manifest(project_path)
     blocks = parse_artifact_blocks(response_text)
 
-    for block in blocks:
-        backup_path = ""
-        target_str = ""
-        try:
-            target = resolve_workspace_target(project_path, block.file_path)
-            target_str = str(target.relative_to(project_path).as_posix())
-            target.parent.mkdir(parents=True, exist_ok=True)
-            if target.exists() and target.is_file():
-                backup = _history_backup_path(project_path, target)
-                backup.parent.mkdir(parents=True, exist_ok=True)
-                backup.write_bytes(target.read_bytes())
-                backup_path = backup.relative_to(project_path).as_posix()
-                status = "updated"
-            else:
-                status = "created"
-            target.write_text(block.content, encoding="utf-8")
-            checks = run_validators(target)
-            update_manifest_for_file(
-                project_path=project_path,
-                target_path=target,
-                write_status=status,
-                checks=checks,
-            )
-            results.append(
-                ArtifactWriteResult(
-                    index=block.index,
-                    declared_path=block.file_path,
-                    target_path=target_str,
-                    status=status,
-                    backup_path=backup_path,
-                    error="",
+    # Every block's manifest entry lands in one rewrite of manifest.json.
+    with manifest_transaction(project_path) as manifest:
+        for block in blocks:
+            backup_path = ""
+            target_str = ""
+            try:
+                target = resolve_workspace_target(project_path, block.file_path)
+                target_str = str(target.relative_to(project_path).as_posix())
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if target.exists() and target.is_file():
+                    backup = _history_backup_path(project_path, target)
+                    backup.parent.mkdir(parents=True, exist_ok=True)
+                    _snapshot_to_history(target, backup)
+                    backup_path = backup.relative_to(project_path).as_posix()
+                    status = "updated"
+                else:
+                    status = "created"
+                sha256 = _write_artifact(target, block.content, replace=status == "updated")
+                checks = run_validators(target)
+                manifest.record(target, status, checks, sha256=sha256)
+                results.append(
+                    ArtifactWriteResult(
+                        index=block.index,
+                        declared_path=block.file_path,
+                        target_path=target_str,
+                        status=status,
+                        backup_path=backup_path,
+                        error="",
+                    )
                 )
-            )
-        except Exception as exc:  # noqa: BLE001
-            results.append(
-                ArtifactWriteResult(
-                    index=block.index,
-                    declared_path=block.file_path,
-                    target_path=target_str,
-                    status="error",
-                    backup_path=backup_path,
-                    error=str(exc),
+            except Exception as exc:  # noqa: BLE001
+                results.append(
+                    ArtifactWriteResult(
+                        index=block.index,
+                        declared_path=block.file_path,
+                        target_path=target_str,
+                        status="error",
+                        backup_path=backup_path,
+                        error=str(exc),
+                    )
                 )
-            )
 
     errors = [result.error for result in results if result.error]
     source_meta = source or {}
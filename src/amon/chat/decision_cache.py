@@ -0,0 +1,234 @@
+"""Persistent cache for router and execution-mode classifier decisions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+from amon.fs.atomic import atomic_write_text
+from amon.fs.safety import validate_project_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_S = 900.0
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MIN_CONFIDENCE = 0.8
+_GLOBAL_SCOPE = "_global"
+_TRAILING_PUNCTUATION = " \t\r\n.。!！?？~～…"
+_COUNTER_NAMES = ("hits", "misses", "stores", "bypassed", "expired", "evicted")
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(float(raw), 0.0)
+    except ValueError:
+        return default
+
+
+def normalize_decision_message(message: str) -> str:
+    return " ".join((message or "").split()).lower().rstrip(_TRAILING_PUNCTUATION)
+
+
+class DecisionCache:
+    """TTL + LRU cache of classifier outputs, one persisted file per project.
+
+    Keys hash the classifier kind, the normalized message and a compact context
+    signature (project, active run, last router type); message text itself is
+    never written to disk. Decisions below ``min_confidence`` are not stored,
+    so uncertain turns always reach the model.
+    """
+
+    def __init__(
+        self,
+        *,
+        data_dir: Path | None = None,
+        ttl_s: float | None = None,
+        max_entries: int | None = None,
+        min_confidence: float | None = None,
+        time_func: Callable[[], float] | None = None,
+    ) -> None:
+        self._data_dir = Path(data_dir) if data_dir is not None else None
+        self.ttl_s = ttl_s if ttl_s is not None else _env_float("AMON_ROUTER_CACHE_TTL_S", DEFAULT_TTL_S)
+        self.max_entries = int(
+            max_entries if max_entries is not None else _env_float("AMON_ROUTER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        self.min_confidence = (
+            min_confidence
+            if min_confidence is not None
+            else _env_float("AMON_ROUTER_CACHE_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE)
+        )
+        self._time = time_func or time.time
+        self._lock = threading.Lock()
+        self._scopes: dict[Path, OrderedDict[str, dict[str, Any]]] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and self.max_entries > 0
+
+    def lookup(
+        self,
+        kind: str,
+        message: str,
+        *,
+        project_id: str | None = None,
+        run_id: str | None = None,
+        last_router_type: str | None = None,
+    ) -> dict[str, Any] | None:
+        if not self.enabled:
+            return None
+        key = _decision_key(kind, message, project_id=project_id, run_id=run_id, last_router_type=last_router_type)
+        with self._lock:
+            path = self._scope_path(project_id)
+            entries = self._load_scope(path)
+            entry = entries.get(key)
+            if entry is not None and float(entry.get("expires_at") or 0) <= self._time():
+                entries.pop(key, None)
+                self._bump(kind, "expired")
+                entry = None
+            if entry is None:
+                self._bump(kind, "misses")
+                return None
+            entries.move_to_end(key)
+            self._bump(kind, "hits")
+            value = entry.get("value")
+            return dict(value) if isinstance(value, dict) else None
+
+    def store(
+        self,
+        kind: str,
+        message: str,
+        value: dict[str, Any],
+        *,
+        confidence: float,
+        project_id: str | None = None,
+        run_id: str | None = None,
+        last_router_type: str | None = None,
+    ) -> bool:
+        if not self.enabled or not normalize_decision_message(message):
+            return False
+        if confidence < self.min_confidence:
+            with self._lock:
+                self._bump(kind, "bypassed")
+            return False
+        key = _decision_key(kind, message, project_id=project_id, run_id=run_id, last_router_type=last_router_type)
+        now = self._time()
+        with self._lock:
+            path = self._scope_path(project_id)
+            entries = self._load_scope(path)
+            entries[key] = {
+                "kind": kind,
+                "value": dict(value),
+                "confidence": float(confidence),
+                "stored_at": now,
+                "expires_at": now + self.ttl_s,
+            }
+            entries.move_to_end(key)
+            self._prune(kind, entries, now)
+            self._bump(kind, "stores")
+            self._persist(path, entries)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            by_kind = {kind: dict(counters) for kind, counters in sorted(self._counters.items())}
+            totals = {name: sum(counters.get(name, 0) for counters in self._counters.values()) for name in _COUNTER_NAMES}
+            return {"totals": totals, "by_kind": by_kind, "entries": sum(len(entries) for entries in self._scopes.values())}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+            self._counters.clear()
+
+    def _scope_path(self, project_id: str | None) -> Path:
+        data_dir = self._data_dir or _resolve_data_dir()
+        scope = _GLOBAL_SCOPE
+        if project_id:
+            validate_project_id(project_id)
+            scope = project_id
+        return data_dir / "cache" / "router_decisions" / f"{scope}.json"
+
+    def _load_scope(self, path: Path) -> OrderedDict[str, dict[str, Any]]:
+        entries = self._scopes.get(path)
+        if entries is not None:
+            return entries
+        entries = OrderedDict()
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            payload = {}
+        except (OSError, ValueError) as exc:
+            logger.warning("router 決策快取讀取失敗，改用空快取：%s", exc)
+            payload = {}
+        rows = payload.get("entries") if isinstance(payload, dict) else None
+        if isinstance(rows, dict):
+            now = self._time()
+            live = [
+                (key, row)
+                for key, row in rows.items()
+                if isinstance(row, dict) and float(row.get("expires_at") or 0) > now
+            ]
+            for key, row in sorted(live, key=lambda item: float(item[1].get("stored_at") or 0)):
+                entries[key] = row
+        self._scopes[path] = entries
+        return entries
+
+    def _prune(self, kind: str, entries: OrderedDict[str, dict[str, Any]], now: float) -> None:
+        for key in [key for key, row in entries.items() if float(row.get("expires_at") or 0) <= now]:
+            entries.pop(key, None)
+            self._bump(kind, "expired")
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self._bump(kind, "evicted")
+
+    def _persist(self, path: Path, entries: OrderedDict[str, dict[str, Any]]) -> None:
+        payload = {"schema_version": 1, "entries": dict(entries)}
+        try:
+            atomic_write_text(path, json.dumps(payload, ensure_ascii=False) + "\n")
+        except OSError as exc:
+            logger.warning("router 決策快取寫入失敗：%s", exc)
+
+    def _bump(self, kind: str, name: str) -> None:
+        counters = self._counters.setdefault(kind, {counter: 0 for counter in _COUNTER_NAMES})
+        counters[name] += 1
+
+
+_DEFAULT_CACHE: DecisionCache | None = None
+_DEFAULT_CACHE_LOCK = threading.Lock()
+
+
+def get_decision_cache() -> DecisionCache:
+    global _DEFAULT_CACHE
+    with _DEFAULT_CACHE_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = DecisionCache()
+        return _DEFAULT_CACHE
+
+
+def _decision_key(
+    kind: str,
+    message: str,
+    *,
+    project_id: str | None,
+    run_id: str | None,
+    last_router_type: str | None,
+) -> str:
+    signature = [kind, normalize_decision_message(message), project_id or "", run_id or "", last_router_type or ""]
+    return hashlib.sha256(json.dumps(signature, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _resolve_data_dir() -> Path:
+    env_path = os.environ.get("AMON_HOME")
+    if env_path:
+        return Path(env_path).expanduser()
+    return Path("~/.amon").expanduser()
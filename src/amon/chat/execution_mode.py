@@ -10,6 +10,8 @@ from amon.config import ConfigLoader
 from amon.events import EXECUTION_MODE_DECISION, emit_event
 from amon.models import ProviderError, build_provider
 
+from .decision_cache import get_decision_cache
+
 logger = logging.getLogger(__name__)
 
 _ALLOWED_MODES = {"single", "self_critique", "team", "graph"}
@@ -27,11 +29,29 @@ def decide_execution_mode(
     model: str | None = None,
     *,
     context: dict[str, Any] | None = None,
+    run_id: str | None = None,
+    last_router_type: str | None = None,
 ) -> str:
     normalized = " ".join((message or "").split())
     if not normalized:
         return "single"
 
+    cache_signature = {"project_id": project_id, "run_id": run_id, "last_router_type": last_router_type}
+    if llm_client is None:
+        cached = get_decision_cache().lookup("execution_mode", normalized, **cache_signature)
+        cached_mode = (cached or {}).get("mode")
+        if cached_mode in _ALLOWED_MODES:
+            _emit_decision_event(
+                project_id=project_id,
+                mode=cached_mode,
+                reason="cache_hit",
+                raw_output="",
+                error="",
+                confidence=float((cached or {}).get("confidence") or 0.0),
+                requires_planning=bool((cached or {}).get("requires_planning")),
+            )
+            return cached_mode
+
     try:
         client = llm_client
         selected_model = model
@@ -53,6 +73,18 @@ def decide_execution_mode(
             raw = repaired
 
         final_mode = _apply_calibration(decision)
+        if llm_client is None:
+            get_decision_cache().store(
+                "execution_mode",
+                normalized,
+                {
+                    "mode": final_mode,
+                    "confidence": float(decision["confidence"]),
+                    "requires_planning": bool(decision["requires_planning"]),
+                },
+                confidence=float(decision["confidence"]),
+                **cache_signature,
+            )
         _emit_decision_event(
             project_id=project_id,
             mode=final_mode,
@@ -0,0 +1,201 @@
+"""Incremental, offset-based cache of chat messages parsed from thread events."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from amon.fs.atomic import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+CACHE_SCHEMA_VERSION = 2
+_ANCHOR_BYTES = 64
+_MEMORY_CACHE_LIMIT = 64
+
+
+@dataclass
+class _FoldState:
+    """Messages folded from the complete lines before ``offset``."""
+
+    offset: int = 0
+    anchor: str = ""
+    messages: list[dict[str, Any]] = field(default_factory=list)
+    # Raw (unstripped) text of a trailing reasoning record still receiving chunks.
+    open_reasoning: str | None = None
+
+    def to_payload(self) -> dict[str, Any]:
+        return {
+            "schema_version": CACHE_SCHEMA_VERSION,
+            "offset": self.offset,
+            "anchor": self.anchor,
+            "open_reasoning": self.open_reasoning,
+            "messages": self.messages,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> "_FoldState | None":
+        if not isinstance(payload, dict) or payload.get("schema_version") != CACHE_SCHEMA_VERSION:
+            return None
+        messages = payload.get("messages")
+        open_reasoning = payload.get("open_reasoning")
+        try:
+            offset = int(payload.get("offset") or 0)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(messages, list) or offset < 0:
+            return None
+        return cls(
+            offset=offset,
+            anchor=str(payload.get("anchor") or ""),
+            messages=[item for item in messages if isinstance(item, dict)],
+            open_reasoning=open_reasoning if isinstance(open_reasoning, str) else None,
+        )
+
+
+class ThreadMessageCache:
+    """Parse only the bytes appended to ``events.jsonl`` since the last read.
+
+    The state keeps the byte offset of the last complete line it consumed and a
+    short fingerprint of the bytes just before it. A file that shrank or whose
+    fingerprint no longer matches was rewritten, and only then is the whole
+    file parsed again. Consecutive ``assistant_reasoning`` chunks fold into one
+    status record; ``assistant_chunk`` events are skipped because the final
+    ``assistant`` event carries the full reply. The snapshot on disk is only
+    rewritten when a new record appears, so streaming chunks cost nothing.
+    """
+
+    def __init__(self, *, memory_limit: int = _MEMORY_CACHE_LIMIT) -> None:
+        self._lock = threading.Lock()
+        self._states: OrderedDict[Path, _FoldState] = OrderedDict()
+        self._memory_limit = memory_limit
+
+    def read(self, session_path: Path, cache_path: Path) -> list[dict[str, Any]]:
+        with self._lock:
+            state = self._states.get(cache_path) or _load_snapshot(cache_path) or _FoldState()
+            record_count = len(state.messages)
+            with session_path.open("rb") as handle:
+                size = os.fstat(handle.fileno()).st_size
+                if not _state_matches(handle, state, size):
+                    state = _FoldState()
+                    record_count = -1
+                handle.seek(state.offset)
+                appended = handle.read(max(0, size - state.offset))
+                complete, newline, tail = appended.rpartition(b"\n")
+                if newline:
+                    _fold_lines(state, complete.split(b"\n"))
+                    state.offset += len(complete) + 1
+                    state.anchor = _read_anchor(handle, state.offset)
+            if len(state.messages) != record_count or not cache_path.exists():
+                _write_snapshot(cache_path, state)
+            self._remember(cache_path, state)
+            if not tail.strip():
+                return list(state.messages)
+            # An unterminated last line is folded into a throwaway copy so the
+            # next read can pick it up again once the writer finishes the line.
+            preview = _FoldState(
+                offset=state.offset,
+                messages=list(state.messages),
+                open_reasoning=state.open_reasoning,
+            )
+            if preview.open_reasoning is not None and preview.messages:
+                preview.messages[-1] = dict(preview.messages[-1])
+            _fold_lines(preview, [tail])
+            return preview.messages
+
+    def invalidate(self, cache_path: Path) -> None:
+        with self._lock:
+            self._states.pop(cache_path, None)
+
+    def _remember(self, cache_path: Path, state: _FoldState) -> None:
+        self._states[cache_path] = state
+        self._states.move_to_end(cache_path)
+        while len(self._states) > self._memory_limit:
+            self._states.popitem(last=False)
+
+
+def _fold_lines(state: _FoldState, lines: list[bytes]) -> None:
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            payload = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if not isinstance(payload, dict):
+            continue
+        _fold_event(state, payload)
+
+
+def _fold_event(state: _FoldState, payload: dict[str, Any]) -> None:
+    event_type = str(payload.get("type") or "").strip()
+    text = payload.get("text")
+    if event_type == "assistant_reasoning":
+        if not isinstance(text, str):
+            return
+        if state.open_reasoning is not None and state.messages:
+            state.open_reasoning += text
+            state.messages[-1]["text"] = state.open_reasoning.strip()
+            return
+        if not text.strip():
+            return
+        state.open_reasoning = text
+        state.messages.append(
+            {
+                "role": "status",
+                "kind": "assistant_reasoning",
+                "text": text.strip(),
+                "ts": str(payload.get("ts") or "").strip(),
+            }
+        )
+        return
+    state.open_reasoning = None
+    if event_type not in {"user", "assistant"} or not isinstance(text, str) or not text.strip():
+        return
+    state.messages.append(
+        {
+            "role": "user" if event_type == "user" else "assistant",
+            "text": text.strip(),
+            "ts": str(payload.get("ts") or "").strip(),
+        }
+    )
+
+
+def _state_matches(handle: BinaryIO, state: _FoldState, size: int) -> bool:
+    if state.offset == 0:
+        return True
+    if size < state.offset:
+        return False
+    return _read_anchor(handle, state.offset) == state.anchor
+
+
+def _read_anchor(handle: BinaryIO, offset: int) -> str:
+    start = max(0, offset - _ANCHOR_BYTES)
+    handle.seek(start)
+    return hashlib.sha1(handle.read(offset - start)).hexdigest()
+
+
+def _load_snapshot(cache_path: Path) -> _FoldState | None:
+    try:
+        payload = json.loads(cache_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("讀取 chat messages cache 失敗：%s", exc)
+        return None
+    return _FoldState.from_payload(payload)
+
+
+def _write_snapshot(cache_path: Path, state: _FoldState) -> None:
+    try:
+        atomic_write_text(cache_path, json.dumps(state.to_payload(), ensure_ascii=False))
+    except OSError as exc:
+        logger.warning("寫入 chat messages cache 失敗：%s", exc)
@@ -0,0 +1,216 @@
+"""Turn pre-processing: deterministic fast paths and concurrent classifiers."""
+
+from __future__ import annotations
+
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from amon.chat.cli import _parse_slash_command
+from amon.commands.registry import ensure_default_commands_initialized, list_commands
+from amon.config import ConfigLoader
+from amon.logging import log_event
+
+from .policy_guard import apply_policy_guard
+from .router_types import RouterResult
+
+DEFAULT_ROUTE_DEADLINE_S = 20.0
+DEFAULT_MODE_DEADLINE_S = 20.0
+_CONTINUATION_PASSTHROUGH_TYPES = {"chat_response", "command_plan", "graph_patch_plan"}
+_ACK_STRIP_RE = re.compile(r"[\s\.,!?~。，、！？…「」]+")
+_ACK_REPLIES = {
+    "好", "好的", "好啊", "好喔", "可以", "行", "沒問題", "對", "是", "是的", "嗯", "繼續", "請繼續", "繼續吧",
+    "開始", "開始吧", "照做", "就這樣", "ok", "okay", "yes", "y", "sure", "go", "continue", "goahead",
+}
+
+# Classifier calls are blocking provider requests; a small shared pool keeps a
+# burst of chat turns from spawning unbounded threads.
+_PREROUTE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="amon-preroute")
+
+RouteFn = Callable[..., RouterResult]
+DecideModeFn = Callable[..., str]
+
+
+@dataclass
+class PreRouteResult:
+    router_result: RouterResult
+    execution_mode: str | None = None
+    execution_mode_source: str | None = None
+    fast_path: str | None = None
+    stage_ms: dict[str, int] = field(default_factory=dict)
+    cancelled: list[str] = field(default_factory=list)
+    timed_out: list[str] = field(default_factory=list)
+
+
+def match_fast_path(
+    message: str,
+    *,
+    project_id: str | None = None,
+    short_continuation: bool = False,
+) -> tuple[str, RouterResult] | None:
+    """Return ``(name, result)`` when the turn can be routed without an LLM call.
+
+    Registered slash commands become command plans (still passed through the
+    policy guard), and short follow-ups in an existing thread become chat
+    responses unless they read like a natural-language command.
+    """
+    normalized = (message or "").strip()
+    if normalized.startswith("/"):
+        try:
+            command_name, args = _parse_slash_command(normalized)
+        except ValueError:
+            return None
+        ensure_default_commands_initialized()
+        registry = list_commands()
+        if command_name not in {command.get("name") for command in registry}:
+            return None
+        config = ConfigLoader().resolve(project_id=project_id).effective
+        guarded = apply_policy_guard(
+            RouterResult(type="command_plan", confidence=1.0, api=command_name, args=args, reason="slash_command"),
+            commands_registry=registry,
+            allowed_paths=config.get("tools", {}).get("allowed_paths", []),
+        )
+        return "slash_command", guarded
+    if short_continuation and is_acknowledgement_reply(normalized):
+        return "short_continuation", RouterResult(type="chat_response", confidence=1.0, reason="short_continuation")
+    return None
+
+
+def is_acknowledgement_reply(message: str) -> bool:
+    """Whether ``message`` is a bare go-ahead or option pick such as 「好」、「繼續」、「2」."""
+    parts = [part for part in _ACK_STRIP_RE.split((message or "").lower()) if part]
+    if not parts:
+        return False
+    joined = "".join(parts)
+    if joined in _ACK_REPLIES or all(part in _ACK_REPLIES for part in parts):
+        return True
+    return len(joined) == 1 and joined.isalnum() and joined.isascii()
+
+
+def preroute_turn(
+    message: str,
+    *,
+    route: RouteFn,
+    decide_mode: DecideModeFn,
+    project_id: str | None = None,
+    run_id: str | None = None,
+    thread_id: str | None = None,
+    last_router_type: str | None = None,
+    context: dict[str, Any] | None = None,
+    short_continuation: bool = False,
+    router_result: RouterResult | None = None,
+    speculate_mode: bool = True,
+    route_deadline_s: float = DEFAULT_ROUTE_DEADLINE_S,
+    mode_deadline_s: float = DEFAULT_MODE_DEADLINE_S,
+    executor: ThreadPoolExecutor | None = None,
+) -> PreRouteResult:
+    """Resolve router type and execution mode for one chat turn.
+
+    The intent router and the execution-mode classifier are independent, so the
+    classifier is started speculatively next to the router and its result is
+    dropped (or the pending call cancelled) when the router already settles the
+    turn. Each classifier has a deadline after which the safe fallback applies.
+    ``router_result`` skips routing when an earlier stage already decided it.
+    """
+    pool = executor or _PREROUTE_EXECUTOR
+    started_at = time.monotonic()
+    outcome = PreRouteResult(router_result=router_result or RouterResult(type="chat_response"))
+
+    if router_result is None:
+        fast_started_at = time.monotonic()
+        matched = match_fast_path(message, project_id=project_id, short_continuation=short_continuation)
+        outcome.stage_ms["fast_path_ms"] = _elapsed_ms(fast_started_at)
+        if matched is not None:
+            outcome.fast_path, router_result = matched
+
+    route_future: Future | None = None
+    if router_result is None:
+        route_future = pool.submit(
+            _timed,
+            route,
+            message,
+            project_id=project_id,
+            run_id=run_id,
+            context=context,
+            last_router_type=last_router_type,
+        )
+    mode_kwargs = {"project_id": project_id, "context": context, "run_id": run_id, "last_router_type": last_router_type}
+    mode_future: Future | None = None
+    mode_submitted_at = started_at
+    needs_mode = router_result is not None and router_result.type == "chat_response" and not router_result.execution_mode
+    if needs_mode or (router_result is None and speculate_mode):
+        mode_future = pool.submit(_timed, decide_mode, message, **mode_kwargs)
+
+    if route_future is not None:
+        routed = _await(route_future, started_at, route_deadline_s)
+        if routed is None:
+            outcome.timed_out.append("route_intent")
+            outcome.stage_ms["route_intent_ms"] = _elapsed_ms(started_at)
+            router_result = RouterResult(
+                type="chat_response",
+                confidence=0.0,
+                execution_mode="graph",
+                reason="路由逾時，已切換安全模式",
+            )
+        else:
+            router_result, outcome.stage_ms["route_intent_ms"] = routed
+        if short_continuation and router_result.type not in _CONTINUATION_PASSTHROUGH_TYPES:
+            log_event(
+                {
+                    "level": "INFO",
+                    "event": "ui_chat_force_continuation",
+                    "project_id": project_id,
+                    "thread_id": thread_id,
+                    "original_router_type": router_result.type,
+                }
+            )
+            router_result = RouterResult(type="chat_response", confidence=1.0, reason="short_continuation")
+    assert router_result is not None
+    outcome.router_result = router_result
+
+    if router_result.type != "chat_response" or router_result.execution_mode:
+        if mode_future is not None:
+            mode_future.cancel()
+            outcome.cancelled.append("execution_mode")
+        if router_result.execution_mode:
+            outcome.execution_mode = str(router_result.execution_mode).strip().lower()
+            outcome.execution_mode_source = "router"
+    else:
+        if mode_future is None:
+            mode_submitted_at = time.monotonic()
+            mode_future = pool.submit(_timed, decide_mode, message, **mode_kwargs)
+        decided = _await(mode_future, mode_submitted_at, mode_deadline_s)
+        if decided is None:
+            outcome.timed_out.append("execution_mode")
+            outcome.stage_ms["execution_mode_ms"] = _elapsed_ms(mode_submitted_at)
+            outcome.execution_mode = "graph"
+            outcome.execution_mode_source = "deadline"
+        else:
+            mode, outcome.stage_ms["execution_mode_ms"] = decided
+            outcome.execution_mode = str(mode or "").strip().lower() or "graph"
+            outcome.execution_mode_source = "classifier"
+    outcome.stage_ms["preroute_ms"] = _elapsed_ms(started_at)
+    return outcome
+
+
+def _timed(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> tuple[Any, int]:
+    started_at = time.monotonic()
+    result = fn(*args, **kwargs)
+    return result, _elapsed_ms(started_at)
+
+
+def _await(future: Future, started_at: float, deadline_s: float) -> tuple[Any, int] | None:
+    remaining = max(0.0, deadline_s - (time.monotonic() - started_at))
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeoutError:
+        # A running provider call cannot be interrupted; its result is dropped.
+        future.cancel()
+        return None
+
+
+def _elapsed_ms(started_at: float) -> int:
+    return int((time.monotonic() - started_at) * 1000)
@@ -18,6 +18,8 @@ def route_intent(
     run_id: str | None = None,
     context: dict[str, Any] | None = None,
     llm_client: LLMClient | None = None,
+    *,
+    last_router_type: str | None = None,
 ) -> RouterResult:
     ensure_default_commands_initialized()
 
@@ -37,6 +39,7 @@ def route_intent(
         commands_registry=commands_registry,
         project_id=project_id,
         llm_client=llm_client,
+        last_router_type=last_router_type,
     )
     config = ConfigLoader().resolve(project_id=project_id).effective
     allowed_paths = config.get("tools", {}).get("allowed_paths", [])
@@ -12,6 +12,7 @@ from typing import Any, Iterable, Protocol
 from amon.config import ConfigLoader
 from amon.models import ProviderError, build_provider
 
+from .decision_cache import get_decision_cache
 from .execution_mode import decide_execution_mode
 from .router_types import RouterResult
 
@@ -53,12 +54,26 @@ def route_with_llm(
     project_id: str | None = None,
     llm_client: LLMClient | None = None,
     model: str | None = None,
+    *,
+    last_router_type: str | None = None,
 ) -> RouterResult:
     global _router_cooldown_until
     if message is None:
         message = ""
 
     use_default_client = llm_client is None
+    cache_signature = {
+        "project_id": project_id,
+        "run_id": str(context.get("run_id") or "") or None,
+        "last_router_type": last_router_type,
+    }
+    if use_default_client:
+        cached = get_decision_cache().lookup("router", message, **cache_signature)
+        if cached is not None:
+            try:
+                return RouterResult(**cached)
+            except TypeError:
+                logger.warning("router 決策快取格式不符，改為重新判斷")
     if use_default_client and _cooldown_active(_router_cooldown_until):
         return RouterResult(type="chat_response", confidence=0.0, execution_mode="graph", reason="路由冷卻中，已切換安全模式")
 
@@ -82,7 +97,16 @@ def route_with_llm(
             },
         ]
         output_text = _collect_stream(llm_client, messages, model)
-        return _parse_router_result(output_text)
+        result = _parse_router_result(output_text)
+        if use_default_client:
+            get_decision_cache().store(
+                "router",
+                message,
+                result.to_dict(),
+                confidence=result.confidence,
+                **cache_signature,
+            )
+        return result
     except (ProviderError, OSError, ValueError) as exc:
         if use_default_client:
             _arm_cooldown("router")
@@ -98,12 +122,16 @@ def choose_execution_mode_with_llm(
     project_id: str | None = None,
     llm_client: LLMClient | None = None,
     model: str | None = None,
+    run_id: str | None = None,
+    last_router_type: str | None = None,
 ) -> str:
     return decide_execution_mode(
         message,
         project_id=project_id,
         llm_client=llm_client,
         model=model,
+        run_id=run_id,
+        last_router_type=last_router_type,
     )
 
 
@@ -0,0 +1,232 @@
+"""Coalesce streamed LLM tokens into small batches before they fan out to sinks."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable
+
+DEFAULT_WINDOW_MS = 40.0
+DEFAULT_MAX_CHARS = 512
+SESSION_WINDOW_MS = 200.0
+SESSION_MAX_CHARS = 64 * 1024
+_FLUSH_REASONS = ("size", "window", "barrier", "final")
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(float(raw), 0.0)
+    except ValueError:
+        return default
+
+
+class TokenCoalescer:
+    """Buffer tokens and hand them to ``emit`` as one joined chunk per batch.
+
+    A batch is emitted when it has been open for ``window_ms`` or holds at
+    least ``max_chars`` characters. Callers emitting any other event for the
+    same stream (reasoning, tool activity, done) must call :meth:`flush` first
+    so the sinks observe events in production order; :meth:`close` performs the
+    final flush and stops the background timer. ``emit`` always runs under the
+    coalescer lock, so batches never interleave. An exception raised by
+    ``emit`` on the timer thread is re-raised to the next caller.
+
+    ``window_ms=0`` disables batching and emits every token immediately.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str], None],
+        *,
+        window_ms: float | None = None,
+        max_chars: int | None = None,
+        time_func: Callable[[], float] | None = None,
+    ) -> None:
+        self._emit = emit
+        self.window_ms = window_ms if window_ms is not None else _env_float("AMON_UI_TOKEN_BATCH_MS", DEFAULT_WINDOW_MS)
+        self.max_chars = int(
+            max_chars if max_chars is not None else _env_float("AMON_UI_TOKEN_BATCH_MAX_CHARS", DEFAULT_MAX_CHARS)
+        )
+        self._time = time_func or time.monotonic
+        self._cond = threading.Condition(threading.RLock())
+        self._parts: list[str] = []
+        self._chars = 0
+        self._opened_at: float | None = None
+        self._closed = False
+        self._error: BaseException | None = None
+        self._timer: threading.Thread | None = None
+        self._batches = 0
+        self._tokens = 0
+        self._emitted_chars = 0
+        self._max_batch_tokens = 0
+        self._max_hold_ms = 0.0
+        self._total_hold_ms = 0.0
+        self._reasons = {reason: 0 for reason in _FLUSH_REASONS}
+
+    def push(self, token: str) -> None:
+        if not token:
+            return
+        with self._cond:
+            self._raise_pending_error()
+            if self._closed:
+                raise RuntimeError("token coalescer 已關閉")
+            self._parts.append(token)
+            self._chars += len(token)
+            if self._opened_at is None:
+                self._opened_at = self._time()
+                self._cond.notify_all()
+            if self.window_ms <= 0 or (self.max_chars > 0 and self._chars >= self.max_chars):
+                self._flush_locked("size")
+                return
+            self._ensure_timer()
+
+    def flush(self) -> None:
+        with self._cond:
+            self._raise_pending_error()
+            self._flush_locked("barrier")
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                self._raise_pending_error()
+                return
+            self._closed = True
+            self._cond.notify_all()
+            self._raise_pending_error()
+            self._flush_locked("final")
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "window_ms": self.window_ms,
+                "max_chars": self.max_chars,
+                "batches": self._batches,
+                "tokens": self._tokens,
+                "chars": self._emitted_chars,
+                "avg_batch_tokens": round(self._tokens / self._batches, 2) if self._batches else 0.0,
+                "max_batch_tokens": self._max_batch_tokens,
+                "avg_hold_ms": round(self._total_hold_ms / self._batches, 2) if self._batches else 0.0,
+                "max_hold_ms": round(self._max_hold_ms, 2),
+                "flush_reasons": dict(self._reasons),
+            }
+
+    def _flush_locked(self, reason: str) -> None:
+        if not self._parts:
+            return
+        parts, opened_at = self._parts, self._opened_at
+        self._parts, self._chars, self._opened_at = [], 0, None
+        hold_ms = max(0.0, (self._time() - opened_at) * 1000) if opened_at is not None else 0.0
+        self._batches += 1
+        self._tokens += len(parts)
+        self._max_batch_tokens = max(self._max_batch_tokens, len(parts))
+        self._max_hold_ms = max(self._max_hold_ms, hold_ms)
+        self._total_hold_ms += hold_ms
+        self._reasons[reason] += 1
+        text = "".join(parts)
+        self._emitted_chars += len(text)
+        self._emit(text)
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _ensure_timer(self) -> None:
+        if self._timer is not None:
+            return
+        self._timer = threading.Thread(target=self._run_timer, name="amon-token-coalescer", daemon=True)
+        self._timer.start()
+
+    def _run_timer(self) -> None:
+        window_s = self.window_ms / 1000
+        with self._cond:
+            while not self._closed:
+                if self._opened_at is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._opened_at + window_s - self._time()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                try:
+                    self._flush_locked("window")
+                except BaseException as exc:  # noqa: BLE001
+                    # Surface sink failures (e.g. a dropped client) on the producer thread.
+                    self._error = exc
+                    self._closed = True
+                    return
+
+
+class SessionEventWriter:
+    """Append events to one session JSONL file through a single handle, in batches.
+
+    Every event is still its own line with its own ``timestamp`` and
+    ``session_id``, exactly as ``AmonCore._append_session_event`` writes it.
+    Lines are held by a :class:`TokenCoalescer` and written with one
+    ``write`` + ``flush`` when the batch has been open for ``window_ms``,
+    holds ``max_chars`` characters, or the writer is closed. Only whole lines
+    are written, so a crash loses at most the unflushed window and never
+    leaves a torn line behind that the old per-event appends would not.
+    """
+
+    def __init__(
+        self,
+        session_path: Path,
+        session_id: str,
+        *,
+        now: Callable[[], str],
+        window_ms: float | None = None,
+        max_chars: int | None = None,
+        time_func: Callable[[], float] | None = None,
+    ) -> None:
+        self.session_path = session_path
+        self.session_id = session_id
+        self._now = now
+        self._handle = session_path.open("a", encoding="utf-8")
+        self._batcher = TokenCoalescer(
+            self._write,
+            window_ms=window_ms if window_ms is not None else _env_float("AMON_SESSION_EVENT_BATCH_MS", SESSION_WINDOW_MS),
+            max_chars=max_chars
+            if max_chars is not None
+            else int(_env_float("AMON_SESSION_EVENT_BATCH_MAX_CHARS", SESSION_MAX_CHARS)),
+            time_func=time_func,
+        )
+
+    def __enter__(self) -> SessionEventWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def append(self, payload: dict[str, Any]) -> None:
+        event_payload = {"timestamp": self._now(), "session_id": self.session_id}
+        event_payload.update(payload)
+        self._batcher.push(json.dumps(event_payload, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        self._batcher.flush()
+
+    def close(self) -> None:
+        try:
+            self._batcher.close()
+        finally:
+            self._handle.close()
+
+    def stats(self) -> dict[str, Any]:
+        return self._batcher.stats()
+
+    def _write(self, text: str) -> None:
+        self._handle.write(text)
+        self._handle.flush()
@@ -307,19 +307,21 @@ def load_recent_dialogue(project_id: str, thread_id: str, limit: int = 12) -> li
 
 
 def load_latest_run_context(project_id: str, thread_id: str) -> dict[str, str | None]:
-    """Load the latest run_id and assistant reply text from a thread."""
+    """Load the latest run_id, assistant reply text and router type from a thread."""
+    empty: dict[str, str | None] = {"run_id": None, "last_assistant_text": None, "last_router_type": None}
     if not thread_id:
-        return {"run_id": None, "last_assistant_text": None}
+        return dict(empty)
     validate_identifier(thread_id, "thread_id")
     validate_project_id(project_id)
     _migrate_legacy_sessions_if_needed(project_id)
 
     session_path = _thread_events_path(project_id, thread_id)
     if not session_path.exists():
-        return {"run_id": None, "last_assistant_text": None}
+        return dict(empty)
 
     latest_run_id: str | None = None
     last_assistant_text: str | None = None
+    last_router_type: str | None = None
     try:
         for payload in _iter_recent_session_payloads(session_path, max_lines=512, max_bytes=384 * 1024):
             run_id = payload.get("run_id")
@@ -329,6 +331,10 @@ def load_latest_run_context(project_id: str, thread_id: str) -> dict[str, str |
                 text = payload.get("text")
                 if isinstance(text, str) and text.strip():
                     last_assistant_text = text.strip()
+            elif payload.get("type") == "router":
+                text = payload.get("text")
+                if isinstance(text, str) and text.strip():
+                    last_router_type = text.strip()
     except OSError as exc:
         log_event(
             {
@@ -339,9 +345,9 @@ def load_latest_run_context(project_id: str, thread_id: str) -> dict[str, str |
                 "error": str(exc),
             }
         )
-        return {"run_id": None, "last_assistant_text": None}
+        return dict(empty)
 
-    return {"run_id": latest_run_id, "last_assistant_text": last_assistant_text}
+    return {"run_id": latest_run_id, "last_assistant_text": last_assistant_text, "last_router_type": last_router_type}
 
 
 def build_prompt_with_history(message: str, dialogue: list[dict[str, str]] | None = None) -> str:
@@ -14,7 +14,7 @@ from pathlib import Path
 
 import yaml
 
-from .artifacts import ensure_manifest, resolve_workspace_target, run_validators, update_manifest_for_file
+from .artifacts import ensure_manifest, manifest_transaction, resolve_workspace_target, run_validators
 from .config import ConfigLoader
 from .core import AmonCore
 from .events import emit_event
@@ -198,7 +198,9 @@ def build_parser() -> argparse.ArgumentParser:
 
     export_parser = subparsers.add_parser("export", help="匯出專案資料")
     export_parser.add_argument("--project", required=True, help="專案 ID")
-    export_parser.add_argument("--out", required=True, help="輸出檔案路徑（zip）")
+    export_parser.add_argument("--out", required=True, help="輸出檔案路徑（zip）；`-` 代表寫到 stdout")
+    export_parser.add_argument("--since", help="先前的匯出檔或 manifest，只打包之後變更的檔案")
+    export_parser.add_argument("--workers", type=int, help="平行壓縮的執行緒數（預設 AMON_EXPORT_WORKERS 或 CPU 數，最多 4）")
 
     eval_parser = subparsers.add_parser("eval", help="執行簡易回歸評測")
     eval_parser.add_argument("--suite", default="basic", help="評測套件（預設 basic）")
@@ -888,7 +890,12 @@ def _handle_fs(core: AmonCore, args: argparse.Namespace) -> None:
 
 
 def _handle_export(core: AmonCore, args: argparse.Namespace) -> None:
-    output_path = core.export_project(args.project, Path(args.out))
+    since = Path(args.since) if args.since else None
+    if args.out == "-":
+        result = core.export_project_stream(args.project, sys.stdout.buffer, since=since, workers=args.workers)
+        print(f"已匯出專案：{result['packed']} 個檔案", file=sys.stderr)
+        return
+    output_path = core.export_project(args.project, Path(args.out), since=since, workers=args.workers)
     print(f"已匯出專案：{output_path}")
 
 
@@ -1251,31 +1258,27 @@ def _handle_artifacts(core: AmonCore, args: argparse.Namespace) -> None:
     if args.artifacts_command == "check":
         target_paths = [args.path] if args.path else sorted(files.keys())
         updated: list[dict[str, str]] = []
-        for rel in target_paths:
-            if not rel:
-                continue
-            try:
-                target = resolve_workspace_target(project_path, str(rel))
-            except ValueError:
-                updated.append({"path": str(rel), "status": "error", "message": "path outside workspace"})
-                continue
-            if not target.exists() or not target.is_file():
-                updated.append({"path": str(rel), "status": "error", "message": "file not found"})
-                continue
-            checks = run_validators(target)
-            entry = update_manifest_for_file(
-                project_path=project_path,
-                target_path=target,
-                write_status="checked",
-                checks=checks,
-            )
-            updated.append(
-                {
-                    "path": str(rel),
-                    "status": str(entry.get("status") or ""),
-                    "message": str((checks[0].get("message") if checks else "") or ""),
-                }
-            )
+        with manifest_transaction(project_path) as transaction:
+            for rel in target_paths:
+                if not rel:
+                    continue
+                try:
+                    target = resolve_workspace_target(project_path, str(rel))
+                except ValueError:
+                    updated.append({"path": str(rel), "status": "error", "message": "path outside workspace"})
+                    continue
+                if not target.exists() or not target.is_file():
+                    updated.append({"path": str(rel), "status": "error", "message": "file not found"})
+                    continue
+                checks = run_validators(target)
+                entry = transaction.record(target, "checked", checks)
+                updated.append(
+                    {
+                        "path": str(rel),
+                        "status": str(entry.get("status") or ""),
+                        "message": str((checks[0].get("message") if checks else "") or ""),
+                    }
+                )
         print(yaml.safe_dump({"checked": updated}, allow_unicode=True, sort_keys=False))
         return
 
@@ -15,14 +15,16 @@ import threading
 import time
 import uuid
 import zipfile
+from bisect import bisect_right
 from collections import Counter
 from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
+from functools import partial
+from datetime import date, datetime
 import hashlib
 import importlib.resources as importlib_resources
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Iterator
 import unicodedata
 from zoneinfo import ZoneInfo
 import urllib.error
@@ -30,6 +32,7 @@ import urllib.request
 
 import yaml
 
+from .chat.stream_batching import SessionEventWriter
 from .config import DEFAULT_CONFIG, deep_merge, default_system_prompt, get_config_value, read_yaml, set_config_value, write_yaml
 from .fs.atomic import atomic_write_text, file_lock
 from .fs.safety import canonicalize_path, make_change_plan, require_confirm
@@ -42,10 +45,19 @@ from .graph_presets import (
     team_role_prototypes_json,
 )
 from .logging import log_billing, log_event
+from .memory import count_jsonl_records, iter_stage_records
+from .memory import extract as memory_extract
+from .memory.aliases import EntityAliasStore, normalize_alias_key
+from .memory.pipeline import IngestPipeline, IngestStage, map_ordered
+from .memory.ranking import DAY_PREFIX, ENTITY_PREFIX, CorpusStats, QueryTerm, TopK, boost_terms, maxscore, ranking_terms, score_terms
+from .memory.segments import MemorySegment, SegmentStore, segment_min_rows
+from .memory.service import MemoryIngestService
+from .memory.tags import TagFileBuilder
 from .logging_utils import setup_logger
 from .llm_request_log import append_llm_request, build_llm_request_payload
 from .mcp_client import MCPClientError, MCPServerConfig, MCPStdioClient
 from .planning import generate_plan_with_llm, semantic_plan_issues
+from .planning.pass_pipeline import PlannerGraphIndex, PlannerPassPipeline
 from .planning.planner_llm import _minimal_plan
 from .models import (
     ProviderError,
@@ -55,6 +67,7 @@ from .models import (
     encode_reasoning_chunk,
     encode_stream_event,
 )
+from .project_export import load_export_manifest, write_project_export
 from .project_registry import ProjectRegistry, load_project_config
 from .taskgraph3.amon_node_runner import AmonNodeRunner
 from .taskgraph3.payloads import (
@@ -143,6 +156,10 @@ class AmonCore:
             slug_builder=self._generate_project_slug,
             logger=self.logger,
         )
+        self._memory_ingest_service: MemoryIngestService | None = None
+        self._memory_ingest_service_lock = threading.Lock()
+        self._memory_segment_stores: dict[Path, SegmentStore] = {}
+        self._memory_segment_stores_lock = threading.Lock()
 
     def ensure_base_structure(self) -> None:
         for path in [
@@ -1515,29 +1532,81 @@ class AmonCore:
         available_tools: list[dict[str, Any]],
     ) -> GraphDefinition:
         tool_names = {str(item.get("name") or "") for item in available_tools if str(item.get("name") or "").strip()}
-        nodes = list(graph.nodes)
-        edges = list(graph.edges)
-        nodes, edges = self._deduplicate_concept_tasks(nodes, edges)
-        nodes, edges = self._ensure_concept_alignment_task(
-            nodes,
-            edges,
-            message=message,
-            tool_names=tool_names,
+        index = PlannerGraphIndex(graph.nodes, graph.edges, identity=self._planner_brief_identity_tokens)
+        pipeline = PlannerPassPipeline(index)
+        pipeline.run("deduplicate_concepts", self._deduplicate_concept_tasks)
+        pipeline.run("ensure_concept_alignment", self._ensure_concept_alignment_task, message=message, tool_names=tool_names)
+        pipeline.run("merge_spec_cluster", self._merge_spec_cluster_tasks)
+        pipeline.run("normalize_edge_directions", self._normalize_planner_edge_directions)
+        pipeline.run("collapse_artifacts", self._collapse_planner_artifact_nodes)
+        pipeline.run("promote_concept_entry", self._promote_concept_alignment_to_entry)
+        pipeline.run("stabilize_roots", self._stabilize_root_sequence)
+        pipeline.run("finalize_agent_nodes", self._finalize_planner_agent_nodes, available_tools=available_tools)
+        log_event(
+            {
+                "level": "INFO",
+                "event": "planner_postprocess_passes",
+                "payload": {
+                    "nodes": len(index.nodes),
+                    "edges": len(index.edges),
+                    "total_ms": pipeline.total_ms(),
+                    "passes": pipeline.timings,
+                },
+            }
+        )
+        nodes = index.nodes
+        edges = index.edges
+        processed = GraphDefinition(
+            id=graph.id,
+            version=graph.version,
+            name=graph.name,
+            description=graph.description,
+            status=graph.status,
+            created_at=graph.created_at,
+            updated_at=graph.updated_at,
+            created_by=graph.created_by,
+            updated_by=graph.updated_by,
+            entity_version=graph.entity_version,
+            nodes=nodes,
+            edges=edges,
+            metadata=graph.metadata,
+            runtime_capabilities=graph.runtime_capabilities,
+        )
+        try:
+            validate_graph_definition(processed)
+            return processed
+        except ValueError as exc:
+            if "CYCLE_DETECTED" not in str(exc):
+                raise
+        repaired_edges = self._linearize_planner_control_edges(processed.nodes, processed.edges)
+        repaired = GraphDefinition(
+            id=graph.id,
+            version=graph.version,
+            name=graph.name,
+            description=graph.description,
+            status=graph.status,
+            created_at=graph.created_at,
+            updated_at=graph.updated_at,
+            created_by=graph.created_by,
+            updated_by=graph.updated_by,
+            entity_version=graph.entity_version,
+            nodes=nodes,
+            edges=repaired_edges,
+            metadata=graph.metadata,
+            runtime_capabilities=graph.runtime_capabilities,
         )
-        nodes, edges = self._merge_spec_cluster_tasks(nodes, edges)
-        edges = self._normalize_planner_edge_directions(nodes, edges)
-        nodes, edges = self._collapse_planner_artifact_nodes(nodes, edges)
-        nodes, edges = self._promote_concept_alignment_to_entry(nodes, edges)
-        edges = self._stabilize_root_sequence(nodes, edges)
-        control_predecessors = self._build_control_predecessors(edges)
-        for node in nodes:
+        validate_graph_definition(repaired)
+        return repaired
+
+    def _finalize_planner_agent_nodes(self, index: PlannerGraphIndex, *, available_tools: list[dict[str, Any]]) -> None:
+        for node in index.nodes:
             if not isinstance(node, TaskNode) or node.task_spec.executor != "agent" or node.task_spec.agent is None:
                 continue
             if node.id == "concept_alignment":
                 self._bind_agent_skills(node, "concept-alignment")
             self._apply_planner_node_focus(node)
             if node.id != "concept_alignment":
-                binding_spec = self._select_planner_context_binding(node.id, control_predecessors)
+                binding_spec = self._select_planner_context_binding(index.predecessors(node.id))
                 if binding_spec is not None:
                     binding_key, binding_from_node, prompt_prefix = binding_spec
                     has_context_binding = any(
@@ -1575,47 +1644,6 @@ class AmonCore:
                 ),
                 available_tools,
             )
-        processed = GraphDefinition(
-            id=graph.id,
-            version=graph.version,
-            name=graph.name,
-            description=graph.description,
-            status=graph.status,
-            created_at=graph.created_at,
-            updated_at=graph.updated_at,
-            created_by=graph.created_by,
-            updated_by=graph.updated_by,
-            entity_version=graph.entity_version,
-            nodes=nodes,
-            edges=edges,
-            metadata=graph.metadata,
-            runtime_capabilities=graph.runtime_capabilities,
-        )
-        try:
-            validate_graph_definition(processed)
-            return processed
-        except ValueError as exc:
-            if "CYCLE_DETECTED" not in str(exc):
-                raise
-        repaired_edges = self._linearize_planner_control_edges(processed.nodes, processed.edges)
-        repaired = GraphDefinition(
-            id=graph.id,
-            version=graph.version,
-            name=graph.name,
-            description=graph.description,
-            status=graph.status,
-            created_at=graph.created_at,
-            updated_at=graph.updated_at,
-            created_by=graph.created_by,
-            updated_by=graph.updated_by,
-            entity_version=graph.entity_version,
-            nodes=nodes,
-            edges=repaired_edges,
-            metadata=graph.metadata,
-            runtime_capabilities=graph.runtime_capabilities,
-        )
-        validate_graph_definition(repaired)
-        return repaired
 
     @staticmethod
     def _linearize_planner_control_edges(
@@ -1721,13 +1749,13 @@ class AmonCore:
             ),
         ).lower()
 
-    def _is_concept_alignment_like_task(self, node: TaskNode) -> bool:
-        normalized = self._planner_brief_identity_tokens(node)
+    def _is_concept_alignment_like_task(self, node: TaskNode, *, identity: str | None = None) -> bool:
+        normalized = identity if identity is not None else self._planner_brief_identity_tokens(node)
         tokens = {"concept_alignment", "concept alignment", "概念對齊", "背景調研", "背景研究", "背景知識", "background research"}
         return any(token in normalized for token in tokens)
 
-    def _is_spec_cluster_like_task(self, node: TaskNode) -> bool:
-        normalized = self._planner_brief_identity_tokens(node)
+    def _is_spec_cluster_like_task(self, node: TaskNode, *, identity: str | None = None) -> bool:
+        normalized = identity if identity is not None else self._planner_brief_identity_tokens(node)
         tokens = {
             "requirements",
             "需求",
@@ -1747,21 +1775,18 @@ class AmonCore:
         }
         return any(token in normalized for token in tokens)
 
-    def _deduplicate_concept_tasks(
-        self,
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
-    ) -> tuple[list[BaseNode], list[GraphEdge]]:
+    def _deduplicate_concept_tasks(self, index: PlannerGraphIndex) -> None:
         concept_nodes = [
-            node for node in nodes if isinstance(node, TaskNode) and self._is_concept_alignment_like_task(node)
+            node
+            for node in index.task_nodes()
+            if self._is_concept_alignment_like_task(node, identity=index.identity(node))
         ]
         if len(concept_nodes) <= 1:
-            return nodes, edges
+            return
         primary_id = "concept_alignment" if any(node.id == "concept_alignment" for node in concept_nodes) else concept_nodes[0].id
         duplicate_ids = {node.id for node in concept_nodes if node.id != primary_id}
         if not duplicate_ids:
-            return nodes, edges
-        retained_nodes = [node for node in nodes if node.id not in duplicate_ids]
+            return
         retained_edges: list[GraphEdge] = []
         seen_edges: set[tuple[str, str, str, str]] = set()
 
@@ -1774,14 +1799,15 @@ class AmonCore:
 
         control_preds: dict[str, list[str]] = {}
         control_succs: dict[str, list[str]] = {}
-        for edge in edges:
-            if edge.edge_type == "CONTROL":
-                if edge.to_node in duplicate_ids and edge.from_node not in duplicate_ids:
-                    control_preds.setdefault(edge.to_node, []).append(edge.from_node)
-                if edge.from_node in duplicate_ids and edge.to_node not in duplicate_ids:
-                    control_succs.setdefault(edge.from_node, []).append(edge.to_node)
-
-        for edge in edges:
+        for duplicate_id in duplicate_ids:
+            for edge in index.incoming(duplicate_id):
+                if edge.edge_type == "CONTROL" and edge.from_node not in duplicate_ids:
+                    control_preds.setdefault(duplicate_id, []).append(edge.from_node)
+            for edge in index.outgoing(duplicate_id):
+                if edge.edge_type == "CONTROL" and edge.to_node not in duplicate_ids:
+                    control_succs.setdefault(duplicate_id, []).append(edge.to_node)
+
+        for edge in index.edges:
             if edge.from_node in duplicate_ids or edge.to_node in duplicate_ids:
                 if edge.edge_type == "DATA" and edge.from_node in duplicate_ids and edge.to_node not in duplicate_ids:
                     replacement = GraphEdge(
@@ -1817,25 +1843,29 @@ class AmonCore:
                             kind="DEPENDS_ON",
                         )
                     )
-        return retained_nodes, retained_edges
+        index.remove_nodes(duplicate_ids)
+        index.set_edges(retained_edges)
 
     def _ensure_concept_alignment_task(
         self,
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
+        index: PlannerGraphIndex,
         *,
         message: str,
         tool_names: set[str],
-    ) -> tuple[list[BaseNode], list[GraphEdge]]:
-        if any(node.id == "concept_alignment" for node in nodes):
-            return nodes, edges
+    ) -> None:
+        if index.has_node("concept_alignment"):
+            return
         existing_concept = next(
-            (node for node in nodes if isinstance(node, TaskNode) and self._is_concept_alignment_like_task(node)),
+            (
+                node
+                for node in index.task_nodes()
+                if self._is_concept_alignment_like_task(node, identity=index.identity(node))
+            ),
             None,
         )
         if existing_concept is not None:
             previous_id = existing_concept.id
-            existing_concept.id = "concept_alignment"
+            index.rename_node(previous_id, "concept_alignment", clone_edge=self._clone_edge_with_nodes)
             existing_concept.title = "概念對齊"
             existing_concept.task_spec.display.label = "概念對齊"
             if not str(existing_concept.task_spec.display.summary or "").strip():
@@ -1847,21 +1877,11 @@ class AmonCore:
                     "輸出請先完成概念對齊，再把摘要提供給下游節點。",
                     existing_concept.task_spec.agent.instructions or "",
                 )
-            rewritten_edges = [
-                self._clone_edge_with_nodes(
-                    edge,
-                    from_node="concept_alignment" if edge.from_node == previous_id else edge.from_node,
-                    to_node="concept_alignment" if edge.to_node == previous_id else edge.to_node,
-                )
-                for edge in edges
-            ]
-            for node in nodes:
-                if not isinstance(node, TaskNode):
-                    continue
+            for node in index.task_nodes():
                 for binding in node.task_spec.input_bindings:
                     if binding.from_node == previous_id:
                         binding.from_node = "concept_alignment"
-            return nodes, rewritten_edges
+            return
         keywords = self._extract_planning_keywords(message, limit=5)
         keyword_text = "、".join(keywords) if keywords else "任務目標、限制條件、輸出格式"
         concept_tools = [name for name in ("web.better_search", "web.search", "web.fetch") if name in tool_names]
@@ -1889,69 +1909,54 @@ class AmonCore:
                 ),
             ),
         )
-        return [concept_node, *nodes], edges
+        index.set_nodes([concept_node, *index.nodes])
 
     @staticmethod
-    def _promote_concept_alignment_to_entry(
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
-    ) -> tuple[list[BaseNode], list[GraphEdge]]:
-        concept_node = next(
-            (node for node in nodes if isinstance(node, TaskNode) and node.id == "concept_alignment"),
-            None,
-        )
-        if concept_node is None:
-            return nodes, edges
-
-        filtered_edges = [
-            edge
-            for edge in edges
-            if not (
-                edge.status == "active"
-                and edge.to_node == "concept_alignment"
-                and edge.edge_type in {"CONTROL", "DATA"}
-            )
-        ]
+    def _promote_concept_alignment_to_entry(index: PlannerGraphIndex) -> None:
+        concept_node = index.node("concept_alignment")
+        if not isinstance(concept_node, TaskNode):
+            return
+
+        dropped = {
+            id(edge)
+            for edge in index.incoming("concept_alignment")
+            if edge.status == "active" and edge.edge_type in {"CONTROL", "DATA"}
+        }
+        if dropped:
+            index.set_edges([edge for edge in index.edges if id(edge) not in dropped])
         concept_node.task_spec.input_bindings = [
             binding
             for binding in concept_node.task_spec.input_bindings
             if binding.source != "upstream"
         ]
-        return nodes, filtered_edges
 
     @staticmethod
-    def _normalize_planner_edge_directions(
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
-    ) -> list[GraphEdge]:
-        if not edges:
-            return edges
-
-        node_index = {node.id: index for index, node in enumerate(nodes)}
-        node_map = {node.id: node for node in nodes}
-        dependency_edges = [
-            edge
-            for edge in edges
-            if edge.status == "active"
-            and edge.edge_type == "CONTROL"
-            and edge.kind in {"DEPENDS_ON", "SOFT_DEPENDS"}
-            and edge.from_node in node_index
-            and edge.to_node in node_index
-        ]
-        backward_dependencies = sum(
-            1 for edge in dependency_edges if node_index[edge.from_node] > node_index[edge.to_node]
-        )
-        forward_dependencies = sum(
-            1 for edge in dependency_edges if node_index[edge.from_node] < node_index[edge.to_node]
-        )
+    def _normalize_planner_edge_directions(index: PlannerGraphIndex) -> None:
+        if not index.edges:
+            return
+
+        backward_dependencies = 0
+        forward_dependencies = 0
+        for edge in index.edges:
+            if edge.status != "active" or edge.edge_type != "CONTROL" or edge.kind not in {"DEPENDS_ON", "SOFT_DEPENDS"}:
+                continue
+            from_position = index.position(edge.from_node)
+            to_position = index.position(edge.to_node)
+            if from_position is None or to_position is None:
+                continue
+            if from_position > to_position:
+                backward_dependencies += 1
+            elif from_position < to_position:
+                forward_dependencies += 1
         reverse_control_dependencies = backward_dependencies > forward_dependencies
 
         normalized: list[GraphEdge] = []
-        for edge in edges:
+        changed = False
+        for edge in index.edges:
             from_node = edge.from_node
             to_node = edge.to_node
-            source_node = node_map.get(from_node)
-            target_node = node_map.get(to_node)
+            source_node = index.node(from_node)
+            target_node = index.node(to_node)
 
             if reverse_control_dependencies and edge.edge_type == "CONTROL" and edge.kind in {"DEPENDS_ON", "SOFT_DEPENDS"}:
                 from_node, to_node = to_node, from_node
@@ -1966,7 +1971,9 @@ class AmonCore:
                 normalized.append(edge)
                 continue
             normalized.append(AmonCore._clone_edge_with_nodes(edge, from_node=from_node, to_node=to_node))
-        return normalized
+            changed = True
+        if changed:
+            index.set_edges(normalized)
 
     @staticmethod
     def _merge_unique_text_segments(*segments: str) -> str:
@@ -2009,21 +2016,17 @@ class AmonCore:
             metadata=edge.metadata,
         )
 
-    def _merge_spec_cluster_tasks(
-        self,
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
-    ) -> tuple[list[BaseNode], list[GraphEdge]]:
+    def _merge_spec_cluster_tasks(self, index: PlannerGraphIndex) -> None:
         spec_nodes = [
-            node for node in nodes if isinstance(node, TaskNode) and self._is_spec_cluster_like_task(node)
+            node for node in index.task_nodes() if self._is_spec_cluster_like_task(node, identity=index.identity(node))
         ]
         if len(spec_nodes) <= 1:
-            return nodes, edges
+            return
 
         primary_node = spec_nodes[0]
         duplicate_ids = {node.id for node in spec_nodes[1:]}
         if not duplicate_ids:
-            return nodes, edges
+            return
 
         if primary_node.task_spec.agent is not None:
             primary_node.task_spec.agent.prompt = self._merge_unique_text_segments(
@@ -2070,10 +2073,9 @@ class AmonCore:
                 merged_artifacts.append(artifact)
         primary_node.task_spec.artifacts = merged_artifacts
 
-        retained_nodes = [node for node in nodes if node.id not in duplicate_ids]
         retained_edges: list[GraphEdge] = []
         seen_edges: set[tuple[str, str, str, str, str | None, str | None]] = set()
-        for edge in edges:
+        for edge in index.edges:
             from_node = primary_node.id if edge.from_node in duplicate_ids else edge.from_node
             to_node = primary_node.id if edge.to_node in duplicate_ids else edge.to_node
             if from_node == to_node:
@@ -2082,8 +2084,12 @@ class AmonCore:
             if signature in seen_edges:
                 continue
             seen_edges.add(signature)
-            retained_edges.append(self._clone_edge_with_nodes(edge, from_node=from_node, to_node=to_node))
-        return retained_nodes, retained_edges
+            if from_node == edge.from_node and to_node == edge.to_node:
+                retained_edges.append(edge)
+            else:
+                retained_edges.append(self._clone_edge_with_nodes(edge, from_node=from_node, to_node=to_node))
+        index.remove_nodes(duplicate_ids)
+        index.set_edges(retained_edges)
 
     @staticmethod
     def _guess_artifact_media_type(title: str) -> str | None:
@@ -2114,36 +2120,19 @@ class AmonCore:
             required=False,
         )
 
-    def _collapse_planner_artifact_nodes(
-        self,
-        nodes: list[BaseNode],
-        edges: list[GraphEdge],
-    ) -> tuple[list[BaseNode], list[GraphEdge]]:
-        artifact_nodes = [node for node in nodes if isinstance(node, ArtifactNode)]
+    def _collapse_planner_artifact_nodes(self, index: PlannerGraphIndex) -> None:
+        artifact_nodes = [node for node in index.nodes if isinstance(node, ArtifactNode)]
         if not artifact_nodes:
-            return nodes, edges
+            return
 
         artifact_ids = {node.id for node in artifact_nodes}
-        task_nodes = {
-            node.id: node
-            for node in nodes
-            if isinstance(node, TaskNode)
-        }
-        control_pairs = {
-            (edge.from_node, edge.to_node)
-            for edge in edges
-            if edge.edge_type == "CONTROL"
-        }
+        task_nodes = {node.id: node for node in index.task_nodes()}
+        control_pairs = set(index.control_pairs())
         additional_edges: list[GraphEdge] = []
 
         for artifact_node in artifact_nodes:
-            producers: list[str] = []
-            consumers: list[str] = []
-            for edge in edges:
-                if edge.to_node == artifact_node.id and edge.from_node in task_nodes:
-                    producers.append(edge.from_node)
-                elif edge.from_node == artifact_node.id and edge.to_node in task_nodes:
-                    consumers.append(edge.to_node)
+            producers = [edge.from_node for edge in index.incoming(artifact_node.id) if edge.from_node in task_nodes]
+            consumers = [edge.to_node for edge in index.outgoing(artifact_node.id) if edge.to_node in task_nodes]
             if not producers:
                 continue
 
@@ -2172,41 +2161,31 @@ class AmonCore:
                     )
                     control_pairs.add((producer_id, consumer_id))
 
-        retained_nodes = [node for node in nodes if node.id not in artifact_ids]
-        retained_edges = [
-            edge
-            for edge in edges
-            if edge.from_node not in artifact_ids and edge.to_node not in artifact_ids
-        ]
-        retained_edges.extend(additional_edges)
-        return retained_nodes, retained_edges
+        index.remove_nodes(artifact_ids)
+        index.set_edges(
+            [
+                edge
+                for edge in index.edges
+                if edge.from_node not in artifact_ids and edge.to_node not in artifact_ids
+            ]
+            + additional_edges
+        )
 
     @staticmethod
-    def _dependency_incoming_counts(nodes: list[BaseNode], edges: list[GraphEdge]) -> dict[str, int]:
-        incoming = {node.id: 0 for node in nodes}
-        for edge in edges:
-            if edge.edge_type not in {"CONTROL", "DATA"}:
-                continue
-            incoming[edge.to_node] = incoming.get(edge.to_node, 0) + 1
-        return incoming
-
-    def _stabilize_root_sequence(self, nodes: list[BaseNode], edges: list[GraphEdge]) -> list[GraphEdge]:
+    def _stabilize_root_sequence(index: PlannerGraphIndex) -> None:
         executable_ids = [
-            node.id for node in nodes if node.id != "concept_alignment" and node.node_type in {"TASK", "GATE", "GROUP"}
+            node.id
+            for node in index.nodes
+            if node.id != "concept_alignment" and node.node_type in {"TASK", "GATE", "GROUP"}
         ]
         if not executable_ids:
-            return edges
-        incoming = self._dependency_incoming_counts(nodes, edges)
-        root_ids = [node_id for node_id in executable_ids if incoming.get(node_id, 0) == 0]
+            return
+        root_ids = [node_id for node_id in executable_ids if not index.predecessors(node_id)]
         if not root_ids:
-            return edges
-        seen_pairs = {
-            (edge.from_node, edge.to_node)
-            for edge in edges
-            if edge.edge_type == "CONTROL"
-        }
-        stabilized = list(edges)
-        previous_id = "concept_alignment" if any(node.id == "concept_alignment" for node in nodes) else None
+            return
+        seen_pairs = set(index.control_pairs())
+        stabilized: list[GraphEdge] = []
+        previous_id = "concept_alignment" if index.has_node("concept_alignment") else None
         for root_id in root_ids:
             if previous_id and previous_id != root_id and (previous_id, root_id) not in seen_pairs:
                 stabilized.append(
@@ -2219,7 +2198,7 @@ class AmonCore:
                 )
                 seen_pairs.add((previous_id, root_id))
             previous_id = root_id
-        return stabilized
+        index.append_edges(stabilized)
 
     @staticmethod
     def _append_agent_system_prompt(agent: AgentTaskConfig, addition: str) -> None:
@@ -2275,20 +2254,8 @@ class AmonCore:
         return []
 
     @staticmethod
-    def _build_control_predecessors(edges: list[GraphEdge]) -> dict[str, list[str]]:
-        predecessors: dict[str, list[str]] = {}
-        for edge in edges:
-            if edge.edge_type not in {"CONTROL", "DATA"}:
-                continue
-            predecessors.setdefault(edge.to_node, []).append(edge.from_node)
-        return predecessors
-
-    @staticmethod
-    def _select_planner_context_binding(
-        node_id: str,
-        control_predecessors: dict[str, list[str]],
-    ) -> tuple[str, str, str] | None:
-        predecessors = [item for item in control_predecessors.get(node_id, []) if item]
+    def _select_planner_context_binding(control_predecessors: list[str]) -> tuple[str, str, str] | None:
+        predecessors = [item for item in control_predecessors if item]
         non_concept_predecessors = [item for item in predecessors if item != "concept_alignment"]
         if len(non_concept_predecessors) == 1:
             return (
@@ -2612,13 +2579,52 @@ class AmonCore:
             summary_lines.append("  - 尚未找到 TODO.md / ProjectManager.md / final.md")
         return "\n".join(summary_lines)
 
-    def export_project(self, project_id: str, output_path: Path) -> Path:
+    def export_project(
+        self,
+        project_id: str,
+        output_path: Path,
+        *,
+        since: Path | None = None,
+        workers: int | None = None,
+    ) -> Path:
+        """Write the project export to ``output_path``.
+
+        ``since`` is an earlier export (or its manifest); only files changed
+        since then are packed. The archive is written next to ``output_path``
+        and renamed into place, so ``since`` may be the same file.
+        """
+        output_path = output_path.expanduser()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_handle = tempfile.NamedTemporaryFile(
+            mode="wb",
+            dir=str(output_path.parent),
+            prefix=f".{output_path.name}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        try:
+            with temp_handle:
+                self.export_project_stream(project_id, temp_handle, since=since, workers=workers, output_path=output_path)
+            os.replace(temp_handle.name, output_path)
+        except BaseException:
+            Path(temp_handle.name).unlink(missing_ok=True)
+            raise
+        return output_path
+
+    def export_project_stream(
+        self,
+        project_id: str,
+        fileobj: BinaryIO,
+        *,
+        since: Path | None = None,
+        workers: int | None = None,
+        output_path: Path | None = None,
+    ) -> dict[str, Any]:
+        """Stream the project export archive to ``fileobj``, which need not be seekable."""
         record = self.get_project(project_id)
         project_path = Path(record.path)
         if not project_path.exists():
             raise FileNotFoundError(f"專案路徑不存在：{project_path}")
-        output_path = output_path.expanduser()
-        output_path.parent.mkdir(parents=True, exist_ok=True)
         payload_paths = [
             project_path / "amon.project.yaml",
             project_path / "docs",
@@ -2626,23 +2632,32 @@ class AmonCore:
             project_path / "sessions",
             project_path / "logs",
         ]
-        base_prefix = project_id
+        started = time.perf_counter()
         try:
-            with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-                for path in payload_paths:
-                    self._add_export_path(archive, path, base_prefix, project_path)
-        except OSError as exc:
+            base_manifest = load_export_manifest(since.expanduser()) if since else None
+            summary = write_project_export(
+                fileobj,
+                project_path,
+                payload_paths,
+                project_id=project_id,
+                base_manifest=base_manifest,
+                workers=workers,
+            )
+        except (OSError, ValueError, json.JSONDecodeError) as exc:
             self.logger.error("匯出專案失敗：%s", exc, exc_info=True)
             raise
+        result = {**summary.as_dict(), "duration_ms": round((time.perf_counter() - started) * 1000, 3)}
         log_event(
             {
                 "level": "INFO",
                 "event": "project_export",
                 "project_id": project_id,
-                "output_path": str(output_path),
+                "output_path": str(output_path) if output_path else None,
+                "incremental": since is not None,
+                **result,
             }
         )
-        return output_path
+        return result
 
     def _build_single_graph(self) -> dict[str, Any]:
         return build_single_graph_payload()
@@ -2899,6 +2914,7 @@ class AmonCore:
             "last_heartbeat_ts": status.last_heartbeat_ts,
             "last_error": status.last_error,
             "last_event_id": status.last_event_id,
+            "watch_metrics": status.watch_metrics,
         }
 
     def create_graph_template(self, project_id: str, run_id: str, name: str | None = None) -> dict[str, Any]:
@@ -5073,236 +5089,200 @@ class AmonCore:
         return memory_dir / "entity_aliases.json"
 
     def _normalize_alias_key(self, name: str) -> str:
-        normalized = unicodedata.normalize("NFKC", name).strip().lower()
-        normalized = re.sub(r"\s+", "", normalized)
-        return normalized
+        return normalize_alias_key(name)
 
-    def _slugify_entity_name(self, name: str) -> str:
-        normalized = unicodedata.normalize("NFKC", name).strip().lower()
-        normalized = re.sub(r"\s+", "_", normalized)
-        normalized = re.sub(r"[^\w\u4e00-\u9fff]+", "_", normalized)
-        normalized = normalized.strip("_")
-        return normalized or "unknown"
-
-    def _load_entity_aliases(self, memory_dir: Path) -> dict[str, Any]:
-        aliases_path = self._entity_aliases_path(memory_dir)
-        if not aliases_path.exists():
-            return {"entities": {}, "aliases": {}}
+    def _load_entity_aliases(self, memory_dir: Path) -> EntityAliasStore:
+        alias_store = EntityAliasStore(self._entity_aliases_path(memory_dir))
+        self._reload_entity_aliases(alias_store)
+        return alias_store
+
+    def _reload_entity_aliases(self, alias_store: EntityAliasStore) -> None:
         try:
-            payload = json.loads(aliases_path.read_text(encoding="utf-8"))
+            alias_store.load()
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("讀取 entity aliases 失敗：%s", exc, exc_info=True)
             raise
-        if not isinstance(payload, dict):
-            return {"entities": {}, "aliases": {}}
-        payload.setdefault("entities", {})
-        payload.setdefault("aliases", {})
-        return payload
 
-    def _save_entity_aliases(self, memory_dir: Path, payload: dict[str, Any]) -> None:
-        aliases_path = self._entity_aliases_path(memory_dir)
+    def _save_entity_aliases(self, memory_dir: Path, alias_store: EntityAliasStore, *, compact: bool = False) -> None:
         try:
-            self._atomic_write_text(
-                aliases_path,
-                json.dumps(payload, ensure_ascii=False, indent=2),
-            )
+            if compact:
+                alias_store.compact()
+            else:
+                alias_store.flush()
         except OSError as exc:
             self.logger.error("寫入 entity aliases 失敗：%s", exc, exc_info=True)
             raise
 
-    def _build_canonical_id(self, entity_type: str, name: str, entities: dict[str, Any]) -> str:
-        base_slug = self._slugify_entity_name(name)
-        canonical_id = f"{entity_type}:{base_slug}"
-        if canonical_id in entities and entities[canonical_id].get("name") != name:
-            digest = hashlib.md5(name.encode("utf-8")).hexdigest()[:6]
-            canonical_id = f"{canonical_id}-{digest}"
-        return canonical_id
-
-    def _ensure_entity_alias(
-        self,
-        entities: dict[str, Any],
-        canonical_id: str,
-        alias: str,
-        entity_type: str | None = None,
-    ) -> None:
-        entry = entities.setdefault(
-            canonical_id,
-            {
-                "canonical_id": canonical_id,
-                "name": alias,
-                "type": entity_type or "",
-                "aliases": [],
-                "merged_ids": [],
-            },
-        )
-        if entity_type and not entry.get("type"):
-            entry["type"] = entity_type
-        if alias and not entry.get("name"):
-            entry["name"] = alias
-        alias_list = entry.setdefault("aliases", [])
-        if alias not in alias_list:
-            alias_list.append(alias)
-
-    def _find_alias_merge_candidate(
-        self,
-        name: str,
-        entity_type: str,
-        entities: dict[str, Any],
-    ) -> str | None:
-        if entity_type != "person":
-            return None
-        if len(name) > 3:
-            return None
-        candidates: list[tuple[int, str]] = []
-        for canonical_id, entry in entities.items():
-            if entry.get("type") != "person":
-                continue
-            known_name = str(entry.get("name") or "")
-            aliases = entry.get("aliases") or []
-            if name and (known_name.endswith(name) or name in known_name):
-                candidates.append((len(known_name), canonical_id))
-                continue
-            if any(name and (alias.endswith(name) or name in alias) for alias in aliases):
-                candidates.append((len(known_name), canonical_id))
-        if not candidates:
-            return None
-        candidates.sort(reverse=True)
-        return candidates[0][1]
-
-    def _resolve_entity_canonical_id(
-        self,
-        name: str,
-        entity_type: str,
-        alias_state: dict[str, Any],
-    ) -> str:
-        alias_key = self._normalize_alias_key(name)
-        aliases = alias_state.setdefault("aliases", {})
-        entities = alias_state.setdefault("entities", {})
-        if alias_key in aliases:
-            canonical_id = aliases[alias_key]
-            self._ensure_entity_alias(entities, canonical_id, name, entity_type)
-            return canonical_id
-        candidate_id = self._find_alias_merge_candidate(name, entity_type, entities)
-        if candidate_id:
-            aliases[alias_key] = candidate_id
-            self._ensure_entity_alias(entities, candidate_id, name, entity_type)
-            return candidate_id
-        canonical_id = self._build_canonical_id(entity_type, name, entities)
-        aliases[alias_key] = canonical_id
-        entities.setdefault(
-            canonical_id,
-            {
-                "canonical_id": canonical_id,
-                "name": name,
-                "type": entity_type,
-                "aliases": [name],
-                "merged_ids": [],
-            },
-        )
-        if entity_type == "person":
-            for derived in self._derive_person_aliases(name):
-                derived_key = self._normalize_alias_key(derived)
-                if derived_key not in aliases:
-                    aliases[derived_key] = canonical_id
-                    self._ensure_entity_alias(entities, canonical_id, derived, entity_type)
-        return canonical_id
-
-    def _derive_person_aliases(self, name: str) -> list[str]:
-        normalized = unicodedata.normalize("NFKC", name).strip()
-        if len(normalized) < 3:
-            return []
-        alias = normalized[1:]
-        return [alias] if alias and alias != normalized else []
-
-    def _vectorize_text(self, text: str) -> Counter[str]:
-        cleaned = re.sub(r"\s+", "", text.lower())
-        if len(cleaned) < 2:
-            return Counter({cleaned: 1}) if cleaned else Counter()
-        grams = [cleaned[index : index + 2] for index in range(len(cleaned) - 1)]
-        return Counter(grams)
-
-    def _cosine_similarity(self, left: Counter[str], right: Counter[str]) -> float:
-        if not left or not right:
-            return 0.0
-        intersection = set(left) & set(right)
-        numerator = sum(left[token] * right[token] for token in intersection)
-        left_norm = sum(value * value for value in left.values()) ** 0.5
-        right_norm = sum(value * value for value in right.values()) ** 0.5
-        if left_norm == 0 or right_norm == 0:
-            return 0.0
-        return numerator / (left_norm * right_norm)
-
     def search_memory(
         self,
         project_path: Path,
         query: str,
         time_range: dict[str, str] | None = None,
         top_k: int = 5,
+        *,
+        entity_boost: float = 1.0,
+        time_boost: float = 0.5,
     ) -> list[dict[str, Any]]:
+        """Rank chunks by BM25 over their tag ``embedding_text``.
+
+        Chunks that mention an entity or a day named in ``query`` gain a fixed
+        ``entity_boost``/``time_boost``. When fewer than ``top_k`` chunks
+        match, the rest are filled with score 0 in file order.
+        """
         if not project_path:
             raise ValueError("執行 memory search 需要指定專案")
         memory_dir = self._prepare_memory_dir(project_path)
         normalized_path = memory_dir / "normalized.jsonl"
         tags_path = memory_dir / "tags.jsonl"
-        if not normalized_path.exists() or not tags_path.exists():
+        segments, cursors = self._open_memory_segments(memory_dir)
+        if not segments and (not normalized_path.exists() or not tags_path.exists()):
             raise FileNotFoundError("找不到 memory normalized/tags 檔案")
+        day_range = self._memory_day_range(time_range or {})
+        tail = self._read_memory_search_tail(memory_dir, cursors)
+        stats = CorpusStats(segments, (terms for _, terms, _ in tail))
+        query_terms = stats.query_terms(query) + self._memory_query_boosts(memory_dir, query, entity_boost, time_boost)
+
+        # Positions number segment rows and then tail rows in file order; the
+        # collector breaks score ties by position.
+        collector = TopK(max(top_k, 1))
+        bases: list[int] = []
+        allowed_rows: list[set[int] | None] = []
+        base = 0
+        for segment in segments:
+            allowed = set(segment.rows_in_days(*day_range)) if day_range else None
+            maxscore(segment, query_terms, stats.avgdl, collector, base=base, allowed=allowed)
+            bases.append(base)
+            allowed_rows.append(allowed)
+            base += len(segment)
+        tail_base = base
+        tail_rows = [
+            index
+            for index, (normalized, _, _) in enumerate(tail)
+            if not day_range or self._within_day_range(normalized, day_range)
+        ]
+        for index in tail_rows:
+            _, terms, boosts = tail[index]
+            score = score_terms(query_terms, terms, boosts, stats.avgdl)
+            if score > collector.threshold:
+                collector.offer(score, tail_base + index, index)
+
+        ranked = [(score, position) for score, position, _ in collector.results()]
+        if len(ranked) < collector.k:
+            taken = collector.positions()
+
+            def _positions() -> Iterator[int]:
+                for segment, segment_base, allowed in zip(segments, bases, allowed_rows):
+                    rows = sorted(allowed) if allowed is not None else range(len(segment))
+                    yield from (segment_base + row for row in rows)
+                yield from (tail_base + index for index in tail_rows)
+
+            for position in _positions():
+                if len(ranked) >= collector.k:
+                    break
+                if position not in taken:
+                    ranked.append((0.0, position))
+
+        hits = []
+        for score, position in ranked:
+            if position >= tail_base:
+                record = tail[position - tail_base][0]
+            else:
+                index = bisect_right(bases, position) - 1
+                record = segments[index].record(position - bases[index])
+            hits.append(self._memory_search_hit(record, score))
+        return hits
+
+    def _read_memory_search_tail(
+        self, memory_dir: Path, cursors: dict[str, Any]
+    ) -> list[tuple[dict[str, Any], Counter[str], set[str]]]:
+        """``(normalized, ranking terms, boost terms)`` of every row after the segments."""
         tag_map: dict[str, dict[str, Any]] = {}
         try:
-            with tags_path.open("r", encoding="utf-8") as tags_handle:
-                for line in tags_handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    record = json.loads(payload)
-                    chunk_id = str(record.get("chunk_id") or "")
-                    if not chunk_id:
-                        continue
-                    tag_map[chunk_id] = record
+            for record in iter_stage_records(memory_dir / "tags.jsonl", cursors["tags"]):
+                chunk_id = str(record.get("chunk_id") or "")
+                if not chunk_id:
+                    continue
+                tag_map[chunk_id] = record
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("讀取 memory tags 失敗：%s", exc, exc_info=True)
             raise
-        query_vector = self._vectorize_text(query)
-        candidates: list[dict[str, Any]] = []
+        entity_map: dict[str, list[dict[str, Any]]] = {}
         try:
-            with normalized_path.open("r", encoding="utf-8") as normalized_handle:
-                for line in normalized_handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    normalized = json.loads(payload)
-                    if time_range and not self._within_time_range(normalized, time_range):
-                        continue
-                    chunk_id = str(normalized.get("chunk_id") or "")
-                    tags = tag_map.get(chunk_id, {})
-                    embedding_text = str(tags.get("embedding_text") or normalized.get("text") or "")
-                    score = self._cosine_similarity(query_vector, self._vectorize_text(embedding_text))
-                    candidates.append(
-                        {
-                            "chunk_id": chunk_id,
-                            "score": score,
-                            "text": normalized.get("text"),
-                            "created_at": normalized.get("created_at"),
-                            "source_path": normalized.get("source_path"),
-                            "time": normalized.get("time"),
-                        }
+            for record in iter_stage_records(memory_dir / "entities.jsonl", cursors["entities"]):
+                chunk_id = str(record.get("chunk_id") or "")
+                if not chunk_id:
+                    continue
+                entity_map.setdefault(chunk_id, []).append(record.get("mention") or {})
+        except (OSError, json.JSONDecodeError) as exc:
+            self.logger.error("讀取 memory entities 失敗：%s", exc, exc_info=True)
+            raise
+        tail = []
+        try:
+            for normalized in iter_stage_records(memory_dir / "normalized.jsonl", cursors["normalized"]):
+                chunk_id = str(normalized.get("chunk_id") or "")
+                tags = tag_map.get(chunk_id, {})
+                embedding_text = str(tags.get("embedding_text") or normalized.get("text") or "")
+                tail.append(
+                    (
+                        normalized,
+                        ranking_terms(embedding_text),
+                        boost_terms(normalized, entity_map.get(chunk_id, [])),
                     )
+                )
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("讀取 memory normalized 失敗：%s", exc, exc_info=True)
             raise
-        candidates.sort(key=lambda item: item["score"], reverse=True)
-        return candidates[: max(top_k, 1)]
+        return tail
+
+    def _memory_query_boosts(
+        self, memory_dir: Path, query: str, entity_boost: float, time_boost: float
+    ) -> list[QueryTerm]:
+        boosts: list[QueryTerm] = []
+        if time_boost > 0:
+            days = set()
+            for mention in memory_extract.extract_time_mentions(query, self._now()):
+                try:
+                    days.add(date.fromisoformat(str(mention.get("resolved_date") or "")).toordinal())
+                except ValueError:
+                    continue
+            boosts.extend(QueryTerm(f"{DAY_PREFIX}{day}", time_boost, saturate=False) for day in sorted(days))
+        if entity_boost > 0:
+            keys = [normalize_alias_key(entity["name"]) for entity in memory_extract.extract_explicit_entities(query)]
+            if keys:
+                aliases = self._load_entity_aliases(memory_dir).aliases
+                canonical_ids = dict.fromkeys(aliases[key] for key in keys if key in aliases)
+                boosts.extend(QueryTerm(ENTITY_PREFIX + canonical_id, entity_boost, saturate=False) for canonical_id in canonical_ids)
+        return boosts
+
+    def _memory_search_hit(self, record: dict[str, Any], score: float) -> dict[str, Any]:
+        return {
+            "chunk_id": str(record.get("chunk_id") or ""),
+            "score": score,
+            "text": record.get("text"),
+            "created_at": record.get("created_at"),
+            "source_path": record.get("source_path"),
+            "time": record.get("time"),
+        }
 
-    def _within_time_range(self, normalized: dict[str, Any], time_range: dict[str, str]) -> bool:
+    def _memory_day_range(self, time_range: dict[str, str]) -> tuple[int | None, int | None] | None:
+        """Inclusive ``(start, end)`` date ordinals of ``time_range``, or ``None`` for no filter."""
         start_raw = time_range.get("start") or time_range.get("from")
         end_raw = time_range.get("end") or time_range.get("to")
         if not start_raw and not end_raw:
-            return True
+            return None
         try:
             start_date = date.fromisoformat(start_raw) if start_raw else None
             end_date = date.fromisoformat(end_raw) if end_raw else None
         except ValueError:
             self.logger.warning("time.range 格式錯誤，略過時間過濾。")
-            return True
+            return None
+        return (
+            start_date.toordinal() if start_date else None,
+            end_date.toordinal() if end_date else None,
+        )
+
+    def _within_day_range(self, normalized: dict[str, Any], day_range: tuple[int | None, int | None]) -> bool:
+        start_day, end_day = day_range
         created_at = str(normalized.get("created_at") or "")
         created = self._parse_chunk_created_at(created_at)
         created_date = created.date() if created else None
@@ -5318,9 +5298,9 @@ class AmonCore:
         def in_range(target: date | None) -> bool:
             if target is None:
                 return False
-            if start_date and target < start_date:
+            if start_day is not None and target.toordinal() < start_day:
                 return False
-            if end_date and target > end_date:
+            if end_day is not None and target.toordinal() > end_day:
                 return False
             return True
         if in_range(created_date):
@@ -5328,300 +5308,144 @@ class AmonCore:
         return any(in_range(item) for item in mention_dates)
 
     def _sanitize_tag_value(self, value: str) -> str:
-        sanitized = value.replace("\n", " ").replace("\r", " ")
-        sanitized = sanitized.replace("```", "").replace("`", "")
-        sanitized = sanitized.replace("<", "").replace(">", "")
-        sanitized = re.sub(r"\s+", " ", sanitized).strip()
-        return sanitized
+        return memory_extract.sanitize_tag_value(value)
 
     def _build_tags_markdown(
         self,
         normalized: dict[str, Any],
         entity_mentions: list[dict[str, Any]],
     ) -> str:
-        lines = ["## AMON_MEMORY_TAGS"]
-        time_mentions = normalized.get("time", {}).get("mentions", [])
-        geo_mentions = normalized.get("geo", {}).get("mentions", [])
-
-        if time_mentions:
-            for mention in time_mentions:
-                raw = self._sanitize_tag_value(str(mention.get("raw") or ""))
-                resolved = self._sanitize_tag_value(str(mention.get("resolved_date") or ""))
-                lines.append(f'- time_mentions: raw="{raw}", resolved_date="{resolved}"')
-        else:
-            lines.append("- time_mentions: none")
-
-        if geo_mentions:
-            for mention in geo_mentions:
-                raw = self._sanitize_tag_value(str(mention.get("raw") or ""))
-                geocode = self._sanitize_tag_value(str(mention.get("geocode_id") or ""))
-                normalized_name = self._sanitize_tag_value(str(mention.get("normalized_name") or ""))
-                lines.append(
-                    f'- geo_mentions: raw="{raw}", geocode_id="{geocode}", normalized_name="{normalized_name}"'
-                )
-        else:
-            lines.append("- geo_mentions: none")
-
-        if entity_mentions:
-            for mention in entity_mentions:
-                pronoun = self._sanitize_tag_value(str(mention.get("pronoun") or ""))
-                resolved_to = self._sanitize_tag_value(str(mention.get("resolved_to") or ""))
-                resolved_to_canonical = self._sanitize_tag_value(str(mention.get("resolved_to_canonical_id") or ""))
-                name = self._sanitize_tag_value(str(mention.get("name") or ""))
-                canonical_id = self._sanitize_tag_value(str(mention.get("canonical_id") or ""))
-                entity_type = self._sanitize_tag_value(str(mention.get("entity_type") or ""))
-                confidence = mention.get("confidence")
-                needs_review = mention.get("needs_review")
-                rule = self._sanitize_tag_value(str(mention.get("rule") or ""))
-                lines.append(
-                    "- entity_mentions: "
-                    f'pronoun="{pronoun}", resolved_to="{resolved_to}", resolved_to_canonical_id="{resolved_to_canonical}", '
-                    f'name="{name}", canonical_id="{canonical_id}", entity_type="{entity_type}", '
-                    f'confidence="{confidence}", needs_review="{needs_review}", rule="{rule}"'
-                )
-        else:
-            lines.append("- entity_mentions: none")
-
-        return "\n".join(lines)
+        return memory_extract.build_tags_markdown(normalized, entity_mentions)
 
     def generate_memory_tags(self, project_path: Path) -> int:
         if not project_path:
             raise ValueError("執行 memory tags 需要指定專案")
         memory_dir = self._prepare_memory_dir(project_path)
         normalized_path = memory_dir / "normalized.jsonl"
-        entities_path = memory_dir / "entities.jsonl"
-        tags_path = memory_dir / "tags.jsonl"
         if not normalized_path.exists():
             self.logger.error("找不到 memory normalized 檔案：%s", normalized_path)
             raise FileNotFoundError(f"找不到 memory normalized 檔案：{normalized_path}")
-        entity_map: dict[str, list[dict[str, Any]]] = {}
-        if entities_path.exists():
+        # The tags stage appends to tags.jsonl, so the swap must not race it.
+        with file_lock(memory_dir / ".ingest.lock"):
+            return self._generate_memory_tags_locked(memory_dir)
+
+    def _generate_memory_tags_locked(self, memory_dir: Path) -> int:
+        normalized_path = memory_dir / "normalized.jsonl"
+        entities_path = memory_dir / "entities.jsonl"
+        tags_path = memory_dir / "tags.jsonl"
+        # Rows already compacted come from the segments; only the JSONL tail
+        # after the segment cursors is parsed.
+        segments, cursors = self._open_memory_segments(memory_dir)
+        entity_map: dict[str, list[dict[str, Any]]] = {}
+        try:
+            for record in iter_stage_records(entities_path, cursors["entities"]):
+                chunk_id = str(record.get("chunk_id") or "")
+                if not chunk_id:
+                    continue
+                entity_map.setdefault(chunk_id, []).append(record.get("mention") or {})
+        except json.JSONDecodeError as exc:
+            self.logger.error("解析 memory entities 失敗：%s", exc, exc_info=True)
+            raise
+        except OSError as exc:
+            self.logger.error("讀取 memory entities 失敗：%s", exc, exc_info=True)
+            raise
+
+        def _rows() -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+            for segment in segments:
+                for row in range(len(segment)):
+                    yield segment.record(row), segment.entity_mentions(row)
             try:
-                with entities_path.open("r", encoding="utf-8") as entity_handle:
-                    for line in entity_handle:
-                        payload = line.strip()
-                        if not payload:
-                            continue
-                        try:
-                            record = json.loads(payload)
-                        except json.JSONDecodeError as exc:
-                            self.logger.error("解析 memory entities 失敗：%s", exc, exc_info=True)
-                            raise
-                        chunk_id = str(record.get("chunk_id") or "")
-                        if not chunk_id:
-                            continue
-                        mention = record.get("mention") or {}
-                        entity_map.setdefault(chunk_id, []).append(mention)
-            except OSError as exc:
-                self.logger.error("讀取 memory entities 失敗：%s", exc, exc_info=True)
+                for normalized in iter_stage_records(normalized_path, cursors["normalized"]):
+                    yield normalized, entity_map.get(str(normalized.get("chunk_id") or ""), [])
+            except json.JSONDecodeError as exc:
+                self.logger.error("解析 memory normalized 失敗：%s", exc, exc_info=True)
                 raise
-        tag_count = 0
+
+        # Only rows whose inputs changed since their tag record was written
+        # are rebuilt; the new file replaces tags.jsonl in one rename.
         try:
-            with (
-                normalized_path.open("r", encoding="utf-8") as normalized_handle,
-                tags_path.open("w", encoding="utf-8") as tags_handle,
-            ):
-                for line in normalized_handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    try:
-                        normalized = json.loads(payload)
-                    except json.JSONDecodeError as exc:
-                        self.logger.error("解析 memory normalized 失敗：%s", exc, exc_info=True)
-                        raise
-                    chunk_id = str(normalized.get("chunk_id") or "")
-                    text = str(normalized.get("text") or "")
-                    entity_mentions = entity_map.get(chunk_id, [])
-                    tags_markdown = self._build_tags_markdown(normalized, entity_mentions)
-                    embedding_text = f"{text}\n\n{tags_markdown}"
-                    record = {
-                        "chunk_id": chunk_id,
-                        "tags_markdown": tags_markdown,
-                        "embedding_text": embedding_text,
-                    }
-                    tags_handle.write(json.dumps(record, ensure_ascii=False))
-                    tags_handle.write("\n")
-                    tag_count += 1
-        except OSError as exc:
+            with TagFileBuilder(tags_path) as builder:
+                for normalized, entity_mentions in _rows():
+                    builder.add(normalized, entity_mentions)
+                builder.publish()
+        except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory tags 失敗：%s", exc, exc_info=True)
             raise
-        return tag_count
+        compacted_rows = sum(len(segment) for segment in segments)
+        if builder.dirty_rows and builder.dirty_rows[0] < compacted_rows:
+            # Segments hold copies of the old tags; republish them from the new file.
+            store = self._memory_segment_store(memory_dir)
+            store.invalidate()
+            store.compact(max_rows=compacted_rows)
+        return builder.count
+
+    def compact_memory(self, project_path: Path, *, min_rows: int = 1, max_rows: int | None = None) -> dict[str, Any]:
+        """Fold the ingested JSONL rows into a new columnar memory segment."""
+        if not project_path:
+            raise ValueError("執行 memory compaction 需要指定專案")
+        memory_dir = self._prepare_memory_dir(project_path)
+        store = self._memory_segment_store(memory_dir)
+        started_at = time.perf_counter()
+        try:
+            with file_lock(memory_dir / ".ingest.lock"):
+                result = store.compact(min_rows=min_rows, max_rows=max_rows)
+        except (OSError, ValueError) as exc:
+            self.logger.error("Memory compaction 失敗：%s", exc, exc_info=True)
+            raise
+        result["duration_ms"] = round((time.perf_counter() - started_at) * 1000, 3)
+        if result["status"] == "ok":
+            log_event(
+                {
+                    "level": "INFO",
+                    "event": "memory_compaction",
+                    "project_id": self.resolve_project_identity(project_path)[0] or project_path.name,
+                    "payload": result,
+                }
+            )
+        return result
 
-    def _parse_chunk_created_at(self, created_at: str) -> datetime | None:
+    def _memory_segment_store(self, memory_dir: Path) -> SegmentStore:
+        with self._memory_segment_stores_lock:
+            store = self._memory_segment_stores.get(memory_dir)
+            if store is None:
+                store = self._memory_segment_stores[memory_dir] = SegmentStore(memory_dir)
+            return store
+
+    def _open_memory_segments(self, memory_dir: Path) -> tuple[list[MemorySegment], dict[str, dict[str, Any]]]:
+        """Published segments still matching the JSONL files, and the cursors where the JSONL tail starts."""
+        store = self._memory_segment_store(memory_dir)
         try:
-            parsed = datetime.fromisoformat(created_at)
-        except ValueError as exc:
-            self.logger.warning("解析 created_at 失敗：%s", exc, exc_info=True)
-            return None
-        taipei_tz = ZoneInfo("Asia/Taipei")
-        if parsed.tzinfo is None:
-            return parsed.replace(tzinfo=taipei_tz)
-        return parsed.astimezone(taipei_tz)
+            manifest = store.manifest()
+            if manifest["segments"] and store.in_sync(manifest):
+                return store.segments(manifest), store.tail_cursors(manifest)
+        except (OSError, ValueError) as exc:
+            self.logger.warning("讀取 memory segments 失敗，改用 JSONL：%s", exc, exc_info=True)
+        return [], store.tail_cursors({"segments": [], "cursors": {}})
+
+    def _parse_chunk_created_at(self, created_at: str) -> datetime | None:
+        return memory_extract.parse_chunk_created_at(created_at)
 
     def _resolve_relative_date(self, raw: str, base_date: date | None) -> str | None:
-        if base_date is None:
-            return None
-        offsets = {
-            "昨天": -1,
-            "明天": 1,
-            "今天": 0,
-            "前天": -2,
-            "後天": 2,
-        }
-        if raw in offsets:
-            return (base_date + timedelta(days=offsets[raw])).isoformat()
-        if raw.startswith("下週"):
-            weekday_map = {"一": 0, "二": 1, "三": 2, "四": 3, "五": 4, "六": 5, "日": 6, "天": 6}
-            weekday_char = raw.replace("下週", "", 1)
-            target_weekday = weekday_map.get(weekday_char)
-            if target_weekday is None:
-                return None
-            days_until_next_monday = 7 - base_date.weekday()
-            resolved = base_date + timedelta(days=days_until_next_monday + target_weekday)
-            return resolved.isoformat()
-        return None
+        return memory_extract.resolve_relative_date(raw, base_date)
 
     def _extract_time_mentions(self, text: str, created_at: str) -> list[dict[str, Any]]:
-        base_datetime = self._parse_chunk_created_at(created_at)
-        base_date = base_datetime.date() if base_datetime else None
-        mentions: list[dict[str, Any]] = []
-        patterns = [
-            r"昨天|明天|今天|前天|後天",
-            r"下週[一二三四五六日天]",
-        ]
-        for pattern in patterns:
-            for match in re.finditer(pattern, text):
-                raw = match.group(0)
-                resolved_date = self._resolve_relative_date(raw, base_date)
-                if resolved_date:
-                    mentions.append(
-                        {
-                            "raw": raw,
-                            "resolved_date": resolved_date,
-                            "confidence": 1,
-                            "needs_review": False,
-                        }
-                    )
-                else:
-                    mentions.append({"raw": raw, "confidence": 0, "needs_review": True})
-        return mentions
+        return memory_extract.extract_time_mentions(text, created_at)
 
     def _extract_geo_mentions(self, text: str) -> list[dict[str, Any]]:
-        mapping = {
-            "台北": {
-                "normalized_name": "Taipei City, Taiwan",
-                "geocode_id": "tw-tpe",
-                "lat": 25.033,
-                "lon": 121.5654,
-            },
-            "臺北": {
-                "normalized_name": "Taipei City, Taiwan",
-                "geocode_id": "tw-tpe",
-                "lat": 25.033,
-                "lon": 121.5654,
-            },
-            "Taipei": {
-                "normalized_name": "Taipei City, Taiwan",
-                "geocode_id": "tw-tpe",
-                "lat": 25.033,
-                "lon": 121.5654,
-            },
-        }
-        mentions: list[dict[str, Any]] = []
-        for alias, info in mapping.items():
-            for match in re.finditer(re.escape(alias), text, flags=re.IGNORECASE):
-                mentions.append(
-                    {
-                        "raw": match.group(0),
-                        "normalized_name": info["normalized_name"],
-                        "geocode_id": info["geocode_id"],
-                        "lat": info["lat"],
-                        "lon": info["lon"],
-                        "confidence": 1,
-                        "needs_review": False,
-                    }
-                )
-        return mentions
+        return memory_extract.extract_geo_mentions(text)
 
     def _extract_explicit_entities(self, text: str) -> list[dict[str, Any]]:
-        mentions: list[dict[str, Any]] = []
-        surname_list = (
-            "王李張劉陳楊黃趙吳周徐孫馬朱胡郭何高林羅鄭梁謝宋唐許韓馮"
-            "鄧曹彭曾蕭田董袁潘於蔣蔡余杜葉程蘇魏呂丁任沈姚盧姜崔鐘譚"
-            "陸汪范金石廖賴邵熊孟秦白江閻薛尹段雷侯龍史陶黎賀顧毛郝龔"
-            "邱萬錢嚴覃武戴莫孔向湯"
-        )
-        person_pattern = rf"(?P<name>[{surname_list}][\u4e00-\u9fff]{{1,2}})"
-        org_pattern = r"(?P<name>[\u4e00-\u9fff]{2,12}(公司|企業|機構|組織|基金會|工作室|學校|大學|協會))"
-        for match in re.finditer(person_pattern, text):
-            mentions.append(
-                {
-                    "name": match.group("name"),
-                    "type": "person",
-                    "start": match.start(),
-                    "end": match.end(),
-                }
-            )
-        for match in re.finditer(org_pattern, text):
-            mentions.append(
-                {
-                    "name": match.group("name"),
-                    "type": "org",
-                    "start": match.start(),
-                    "end": match.end(),
-                }
-            )
-        return sorted(mentions, key=lambda item: item["start"])
+        return memory_extract.extract_explicit_entities(text)
 
     def _extract_pronoun_mentions(self, text: str) -> list[dict[str, Any]]:
-        pronouns = ["他們", "她們", "他", "她", "這家公司", "該公司", "這個公司", "該企業", "該組織"]
-        pattern = "|".join(re.escape(pronoun) for pronoun in pronouns)
-        mentions: list[dict[str, Any]] = []
-        for match in re.finditer(pattern, text):
-            mentions.append(
-                {
-                    "pronoun": match.group(0),
-                    "start": match.start(),
-                    "end": match.end(),
-                }
-            )
-        return mentions
+        return memory_extract.extract_pronoun_mentions(text)
 
     def _resolve_pronouns_in_text(
         self,
         text: str,
         last_entity: dict[str, Any] | None,
     ) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
-        mentions: list[dict[str, Any]] = []
-        explicit_entities = self._extract_explicit_entities(text)
-        pronouns = self._extract_pronoun_mentions(text)
-        events: list[dict[str, Any]] = []
-        for entity in explicit_entities:
-            event = dict(entity)
-            event["kind"] = "entity"
-            events.append(event)
-        for pronoun in pronouns:
-            event = dict(pronoun)
-            event["kind"] = "pronoun"
-            events.append(event)
-        for event in sorted(events, key=lambda item: item["start"]):
-            if event["kind"] == "entity":
-                last_entity = {"name": event["name"], "type": event["type"]}
-                continue
-            resolved_to = last_entity.get("name") if last_entity else None
-            entity_type = last_entity.get("type") if last_entity else None
-            mentions.append(
-                {
-                    "pronoun": event["pronoun"],
-                    "resolved_to": resolved_to,
-                    "entity_type": entity_type,
-                    "confidence": 0.6 if resolved_to else 0.0,
-                    "needs_review": resolved_to is None,
-                    "rule": "session_last_explicit",
-                }
-            )
-        return mentions, last_entity
+        return memory_extract.resolve_pronouns_in_text(text, last_entity)
 
     def ingest_session_memory(
         self,
@@ -5629,7 +5453,16 @@ class AmonCore:
         session_id: str,
         project_id: str | None = None,
         lang: str = "zh-TW",
+        *,
+        background: bool = False,
     ) -> int:
+        """Split a session into memory chunks and run the ingest pipeline.
+
+        With ``background=True`` the pipeline is left to the memory ingest
+        service and this returns as soon as the chunks are written. A
+        synchronous run that hits backpressure also hands the backlog to the
+        service instead of leaving it for the next session.
+        """
         if not project_path:
             raise ValueError("執行 memory ingest 需要指定專案")
         source_path = project_path / "sessions" / f"{session_id}.jsonl"
@@ -5640,8 +5473,12 @@ class AmonCore:
         chunks_path = memory_dir / "chunks.jsonl"
         source_rel_path = f"sessions/{session_id}.jsonl"
         chunk_count = 0
+        chunk_project_id = project_id
         try:
-            with source_path.open("r", encoding="utf-8") as handle:
+            with (
+                source_path.open("r", encoding="utf-8") as handle,
+                chunks_path.open("a", encoding="utf-8") as chunk_handle,
+            ):
                 for line in handle:
                     payload = line.strip()
                     if not payload:
@@ -5655,35 +5492,60 @@ class AmonCore:
                     if event_type not in {"prompt", "final"}:
                         continue
                     text = str(event.get("content") or "")
+                    if not chunk_project_id:
+                        chunk_project_id = self.resolve_project_identity(project_path)[0]
                     chunk = {
                         "chunk_id": uuid.uuid4().hex,
-                        "project_id": project_id or self.resolve_project_identity(project_path)[0],
+                        "project_id": chunk_project_id,
                         "session_id": session_id,
                         "source_path": source_rel_path,
                         "text": text,
                         "created_at": self._now(),
                         "lang": lang,
                     }
-                    with chunks_path.open("a", encoding="utf-8") as chunk_handle:
-                        chunk_handle.write(json.dumps(chunk, ensure_ascii=False))
-                        chunk_handle.write("\n")
+                    chunk_handle.write(json.dumps(chunk, ensure_ascii=False))
+                    chunk_handle.write("\n")
                     chunk_count += 1
         except OSError as exc:
             self.logger.error("寫入 memory chunk 失敗：%s", exc, exc_info=True)
             raise
+        if background:
+            self.memory_ingest_service().submit(project_path)
+            return chunk_count
         try:
-            self.run_memory_ingest_pipeline(project_path, batch_size=50)
+            result = self.run_memory_ingest_pipeline(project_path, batch_size=50)
         except Exception as exc:  # noqa: BLE001
             self.logger.error("Memory ingest pipeline 失敗：%s", exc, exc_info=True)
             raise
+        if result.get("status") == "backpressure":
+            self.logger.info("Memory ingest 待處理 %s 筆，改由背景服務消化", result.get("pending_chunks"))
+            self.memory_ingest_service().submit(project_path)
         return chunk_count
 
+    def memory_ingest_service(self) -> MemoryIngestService:
+        """Background service that drains the memory ingest pipeline for this core."""
+        with self._memory_ingest_service_lock:
+            if self._memory_ingest_service is None:
+                self._memory_ingest_service = MemoryIngestService(
+                    self._drain_memory_ingest,
+                    after_catch_up=self._compact_memory_tail,
+                )
+            return self._memory_ingest_service
+
+    def _drain_memory_ingest(self, project_path: Path) -> dict[str, Any]:
+        # The service is the consumer that backpressure protects, so it never
+        # defers to itself; larger batches amortise per-run overhead.
+        return self.run_memory_ingest_pipeline(project_path, batch_size=500, max_queue_size=None)
+
+    def _compact_memory_tail(self, project_path: Path) -> dict[str, Any]:
+        return self.compact_memory(project_path, min_rows=segment_min_rows())
+
     def run_memory_ingest_pipeline(
         self,
         project_path: Path,
         *,
         batch_size: int = 50,
-        max_queue_size: int = 1000,
+        max_queue_size: int | None = 1000,
     ) -> dict[str, Any]:
         if not project_path:
             raise ValueError("執行 memory pipeline 需要指定專案")
@@ -5692,10 +5554,24 @@ class AmonCore:
         if not chunks_path.exists():
             self.logger.error("找不到 memory chunks 檔案：%s", chunks_path)
             raise FileNotFoundError(f"找不到 memory chunks 檔案：{chunks_path}")
+        # Runs from callers and from the background service share stage
+        # cursors in ingest_state.json, so they must not overlap.
+        with file_lock(memory_dir / ".ingest.lock"):
+            return self._run_memory_ingest_pipeline_locked(project_path, memory_dir, batch_size, max_queue_size)
+
+    def _run_memory_ingest_pipeline_locked(
+        self,
+        project_path: Path,
+        memory_dir: Path,
+        batch_size: int,
+        max_queue_size: int | None,
+    ) -> dict[str, Any]:
+        chunks_path = memory_dir / "chunks.jsonl"
         state = self._load_memory_ingest_state(memory_dir)
         project_id = self.resolve_project_identity(project_path)[0] or project_path.name
-        pending_chunks = self._count_pending_chunks(chunks_path, state.get("stages", {}).get("normalized", {}))
-        if pending_chunks > max_queue_size:
+        pending_chunks = self._count_pending_chunks(chunks_path, state)
+        if max_queue_size is not None and pending_chunks > max_queue_size:
+            self._save_memory_ingest_state(memory_dir, state)
             emit_event(
                 {
                     "type": "system.backpressure",
@@ -5712,109 +5588,133 @@ class AmonCore:
             )
             return {"status": "backpressure", "pending_chunks": pending_chunks}
 
-        processed: dict[str, int] = {}
-        processed["normalized"] = self._process_memory_normalized(project_path, memory_dir, state, batch_size)
-        processed["entities"] = self._process_memory_entities(project_path, memory_dir, state, batch_size)
-        processed["tags"] = self._process_memory_tags(project_path, memory_dir, state, batch_size)
-        processed["embed"] = self._process_memory_embed(project_path, memory_dir, state, batch_size)
-        processed["index"] = self._process_memory_index(project_path, memory_dir, state, batch_size)
+        stages = state.setdefault("stages", {})
+        for stage_name in ("normalized", "entities", "tags", "embed", "index"):
+            stages.setdefault(stage_name, {"last_chunk_id": None, "processed": 0})
+        state.setdefault("session_last_entity", {})
+        alias_store = EntityAliasStore(self._entity_aliases_path(memory_dir))
+        pipeline = IngestPipeline(
+            [
+                IngestStage(
+                    "normalized",
+                    partial(self._process_memory_normalized, memory_dir, state),
+                    frontier=partial(self._memory_file_size, memory_dir / "normalized.jsonl"),
+                ),
+                IngestStage(
+                    "entities",
+                    partial(self._process_memory_entities, memory_dir, state, alias_store),
+                    frontier=lambda: stages["entities"].get("offset"),
+                    session=partial(self._memory_alias_session, memory_dir, alias_store),
+                ),
+                IngestStage(
+                    "tags",
+                    partial(self._process_memory_tags, memory_dir, state),
+                    frontier=partial(self._memory_file_size, memory_dir / "tags.jsonl"),
+                ),
+                IngestStage(
+                    "embed",
+                    partial(self._process_memory_embed, memory_dir, state),
+                    frontier=partial(self._memory_file_size, memory_dir / "embed.jsonl"),
+                ),
+                IngestStage(
+                    "index",
+                    partial(self._process_memory_index, memory_dir, state),
+                    frontier=lambda: None,
+                ),
+            ],
+            batch_size=batch_size,
+        )
+        throughput = pipeline.run()
         self._save_memory_ingest_state(memory_dir, state)
-        return {"status": "ok", "processed": processed, "pending_chunks": pending_chunks}
+        processed = {name: metrics["records"] for name, metrics in throughput.items()}
+        log_event(
+            {
+                "level": "INFO",
+                "event": "memory_ingest_throughput",
+                "project_id": project_id,
+                "payload": {"pending_chunks": pending_chunks, "stages": throughput},
+            }
+        )
+        return {"status": "ok", "processed": processed, "pending_chunks": pending_chunks, "throughput": throughput}
+
+    def _memory_file_size(self, path: Path) -> int | None:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _memory_alias_session(self, memory_dir: Path, alias_store: EntityAliasStore):
+        with file_lock(memory_dir / ".aliases.lock"):
+            self._reload_entity_aliases(alias_store)
+            yield
+            self._save_entity_aliases(memory_dir, alias_store)
 
     def _process_memory_normalized(
         self,
-        project_path: Path,
         memory_dir: Path,
         state: dict[str, Any],
-        batch_size: int,
+        limit: int,
+        end_offset: int | None = None,
     ) -> int:
         chunks_path = memory_dir / "chunks.jsonl"
         normalized_path = memory_dir / "normalized.jsonl"
-        stages = state.setdefault("stages", {})
-        cursor = stages.setdefault("normalized", {"last_chunk_id": None, "processed": 0})
-        last_chunk_id = cursor.get("last_chunk_id")
-        processed = 0
+        cursor = state["stages"]["normalized"]
         try:
-            with chunks_path.open("r", encoding="utf-8") as handle, normalized_path.open("a", encoding="utf-8") as out_handle:
-                seen_last = last_chunk_id is None
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    chunk = json.loads(payload)
-                    chunk_id = str(chunk.get("chunk_id") or "")
-                    if not seen_last:
-                        if chunk_id == last_chunk_id:
-                            seen_last = True
-                        continue
-                    text = str(chunk.get("text") or "")
-                    created_at = str(chunk.get("created_at") or "")
-                    mentions = self._extract_time_mentions(text, created_at)
-                    geo_mentions = self._extract_geo_mentions(text)
-                    normalized = dict(chunk)
-                    normalized["time"] = {"mentions": mentions}
-                    normalized["geo"] = {"mentions": geo_mentions}
+            batch = list(iter_stage_records(chunks_path, cursor, limit=limit, end_offset=end_offset))
+            if not batch:
+                return 0
+            with normalized_path.open("a", encoding="utf-8") as out_handle:
+                for normalized in map_ordered(memory_extract.normalize_chunk, batch):
                     out_handle.write(json.dumps(normalized, ensure_ascii=False))
                     out_handle.write("\n")
-                    cursor["last_chunk_id"] = chunk_id
-                    cursor["processed"] = int(cursor.get("processed", 0)) + 1
-                    processed += 1
-                    if processed >= batch_size:
-                        break
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory normalized 失敗：%s", exc, exc_info=True)
             raise
-        return processed
+        return len(batch)
 
     def _process_memory_entities(
         self,
-        project_path: Path,
         memory_dir: Path,
         state: dict[str, Any],
-        batch_size: int,
-    ) -> int:
-        lock_path = memory_dir / ".aliases.lock"
-        with file_lock(lock_path):
-            return self._process_memory_entities_locked(project_path, memory_dir, state, batch_size)
-
-    def _process_memory_entities_locked(
-        self,
-        project_path: Path,
-        memory_dir: Path,
-        state: dict[str, Any],
-        batch_size: int,
+        alias_store: EntityAliasStore,
+        limit: int,
+        end_offset: int | None = None,
     ) -> int:
         normalized_path = memory_dir / "normalized.jsonl"
         entities_path = memory_dir / "entities.jsonl"
-        stages = state.setdefault("stages", {})
-        cursor = stages.setdefault("entities", {"last_chunk_id": None, "processed": 0})
-        last_chunk_id = cursor.get("last_chunk_id")
-        processed = 0
-        session_last_entity = state.setdefault("session_last_entity", {})
-        alias_state = self._load_entity_aliases(memory_dir)
+        cursor = state["stages"]["entities"]
+        session_last_entity = state["session_last_entity"]
         try:
-            with normalized_path.open("r", encoding="utf-8") as handle, entities_path.open("a", encoding="utf-8") as out_handle:
-                seen_last = last_chunk_id is None
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    normalized = json.loads(payload)
+            batch = list(iter_stage_records(normalized_path, cursor, limit=limit, end_offset=end_offset))
+            if not batch:
+                return 0
+            # Pronoun resolution only depends on earlier chunks of the same
+            # session, so each session is one shard for the worker pool.
+            shards: dict[str, list[int]] = {}
+            for position, normalized in enumerate(batch):
+                shards.setdefault(str(normalized.get("session_id") or ""), []).append(position)
+            shard_results = map_ordered(
+                memory_extract.resolve_session_shard,
+                [[str(batch[position].get("text") or "") for position in positions] for positions in shards.values()],
+                [session_last_entity.get(session_id) for session_id in shards],
+            )
+            extracted: list[Any] = [None] * len(batch)
+            for (session_id, positions), (results, last_entity) in zip(shards.items(), shard_results):
+                session_last_entity[session_id] = last_entity
+                for position, result in zip(positions, results):
+                    extracted[position] = result
+            # Canonical ids depend on the order aliases are first seen, so they
+            # are assigned here in chunk order rather than in the workers.
+            with entities_path.open("a", encoding="utf-8") as out_handle:
+                for normalized, (explicit_entities, pronoun_mentions) in zip(batch, extracted):
                     chunk_id = str(normalized.get("chunk_id") or "")
-                    if not seen_last:
-                        if chunk_id == last_chunk_id:
-                            seen_last = True
-                        continue
                     text = str(normalized.get("text") or "")
                     session_id = str(normalized.get("session_id") or "")
-                    last_entity = session_last_entity.get(session_id)
-                    pronoun_mentions, last_entity = self._resolve_pronouns_in_text(text, last_entity)
-                    session_last_entity[session_id] = last_entity
-                    explicit_entities = self._extract_explicit_entities(text)
                     for entity in explicit_entities:
                         name = str(entity.get("name") or "")
                         entity_type = str(entity.get("type") or "")
-                        canonical_id = self._resolve_entity_canonical_id(name, entity_type, alias_state)
+                        canonical_id = alias_store.resolve(name, entity_type)
                         entity_record = {
                             "chunk_id": chunk_id,
                             "project_id": normalized.get("project_id"),
@@ -5836,7 +5736,7 @@ class AmonCore:
                         resolved_to = mention.get("resolved_to")
                         entity_type = mention.get("entity_type") or ""
                         resolved_canonical_id = (
-                            self._resolve_entity_canonical_id(str(resolved_to), entity_type, alias_state)
+                            alias_store.resolve(str(resolved_to), entity_type)
                             if resolved_to
                             else None
                         )
@@ -5851,141 +5751,83 @@ class AmonCore:
                         }
                         out_handle.write(json.dumps(entity_record, ensure_ascii=False))
                         out_handle.write("\n")
-                    cursor["last_chunk_id"] = chunk_id
-                    cursor["processed"] = int(cursor.get("processed", 0)) + 1
-                    processed += 1
-                    if processed >= batch_size:
-                        break
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory entities 失敗：%s", exc, exc_info=True)
             raise
-        self._save_entity_aliases(memory_dir, alias_state)
-        return processed
+        return len(batch)
 
     def _process_memory_tags(
         self,
-        project_path: Path,
         memory_dir: Path,
         state: dict[str, Any],
-        batch_size: int,
+        limit: int,
+        end_offset: int | None = None,
     ) -> int:
         normalized_path = memory_dir / "normalized.jsonl"
         entities_path = memory_dir / "entities.jsonl"
         tags_path = memory_dir / "tags.jsonl"
-        stages = state.setdefault("stages", {})
-        cursor = stages.setdefault("tags", {"last_chunk_id": None, "processed": 0})
-        last_chunk_id = cursor.get("last_chunk_id")
-        processed = 0
-        entity_map = self._load_entity_mentions(entities_path)
+        cursor = state["stages"]["tags"]
         try:
-            with normalized_path.open("r", encoding="utf-8") as handle, tags_path.open("a", encoding="utf-8") as tags_handle:
-                seen_last = last_chunk_id is None
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    normalized = json.loads(payload)
-                    chunk_id = str(normalized.get("chunk_id") or "")
-                    if not seen_last:
-                        if chunk_id == last_chunk_id:
-                            seen_last = True
-                        continue
-                    text = str(normalized.get("text") or "")
-                    entity_mentions = entity_map.get(chunk_id, [])
-                    tags_markdown = self._build_tags_markdown(normalized, entity_mentions)
-                    embedding_text = f"{text}\n\n{tags_markdown}"
-                    record = {
-                        "chunk_id": chunk_id,
-                        "tags_markdown": tags_markdown,
-                        "embedding_text": embedding_text,
-                    }
+            batch = list(iter_stage_records(normalized_path, cursor, limit=limit, end_offset=end_offset))
+            if not batch:
+                return 0
+            entity_map = self._load_batch_entity_mentions(
+                entities_path,
+                cursor,
+                {str(normalized.get("chunk_id") or "") for normalized in batch},
+            )
+            records = map_ordered(
+                memory_extract.build_tag_record,
+                batch,
+                [entity_map.get(str(normalized.get("chunk_id") or ""), []) for normalized in batch],
+            )
+            with tags_path.open("a", encoding="utf-8") as tags_handle:
+                for record in records:
                     tags_handle.write(json.dumps(record, ensure_ascii=False))
                     tags_handle.write("\n")
-                    cursor["last_chunk_id"] = chunk_id
-                    cursor["processed"] = int(cursor.get("processed", 0)) + 1
-                    processed += 1
-                    if processed >= batch_size:
-                        break
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory tags 失敗：%s", exc, exc_info=True)
             raise
-        return processed
+        return len(batch)
 
     def _process_memory_embed(
         self,
-        project_path: Path,
         memory_dir: Path,
         state: dict[str, Any],
-        batch_size: int,
+        limit: int,
+        end_offset: int | None = None,
     ) -> int:
         tags_path = memory_dir / "tags.jsonl"
         embed_path = memory_dir / "embed.jsonl"
-        stages = state.setdefault("stages", {})
-        cursor = stages.setdefault("embed", {"last_chunk_id": None, "processed": 0})
-        last_chunk_id = cursor.get("last_chunk_id")
-        processed = 0
+        cursor = state["stages"]["embed"]
         try:
-            with tags_path.open("r", encoding="utf-8") as handle, embed_path.open("a", encoding="utf-8") as embed_handle:
-                seen_last = last_chunk_id is None
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    record = json.loads(payload)
-                    chunk_id = str(record.get("chunk_id") or "")
-                    if not seen_last:
-                        if chunk_id == last_chunk_id:
-                            seen_last = True
-                        continue
-                    embedding_text = str(record.get("embedding_text") or "")
-                    vector = self._vectorize_text(embedding_text)
-                    embed_handle.write(
-                        json.dumps(
-                            {
-                                "chunk_id": chunk_id,
-                                "embedding_text": embedding_text,
-                                "vector": dict(vector),
-                            },
-                            ensure_ascii=False,
-                        )
-                    )
+            batch = list(iter_stage_records(tags_path, cursor, limit=limit, end_offset=end_offset))
+            if not batch:
+                return 0
+            with embed_path.open("a", encoding="utf-8") as embed_handle:
+                for record in map_ordered(memory_extract.embed_record, batch):
+                    embed_handle.write(json.dumps(record, ensure_ascii=False))
                     embed_handle.write("\n")
-                    cursor["last_chunk_id"] = chunk_id
-                    cursor["processed"] = int(cursor.get("processed", 0)) + 1
-                    processed += 1
-                    if processed >= batch_size:
-                        break
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory embed 失敗：%s", exc, exc_info=True)
             raise
-        return processed
+        return len(batch)
 
     def _process_memory_index(
         self,
-        project_path: Path,
         memory_dir: Path,
         state: dict[str, Any],
-        batch_size: int,
+        limit: int,
+        end_offset: int | None = None,
     ) -> int:
         embed_path = memory_dir / "embed.jsonl"
         index_path = memory_dir / "index.jsonl"
-        stages = state.setdefault("stages", {})
-        cursor = stages.setdefault("index", {"last_chunk_id": None, "processed": 0})
-        last_chunk_id = cursor.get("last_chunk_id")
+        cursor = state["stages"]["index"]
         processed = 0
         try:
-            with embed_path.open("r", encoding="utf-8") as handle, index_path.open("a", encoding="utf-8") as index_handle:
-                seen_last = last_chunk_id is None
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    record = json.loads(payload)
+            with index_path.open("a", encoding="utf-8") as index_handle:
+                for record in iter_stage_records(embed_path, cursor, limit=limit, end_offset=end_offset):
                     chunk_id = str(record.get("chunk_id") or "")
-                    if not seen_last:
-                        if chunk_id == last_chunk_id:
-                            seen_last = True
-                        continue
                     index_handle.write(
                         json.dumps(
                             {
@@ -5996,35 +5838,48 @@ class AmonCore:
                         )
                     )
                     index_handle.write("\n")
-                    cursor["last_chunk_id"] = chunk_id
-                    cursor["processed"] = int(cursor.get("processed", 0)) + 1
                     processed += 1
-                    if processed >= batch_size:
-                        break
         except (OSError, json.JSONDecodeError) as exc:
             self.logger.error("寫入 memory index 失敗：%s", exc, exc_info=True)
             raise
         return processed
 
-    def _load_entity_mentions(self, entities_path: Path) -> dict[str, list[dict[str, Any]]]:
-        if not entities_path.exists():
-            return {}
+    def _load_batch_entity_mentions(
+        self,
+        entities_path: Path,
+        tags_cursor: dict[str, Any],
+        chunk_ids: set[str],
+    ) -> dict[str, list[dict[str, Any]]]:
+        chunk_ids.discard("")
         entity_map: dict[str, list[dict[str, Any]]] = {}
-        try:
-            with entities_path.open("r", encoding="utf-8") as entity_handle:
-                for line in entity_handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    record = json.loads(payload)
-                    chunk_id = str(record.get("chunk_id") or "")
-                    if not chunk_id:
-                        continue
-                    mention = record.get("mention") or {}
-                    entity_map.setdefault(chunk_id, []).append(mention)
-        except (OSError, json.JSONDecodeError) as exc:
-            self.logger.error("讀取 memory entities 失敗：%s", exc, exc_info=True)
-            raise
+        if not chunk_ids:
+            return entity_map
+
+        def _in_batch(record: dict[str, Any]) -> bool:
+            chunk_id = str(record.get("chunk_id") or "")
+            return not chunk_id or chunk_id in chunk_ids
+
+        entity_cursor = tags_cursor.get("entities")
+        if entity_cursor is None and int(tags_cursor.get("processed", 0)) > len(chunk_ids):
+            # State written before the entities cursor existed: locate this batch
+            # with one full pass and continue from its last record afterwards.
+            scan_cursor: dict[str, Any] = {"last_chunk_id": None, "processed": 0}
+            entity_cursor = dict(scan_cursor)
+            for record in iter_stage_records(entities_path, scan_cursor):
+                chunk_id = str(record.get("chunk_id") or "")
+                if chunk_id in chunk_ids:
+                    entity_map.setdefault(chunk_id, []).append(record.get("mention") or {})
+                    entity_cursor = dict(scan_cursor)
+            tags_cursor["entities"] = entity_cursor
+            return entity_map
+        if entity_cursor is None:
+            entity_cursor = tags_cursor.setdefault("entities", {"last_chunk_id": None, "processed": 0})
+        # Entity records follow normalized.jsonl order, so this batch's mentions
+        # are the records right after the cursor.
+        for record in iter_stage_records(entities_path, entity_cursor, accept=_in_batch):
+            chunk_id = str(record.get("chunk_id") or "")
+            if chunk_id:
+                entity_map.setdefault(chunk_id, []).append(record.get("mention") or {})
         return entity_map
 
     def _load_memory_ingest_state(self, memory_dir: Path) -> dict[str, Any]:
@@ -6050,14 +5905,10 @@ class AmonCore:
             self.logger.error("寫入 memory ingest state 失敗：%s", exc, exc_info=True)
             raise
 
-    def _count_pending_chunks(self, chunks_path: Path, stage_state: dict[str, Any]) -> int:
-        processed = int(stage_state.get("processed", 0))
-        total = 0
+    def _count_pending_chunks(self, chunks_path: Path, state: dict[str, Any]) -> int:
+        processed = int(state.get("stages", {}).get("normalized", {}).get("processed", 0))
         try:
-            with chunks_path.open("r", encoding="utf-8") as handle:
-                for line in handle:
-                    if line.strip():
-                        total += 1
+            total = count_jsonl_records(chunks_path, state.setdefault("chunks_tally", {}))
         except OSError as exc:
             self.logger.error("讀取 memory chunks 失敗：%s", exc, exc_info=True)
             raise
@@ -6073,9 +5924,11 @@ class AmonCore:
         if not chunks_path.exists():
             self.logger.error("找不到 memory chunks 檔案：%s", chunks_path)
             raise FileNotFoundError(f"找不到 memory chunks 檔案：{chunks_path}")
+        # normalized/entities are rewritten from scratch, so compacted rows are stale.
+        self._memory_segment_store(memory_dir).invalidate()
         normalized_count = 0
         session_last_entity: dict[str, dict[str, Any] | None] = {}
-        alias_state = self._load_entity_aliases(memory_dir)
+        alias_store = self._load_entity_aliases(memory_dir)
         try:
             with (
                 chunks_path.open("r", encoding="utf-8") as handle,
@@ -6108,7 +5961,7 @@ class AmonCore:
                     for entity in explicit_entities:
                         name = str(entity.get("name") or "")
                         entity_type = str(entity.get("type") or "")
-                        canonical_id = self._resolve_entity_canonical_id(name, entity_type, alias_state)
+                        canonical_id = alias_store.resolve(name, entity_type)
                         entity_record = {
                             "chunk_id": chunk.get("chunk_id"),
                             "project_id": chunk.get("project_id"),
@@ -6130,7 +5983,7 @@ class AmonCore:
                         resolved_to = mention.get("resolved_to")
                         entity_type = mention.get("entity_type") or ""
                         resolved_canonical_id = (
-                            self._resolve_entity_canonical_id(str(resolved_to), entity_type, alias_state)
+                            alias_store.resolve(str(resolved_to), entity_type)
                             if resolved_to
                             else None
                         )
@@ -6149,7 +6002,8 @@ class AmonCore:
         except OSError as exc:
             self.logger.error("寫入 memory normalized 失敗：%s", exc, exc_info=True)
             raise
-        self._save_entity_aliases(memory_dir, alias_state)
+        # A full rebuild folds the alias journal back into the snapshot.
+        self._save_entity_aliases(memory_dir, alias_store, compact=True)
         try:
             self.generate_memory_tags(project_path)
         except Exception as exc:  # noqa: BLE001
@@ -6399,69 +6253,63 @@ class AmonCore:
         prompt_text: str,
         project_id: str | None,
     ) -> str:
-        response_text = ""
+        response_parts: list[str] = []
         try:
-            self._append_session_event(
-                session_path,
-                {
-                    "event": "prompt",
-                    "content": prompt_text,
-                    "stage": stage,
-                    "provider": provider_name,
-                    "model": provider_model,
-                },
-                session_id=session_id,
-            )
-            with output_path.open("w", encoding="utf-8") as handle:
-                for index, token in enumerate(provider.generate_stream(messages, model=provider_model)):
-                    is_reasoning, reasoning_text = decode_reasoning_chunk(token)
-                    if is_reasoning:
-                        self._append_session_event(
-                            session_path,
+            with self._session_events(session_path, session_id) as events:
+                events.append(
+                    {
+                        "event": "prompt",
+                        "content": prompt_text,
+                        "stage": stage,
+                        "provider": provider_name,
+                        "model": provider_model,
+                    }
+                )
+                with output_path.open("w", encoding="utf-8") as handle:
+                    for index, token in enumerate(provider.generate_stream(messages, model=provider_model)):
+                        is_reasoning, reasoning_text = decode_reasoning_chunk(token)
+                        if is_reasoning:
+                            events.append(
+                                {
+                                    "event": "reasoning_chunk",
+                                    "index": index,
+                                    "content": reasoning_text,
+                                    "stage": stage,
+                                    "provider": provider_name,
+                                    "model": provider_model,
+                                }
+                            )
+                            continue
+                        print(token, end="", flush=True)
+                        handle.write(token)
+                        response_parts.append(token)
+                        events.append(
                             {
-                                "event": "reasoning_chunk",
+                                "event": "chunk",
                                 "index": index,
-                                "content": reasoning_text,
+                                "content": token,
                                 "stage": stage,
                                 "provider": provider_name,
                                 "model": provider_model,
-                            },
-                            session_id=session_id,
+                            }
                         )
-                        continue
-                    print(token, end="", flush=True)
-                    handle.write(token)
-                    response_text += token
-                    self._append_session_event(
-                        session_path,
-                        {
-                            "event": "chunk",
-                            "index": index,
-                            "content": token,
-                            "stage": stage,
-                            "provider": provider_name,
-                            "model": provider_model,
-                        },
-                        session_id=session_id,
-                    )
-            print("")
+                print("")
+                response_text = "".join(response_parts)
+                events.append(
+                    {
+                        "event": "final",
+                        "content": response_text,
+                        "stage": stage,
+                        "provider": provider_name,
+                        "model": provider_model,
+                    }
+                )
         except OSError as exc:
             self.logger.error("寫入輸出失敗：%s", exc, exc_info=True)
             raise
         except ProviderError as exc:
             self.logger.error("模型執行失敗：%s", exc, exc_info=True)
             raise
-        self._append_session_event(
-            session_path,
-            {
-                "event": "final",
-                "content": response_text,
-                "stage": stage,
-                "provider": provider_name,
-                "model": provider_model,
-            },
-            session_id=session_id,
-        )
         self._log_billing(
             config,
             provider_name,
@@ -6487,64 +6335,58 @@ class AmonCore:
         prompt_text: str,
         project_id: str | None,
     ) -> str:
-        response_text = ""
+        response_parts: list[str] = []
         try:
-            self._append_session_event(
-                session_path,
-                {
-                    "event": "prompt",
-                    "content": prompt_text,
-                    "stage": stage,
-                    "provider": provider_name,
-                    "model": provider_model,
-                },
-                session_id=session_id,
-            )
-            for index, token in enumerate(provider.generate_stream(messages, model=provider_model)):
-                is_reasoning, reasoning_text = decode_reasoning_chunk(token)
-                if is_reasoning:
-                    self._append_session_event(
-                        session_path,
+            with self._session_events(session_path, session_id) as events:
+                events.append(
+                    {
+                        "event": "prompt",
+                        "content": prompt_text,
+                        "stage": stage,
+                        "provider": provider_name,
+                        "model": provider_model,
+                    }
+                )
+                for index, token in enumerate(provider.generate_stream(messages, model=provider_model)):
+                    is_reasoning, reasoning_text = decode_reasoning_chunk(token)
+                    if is_reasoning:
+                        events.append(
+                            {
+                                "event": "reasoning_chunk",
+                                "index": index,
+                                "content": reasoning_text,
+                                "stage": stage,
+                                "provider": provider_name,
+                                "model": provider_model,
+                            }
+                        )
+                        continue
+                    print(token, end="", flush=True)
+                    response_parts.append(token)
+                    events.append(
                         {
-                            "event": "reasoning_chunk",
+                            "event": "chunk",
                             "index": index,
-                            "content": reasoning_text,
+                            "content": token,
                             "stage": stage,
                             "provider": provider_name,
                             "model": provider_model,
-                        },
-                        session_id=session_id,
+                        }
                     )
-                    continue
-                print(token, end="", flush=True)
-                response_text += token
-                self._append_session_event(
-                    session_path,
+                print("")
+                response_text = "".join(response_parts)
+                events.append(
                     {
-                        "event": "chunk",
-                        "index": index,
-                        "content": token,
+                        "event": "final",
+                        "content": response_text,
                         "stage": stage,
                         "provider": provider_name,
                         "model": provider_model,
-                    },
-                    session_id=session_id,
+                    }
                 )
-            print("")
         except ProviderError as exc:
             self.logger.error("模型執行失敗：%s", exc, exc_info=True)
             raise
-        self._append_session_event(
-            session_path,
-            {
-                "event": "final",
-                "content": response_text,
-                "stage": stage,
-                "provider": provider_name,
-                "model": provider_model,
-            },
-            session_id=session_id,
-        )
         self._log_billing(
             config,
             provider_name,
@@ -6708,6 +6550,23 @@ class AmonCore:
             self.logger.error("寫入 session 事件失敗：%s", exc, exc_info=True)
             raise
 
+    @contextmanager
+    def _session_events(self, session_path: Path, session_id: str) -> Iterator[SessionEventWriter]:
+        """Buffered ``_append_session_event`` for streams; events are flushed by size, time and on exit."""
+        try:
+            writer = SessionEventWriter(session_path, session_id, now=self._now)
+        except OSError as exc:
+            self.logger.error("寫入 session 事件失敗：%s", exc, exc_info=True)
+            raise
+        try:
+            yield writer
+        finally:
+            try:
+                writer.close()
+            except OSError as exc:
+                self.logger.error("寫入 session 事件失敗：%s", exc, exc_info=True)
+                raise
+
     def _log_billing(
         self,
         config: dict[str, Any],
@@ -6912,27 +6771,6 @@ class AmonCore:
         except ValueError:
             return None
 
-    def _add_export_path(
-        self,
-        archive: zipfile.ZipFile,
-        path: Path,
-        base_prefix: str,
-        project_path: Path,
-    ) -> None:
-        if not path.exists():
-            return
-        relative = path.relative_to(project_path)
-        if path.is_dir():
-            entries = list(path.rglob("*"))
-            if not entries:
-                archive.writestr(f"{base_prefix}/{relative}/", "")
-                return
-            for entry in entries:
-                if entry.is_file():
-                    archive.write(entry, arcname=f"{base_prefix}/{entry.relative_to(project_path)}")
-        else:
-            archive.write(path, arcname=f"{base_prefix}/{relative}")
-
     def _validate_eval_outputs(self, project_path: Path) -> list[dict[str, Any]]:
         checks: list[dict[str, Any]] = []
         sessions = list((project_path / "sessions").glob("*.jsonl"))
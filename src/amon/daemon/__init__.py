@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import os
-import time
 from collections import deque
 from pathlib import Path
 from typing import Any, Callable
@@ -13,7 +12,7 @@ from amon.events import emit_event
 from amon.hooks.runner import process_event
 from amon.jobs.runner import start_job
 from amon.logging import log_event
-from amon.scheduler.engine import tick
+from amon.scheduler.engine import ScheduleLoop, tick
 
 from .queue import configure_action_queue
 
@@ -42,18 +41,22 @@ def run_daemon(
         event_queue.append(payload)
         return event_id
 
+    schedule_loop = ScheduleLoop(data_dir=core.data_dir, event_emitter=queue_emitter)
     while True:
         try:
             _ensure_jobs_started(core.data_dir, started_jobs, queue_emitter)
-            tick(data_dir=core.data_dir, event_emitter=queue_emitter)
+            schedule_loop.run_pending()
             _drain_event_queue(core, event_queue)
         except Exception as exc:  # noqa: BLE001
             logger.error("Scheduler tick 失敗：%s", exc, exc_info=True)
         try:
-            time.sleep(tick_interval_seconds)
+            # Wake exactly when the next schedule is due (or schedules change);
+            # tick_interval_seconds still bounds how long job events wait to drain.
+            schedule_loop.wait(timeout=tick_interval_seconds)
         except KeyboardInterrupt:
             logger.info("Daemon 已停止")
             break
+    schedule_loop.stop()
     action_queue.stop()
 
 
@@ -15,6 +15,7 @@ from typing import Any, Callable, Iterable
 from amon.config import read_yaml
 from amon.events import emit_event
 from amon.fs.atomic import atomic_write_text
+from amon.jobs.watchers import build_watcher, coalesce_events
 from amon.logging_utils import setup_logger
 
 
@@ -31,6 +32,7 @@ class JobStatus:
     last_heartbeat_ts: str | None
     last_error: str | None
     last_event_id: str | None
+    watch_metrics: dict[str, Any] | None = None
 
 
 @dataclass
@@ -45,6 +47,7 @@ class _JobHandle:
     event_emitter: EventEmitter
     last_event_id: str | None
     state_lock: threading.Lock = field(default_factory=threading.Lock)
+    watch_metrics: dict[str, Any] | None = None
 
 
 _JOB_REGISTRY: dict[str, _JobHandle] = {}
@@ -137,12 +140,15 @@ def status_job(job_id: str, *, data_dir: Path | None = None) -> JobStatus:
     handle = _JOB_REGISTRY.get(job_id)
     if handle:
         last_heartbeat = _read_state_file(job_id, resolved_data_dir).get("last_heartbeat_ts")
+        with handle.state_lock:
+            watch_metrics = dict(handle.watch_metrics) if handle.watch_metrics is not None else None
         return JobStatus(
             job_id=job_id,
             status=handle.status,
             last_heartbeat_ts=last_heartbeat,
             last_error=handle.last_error,
             last_event_id=handle.last_event_id,
+            watch_metrics=watch_metrics,
         )
     return _read_state(job_id, resolved_data_dir)
 
@@ -170,21 +176,65 @@ def _filesystem_watcher(handle: _JobHandle, paths: Iterable[Path], config: dict[
     debounce_seconds = _read_int(config.get("debounce_seconds")) or 1
     poll_interval = _read_int(config.get("watch_interval_seconds")) or 1
     last_emitted: dict[tuple[str, str], float] = {}
-    snapshot = _scan_paths(paths)
+    try:
+        watcher = build_watcher(
+            paths,
+            backend=str(config.get("watch_backend") or "auto"),
+            interval_seconds=poll_interval,
+        )
+    except Exception as exc:  # noqa: BLE001
+        _record_error(handle, "watcher 初始化失敗", exc)
+        return
+    with handle.state_lock:
+        handle.watch_metrics = {
+            "backend": watcher.name,
+            "events_seen": 0,
+            "events_emitted": 0,
+            "events_suppressed": 0,
+        }
 
-    while not handle.stop_event.is_set():
-        try:
-            time.sleep(poll_interval)
-        except Exception as exc:  # noqa: BLE001
-            _record_error(handle, "watcher sleep 失敗", exc)
+    try:
+        while not handle.stop_event.is_set():
+            try:
+                raw_events = watcher.poll(poll_interval)
+            except Exception as exc:  # noqa: BLE001
+                _record_error(handle, "watcher 掃描失敗", exc)
+                handle.stop_event.wait(poll_interval)
+                continue
+            if not raw_events:
+                continue
+            try:
+                _dispatch_fs_events(handle, raw_events, last_emitted, debounce_seconds)
+            except Exception as exc:  # noqa: BLE001
+                _record_error(handle, "watcher 事件派送失敗", exc)
+    finally:
+        watcher.close()
+
+
+def _dispatch_fs_events(
+    handle: _JobHandle,
+    raw_events: list[tuple[str, str]],
+    last_emitted: dict[tuple[str, str], float],
+    debounce_seconds: int,
+) -> None:
+    _bump_watch_metrics(handle, events_seen=len(raw_events), events_suppressed=len(raw_events))
+    now = time.monotonic()
+    for event_type, path in coalesce_events(raw_events):
+        key = (path, event_type)
+        last_time = last_emitted.get(key)
+        if last_time is not None and (now - last_time) < debounce_seconds:
             continue
+        last_emitted[key] = now
+        _bump_watch_metrics(handle, events_emitted=1, events_suppressed=-1)
+        _emit_job_event(handle.event_emitter, handle.job_id, event_type, {"job_id": handle.job_id, "path": path})
 
-        try:
-            new_snapshot = _scan_paths(paths)
-            _diff_snapshots(handle, snapshot, new_snapshot, last_emitted, debounce_seconds)
-            snapshot = new_snapshot
-        except Exception as exc:  # noqa: BLE001
-            _record_error(handle, "watcher 掃描失敗", exc)
+
+def _bump_watch_metrics(handle: _JobHandle, **deltas: int) -> None:
+    with handle.state_lock:
+        if handle.watch_metrics is None:
+            return
+        for key, delta in deltas.items():
+            handle.watch_metrics[key] = handle.watch_metrics.get(key, 0) + delta
 
 
 def _polling_job(
@@ -223,64 +273,6 @@ def _heartbeat_loop(handle: _JobHandle) -> None:
     _write_state(handle)
 
 
-def _scan_paths(paths: Iterable[Path]) -> dict[str, tuple[float, int]]:
-    snapshot: dict[str, tuple[float, int]] = {}
-    for path in paths:
-        if path.is_dir():
-            for root, _, files in os.walk(path):
-                for name in files:
-                    file_path = Path(root) / name
-                    try:
-                        stat = file_path.stat()
-                    except OSError:
-                        continue
-                    snapshot[str(file_path)] = (stat.st_mtime, stat.st_size)
-        elif path.exists():
-            try:
-                stat = path.stat()
-            except OSError:
-                continue
-            snapshot[str(path)] = (stat.st_mtime, stat.st_size)
-    return snapshot
-
-
-def _diff_snapshots(
-    handle: _JobHandle,
-    old: dict[str, tuple[float, int]],
-    new: dict[str, tuple[float, int]],
-    last_emitted: dict[tuple[str, str], float],
-    debounce_seconds: int,
-) -> None:
-    now = time.monotonic()
-    for path, meta in new.items():
-        if path not in old:
-            _emit_fs_event(handle.event_emitter, handle.job_id, "doc.created", path, last_emitted, now, debounce_seconds)
-            continue
-        if old[path] != meta:
-            _emit_fs_event(handle.event_emitter, handle.job_id, "doc.updated", path, last_emitted, now, debounce_seconds)
-
-    for path in old:
-        if path not in new:
-            _emit_fs_event(handle.event_emitter, handle.job_id, "doc.deleted", path, last_emitted, now, debounce_seconds)
-
-
-def _emit_fs_event(
-    emitter: EventEmitter,
-    job_id: str,
-    event_type: str,
-    path: str,
-    last_emitted: dict[tuple[str, str], float],
-    now: float,
-    debounce_seconds: int,
-) -> None:
-    key = (path, event_type)
-    last_time = last_emitted.get(key)
-    if last_time is not None and (now - last_time) < debounce_seconds:
-        return
-    last_emitted[key] = now
-    _emit_job_event(emitter, job_id, event_type, {"job_id": job_id, "path": path})
-
-
 def _emit_job_event(emitter: EventEmitter, job_id: str, event_type: str, payload: dict[str, Any]) -> None:
     event_id = datetime.now().astimezone().strftime("%Y%m%d%H%M%S%f")
     handle = _JOB_REGISTRY.get(job_id)
@@ -316,6 +308,8 @@ def _write_state(handle: _JobHandle) -> None:
             "last_error": handle.last_error,
             "last_event_id": handle.last_event_id,
         }
+        if handle.watch_metrics is not None:
+            state["watch_metrics"] = dict(handle.watch_metrics)
     state_path = state_dir / f"{handle.job_id}.json"
     try:
         atomic_write_text(state_path, json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -342,6 +336,7 @@ def _read_state(job_id: str, data_dir: Path) -> JobStatus:
         last_heartbeat_ts=state.get("last_heartbeat_ts"),
         last_error=state.get("last_error"),
         last_event_id=state.get("last_event_id"),
+        watch_metrics=state.get("watch_metrics"),
     )
 
 
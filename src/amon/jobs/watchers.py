@@ -0,0 +1,298 @@
+"""Filesystem watcher backends for resident jobs."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger("amon.jobs")
+
+FsEvent = tuple[str, str]
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+_SETTLE_SECONDS = 0.05
+_READ_BUFFER_BYTES = 64 * 1024
+
+
+class PollingWatcher:
+    """Snapshot-diff watcher; works everywhere but costs a full scan per interval."""
+
+    name = "polling"
+
+    def __init__(self, paths: Iterable[Path], *, interval_seconds: float) -> None:
+        self.paths = list(paths)
+        self.interval_seconds = interval_seconds
+        self._snapshot = scan_paths(self.paths)
+
+    def poll(self, timeout: float) -> list[FsEvent]:
+        time.sleep(min(timeout, self.interval_seconds))
+        new_snapshot = scan_paths(self.paths)
+        events = diff_snapshots(self._snapshot, new_snapshot)
+        self._snapshot = new_snapshot
+        return events
+
+    def close(self) -> None:
+        return None
+
+
+class InotifyWatcher:
+    """Linux inotify watcher with recursive watch management.
+
+    Directories created under a watched tree get their own watch as soon as the
+    creation event is seen, and files already present in them are reported as
+    created so nothing written before the watch existed is missed.
+    """
+
+    name = "inotify"
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify 不可用")
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失敗")
+        self._fd = fd
+        self._dirs: dict[int, Path] = {}
+        self._wd_by_dir: dict[Path, int] = {}
+        self._file_filters: dict[Path, set[str]] = {}
+        self.overflows = 0
+        self.paths = list(paths)
+        try:
+            for path in self.paths:
+                self._watch_root(path)
+        except OSError:
+            self.close()
+            raise
+
+    def poll(self, timeout: float) -> list[FsEvent]:
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not readable:
+            return []
+        raw = self._read_available()
+        # Editors and write_text() emit CREATE/MODIFY/CLOSE_WRITE in quick bursts;
+        # wait briefly so one logical write lands in a single batch.
+        time.sleep(_SETTLE_SECONDS)
+        raw += self._read_available()
+        return self._decode(raw)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = -1
+
+    def _watch_root(self, path: Path) -> None:
+        if path.is_dir():
+            self._watch_tree(path)
+            return
+        parent = path.parent
+        if not parent.is_dir():
+            raise OSError(errno.ENOENT, f"監看路徑不存在：{path}")
+        self._add_watch(parent)
+        self._file_filters.setdefault(parent, set()).add(path.name)
+
+    def _watch_tree(self, root: Path) -> list[str]:
+        discovered: list[str] = []
+        for current, dirnames, filenames in os.walk(root):
+            current_path = Path(current)
+            try:
+                self._add_watch(current_path)
+            except OSError as exc:
+                logger.warning("無法監看目錄 %s：%s", current_path, exc)
+                dirnames[:] = []
+                continue
+            discovered.extend(str(current_path / name) for name in filenames)
+        return discovered
+
+    def _add_watch(self, directory: Path) -> None:
+        if directory in self._wd_by_dir:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), _WATCH_MASK | _IN_ONLYDIR)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch 失敗：{directory}")
+        self._dirs[wd] = directory
+        self._wd_by_dir[directory] = wd
+
+    def _forget_watch(self, wd: int) -> None:
+        directory = self._dirs.pop(wd, None)
+        if directory is not None:
+            self._wd_by_dir.pop(directory, None)
+
+    def _read_available(self) -> bytes:
+        chunks: list[bytes] = []
+        while True:
+            try:
+                data = os.read(self._fd, _READ_BUFFER_BYTES)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def _decode(self, raw: bytes) -> list[FsEvent]:
+        events: list[FsEvent] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(raw):
+            wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(raw, offset)
+            offset += _EVENT_HEADER.size
+            name = raw[offset : offset + name_len].split(b"\0", 1)[0]
+            offset += name_len
+            if mask & _IN_Q_OVERFLOW:
+                self.overflows += 1
+                logger.warning("inotify 佇列溢位，部分檔案事件可能遺失")
+                continue
+            if mask & _IN_IGNORED:
+                self._forget_watch(wd)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            decoded_name = os.fsdecode(name)
+            allowed = self._file_filters.get(directory)
+            if allowed is not None and directory not in self.paths and decoded_name not in allowed:
+                continue
+            path = directory / decoded_name
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    events.extend(("doc.created", item) for item in self._watch_tree(path))
+                continue
+            if mask & (_IN_CREATE | _IN_MOVED_TO):
+                events.append(("doc.created", str(path)))
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                events.append(("doc.deleted", str(path)))
+            elif mask & (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_ATTRIB):
+                events.append(("doc.updated", str(path)))
+        return events
+
+
+def build_watcher(paths: Iterable[Path], *, backend: str = "auto", interval_seconds: float = 1):
+    """Return the watcher backend selected by ``backend`` (auto/inotify/polling)."""
+    path_list = list(paths)
+    normalized = (backend or "auto").strip().lower()
+    if normalized not in {"auto", "inotify", "polling"}:
+        raise ValueError(f"不支援的 watch_backend：{backend}")
+    if normalized in {"auto", "inotify"}:
+        try:
+            return InotifyWatcher(path_list)
+        except OSError as exc:
+            if normalized == "inotify":
+                logger.warning("inotify 無法啟用，改用輪詢：%s", exc)
+    return PollingWatcher(path_list, interval_seconds=interval_seconds)
+
+
+def coalesce_events(events: Iterable[FsEvent]) -> list[FsEvent]:
+    """Fold a batch of raw events into one net event per path.
+
+    The result matches what a snapshot diff over the same interval would report:
+    create+modify is a create, delete+create is an update, and a file created
+    and removed inside the batch produces nothing.
+    """
+    first_seen: dict[str, str] = {}
+    last_seen: dict[str, str] = {}
+    order: list[str] = []
+    for event_type, path in events:
+        if path not in first_seen:
+            first_seen[path] = event_type
+            order.append(path)
+        last_seen[path] = event_type
+    coalesced: list[FsEvent] = []
+    for path in order:
+        first, last = first_seen[path], last_seen[path]
+        if first == "doc.created":
+            if last != "doc.deleted":
+                coalesced.append(("doc.created", path))
+        elif last == "doc.deleted":
+            coalesced.append(("doc.deleted", path))
+        else:
+            coalesced.append(("doc.updated", path))
+    return coalesced
+
+
+def scan_paths(paths: Iterable[Path]) -> dict[str, tuple[float, int]]:
+    snapshot: dict[str, tuple[float, int]] = {}
+    for path in paths:
+        if path.is_dir():
+            for root, _, files in os.walk(path):
+                for name in files:
+                    file_path = Path(root) / name
+                    try:
+                        stat = file_path.stat()
+                    except OSError:
+                        continue
+                    snapshot[str(file_path)] = (stat.st_mtime, stat.st_size)
+        elif path.exists():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[str(path)] = (stat.st_mtime, stat.st_size)
+    return snapshot
+
+
+def diff_snapshots(old: dict[str, tuple[float, int]], new: dict[str, tuple[float, int]]) -> list[FsEvent]:
+    events: list[FsEvent] = []
+    for path, meta in new.items():
+        if path not in old:
+            events.append(("doc.created", path))
+        elif old[path] != meta:
+            events.append(("doc.updated", path))
+    for path in old:
+        if path not in new:
+            events.append(("doc.deleted", path))
+    return events
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    library = ctypes.util.find_library("c") or "libc.so.6"
+    try:
+        libc = ctypes.CDLL(library, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_init1.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_add_watch.restype = ctypes.c_int
+    return libc
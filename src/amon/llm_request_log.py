@@ -2,12 +2,32 @@
 
 from __future__ import annotations
 
+import gzip
+import hashlib
 import json
+import os
+import re
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
-from .fs.atomic import append_jsonl
+from .fs.atomic import append_jsonl, atomic_write_text, file_lock
+
+try:
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+LLM_REQUEST_LOG_NAME = "llm_requests.jsonl"
+LLM_REQUEST_BLOB_DIRNAME = "llm_request_blobs"
+DEFAULT_MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+DEFAULT_KEEP_UNCOMPRESSED_SEGMENTS = 1
+DEFAULT_ARCHIVE_COMPRESSION = "gzip"
+BLOB_MIN_CHARS = 1024
+_TAIL_BLOCK_BYTES = 64 * 1024
+_SEGMENT_NAME_RE = re.compile(r"^llm_requests\.(\d{6})\.jsonl(\.gz|\.zst)?$")
+_ROTATION_LOCK = threading.Lock()
 
 
 def build_llm_request_payload(
@@ -49,48 +69,228 @@ def build_llm_request_payload(
     return payload
 
 
-def append_llm_request(project_path: Path | None, payload: dict[str, Any]) -> Path | None:
+def append_llm_request(
+    project_path: Path | None,
+    payload: dict[str, Any],
+    *,
+    max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+    keep_uncompressed_segments: int = DEFAULT_KEEP_UNCOMPRESSED_SEGMENTS,
+    compression: str | None = DEFAULT_ARCHIVE_COMPRESSION,
+) -> Path | None:
+    """Append one request record to the active segment.
+
+    Message contents longer than ``BLOB_MIN_CHARS`` are stored once per project
+    under ``llm_request_blobs/`` and referenced by sha256; ``openai_messages`` is
+    derived from ``chat_messages`` on read instead of being written twice.
+    When the active segment grows past ``max_segment_bytes`` it is rotated into a
+    numbered segment, and older segments are archived with ``compression``.
+    """
     if project_path is None:
         return None
     path = llm_request_log_path(project_path, run_id=payload.get("run_id"))
-    append_jsonl(path, payload)
+    record = _compact_payload(payload, blob_dir=llm_request_blob_dir(project_path))
+    if max_segment_bytes > 0:
+        _rotate_if_needed(
+            path,
+            max_segment_bytes=max_segment_bytes,
+            keep_uncompressed_segments=keep_uncompressed_segments,
+            compression=compression,
+        )
+    append_jsonl(path, record)
     return path
 
 
 def llm_request_log_path(project_path: Path, *, run_id: Any = None) -> Path:
     normalized_run_id = str(run_id or "").strip()
     if normalized_run_id and not _is_unsafe_path_token(normalized_run_id):
-        return project_path / ".amon" / "runs" / normalized_run_id / "llm_requests.jsonl"
-    return project_path / ".amon" / "context" / "llm_requests.jsonl"
+        return project_path / ".amon" / "runs" / normalized_run_id / LLM_REQUEST_LOG_NAME
+    return project_path / ".amon" / "context" / LLM_REQUEST_LOG_NAME
+
+
+def llm_request_blob_dir(project_path: Path) -> Path:
+    return project_path / ".amon" / "context" / LLM_REQUEST_BLOB_DIRNAME
+
+
+def list_llm_request_segments(path: Path) -> list[Path]:
+    """Return rotated segments for ``path``, oldest first (active segment excluded)."""
+    if not path.parent.exists():
+        return []
+    numbered: list[tuple[int, Path]] = []
+    for candidate in path.parent.iterdir():
+        match = _SEGMENT_NAME_RE.match(candidate.name)
+        if match and candidate.is_file():
+            numbered.append((int(match.group(1)), candidate))
+    numbered.sort(key=lambda item: item[0])
+    return [candidate for _, candidate in numbered]
 
 
 def load_recent_llm_requests(project_path: Path, *, run_id: Any = None, limit: int = 12) -> list[dict[str, Any]]:
+    """Return up to ``limit`` most recent requests, newest first.
+
+    The active segment is read backward from its end, so the cost depends on
+    ``limit`` rather than on the total log size. Older rotated segments are only
+    opened when the active one does not hold enough records.
+    """
     if limit <= 0:
         return []
     path = llm_request_log_path(project_path, run_id=run_id)
-    if not path.exists() or not path.is_file():
-        return []
-    try:
-        lines = path.read_text(encoding="utf-8").splitlines()
-    except OSError:
-        return []
+    blob_dir = llm_request_blob_dir(project_path)
+    segments = [path, *reversed(list_llm_request_segments(path))]
 
     payloads: list[dict[str, Any]] = []
-    for raw_line in reversed(lines):
-        line = raw_line.strip()
-        if not line:
+    for segment in segments:
+        if not segment.exists() or not segment.is_file():
             continue
         try:
-            payload = json.loads(line)
-        except json.JSONDecodeError:
+            for raw_line in _iter_segment_lines_reversed(segment):
+                line = raw_line.strip()
+                if not line:
+                    continue
+                try:
+                    payload = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(payload, dict):
+                    payloads.append(_expand_payload(payload, blob_dir=blob_dir))
+                if len(payloads) >= limit:
+                    return payloads
+        except OSError:
             continue
-        if isinstance(payload, dict):
-            payloads.append(payload)
-        if len(payloads) >= limit:
-            break
     return payloads
 
 
+def _compact_payload(payload: dict[str, Any], *, blob_dir: Path) -> dict[str, Any]:
+    record = {key: value for key, value in payload.items() if key != "openai_messages"}
+    record["schema_version"] = 2
+    compacted: list[dict[str, Any]] = []
+    for message in payload.get("chat_messages") or []:
+        if not isinstance(message, dict):
+            continue
+        content = message.get("content")
+        if isinstance(content, str) and len(content) >= BLOB_MIN_CHARS:
+            digest = _store_blob(blob_dir, content)
+            compacted.append({"role": message.get("role"), "content_ref": f"sha256:{digest}", "content_chars": len(content)})
+        else:
+            compacted.append(dict(message))
+    record["chat_messages"] = compacted
+    return record
+
+
+def _expand_payload(record: dict[str, Any], *, blob_dir: Path) -> dict[str, Any]:
+    if record.get("schema_version") != 2:
+        return record
+    payload = dict(record)
+    chat_messages: list[dict[str, str]] = []
+    for message in record.get("chat_messages") or []:
+        if not isinstance(message, dict):
+            continue
+        role = str(message.get("role") or "")
+        content_ref = message.get("content_ref")
+        if isinstance(content_ref, str):
+            content = _load_blob(blob_dir, content_ref)
+        else:
+            content = str(message.get("content") or "")
+        chat_messages.append({"role": role, "content": content})
+    payload["chat_messages"] = chat_messages
+    payload["openai_messages"] = [_to_openai_input_message(item) for item in chat_messages]
+    return payload
+
+
+def _store_blob(blob_dir: Path, content: str) -> str:
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    blob_path = blob_dir / digest[:2] / f"{digest}.txt"
+    if not blob_path.exists():
+        atomic_write_text(blob_path, content)
+    return digest
+
+
+def _load_blob(blob_dir: Path, content_ref: str) -> str:
+    digest = content_ref.split(":", 1)[-1]
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        return ""
+    try:
+        return (blob_dir / digest[:2] / f"{digest}.txt").read_text(encoding="utf-8")
+    except OSError:
+        return ""
+
+
+def _rotate_if_needed(
+    path: Path,
+    *,
+    max_segment_bytes: int,
+    keep_uncompressed_segments: int,
+    compression: str | None,
+) -> None:
+    try:
+        if path.stat().st_size < max_segment_bytes:
+            return
+    except OSError:
+        return
+    lock_path = path.with_suffix(f"{path.suffix}.lock")
+    with _ROTATION_LOCK:
+        with file_lock(lock_path):
+            try:
+                if path.stat().st_size < max_segment_bytes:
+                    return
+            except OSError:
+                return
+            segments = list_llm_request_segments(path)
+            next_index = 1
+            if segments:
+                match = _SEGMENT_NAME_RE.match(segments[-1].name)
+                if match:
+                    next_index = int(match.group(1)) + 1
+            rotated = path.with_name(f"llm_requests.{next_index:06d}.jsonl")
+            os.replace(path, rotated)
+            segments.append(rotated)
+            plain_segments = [segment for segment in segments if segment.suffix == ".jsonl"]
+            if compression and keep_uncompressed_segments >= 0:
+                cutoff = len(plain_segments) - keep_uncompressed_segments
+                for segment in plain_segments[: max(cutoff, 0)]:
+                    _archive_segment(segment, compression=compression)
+
+
+def _archive_segment(segment: Path, *, compression: str) -> Path:
+    if compression == "zstd" and zstandard is not None:
+        target = segment.with_name(f"{segment.name}.zst")
+        data = zstandard.ZstdCompressor().compress(segment.read_bytes())
+    else:
+        target = segment.with_name(f"{segment.name}.gz")
+        data = gzip.compress(segment.read_bytes())
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, target)
+    segment.unlink()
+    return target
+
+
+def _iter_segment_lines_reversed(segment: Path) -> Iterator[str]:
+    if segment.name.endswith(".gz"):
+        yield from reversed(gzip.decompress(segment.read_bytes()).decode("utf-8").splitlines())
+        return
+    if segment.name.endswith(".zst"):
+        if zstandard is None:
+            return
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(segment.read_bytes())
+        yield from reversed(data.decode("utf-8").splitlines())
+        return
+    with segment.open("rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        position = handle.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(_TAIL_BLOCK_BYTES, position)
+            position -= read_size
+            handle.seek(position)
+            block = handle.read(read_size) + remainder
+            lines = block.split(b"\n")
+            remainder = lines[0]
+            for raw_line in reversed(lines[1:]):
+                yield raw_line.decode("utf-8", errors="replace")
+        if remainder:
+            yield remainder.decode("utf-8", errors="replace")
+
+
 def _normalize_chat_messages(messages: list[dict[str, Any]]) -> list[dict[str, str]]:
     normalized: list[dict[str, str]] = []
     for item in messages:
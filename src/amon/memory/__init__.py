@@ -0,0 +1,5 @@
+"""Memory ingest helpers."""
+
+from .cursor import count_jsonl_records, iter_stage_records
+
+__all__ = ["count_jsonl_records", "iter_stage_records"]
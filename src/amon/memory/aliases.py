@@ -0,0 +1,227 @@
+"""Entity alias registry used by the memory entities stage."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any
+
+from ..fs.atomic import append_jsonl, atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# Only person names up to this length are merged into a longer known name
+# ("小明" -> "王小明"), so the index keeps substrings up to this length.
+SHORT_NAME_MAX = 3
+_COMPACT_MIN_BYTES = 64 * 1024
+
+
+def normalize_alias_key(name: str) -> str:
+    normalized = unicodedata.normalize("NFKC", name).strip().lower()
+    return re.sub(r"\s+", "", normalized)
+
+
+def slugify_entity_name(name: str) -> str:
+    normalized = unicodedata.normalize("NFKC", name).strip().lower()
+    normalized = re.sub(r"\s+", "_", normalized)
+    normalized = re.sub(r"[^\w\u4e00-\u9fff]+", "_", normalized)
+    normalized = normalized.strip("_")
+    return normalized or "unknown"
+
+
+def derive_person_aliases(name: str) -> list[str]:
+    normalized = unicodedata.normalize("NFKC", name).strip()
+    if len(normalized) < 3:
+        return []
+    alias = normalized[1:]
+    return [alias] if alias and alias != normalized else []
+
+
+class EntityAliasStore:
+    """Canonical entities and their aliases for one memory directory.
+
+    ``entity_aliases.json`` is a snapshot; changes since the snapshot are
+    appended to ``entity_aliases.journal.jsonl`` by ``flush`` (one line per
+    flush holding the touched aliases and full entity entries) and folded
+    back into the snapshot by ``compact`` once the journal outgrows it.
+    Replaying the journal is idempotent, so a crash between writing the
+    snapshot and truncating the journal loses nothing.
+
+    Short person names are matched against known names through an index of
+    every substring of up to ``SHORT_NAME_MAX`` characters instead of
+    scanning all entities per mention.
+    """
+
+    def __init__(self, snapshot_path: Path, *, compact_min_bytes: int = _COMPACT_MIN_BYTES) -> None:
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.with_name(f"{snapshot_path.stem}.journal.jsonl")
+        self.compact_min_bytes = compact_min_bytes
+        self.payload: dict[str, Any] = {"entities": {}, "aliases": {}}
+        self._substrings: dict[str, set[str]] = {}
+        self._dirty_aliases: dict[str, str] = {}
+        self._dirty_entities: dict[str, None] = {}
+
+    @property
+    def entities(self) -> dict[str, Any]:
+        return self.payload["entities"]
+
+    @property
+    def aliases(self) -> dict[str, str]:
+        return self.payload["aliases"]
+
+    def load(self) -> None:
+        payload: Any = {}
+        if self.snapshot_path.exists():
+            payload = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        if not isinstance(payload, dict):
+            payload = {}
+        payload.setdefault("entities", {})
+        payload.setdefault("aliases", {})
+        self.payload = payload
+        self._dirty_aliases = {}
+        self._dirty_entities = {}
+        if self.journal_path.exists():
+            with self.journal_path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    entry = line.strip()
+                    if not entry:
+                        continue
+                    try:
+                        change = json.loads(entry)
+                    except json.JSONDecodeError as exc:
+                        # A torn append from an interrupted flush; the next
+                        # flush starts on a fresh line.
+                        logger.warning("略過無法解析的 entity alias journal 紀錄：%s", exc)
+                        continue
+                    self.aliases.update(change.get("aliases") or {})
+                    self.entities.update(change.get("entities") or {})
+        self._substrings = {}
+        for canonical_id, entry in self.entities.items():
+            self._index_text(canonical_id, str(entry.get("name") or ""))
+            for alias in entry.get("aliases") or []:
+                self._index_text(canonical_id, str(alias))
+
+    def flush(self) -> None:
+        if self._dirty_aliases or self._dirty_entities:
+            append_jsonl(
+                self.journal_path,
+                {
+                    "aliases": self._dirty_aliases,
+                    "entities": {canonical_id: self.entities[canonical_id] for canonical_id in self._dirty_entities},
+                },
+            )
+            self._dirty_aliases = {}
+            self._dirty_entities = {}
+        if self._journal_size() > max(self.compact_min_bytes, self._snapshot_size()):
+            self.compact()
+
+    def compact(self) -> None:
+        atomic_write_text(self.snapshot_path, json.dumps(self.payload, ensure_ascii=False, indent=2))
+        self._dirty_aliases = {}
+        self._dirty_entities = {}
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+
+    def resolve(self, name: str, entity_type: str) -> str:
+        alias_key = normalize_alias_key(name)
+        if alias_key in self.aliases:
+            canonical_id = self.aliases[alias_key]
+            self._ensure_alias(canonical_id, name, entity_type)
+            return canonical_id
+        candidate_id = self.find_merge_candidate(name, entity_type)
+        if candidate_id:
+            self._set_alias(alias_key, candidate_id)
+            self._ensure_alias(candidate_id, name, entity_type)
+            return candidate_id
+        canonical_id = self._build_canonical_id(entity_type, name)
+        self._set_alias(alias_key, canonical_id)
+        if canonical_id not in self.entities:
+            self.entities[canonical_id] = {
+                "canonical_id": canonical_id,
+                "name": name,
+                "type": entity_type,
+                "aliases": [name],
+                "merged_ids": [],
+            }
+            self._dirty_entities[canonical_id] = None
+            self._index_text(canonical_id, name)
+        if entity_type == "person":
+            for derived in derive_person_aliases(name):
+                derived_key = normalize_alias_key(derived)
+                if derived_key not in self.aliases:
+                    self._set_alias(derived_key, canonical_id)
+                    self._ensure_alias(canonical_id, derived, entity_type)
+        return canonical_id
+
+    def find_merge_candidate(self, name: str, entity_type: str) -> str | None:
+        """Longest-named person entity whose name or an alias contains ``name``."""
+        if entity_type != "person" or not name or len(name) > SHORT_NAME_MAX:
+            return None
+        best: tuple[int, str] | None = None
+        for canonical_id in self._substrings.get(name, ()):
+            entry = self.entities[canonical_id]
+            if entry.get("type") != "person":
+                continue
+            candidate = (len(str(entry.get("name") or "")), canonical_id)
+            if best is None or candidate > best:
+                best = candidate
+        return best[1] if best else None
+
+    def _build_canonical_id(self, entity_type: str, name: str) -> str:
+        canonical_id = f"{entity_type}:{slugify_entity_name(name)}"
+        if canonical_id in self.entities and self.entities[canonical_id].get("name") != name:
+            digest = hashlib.md5(name.encode("utf-8")).hexdigest()[:6]
+            canonical_id = f"{canonical_id}-{digest}"
+        return canonical_id
+
+    def _set_alias(self, alias_key: str, canonical_id: str) -> None:
+        self.aliases[alias_key] = canonical_id
+        self._dirty_aliases[alias_key] = canonical_id
+
+    def _ensure_alias(self, canonical_id: str, alias: str, entity_type: str | None = None) -> None:
+        entry = self.entities.get(canonical_id)
+        if entry is None:
+            entry = {
+                "canonical_id": canonical_id,
+                "name": alias,
+                "type": entity_type or "",
+                "aliases": [],
+                "merged_ids": [],
+            }
+            self.entities[canonical_id] = entry
+            self._dirty_entities[canonical_id] = None
+            self._index_text(canonical_id, alias)
+        if entity_type and not entry.get("type"):
+            entry["type"] = entity_type
+            self._dirty_entities[canonical_id] = None
+        if alias and not entry.get("name"):
+            entry["name"] = alias
+            self._dirty_entities[canonical_id] = None
+            self._index_text(canonical_id, alias)
+        alias_list = entry.setdefault("aliases", [])
+        if alias not in alias_list:
+            alias_list.append(alias)
+            self._dirty_entities[canonical_id] = None
+            self._index_text(canonical_id, alias)
+
+    def _index_text(self, canonical_id: str, text: str) -> None:
+        for start in range(len(text)):
+            for end in range(start + 1, min(start + SHORT_NAME_MAX, len(text)) + 1):
+                self._substrings.setdefault(text[start:end], set()).add(canonical_id)
+
+    def _journal_size(self) -> int:
+        try:
+            return os.stat(self.journal_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _snapshot_size(self) -> int:
+        try:
+            return os.stat(self.snapshot_path).st_size
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,167 @@
+"""Byte-offset cursors over the append-only JSONL files of the memory pipeline."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator
+
+_ANCHOR_BYTES = 64
+
+
+def line_checksum(raw_line: bytes) -> str:
+    return hashlib.sha1(raw_line).hexdigest()[:16]
+
+
+def iter_stage_records(
+    path: Path,
+    cursor: dict[str, Any],
+    *,
+    limit: int | None = None,
+    accept: Callable[[dict[str, Any]], bool] | None = None,
+    id_field: str = "chunk_id",
+    end_offset: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield records after ``cursor`` and advance it past each yielded line.
+
+    The cursor is a plain dict persisted in ``ingest_state.json``: ``offset`` is
+    where the next line starts, ``line_offset`` and ``checksum`` identify the
+    last consumed line, and ``last_chunk_id``/``processed`` keep their old
+    meaning. Resuming seeks straight to ``offset`` once the checksum of the line
+    before it still matches. A cursor without an offset (older state) or a
+    file rewritten underneath it is re-synchronised by scanning for
+    ``last_chunk_id``, as the pipeline used to do on every call.
+
+    Lines starting at or after ``end_offset`` are not read, which lets a stage
+    trail an upstream stage that is still appending to ``path``.
+    Unterminated trailing lines are left for the next call. When ``accept``
+    rejects a record, iteration stops without consuming it. The cursor is
+    updated before a record is yielded; callers only persist it after the
+    whole batch succeeded.
+    """
+    if limit is not None and limit <= 0:
+        return
+    if not path.exists():
+        return
+    with path.open("rb") as handle:
+        offset = _resume_offset(handle, cursor, id_field)
+        if offset is None:
+            return
+        handle.seek(offset)
+        taken = 0
+        while limit is None or taken < limit:
+            line_offset = handle.tell()
+            if end_offset is not None and line_offset >= end_offset:
+                return
+            raw_line = handle.readline()
+            if not raw_line.endswith(b"\n"):
+                return
+            payload = raw_line.strip()
+            if not payload:
+                cursor["offset"] = handle.tell()
+                continue
+            record = json.loads(payload)
+            if accept is not None and not accept(record):
+                return
+            cursor["offset"] = handle.tell()
+            cursor["line_offset"] = line_offset
+            cursor["checksum"] = line_checksum(raw_line)
+            cursor["last_chunk_id"] = str(record.get(id_field) or "")
+            cursor["processed"] = int(cursor.get("processed", 0)) + 1
+            taken += 1
+            yield record
+
+
+def cursor_in_sync(path: Path, cursor: dict[str, Any]) -> bool:
+    """Whether ``path`` still starts with the lines ``cursor`` has consumed.
+
+    A cursor that never consumed anything is always in sync; a rewritten or
+    truncated file is not.
+    """
+    if not isinstance(cursor.get("offset"), int) or cursor["offset"] <= 0:
+        return cursor.get("checksum") is None
+    if not path.exists():
+        return False
+    with path.open("rb") as handle:
+        return _offset_verified(handle, cursor)
+
+
+def _offset_verified(handle: BinaryIO, cursor: dict[str, Any]) -> bool:
+    offset = cursor["offset"]
+    if cursor.get("checksum") is None:
+        # Only blank lines consumed so far; nothing to verify against.
+        return offset <= os.fstat(handle.fileno()).st_size
+    handle.seek(int(cursor.get("line_offset") or 0))
+    raw_line = handle.readline()
+    return handle.tell() == offset and line_checksum(raw_line) == cursor["checksum"]
+
+
+def _resume_offset(handle: BinaryIO, cursor: dict[str, Any], id_field: str) -> int | None:
+    offset = cursor.get("offset")
+    if isinstance(offset, int) and offset >= 0 and _offset_verified(handle, cursor):
+        return offset
+    return _scan_for_last_chunk(handle, cursor, id_field)
+
+
+def _scan_for_last_chunk(handle: BinaryIO, cursor: dict[str, Any], id_field: str) -> int | None:
+    last_chunk_id = cursor.get("last_chunk_id")
+    handle.seek(0)
+    if last_chunk_id is None:
+        cursor.pop("checksum", None)
+        cursor["offset"] = 0
+        return 0
+    found: int | None = None
+    while True:
+        line_offset = handle.tell()
+        raw_line = handle.readline()
+        if not raw_line.endswith(b"\n"):
+            break
+        payload = raw_line.strip()
+        if not payload:
+            continue
+        record_id = str(json.loads(payload).get(id_field) or "")
+        if record_id == last_chunk_id:
+            found = handle.tell()
+            cursor["line_offset"] = line_offset
+            cursor["checksum"] = line_checksum(raw_line)
+        elif found is not None:
+            break
+    if found is None:
+        return None
+    cursor["offset"] = found
+    return found
+
+
+def count_jsonl_records(path: Path, tally: dict[str, Any]) -> int:
+    """Count non-blank lines in ``path``, reading only bytes added since ``tally``.
+
+    ``tally`` keeps the offset of the last complete line counted, the count up
+    to there and a fingerprint of the bytes just before the offset. A shorter
+    file or a changed fingerprint means it was rewritten and is counted again
+    from the start. An unterminated last line is counted but not committed.
+    """
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        offset = int(tally.get("offset") or 0)
+        if offset > size or _read_anchor(handle, offset) != tally.get("anchor", ""):
+            offset = 0
+            tally.update({"offset": 0, "lines": 0, "anchor": ""})
+        handle.seek(offset)
+        appended = handle.read(size - offset)
+        complete, newline, tail = appended.rpartition(b"\n")
+        if newline:
+            tally["lines"] = int(tally.get("lines") or 0) + sum(1 for line in complete.split(b"\n") if line.strip())
+            offset += len(complete) + 1
+            tally["offset"] = offset
+            tally["anchor"] = _read_anchor(handle, offset)
+    return int(tally.get("lines") or 0) + (1 if tail.strip() else 0)
+
+
+def _read_anchor(handle: BinaryIO, offset: int) -> str:
+    if offset <= 0:
+        return ""
+    start = max(0, offset - _ANCHOR_BYTES)
+    handle.seek(start)
+    return hashlib.sha1(handle.read(offset - start)).hexdigest()
@@ -0,0 +1,279 @@
+"""Per-chunk extraction for the memory ingest stages.
+
+Everything here is a plain module-level function of its arguments so the
+ingest engine can hand chunks to worker processes; ``AmonCore`` keeps thin
+wrappers with the historical method names.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+_TAIPEI_TZ = ZoneInfo("Asia/Taipei")
+# Bump whenever build_tag_record output changes so every tag is regenerated.
+TAGS_FORMAT_VERSION = 1
+_RELATIVE_DAY_OFFSETS = {
+    "昨天": -1,
+    "明天": 1,
+    "今天": 0,
+    "前天": -2,
+    "後天": 2,
+}
+_WEEKDAYS = {"一": 0, "二": 1, "三": 2, "四": 3, "五": 4, "六": 5, "日": 6, "天": 6}
+_TIME_PATTERNS = (
+    re.compile(r"昨天|明天|今天|前天|後天"),
+    re.compile(r"下週[一二三四五六日天]"),
+)
+_TAIPEI_GEO = {
+    "normalized_name": "Taipei City, Taiwan",
+    "geocode_id": "tw-tpe",
+    "lat": 25.033,
+    "lon": 121.5654,
+}
+_GEO_PATTERNS = tuple(
+    (re.compile(re.escape(alias), flags=re.IGNORECASE), _TAIPEI_GEO) for alias in ("台北", "臺北", "Taipei")
+)
+_SURNAMES = (
+    "王李張劉陳楊黃趙吳周徐孫馬朱胡郭何高林羅鄭梁謝宋唐許韓馮"
+    "鄧曹彭曾蕭田董袁潘於蔣蔡余杜葉程蘇魏呂丁任沈姚盧姜崔鐘譚"
+    "陸汪范金石廖賴邵熊孟秦白江閻薛尹段雷侯龍史陶黎賀顧毛郝龔"
+    "邱萬錢嚴覃武戴莫孔向湯"
+)
+_PERSON_PATTERN = re.compile(rf"(?P<name>[{_SURNAMES}][\u4e00-\u9fff]{{1,2}})")
+_ORG_PATTERN = re.compile(r"(?P<name>[\u4e00-\u9fff]{2,12}(公司|企業|機構|組織|基金會|工作室|學校|大學|協會))")
+_PRONOUN_PATTERN = re.compile(
+    "|".join(re.escape(pronoun) for pronoun in ["他們", "她們", "他", "她", "這家公司", "該公司", "這個公司", "該企業", "該組織"])
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def parse_chunk_created_at(created_at: str) -> datetime | None:
+    try:
+        parsed = datetime.fromisoformat(created_at)
+    except ValueError as exc:
+        logger.warning("解析 created_at 失敗：%s", exc, exc_info=True)
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=_TAIPEI_TZ)
+    return parsed.astimezone(_TAIPEI_TZ)
+
+
+def resolve_relative_date(raw: str, base_date: date | None) -> str | None:
+    if base_date is None:
+        return None
+    if raw in _RELATIVE_DAY_OFFSETS:
+        return (base_date + timedelta(days=_RELATIVE_DAY_OFFSETS[raw])).isoformat()
+    if raw.startswith("下週"):
+        target_weekday = _WEEKDAYS.get(raw.replace("下週", "", 1))
+        if target_weekday is None:
+            return None
+        days_until_next_monday = 7 - base_date.weekday()
+        return (base_date + timedelta(days=days_until_next_monday + target_weekday)).isoformat()
+    return None
+
+
+def extract_time_mentions(text: str, created_at: str) -> list[dict[str, Any]]:
+    base_datetime = parse_chunk_created_at(created_at)
+    base_date = base_datetime.date() if base_datetime else None
+    mentions: list[dict[str, Any]] = []
+    for pattern in _TIME_PATTERNS:
+        for match in pattern.finditer(text):
+            raw = match.group(0)
+            resolved_date = resolve_relative_date(raw, base_date)
+            if resolved_date:
+                mentions.append(
+                    {
+                        "raw": raw,
+                        "resolved_date": resolved_date,
+                        "confidence": 1,
+                        "needs_review": False,
+                    }
+                )
+            else:
+                mentions.append({"raw": raw, "confidence": 0, "needs_review": True})
+    return mentions
+
+
+def extract_geo_mentions(text: str) -> list[dict[str, Any]]:
+    mentions: list[dict[str, Any]] = []
+    for pattern, info in _GEO_PATTERNS:
+        for match in pattern.finditer(text):
+            mentions.append(
+                {
+                    "raw": match.group(0),
+                    "normalized_name": info["normalized_name"],
+                    "geocode_id": info["geocode_id"],
+                    "lat": info["lat"],
+                    "lon": info["lon"],
+                    "confidence": 1,
+                    "needs_review": False,
+                }
+            )
+    return mentions
+
+
+def extract_explicit_entities(text: str) -> list[dict[str, Any]]:
+    mentions: list[dict[str, Any]] = []
+    for match in _PERSON_PATTERN.finditer(text):
+        mentions.append({"name": match.group("name"), "type": "person", "start": match.start(), "end": match.end()})
+    for match in _ORG_PATTERN.finditer(text):
+        mentions.append({"name": match.group("name"), "type": "org", "start": match.start(), "end": match.end()})
+    return sorted(mentions, key=lambda item: item["start"])
+
+
+def extract_pronoun_mentions(text: str) -> list[dict[str, Any]]:
+    return [
+        {"pronoun": match.group(0), "start": match.start(), "end": match.end()}
+        for match in _PRONOUN_PATTERN.finditer(text)
+    ]
+
+
+def resolve_pronouns_in_text(
+    text: str,
+    last_entity: dict[str, Any] | None,
+    explicit_entities: list[dict[str, Any]] | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
+    mentions: list[dict[str, Any]] = []
+    events: list[dict[str, Any]] = []
+    for entity in explicit_entities if explicit_entities is not None else extract_explicit_entities(text):
+        event = dict(entity)
+        event["kind"] = "entity"
+        events.append(event)
+    for pronoun in extract_pronoun_mentions(text):
+        event = dict(pronoun)
+        event["kind"] = "pronoun"
+        events.append(event)
+    for event in sorted(events, key=lambda item: item["start"]):
+        if event["kind"] == "entity":
+            last_entity = {"name": event["name"], "type": event["type"]}
+            continue
+        resolved_to = last_entity.get("name") if last_entity else None
+        entity_type = last_entity.get("type") if last_entity else None
+        mentions.append(
+            {
+                "pronoun": event["pronoun"],
+                "resolved_to": resolved_to,
+                "entity_type": entity_type,
+                "confidence": 0.6 if resolved_to else 0.0,
+                "needs_review": resolved_to is None,
+                "rule": "session_last_explicit",
+            }
+        )
+    return mentions, last_entity
+
+
+def sanitize_tag_value(value: str) -> str:
+    sanitized = value.replace("\n", " ").replace("\r", " ")
+    sanitized = sanitized.replace("```", "").replace("`", "")
+    sanitized = sanitized.replace("<", "").replace(">", "")
+    return _WHITESPACE.sub(" ", sanitized).strip()
+
+
+def build_tags_markdown(normalized: dict[str, Any], entity_mentions: list[dict[str, Any]]) -> str:
+    lines = ["## AMON_MEMORY_TAGS"]
+    time_mentions = normalized.get("time", {}).get("mentions", [])
+    geo_mentions = normalized.get("geo", {}).get("mentions", [])
+
+    if time_mentions:
+        for mention in time_mentions:
+            raw = sanitize_tag_value(str(mention.get("raw") or ""))
+            resolved = sanitize_tag_value(str(mention.get("resolved_date") or ""))
+            lines.append(f'- time_mentions: raw="{raw}", resolved_date="{resolved}"')
+    else:
+        lines.append("- time_mentions: none")
+
+    if geo_mentions:
+        for mention in geo_mentions:
+            raw = sanitize_tag_value(str(mention.get("raw") or ""))
+            geocode = sanitize_tag_value(str(mention.get("geocode_id") or ""))
+            normalized_name = sanitize_tag_value(str(mention.get("normalized_name") or ""))
+            lines.append(f'- geo_mentions: raw="{raw}", geocode_id="{geocode}", normalized_name="{normalized_name}"')
+    else:
+        lines.append("- geo_mentions: none")
+
+    if entity_mentions:
+        for mention in entity_mentions:
+            pronoun = sanitize_tag_value(str(mention.get("pronoun") or ""))
+            resolved_to = sanitize_tag_value(str(mention.get("resolved_to") or ""))
+            resolved_to_canonical = sanitize_tag_value(str(mention.get("resolved_to_canonical_id") or ""))
+            name = sanitize_tag_value(str(mention.get("name") or ""))
+            canonical_id = sanitize_tag_value(str(mention.get("canonical_id") or ""))
+            entity_type = sanitize_tag_value(str(mention.get("entity_type") or ""))
+            confidence = mention.get("confidence")
+            needs_review = mention.get("needs_review")
+            rule = sanitize_tag_value(str(mention.get("rule") or ""))
+            lines.append(
+                "- entity_mentions: "
+                f'pronoun="{pronoun}", resolved_to="{resolved_to}", resolved_to_canonical_id="{resolved_to_canonical}", '
+                f'name="{name}", canonical_id="{canonical_id}", entity_type="{entity_type}", '
+                f'confidence="{confidence}", needs_review="{needs_review}", rule="{rule}"'
+            )
+    else:
+        lines.append("- entity_mentions: none")
+
+    return "\n".join(lines)
+
+
+def vectorize_text(text: str) -> Counter[str]:
+    cleaned = _WHITESPACE.sub("", text.lower())
+    if len(cleaned) < 2:
+        return Counter({cleaned: 1}) if cleaned else Counter()
+    return Counter(cleaned[index : index + 2] for index in range(len(cleaned) - 1))
+
+
+# -- stage workers (run in the ingest process pool) ------------------------
+
+
+def normalize_chunk(chunk: dict[str, Any]) -> dict[str, Any]:
+    text = str(chunk.get("text") or "")
+    normalized = dict(chunk)
+    normalized["time"] = {"mentions": extract_time_mentions(text, str(chunk.get("created_at") or ""))}
+    normalized["geo"] = {"mentions": extract_geo_mentions(text)}
+    return normalized
+
+
+def resolve_session_shard(
+    texts: list[str],
+    last_entity: dict[str, Any] | None,
+) -> tuple[list[tuple[list[dict[str, Any]], list[dict[str, Any]]]], dict[str, Any] | None]:
+    """Entity extraction for consecutive chunks of one session, in order."""
+    results: list[tuple[list[dict[str, Any]], list[dict[str, Any]]]] = []
+    for text in texts:
+        explicit_entities = extract_explicit_entities(text)
+        pronoun_mentions, last_entity = resolve_pronouns_in_text(text, last_entity, explicit_entities)
+        results.append((explicit_entities, pronoun_mentions))
+    return results, last_entity
+
+
+def tag_source_digest(normalized: dict[str, Any], entity_mentions: list[dict[str, Any]]) -> str:
+    """Fingerprint of everything a tag record is built from, including the tag format."""
+    payload = json.dumps([TAGS_FORMAT_VERSION, normalized, entity_mentions], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def build_tag_record(normalized: dict[str, Any], entity_mentions: list[dict[str, Any]]) -> dict[str, Any]:
+    tags_markdown = build_tags_markdown(normalized, entity_mentions)
+    return {
+        "chunk_id": str(normalized.get("chunk_id") or ""),
+        "tags_markdown": tags_markdown,
+        "embedding_text": f"{normalized.get('text') or ''}\n\n{tags_markdown}",
+        "source_digest": tag_source_digest(normalized, entity_mentions),
+    }
+
+
+def embed_record(record: dict[str, Any]) -> dict[str, Any]:
+    embedding_text = str(record.get("embedding_text") or "")
+    return {
+        "chunk_id": str(record.get("chunk_id") or ""),
+        "embedding_text": embedding_text,
+        "vector": dict(vectorize_text(embedding_text)),
+    }
@@ -0,0 +1,229 @@
+"""Pipelined execution of the memory ingest stages."""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+_EXECUTOR_LOCK = threading.Lock()
+_EXECUTOR: ProcessPoolExecutor | None = None
+_EXECUTOR_WORKERS = 0
+_EXECUTOR_DISABLED = False
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def ingest_workers() -> int:
+    return max(0, _env_int("AMON_MEMORY_INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def ingest_executor() -> ProcessPoolExecutor | None:
+    """Process pool shared by every ingest run in this process, or ``None`` to run inline."""
+    global _EXECUTOR, _EXECUTOR_WORKERS, _EXECUTOR_DISABLED
+    workers = ingest_workers()
+    if workers <= 1:
+        return None
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR_DISABLED:
+            return None
+        if _EXECUTOR is not None and _EXECUTOR_WORKERS == workers:
+            return _EXECUTOR
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        try:
+            _EXECUTOR = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as exc:
+            logger.warning("無法建立 memory ingest process pool，改為單執行緒處理：%s", exc)
+            _EXECUTOR = None
+            _EXECUTOR_DISABLED = True
+            return None
+        _EXECUTOR_WORKERS = workers
+        return _EXECUTOR
+
+
+def _discard_executor(executor: Executor) -> None:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is executor:
+            _EXECUTOR = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def map_ordered(fn: Callable[..., Any], *iterables: Iterable[Any]) -> list[Any]:
+    """``map`` over the shared process pool, keeping input order.
+
+    Small batches run inline because pickling them costs more than the work;
+    a pool that died (e.g. a worker was killed) is replaced on the next call
+    and this batch falls back to inline execution.
+    """
+    arguments = list(zip(*iterables))
+    executor = ingest_executor() if len(arguments) >= _env_int("AMON_MEMORY_INGEST_PARALLEL_MIN", 32) else None
+    if executor is None:
+        return [fn(*args) for args in arguments]
+    chunksize = max(1, len(arguments) // (_EXECUTOR_WORKERS * 4 or 1))
+    try:
+        return list(executor.map(fn, *zip(*arguments), chunksize=chunksize))
+    except BrokenProcessPool as exc:
+        logger.warning("memory ingest process pool 中斷，改為單執行緒重跑此批次：%s", exc)
+        _discard_executor(executor)
+        return [fn(*args) for args in arguments]
+
+
+@dataclass
+class IngestStage:
+    """One stage of the ingest pipeline.
+
+    ``process(limit, end_offset)`` handles at most ``limit`` records whose
+    input lines start before ``end_offset`` (``None`` = no bound) and returns
+    how many it handled. ``frontier()`` is the offset in the next stage's
+    input file up to which this stage's output is complete. ``session``
+    wraps the whole stage run, e.g. to hold a lock.
+    """
+
+    name: str
+    process: Callable[[int, int | None], int]
+    frontier: Callable[[], int | None]
+    session: Callable[[], AbstractContextManager[Any]] | None = None
+
+
+class _Aborted(Exception):
+    pass
+
+
+class IngestPipeline:
+    """Run stages concurrently, each feeding the next through a bounded queue.
+
+    Every stage runs in its own thread and works in micro-batches of at most
+    ``micro_batch`` records, up to ``batch_size`` records per run. After each
+    micro-batch it tells the next stage how far its output reaches, so
+    downstream stages start while upstream ones are still busy. Records are
+    always consumed in file order, so the output is the same as running the
+    stages one after another. The first failure aborts the other stages and
+    is re-raised from ``run``.
+    """
+
+    def __init__(
+        self,
+        stages: list[IngestStage],
+        *,
+        batch_size: int,
+        micro_batch: int | None = None,
+        queue_max: int | None = None,
+    ) -> None:
+        self.stages = stages
+        self.batch_size = batch_size
+        self.micro_batch = max(1, micro_batch or _env_int("AMON_MEMORY_INGEST_MICRO_BATCH", 64))
+        self.queue_max = max(1, queue_max or _env_int("AMON_MEMORY_INGEST_QUEUE_MAX", 8))
+
+    def run(self) -> dict[str, dict[str, Any]]:
+        links: list[queue.Queue] = [queue.Queue(maxsize=self.queue_max) for _ in self.stages[1:]]
+        metrics = {stage.name: {"records": 0, "batches": 0, "busy_s": 0.0, "wait_s": 0.0} for stage in self.stages}
+        errors: list[BaseException] = []
+        abort = threading.Event()
+        threads = []
+        for position, stage in enumerate(self.stages):
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(
+                    stage,
+                    links[position - 1] if position else None,
+                    links[position] if position < len(links) else None,
+                    metrics[stage.name],
+                    abort,
+                    errors,
+                ),
+                name=f"amon-memory-{stage.name}",
+                daemon=True,
+            )
+            threads.append(thread)
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_s = time.perf_counter() - started_at
+        if errors:
+            raise errors[0]
+        for item in metrics.values():
+            item["busy_s"] = round(item["busy_s"], 6)
+            item["wait_s"] = round(item["wait_s"], 6)
+            item["records_per_s"] = round(item["records"] / item["busy_s"], 1) if item["busy_s"] else 0.0
+            item["wall_s"] = round(wall_s, 6)
+        return metrics
+
+    def _run_stage(
+        self,
+        stage: IngestStage,
+        inbox: queue.Queue | None,
+        outbox: queue.Queue | None,
+        metrics: dict[str, Any],
+        abort: threading.Event,
+        errors: list[BaseException],
+    ) -> None:
+        remaining = self.batch_size
+        end_offset: int | None = None
+        upstream_done = inbox is None
+        try:
+            with stage.session() if stage.session is not None else nullcontext():
+                while True:
+                    if not upstream_done:
+                        waited_at = time.perf_counter()
+                        upstream_done, end_offset = self._get(inbox, abort)
+                        metrics["wait_s"] += time.perf_counter() - waited_at
+                    while remaining > 0:
+                        started_at = time.perf_counter()
+                        processed = stage.process(min(self.micro_batch, remaining), end_offset)
+                        metrics["busy_s"] += time.perf_counter() - started_at
+                        if processed <= 0:
+                            break
+                        remaining -= processed
+                        metrics["records"] += processed
+                        metrics["batches"] += 1
+                        if outbox is not None:
+                            self._put(outbox, (False, stage.frontier()), abort)
+                    if upstream_done:
+                        break
+            if outbox is not None:
+                self._put(outbox, (True, stage.frontier()), abort)
+        except _Aborted:
+            return
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+            abort.set()
+
+    @staticmethod
+    def _get(inbox: queue.Queue, abort: threading.Event) -> tuple[bool, int | None]:
+        while True:
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                if abort.is_set():
+                    raise _Aborted() from None
+
+    @staticmethod
+    def _put(outbox: queue.Queue, message: tuple[bool, int | None], abort: threading.Event) -> None:
+        while True:
+            try:
+                outbox.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                if abort.is_set():
+                    raise _Aborted() from None
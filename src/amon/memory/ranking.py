@@ -0,0 +1,267 @@
+"""BM25 ranking for memory search, with MaxScore top-k over segment postings.
+
+Documents are the tag records' ``embedding_text``. Terms are the character
+bigrams the rest of the memory code already uses plus whole Latin words, so
+English queries match on words rather than on letter pairs alone. Entity
+and time boosts are pseudo-terms in the same posting lists: one per
+canonical entity id a chunk mentions and one per day it was created on or
+mentions. They add a fixed weight instead of a saturated BM25 term.
+
+Corpus statistics (document count, total length, document frequencies) are
+kept per segment when it is compacted; only the JSONL tail after the
+segments is counted at query time.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable, Protocol, Sequence
+
+from .extract import parse_chunk_created_at, vectorize_text
+
+K1 = 1.2
+B = 0.75
+# Prefixes use characters vectorize_text strips, so they never collide with bigrams.
+WORD_PREFIX = "\t"
+ENTITY_PREFIX = "\ne:"
+DAY_PREFIX = "\nd:"
+_WORD = re.compile(r"[a-z0-9]{2,}")
+
+
+def ranking_terms(text: str) -> Counter[str]:
+    """Term frequencies BM25 scores ``text`` by; the sum of the counts is its length."""
+    terms = vectorize_text(text)
+    terms.update(WORD_PREFIX + word for word in _WORD.findall(text.lower()))
+    return terms
+
+
+def row_days(normalized: dict[str, Any]) -> list[int]:
+    """Date ordinals of the chunk's creation day and its resolved time mentions."""
+    days = []
+    created_at = str(normalized.get("created_at") or "")
+    created = parse_chunk_created_at(created_at) if created_at else None
+    if created is not None:
+        days.append(created.date().toordinal())
+    for mention in (normalized.get("time") or {}).get("mentions", []):
+        resolved = mention.get("resolved_date")
+        if not resolved:
+            continue
+        try:
+            days.append(date.fromisoformat(resolved).toordinal())
+        except ValueError:
+            continue
+    return days
+
+
+def boost_terms(normalized: dict[str, Any], entity_mentions: list[dict[str, Any]]) -> set[str]:
+    terms = {f"{DAY_PREFIX}{day}" for day in row_days(normalized)}
+    for mention in entity_mentions:
+        for key in ("canonical_id", "resolved_to_canonical_id"):
+            canonical_id = mention.get(key)
+            if canonical_id:
+                terms.add(ENTITY_PREFIX + str(canonical_id))
+    return terms
+
+
+class PostingSource(Protocol):
+    def postings(self, term: str) -> tuple[Sequence[int], Sequence[int], int, int, int, int] | None:
+        """``(rows, tfs, start, end, max_tf, min_length)``: the term's postings are ``rows[start:end]``."""
+
+    def doc_length(self, row: int) -> int: ...
+
+
+@dataclass
+class QueryTerm:
+    """``weight`` is ``idf * query tf`` for text terms and the boost for pseudo-terms."""
+
+    term: str
+    weight: float
+    saturate: bool = True
+
+    def score(self, tf: int, doc_length: int, avgdl: float) -> float:
+        if not self.saturate:
+            return self.weight
+        norm = K1 * (1 - B + B * doc_length / avgdl) if avgdl else K1
+        return self.weight * tf * (K1 + 1) / (tf + norm)
+
+
+def idf(docs: int, df: int) -> float:
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+def score_terms(query_terms: list[QueryTerm], terms: Counter[str], boosts: set[str], avgdl: float) -> float:
+    doc_length = sum(terms.values())
+    contributions = []
+    for query_term in query_terms:
+        if query_term.saturate:
+            tf = terms.get(query_term.term, 0)
+            if tf:
+                contributions.append(query_term.score(tf, doc_length, avgdl))
+        elif query_term.term in boosts:
+            contributions.append(query_term.weight)
+    # fsum is exact, so the score does not depend on the order terms were added in.
+    return math.fsum(contributions)
+
+
+class TopK:
+    """Best ``k`` hits by score; on equal scores the earlier position wins, as a stable sort would."""
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self._heap: list[tuple[float, int, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def threshold(self) -> float:
+        """Score a new, later hit must exceed to enter."""
+        return self._heap[0][0] if len(self._heap) >= self.k else 0.0
+
+    def offer(self, score: float, position: int, payload: Any) -> None:
+        # Positions arrive in increasing order, so a tie never displaces an earlier hit.
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (score, -position, payload))
+        elif score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (score, -position, payload))
+
+    def positions(self) -> set[int]:
+        return {-position for _, position, _ in self._heap}
+
+    def results(self) -> list[tuple[float, int, Any]]:
+        return [(score, -position, payload) for score, position, payload in sorted(self._heap, reverse=True)]
+
+
+@dataclass
+class _PostingList:
+    query_term: QueryTerm
+    rows: Sequence[int]
+    tfs: Sequence[int]
+    cursor: int
+    end: int
+    bound: float
+
+    def tf_at(self, row: int) -> int:
+        """tf of ``row``; rows must be asked for in increasing order."""
+        self.cursor = bisect_left(self.rows, row, self.cursor, self.end)
+        if self.cursor < self.end and self.rows[self.cursor] == row:
+            return self.tfs[self.cursor]
+        return 0
+
+
+def maxscore(
+    source: PostingSource,
+    query_terms: list[QueryTerm],
+    avgdl: float,
+    collector: TopK,
+    *,
+    base: int = 0,
+    allowed: set[int] | None = None,
+) -> None:
+    """Offer every row of ``source`` that can still enter ``collector``.
+
+    MaxScore: posting lists are ordered by their score upper bound, and the
+    lowest ones whose bounds together cannot beat the current threshold are
+    "non-essential". Only rows in an essential list are visited; the
+    non-essential lists are probed by binary search, stopping as soon as the
+    remaining bounds cannot lift the row over the threshold.
+    """
+    lists = []
+    for query_term in query_terms:
+        postings = source.postings(query_term.term)
+        if postings is None:
+            continue
+        rows, tfs, start, end, max_tf, min_length = postings
+        if start >= end:
+            continue
+        bound = query_term.score(max_tf, min_length, avgdl)
+        lists.append(_PostingList(query_term, rows, tfs, start, end, bound))
+    if not lists:
+        return
+    lists.sort(key=lambda posting_list: posting_list.bound)
+    prefix = []
+    total = 0.0
+    for posting_list in lists:
+        total += posting_list.bound
+        prefix.append(total)
+
+    def essential_start(threshold: float) -> int:
+        start = 0
+        while start < len(lists) and prefix[start] <= threshold:
+            start += 1
+        return start
+
+    first = essential_start(collector.threshold)
+    frontier = [(posting_list.rows[posting_list.cursor], index) for index, posting_list in enumerate(lists) if index >= first]
+    heapq.heapify(frontier)
+    while frontier:
+        row = frontier[0][0]
+        matched: list[_PostingList] = []
+        while frontier and frontier[0][0] == row:
+            _, index = heapq.heappop(frontier)
+            posting_list = lists[index]
+            matched.append(posting_list)
+            posting_list.cursor += 1
+            if posting_list.cursor < posting_list.end:
+                heapq.heappush(frontier, (posting_list.rows[posting_list.cursor], index))
+        if allowed is not None and row not in allowed:
+            continue
+        threshold = collector.threshold
+        doc_length = source.doc_length(row)
+        contributions = [
+            posting_list.query_term.score(posting_list.tfs[posting_list.cursor - 1], doc_length, avgdl)
+            for posting_list in matched
+        ]
+        score = sum(contributions)
+        for index in range(first - 1, -1, -1):
+            if score + prefix[index] <= threshold:
+                break
+            posting_list = lists[index]
+            tf = posting_list.tf_at(row)
+            if tf:
+                contributions.append(posting_list.query_term.score(tf, doc_length, avgdl))
+                score += contributions[-1]
+        else:
+            score = math.fsum(contributions)
+        if score <= threshold:
+            continue
+        collector.offer(score, base + row, row)
+        new_first = essential_start(collector.threshold)
+        if new_first > first:
+            # Lists that just became non-essential leave the frontier and
+            # are only probed from now on.
+            first = new_first
+            frontier = [(next_row, index) for next_row, index in frontier if index >= first]
+            heapq.heapify(frontier)
+
+
+class CorpusStats:
+    """BM25 statistics over the segments plus the uncompacted JSONL tail."""
+
+    def __init__(self, segments: Iterable[Any], tail: Iterable[Counter[str]]) -> None:
+        self._segments = list(segments)
+        self.docs = sum(len(segment) for segment in self._segments)
+        total_length = sum(segment.total_length for segment in self._segments)
+        self._tail_df: Counter[str] = Counter()
+        for terms in tail:
+            self.docs += 1
+            total_length += sum(terms.values())
+            self._tail_df.update(terms.keys())
+        self.avgdl = total_length / self.docs if self.docs else 0.0
+
+    def df(self, term: str) -> int:
+        return self._tail_df.get(term, 0) + sum(segment.document_frequency(term) for segment in self._segments)
+
+    def query_terms(self, query: str) -> list[QueryTerm]:
+        query_terms = []
+        for term, count in ranking_terms(query).items():
+            df = self.df(term)
+            if df:
+                query_terms.append(QueryTerm(term, count * idf(self.docs, df)))
+        return query_terms
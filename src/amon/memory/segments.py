@@ -0,0 +1,501 @@
+"""Columnar, memory-mapped segments compacted from the memory JSONL stages.
+
+A segment is an immutable directory under ``memory/segments/`` holding one
+flat file per column, written with :mod:`array` and read back through
+:mod:`mmap` without parsing:
+
+* per-row int32 references into a deduplicated UTF-8 string pool
+  (``strings.bin`` + ``string_offsets``) for ids, paths, text, tags and the
+  JSON of time/geo/entity mentions;
+* ``created_ts`` (epoch seconds) and ``created_day`` (date ordinal in
+  Asia/Taipei) plus CSR lists of resolved mention days;
+* BM25 data over a per-segment vocabulary: per-row document lengths and
+  inverted posting lists (rows and term frequencies per term, with the
+  largest tf and smallest document length of each list as score bounds),
+  including the entity and day pseudo-terms of :mod:`.ranking`;
+* two sorted time indexes, by creation day and by mention day, so a date
+  range is answered with two binary searches per segment.
+
+``segments/manifest.json`` lists the published segments and the stage
+cursors up to which the JSONL files were folded in; readers combine the
+segments with the JSONL rows after those cursors.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from ..fs.atomic import atomic_write_text
+from .cursor import cursor_in_sync, iter_stage_records
+from .extract import parse_chunk_created_at
+from .ranking import boost_terms, ranking_terms
+
+SEGMENT_VERSION = 2
+MISSING_TS = -(2**63)
+MISSING_DAY = 0
+_COMPOSED = -1
+
+_REF_COLUMNS = (
+    "chunk_id",
+    "project_id",
+    "session_id",
+    "source_path",
+    "lang",
+    "created_at",
+    "text",
+    "tags_markdown",
+    "embedding_text",
+    "time",
+    "geo",
+    "entities",
+    "extra",
+)
+_STRING_FIELDS = ("chunk_id", "project_id", "session_id", "source_path", "text", "created_at", "lang")
+_ROW_FIELDS = (*_STRING_FIELDS, "time", "geo")
+_SOURCES = ("normalized", "tags", "entities")
+_DEFAULT_MIN_ROWS = 4096
+
+
+def segment_min_rows() -> int:
+    """Rows the JSONL tail must reach before the ingest service compacts it."""
+    raw = os.environ.get("AMON_MEMORY_SEGMENT_MIN_ROWS")
+    try:
+        return max(1, int(raw)) if raw and raw.strip() else _DEFAULT_MIN_ROWS
+    except ValueError:
+        return _DEFAULT_MIN_ROWS
+
+
+def _day_of(value: str) -> int:
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return MISSING_DAY
+
+
+class SegmentWriter:
+    """Collect joined rows and write them as one segment directory."""
+
+    def __init__(self) -> None:
+        self._pool: dict[str, int] = {}
+        self._vocab: dict[str, int] = {}
+        self._refs: dict[str, array] = {name: array("i") for name in _REF_COLUMNS}
+        self._created_ts = array("q")
+        self._created_day = array("i")
+        self._mention_offsets = array("Q", [0])
+        self._mention_days = array("i")
+        self._doc_lengths = array("I")
+        self._postings: list[tuple[array, array]] = []
+
+    def __len__(self) -> int:
+        return len(self._created_ts)
+
+    def add(
+        self,
+        normalized: dict[str, Any],
+        *,
+        tags_markdown: str,
+        embedding_text: str,
+        entity_mentions: list[dict[str, Any]],
+    ) -> None:
+        text = str(normalized.get("text") or "")
+        created_at = str(normalized.get("created_at") or "")
+        refs = self._refs
+        extra = {key: value for key, value in normalized.items() if key not in _ROW_FIELDS}
+        for name in _STRING_FIELDS:
+            value = normalized.get(name)
+            if isinstance(value, str):
+                refs[name].append(self._intern(value))
+                continue
+            refs[name].append(-1)
+            if name in normalized:
+                extra[name] = value
+        refs["tags_markdown"].append(self._intern(tags_markdown))
+        if embedding_text == f"{text}\n\n{tags_markdown}":
+            refs["embedding_text"].append(_COMPOSED)
+        else:
+            refs["embedding_text"].append(self._intern(embedding_text))
+        refs["time"].append(self._intern_json(normalized["time"]) if "time" in normalized else -1)
+        refs["geo"].append(self._intern_json(normalized["geo"]) if "geo" in normalized else -1)
+        refs["entities"].append(self._intern_json(entity_mentions))
+        refs["extra"].append(self._intern_json(extra) if extra else -1)
+
+        created = parse_chunk_created_at(created_at) if created_at else None
+        self._created_ts.append(int(created.timestamp()) if created else MISSING_TS)
+        self._created_day.append(created.date().toordinal() if created else MISSING_DAY)
+        for mention in (normalized.get("time") or {}).get("mentions", []):
+            resolved = mention.get("resolved_date")
+            day = _day_of(resolved) if resolved else MISSING_DAY
+            if day != MISSING_DAY:
+                self._mention_days.append(day)
+        self._mention_offsets.append(len(self._mention_days))
+
+        row = len(self._doc_lengths)
+        terms = ranking_terms(embedding_text)
+        for term, count in terms.items():
+            self._post(term, row, count)
+        for term in boost_terms(normalized, entity_mentions):
+            self._post(term, row, 1)
+        self._doc_lengths.append(sum(terms.values()))
+
+    def write(self, directory: Path) -> None:
+        """Write the segment to a temporary sibling and rename it into place."""
+        staging = directory.with_name(f".{directory.name}.tmp")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        rows = len(self)
+        columns: dict[str, array] = {f"ref_{name}": values for name, values in self._refs.items()}
+        columns.update(
+            {
+                "created_ts": self._created_ts,
+                "created_day": self._created_day,
+                "mention_offsets": self._mention_offsets,
+                "mention_days": self._mention_days,
+                "doc_lengths": self._doc_lengths,
+            }
+        )
+        postings_offsets = array("Q", [0])
+        postings_rows = array("I")
+        postings_tfs = array("I")
+        term_max_tf = array("I")
+        term_min_length = array("I")
+        for term_rows, term_tfs in self._postings:
+            postings_rows.extend(term_rows)
+            postings_tfs.extend(term_tfs)
+            postings_offsets.append(len(postings_rows))
+            term_max_tf.append(max(term_tfs))
+            term_min_length.append(min(self._doc_lengths[row] for row in term_rows))
+        columns.update(
+            {
+                "postings_offsets": postings_offsets,
+                "postings_rows": postings_rows,
+                "postings_tfs": postings_tfs,
+                "term_max_tf": term_max_tf,
+                "term_min_length": term_min_length,
+                "vocab_refs": array("i", (self._intern(term) for term in self._vocab)),
+            }
+        )
+        created_order = sorted(range(rows), key=lambda row: (self._created_day[row], row))
+        columns["created_index_rows"] = array("I", created_order)
+        columns["created_index_days"] = array("i", (self._created_day[row] for row in created_order))
+        mention_pairs = sorted(
+            (self._mention_days[position], row)
+            for row in range(rows)
+            for position in range(self._mention_offsets[row], self._mention_offsets[row + 1])
+        )
+        columns["mention_index_days"] = array("i", (day for day, _ in mention_pairs))
+        columns["mention_index_rows"] = array("I", (row for _, row in mention_pairs))
+        pool = [value.encode("utf-8") for value in self._pool]
+        string_offsets = array("Q", [0])
+        for encoded in pool:
+            string_offsets.append(string_offsets[-1] + len(encoded))
+        columns["string_offsets"] = string_offsets
+        for name, values in columns.items():
+            with (staging / f"{name}.bin").open("wb") as handle:
+                values.tofile(handle)
+        with (staging / "strings.bin").open("wb") as handle:
+            for encoded in pool:
+                handle.write(encoded)
+        meta = {
+            "version": SEGMENT_VERSION,
+            "rows": rows,
+            "total_length": sum(self._doc_lengths),
+            "byteorder": sys.byteorder,
+            "columns": {name: values.typecode for name, values in columns.items()},
+        }
+        (staging / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(staging, directory)
+
+    def _intern(self, value: str) -> int:
+        return self._pool.setdefault(value, len(self._pool))
+
+    def _post(self, term: str, row: int, tf: int) -> None:
+        term_id = self._vocab.setdefault(term, len(self._vocab))
+        if term_id == len(self._postings):
+            self._postings.append((array("I"), array("I")))
+        term_rows, term_tfs = self._postings[term_id]
+        term_rows.append(row)
+        term_tfs.append(tf)
+
+    def _intern_json(self, value: Any) -> int:
+        return self._intern(json.dumps(value, ensure_ascii=False))
+
+
+class MemorySegment:
+    """Read-only view of one segment; columns are memory-mapped on open."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != SEGMENT_VERSION:
+            raise ValueError(f"不支援的 memory segment 版本：{meta.get('version')}")
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"memory segment 位元組順序不符：{meta.get('byteorder')}")
+        self.rows = int(meta["rows"])
+        self.total_length = int(meta.get("total_length") or 0)
+        self._maps: list[mmap.mmap] = []
+        self._views: list[memoryview] = []
+        self._columns = {name: self._map(name, typecode) for name, typecode in meta["columns"].items()}
+        self._strings = self._map_bytes(directory / "strings.bin")
+        self._term_ids: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+
+    def string(self, ref: int) -> str | None:
+        if ref < 0:
+            return None
+        offsets = self._columns["string_offsets"]
+        return self._strings[offsets[ref] : offsets[ref + 1]].decode("utf-8")
+
+    def _ref(self, column: str, row: int) -> str | None:
+        return self.string(self._columns[f"ref_{column}"][row])
+
+    def _json(self, column: str, row: int) -> Any:
+        raw = self._ref(column, row)
+        return json.loads(raw) if raw is not None else None
+
+    def chunk_id(self, row: int) -> str:
+        return self._ref("chunk_id", row) or ""
+
+    def text(self, row: int) -> str:
+        return self._ref("text", row) or ""
+
+    def tags_markdown(self, row: int) -> str:
+        return self._ref("tags_markdown", row) or ""
+
+    def embedding_text(self, row: int) -> str:
+        ref = self._columns["ref_embedding_text"][row]
+        if ref == _COMPOSED:
+            return f"{self.text(row)}\n\n{self.tags_markdown(row)}"
+        return self.string(ref) or ""
+
+    def entity_mentions(self, row: int) -> list[dict[str, Any]]:
+        return self._json("entities", row) or []
+
+    def created_ts(self, row: int) -> int | None:
+        value = self._columns["created_ts"][row]
+        return None if value == MISSING_TS else value
+
+    def record(self, row: int) -> dict[str, Any]:
+        """The normalized record for ``row``, with its original keys."""
+        record: dict[str, Any] = {}
+        for name in _STRING_FIELDS:
+            value = self._ref(name, row)
+            if value is not None:
+                record[name] = value
+        for name in ("time", "geo"):
+            value = self._json(name, row)
+            if value is not None:
+                record[name] = value
+        record.update(self._json("extra", row) or {})
+        return record
+
+    def doc_length(self, row: int) -> int:
+        return self._columns["doc_lengths"][row]
+
+    def document_frequency(self, term: str) -> int:
+        term_id = self._term_id(term)
+        if term_id is None:
+            return 0
+        offsets = self._columns["postings_offsets"]
+        return offsets[term_id + 1] - offsets[term_id]
+
+    def postings(self, term: str) -> tuple[memoryview, memoryview, int, int, int, int] | None:
+        """``(rows, tfs, start, end, max_tf, min_length)`` for ``term``; see :func:`.ranking.maxscore`."""
+        term_id = self._term_id(term)
+        if term_id is None:
+            return None
+        offsets = self._columns["postings_offsets"]
+        return (
+            self._columns["postings_rows"],
+            self._columns["postings_tfs"],
+            offsets[term_id],
+            offsets[term_id + 1],
+            self._columns["term_max_tf"][term_id],
+            self._columns["term_min_length"][term_id],
+        )
+
+    def _term_id(self, term: str) -> int | None:
+        if self._term_ids is None:
+            vocab = self._columns["vocab_refs"]
+            self._term_ids = {self.string(vocab[term_id]) or "": term_id for term_id in range(len(vocab))}
+        return self._term_ids.get(term)
+
+    def rows_in_days(self, start_day: int | None, end_day: int | None) -> list[int]:
+        """Rows created, or mentioning a resolved date, within the inclusive day range."""
+        low = start_day if start_day is not None else MISSING_DAY + 1
+        high = end_day if end_day is not None else date.max.toordinal()
+        matched: set[int] = set()
+        for days, rows in (
+            (self._columns["created_index_days"], self._columns["created_index_rows"]),
+            (self._columns["mention_index_days"], self._columns["mention_index_rows"]),
+        ):
+            matched.update(rows[bisect_left(days, low) : bisect_right(days, high)])
+        return sorted(matched)
+
+    def _map(self, name: str, typecode: str) -> memoryview:
+        view = memoryview(self._map_bytes(self.directory / f"{name}.bin"))
+        cast = view.cast(typecode)
+        self._views.extend((view, cast))
+        return cast
+
+    def _map_bytes(self, path: Path) -> mmap.mmap | bytes:
+        with path.open("rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                return b""
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+
+class SegmentStore:
+    """Published segments of one memory directory and the JSONL cursors they cover."""
+
+    def __init__(self, memory_dir: Path) -> None:
+        self.memory_dir = memory_dir
+        self.directory = memory_dir / "segments"
+        self.manifest_path = self.directory / "manifest.json"
+        self._open: dict[str, MemorySegment] = {}
+
+    def manifest(self) -> dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"version": SEGMENT_VERSION, "segments": [], "cursors": {}}
+        payload = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        payload.setdefault("segments", [])
+        payload.setdefault("cursors", {})
+        return payload
+
+    def in_sync(self, manifest: dict[str, Any] | None = None) -> bool:
+        """Whether the segments are in the current format and the JSONL files still extend what they were built from."""
+        manifest = manifest if manifest is not None else self.manifest()
+        if manifest["segments"] and manifest.get("version") != SEGMENT_VERSION:
+            return False
+        cursors = manifest.get("cursors") or {}
+        return all(
+            cursor_in_sync(self.memory_dir / f"{source}.jsonl", cursors.get(source) or {}) for source in _SOURCES
+        )
+
+    def segments(self, manifest: dict[str, Any] | None = None) -> list[MemorySegment]:
+        manifest = manifest if manifest is not None else self.manifest()
+        names = [entry["name"] for entry in manifest.get("segments", [])]
+        for stale in set(self._open) - set(names):
+            self._open.pop(stale).close()
+        for name in names:
+            if name not in self._open:
+                self._open[name] = MemorySegment(self.directory / name)
+        return [self._open[name] for name in names]
+
+    def tail_cursors(self, manifest: dict[str, Any] | None = None) -> dict[str, dict[str, Any]]:
+        """Copies of the cursors where the JSONL rows not yet in a segment begin."""
+        manifest = manifest if manifest is not None else self.manifest()
+        cursors = manifest.get("cursors") or {}
+        return {
+            source: dict(cursors.get(source) or {"last_chunk_id": None, "processed": 0}) for source in _SOURCES
+        }
+
+    def close(self) -> None:
+        for segment in self._open.values():
+            segment.close()
+        self._open = {}
+
+    def invalidate(self) -> None:
+        """Drop every segment, e.g. before the JSONL stages are rewritten from scratch."""
+        manifest = self.manifest()
+        self.close()
+        if self.manifest_path.exists():
+            self.manifest_path.unlink()
+        for entry in manifest["segments"]:
+            shutil.rmtree(self.directory / entry["name"], ignore_errors=True)
+
+    def compact(self, *, min_rows: int = 1, max_rows: int | None = None) -> dict[str, Any]:
+        """Fold JSONL rows that have tags into a new segment.
+
+        When the JSONL files were rewritten since the last compaction (for
+        example by ``normalize_memory_dates``), every segment is dropped and
+        rebuilt from the start.
+        """
+        manifest = self.manifest()
+        rebuilt = False
+        if manifest["segments"] and not self.in_sync(manifest):
+            self.close()
+            for entry in manifest["segments"]:
+                shutil.rmtree(self.directory / entry["name"], ignore_errors=True)
+            manifest = {"version": SEGMENT_VERSION, "segments": [], "cursors": {}}
+            rebuilt = True
+        cursors = self.tail_cursors(manifest)
+        writer = SegmentWriter()
+        for normalized, tags, mentions in iter_joined_rows(self.memory_dir, cursors, limit=max_rows):
+            writer.add(
+                normalized,
+                tags_markdown=str(tags.get("tags_markdown") or ""),
+                embedding_text=str(tags.get("embedding_text") or normalized.get("text") or ""),
+                entity_mentions=mentions,
+            )
+        rows = len(writer)
+        if rows < max(min_rows, 1):
+            if rebuilt:
+                self._publish(manifest)
+            return {"status": "skipped", "rows": rows, "segments": len(manifest["segments"]), "rebuilt": rebuilt}
+        sequence = max((int(entry["name"].split("-")[-1]) for entry in manifest["segments"]), default=0) + 1
+        name = f"seg-{sequence:06d}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        writer.write(self.directory / name)
+        manifest["segments"].append({"name": name, "rows": rows})
+        manifest["cursors"] = cursors
+        self._publish(manifest)
+        return {"status": "ok", "rows": rows, "segment": name, "segments": len(manifest["segments"]), "rebuilt": rebuilt}
+
+    def _publish(self, manifest: dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+def iter_joined_rows(
+    memory_dir: Path,
+    cursors: dict[str, dict[str, Any]],
+    *,
+    limit: int | None = None,
+) -> Iterator[tuple[dict[str, Any], dict[str, Any], list[dict[str, Any]]]]:
+    """Yield ``(normalized, tags, entity_mentions)`` for rows after ``cursors``, advancing them.
+
+    Only rows that already have a tags record are joined; tags and entity
+    records follow normalized.jsonl order, so each is read sequentially.
+    """
+    tags_batch = list(iter_stage_records(memory_dir / "tags.jsonl", cursors["tags"], limit=limit))
+    if not tags_batch:
+        return
+    tags_by_id = {str(record.get("chunk_id") or ""): record for record in tags_batch}
+    rows = list(iter_stage_records(memory_dir / "normalized.jsonl", cursors["normalized"], limit=len(tags_batch)))
+    chunk_ids = {str(row.get("chunk_id") or "") for row in rows}
+    chunk_ids.discard("")
+    mentions: dict[str, list[dict[str, Any]]] = {}
+
+    def _in_batch(record: dict[str, Any]) -> bool:
+        chunk_id = str(record.get("chunk_id") or "")
+        return not chunk_id or chunk_id in chunk_ids
+
+    for record in iter_stage_records(memory_dir / "entities.jsonl", cursors["entities"], accept=_in_batch):
+        chunk_id = str(record.get("chunk_id") or "")
+        if chunk_id:
+            mentions.setdefault(chunk_id, []).append(record.get("mention") or {})
+    for row in rows:
+        chunk_id = str(row.get("chunk_id") or "")
+        yield row, tags_by_id.get(chunk_id, {}), mentions.get(chunk_id, [])
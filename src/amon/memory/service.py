@@ -0,0 +1,189 @@
+"""Background draining of the memory ingest pipeline."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+PipelineRunner = Callable[[Path], dict[str, Any]]
+CatchUpHook = Callable[[Path], Any]
+
+
+class MemoryIngestService:
+    """Run ``run_pipeline(project_path)`` in a worker thread until each submitted project is caught up.
+
+    ``submit`` only records that a project has new chunks and returns at once;
+    repeated submits while a project is queued or running are merged. The
+    worker keeps calling the pipeline for a project until one call processes
+    nothing in any stage, which is what "caught up" means here. ``progress``
+    reports per-project counters and ``lag_s``, the age of the oldest submit
+    not yet caught up. ``drain`` waits for the worker; ``flush`` catches a
+    project up in the caller's thread, which keeps tests deterministic.
+    ``after_catch_up`` runs once a project is caught up (e.g. to compact it);
+    its failures are logged and do not mark the project as failed.
+    """
+
+    def __init__(
+        self,
+        run_pipeline: PipelineRunner,
+        *,
+        after_catch_up: CatchUpHook | None = None,
+        name: str = "amon-memory-ingest",
+    ) -> None:
+        self._run_pipeline = run_pipeline
+        self._after_catch_up = after_catch_up
+        self._name = name
+        self._cond = threading.Condition()
+        self._queued: dict[Path, None] = {}
+        self._running: Path | None = None
+        self._project_locks: dict[Path, threading.Lock] = {}
+        self._progress: dict[Path, dict[str, Any]] = {}
+        self._pending_since: dict[Path, float] = {}
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker_loop, name=self._name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout=timeout)
+        with self._cond:
+            self._thread = None
+
+    def submit(self, project_path: Path) -> None:
+        project_path = Path(project_path)
+        with self._cond:
+            self._pending_since.setdefault(project_path, time.monotonic())
+            self._queued[project_path] = None
+            self._entry(project_path)["status"] = "running" if self._running == project_path else "queued"
+            self._cond.notify_all()
+        self.start()
+
+    def drain(self, project_path: Path | None = None, timeout: float | None = None) -> bool:
+        """Wait until ``project_path`` (or every project) is caught up; ``False`` on timeout."""
+        project_path = Path(project_path) if project_path is not None else None
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def _idle() -> bool:
+            if project_path is None:
+                return not self._queued and self._running is None
+            return project_path not in self._queued and self._running != project_path
+
+        with self._cond:
+            while not _idle():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def flush(self, project_path: Path) -> dict[str, Any]:
+        """Catch ``project_path`` up in the calling thread and return its progress."""
+        project_path = Path(project_path)
+        with self._cond:
+            self._queued.pop(project_path, None)
+            self._pending_since.setdefault(project_path, time.monotonic())
+        self._catch_up(project_path, reraise=True)
+        return self.progress(project_path)
+
+    def progress(self, project_path: Path) -> dict[str, Any]:
+        project_path = Path(project_path)
+        with self._cond:
+            entry = dict(self._entry(project_path))
+            entry["processed"] = dict(entry["processed"])
+            since = self._pending_since.get(project_path)
+            entry["lag_s"] = round(time.monotonic() - since, 3) if since is not None else 0.0
+            return entry
+
+    def _entry(self, project_path: Path) -> dict[str, Any]:
+        return self._progress.setdefault(
+            project_path,
+            {
+                "status": "idle",
+                "runs": 0,
+                "processed": {},
+                "pending_chunks": 0,
+                "last_run_at": None,
+                "last_error": None,
+            },
+        )
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queued and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                project_path = next(iter(self._queued))
+                del self._queued[project_path]
+                self._running = project_path
+            try:
+                self._catch_up(project_path)
+            finally:
+                with self._cond:
+                    self._running = None
+                    self._cond.notify_all()
+
+    def _catch_up(self, project_path: Path, *, reraise: bool = False) -> None:
+        with self._cond:
+            lock = self._project_locks.setdefault(project_path, threading.Lock())
+        with lock:
+            with self._cond:
+                self._entry(project_path)["status"] = "running"
+            try:
+                while True:
+                    result = self._run_pipeline(project_path)
+                    processed = result.get("processed") or {}
+                    with self._cond:
+                        entry = self._entry(project_path)
+                        entry["runs"] += 1
+                        entry["pending_chunks"] = int(result.get("pending_chunks") or 0)
+                        entry["last_run_at"] = time.time()
+                        entry["last_error"] = None
+                        for stage, count in processed.items():
+                            entry["processed"][stage] = entry["processed"].get(stage, 0) + int(count)
+                        stopping = self._stopping and threading.current_thread() is self._thread
+                    if not any(processed.values()) or stopping:
+                        break
+            except Exception as exc:  # noqa: BLE001
+                logger.error("背景 memory ingest 失敗：%s", exc, exc_info=True)
+                with self._cond:
+                    entry = self._entry(project_path)
+                    entry["status"] = "error"
+                    entry["last_error"] = str(exc)
+                    self._cond.notify_all()
+                if reraise:
+                    raise
+                return
+            if not stopping and self._after_catch_up is not None:
+                try:
+                    self._after_catch_up(project_path)
+                except Exception as exc:  # noqa: BLE001
+                    logger.error("背景 memory ingest 收尾失敗：%s", exc, exc_info=True)
+            with self._cond:
+                if stopping:
+                    # Not caught up yet; resume when the worker is restarted.
+                    self._queued[project_path] = None
+                entry = self._entry(project_path)
+                if project_path in self._queued:
+                    entry["status"] = "queued"
+                else:
+                    entry["status"] = "idle"
+                    self._pending_since.pop(project_path, None)
+                self._cond.notify_all()
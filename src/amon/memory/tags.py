@@ -0,0 +1,134 @@
+"""Incremental regeneration of ``tags.jsonl``."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO
+
+from .extract import build_tag_record, tag_source_digest
+from .pipeline import map_ordered
+
+
+class TagFileBuilder:
+    """Rewrite ``tags.jsonl`` from ``(normalized, entity_mentions)`` rows, rebuilding only dirty rows.
+
+    Every tag record carries the ``source_digest`` of its inputs. A row is
+    dirty when no current record has its digest, i.e. the chunk is new, its
+    normalized record or entity mentions changed, or ``TAGS_FORMAT_VERSION``
+    was bumped. Clean rows are copied from the current file byte for byte;
+    dirty rows are rebuilt in batches on the ingest worker pool.
+
+    Output goes to a temporary file next to ``tags.jsonl`` and ``publish``
+    swaps it in with ``os.replace``, so readers see either the old file or
+    the complete new one. When nothing changed the current file is kept, and
+    with it every cursor into it.
+    """
+
+    def __init__(self, tags_path: Path, *, batch_size: int = 512) -> None:
+        self.tags_path = tags_path
+        self.batch_size = batch_size
+        self.count = 0
+        self.dirty_rows: list[int] = []
+        self._previous: dict[str, tuple[str, int, int, int]] = {}
+        self._previous_records = 0
+        self._in_order = True
+        self._source: BinaryIO | None = None
+        self._output: Any = None
+        self._pending: list[tuple[bytes | None, dict[str, Any], list[dict[str, Any]]]] = []
+
+    def __enter__(self) -> TagFileBuilder:
+        if self.tags_path.exists():
+            self._source = self.tags_path.open("rb")
+            self._index_previous(self._source)
+        self._output = tempfile.NamedTemporaryFile(
+            mode="wb",
+            dir=str(self.tags_path.parent),
+            prefix=f".{self.tags_path.name}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._close_source()
+        if self._output is not None:
+            self._output.close()
+            os.unlink(self._output.name)
+            self._output = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.dirty_rows) or not self._in_order or self.count != self._previous_records
+
+    def add(self, normalized: dict[str, Any], entity_mentions: list[dict[str, Any]]) -> None:
+        chunk_id = str(normalized.get("chunk_id") or "")
+        previous = self._previous.get(chunk_id)
+        line: bytes | None = None
+        if previous is not None and previous[0] == tag_source_digest(normalized, entity_mentions):
+            _, position, offset, length = previous
+            if position != self.count:
+                self._in_order = False
+            self._source.seek(offset)
+            line = self._source.read(length)
+        else:
+            self.dirty_rows.append(self.count)
+        self._pending.append((line, normalized, entity_mentions))
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def publish(self) -> bool:
+        """Swap the new file in if anything changed; returns whether it did."""
+        self._flush()
+        self._output.flush()
+        self._close_source()
+        if not self.changed and self.tags_path.exists():
+            return False
+        os.fsync(self._output.fileno())
+        self._output.close()
+        os.replace(self._output.name, self.tags_path)
+        self._output = None
+        return True
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        dirty = [(normalized, mentions) for line, normalized, mentions in self._pending if line is None]
+        rebuilt = iter(map_ordered(build_tag_record, *zip(*dirty))) if dirty else iter(())
+        for line, _, _ in self._pending:
+            if line is None:
+                line = json.dumps(next(rebuilt), ensure_ascii=False).encode("utf-8") + b"\n"
+            self._output.write(line)
+        self._pending = []
+
+    def _index_previous(self, handle: BinaryIO) -> None:
+        while True:
+            offset = handle.tell()
+            raw_line = handle.readline()
+            if not raw_line:
+                break
+            payload = raw_line.strip()
+            if not payload or not raw_line.endswith(b"\n"):
+                # Blank lines are dropped and a torn last line is rebuilt.
+                self._in_order = False
+                continue
+            record = json.loads(payload)
+            digest = record.get("source_digest")
+            if isinstance(digest, str):
+                chunk_id = str(record.get("chunk_id") or "")
+                self._previous[chunk_id] = (digest, self._previous_records, offset, len(raw_line))
+            self._previous_records += 1
+
+    def _close_source(self) -> None:
+        if self._source is not None:
+            self._source.close()
+            self._source = None
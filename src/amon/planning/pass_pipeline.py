@@ -0,0 +1,197 @@
+"""Shared graph index and timed pass pipeline for planner post-processing."""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Iterable
+
+from amon.taskgraph3.schema import BaseNode, GraphEdge, TaskNode
+
+DEPENDENCY_EDGE_TYPES = frozenset({"CONTROL", "DATA"})
+
+
+class PlannerGraphIndex:
+    """Node and edge lists plus the lookups planner passes keep asking for.
+
+    Passes read positions, adjacency and cached node identity text from here
+    instead of rescanning the full lists, and report their edits through the
+    mutation methods so the lookups stay current: appends and single-edge
+    replacements update adjacency in place, bulk replacements rebuild it once.
+    ``version`` increases on every mutation, which lets the pipeline tell
+    which passes changed the graph.
+    """
+
+    def __init__(
+        self,
+        nodes: Iterable[BaseNode],
+        edges: Iterable[GraphEdge],
+        *,
+        identity: Callable[[TaskNode], str],
+    ) -> None:
+        self.nodes: list[BaseNode] = list(nodes)
+        self.edges: list[GraphEdge] = list(edges)
+        self.version = 0
+        self._identity = identity
+        self._identity_cache: dict[int, tuple[tuple[Any, ...], str]] = {}
+        self._position: dict[str, int] = {}
+        self._by_id: dict[str, BaseNode] = {}
+        self._incoming: dict[str, list[GraphEdge]] = {}
+        self._outgoing: dict[str, list[GraphEdge]] = {}
+        self._control_pairs: set[tuple[str, str]] | None = None
+        self._reindex_nodes()
+        self._reindex_edges()
+
+    # -- reads -----------------------------------------------------------
+
+    def node(self, node_id: str) -> BaseNode | None:
+        return self._by_id.get(node_id)
+
+    def has_node(self, node_id: str) -> bool:
+        return node_id in self._by_id
+
+    def position(self, node_id: str) -> int | None:
+        return self._position.get(node_id)
+
+    def task_nodes(self) -> list[TaskNode]:
+        return [node for node in self.nodes if isinstance(node, TaskNode)]
+
+    def incoming(self, node_id: str) -> list[GraphEdge]:
+        return self._incoming.get(node_id, [])
+
+    def outgoing(self, node_id: str) -> list[GraphEdge]:
+        return self._outgoing.get(node_id, [])
+
+    def predecessors(self, node_id: str) -> list[str]:
+        """Sources of CONTROL/DATA edges into ``node_id``, in edge order."""
+        return [edge.from_node for edge in self.incoming(node_id) if edge.edge_type in DEPENDENCY_EDGE_TYPES]
+
+    def control_pairs(self) -> set[tuple[str, str]]:
+        if self._control_pairs is None:
+            self._control_pairs = {(edge.from_node, edge.to_node) for edge in self.edges if edge.edge_type == "CONTROL"}
+        return self._control_pairs
+
+    def identity(self, node: TaskNode) -> str:
+        display = node.task_spec.display
+        fingerprint = (node.id, node.title, display.label if display else "")
+        cached = self._identity_cache.get(id(node))
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        text = self._identity(node)
+        self._identity_cache[id(node)] = (fingerprint, text)
+        return text
+
+    # -- mutations -------------------------------------------------------
+
+    def set_nodes(self, nodes: list[BaseNode]) -> None:
+        self.nodes = nodes
+        self._reindex_nodes()
+        self.version += 1
+
+    def remove_nodes(self, node_ids: set[str]) -> None:
+        if not node_ids:
+            return
+        self.set_nodes([node for node in self.nodes if node.id not in node_ids])
+
+    def set_edges(self, edges: list[GraphEdge]) -> None:
+        self.edges = edges
+        self._reindex_edges()
+        self.version += 1
+
+    def append_edges(self, edges: Iterable[GraphEdge]) -> None:
+        added = False
+        for edge in edges:
+            self.edges.append(edge)
+            self._link(edge)
+            added = True
+        if added:
+            self.version += 1
+
+    def replace_edge(self, position: int, edge: GraphEdge) -> None:
+        previous = self.edges[position]
+        self._unlink(previous)
+        self.edges[position] = edge
+        self._link(edge)
+        self.version += 1
+
+    def rename_node(self, old_id: str, new_id: str, *, clone_edge: Callable[..., GraphEdge]) -> None:
+        """Rename a node and re-point only the edges that touch it."""
+        node = self._by_id.pop(old_id, None)
+        if node is None:
+            return
+        node.id = new_id
+        self._by_id[new_id] = node
+        self._position[new_id] = self._position.pop(old_id)
+        touched = {id(edge) for edge in self._incoming.get(old_id, [])}
+        touched.update(id(edge) for edge in self._outgoing.get(old_id, []))
+        if touched:
+            for position, edge in enumerate(self.edges):
+                if id(edge) not in touched:
+                    continue
+                self.replace_edge(
+                    position,
+                    clone_edge(
+                        edge,
+                        from_node=new_id if edge.from_node == old_id else edge.from_node,
+                        to_node=new_id if edge.to_node == old_id else edge.to_node,
+                    ),
+                )
+        self.version += 1
+
+    def _reindex_nodes(self) -> None:
+        self._position = {node.id: index for index, node in enumerate(self.nodes)}
+        self._by_id = {node.id: node for node in self.nodes}
+
+    def _reindex_edges(self) -> None:
+        self._incoming = {}
+        self._outgoing = {}
+        self._control_pairs = None
+        for edge in self.edges:
+            self._link(edge)
+
+    def _link(self, edge: GraphEdge) -> None:
+        self._incoming.setdefault(edge.to_node, []).append(edge)
+        self._outgoing.setdefault(edge.from_node, []).append(edge)
+        if self._control_pairs is not None and edge.edge_type == "CONTROL":
+            self._control_pairs.add((edge.from_node, edge.to_node))
+
+    def _unlink(self, edge: GraphEdge) -> None:
+        _remove_identity(self._incoming.get(edge.to_node), edge)
+        _remove_identity(self._outgoing.get(edge.from_node), edge)
+        if edge.edge_type == "CONTROL":
+            # Another edge may still carry the same pair; recompute on demand.
+            self._control_pairs = None
+
+
+class PlannerPassPipeline:
+    """Run planner passes over one ``PlannerGraphIndex`` and time each of them."""
+
+    def __init__(self, index: PlannerGraphIndex) -> None:
+        self.index = index
+        self.timings: list[dict[str, Any]] = []
+
+    def run(self, name: str, planner_pass: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        version = self.index.version
+        started_at = time.perf_counter()
+        result = planner_pass(self.index, *args, **kwargs)
+        self.timings.append(
+            {
+                "pass": name,
+                "ms": round((time.perf_counter() - started_at) * 1000, 3),
+                "changed": self.index.version != version,
+                "nodes": len(self.index.nodes),
+                "edges": len(self.index.edges),
+            }
+        )
+        return result
+
+    def total_ms(self) -> float:
+        return round(sum(item["ms"] for item in self.timings), 3)
+
+
+def _remove_identity(items: list[GraphEdge] | None, edge: GraphEdge) -> None:
+    if not items:
+        return
+    for position, candidate in enumerate(items):
+        if candidate is edge:
+            del items[position]
+            return
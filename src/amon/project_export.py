@@ -0,0 +1,417 @@
+"""Project export archives: parallel compression, streamed output and incremental manifests."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Iterable, Iterator
+
+MANIFEST_NAME = ".amon-export-manifest.json"
+MANIFEST_VERSION = 1
+# Formats that are already compressed; deflating them again costs CPU and saves nothing.
+STORED_SUFFIXES = frozenset(
+    {
+        ".7z", ".avif", ".br", ".bz2", ".docx", ".epub", ".gif", ".gz", ".heic", ".jar", ".jpeg", ".jpg",
+        ".m4a", ".mkv", ".mov", ".mp3", ".mp4", ".odt", ".ogg", ".opus", ".png", ".pptx", ".rar", ".tgz",
+        ".webm", ".webp", ".whl", ".woff", ".woff2", ".xlsx", ".xz", ".zip", ".zst",
+    }
+)
+_READ_CHUNK = 1024 * 1024
+_SPOOL_MAX_BYTES = 4 * 1024 * 1024
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP_FILECOUNT_LIMIT = 0xFFFF
+_UTF8_FLAG = 0x800
+
+
+def export_workers() -> int:
+    raw = os.environ.get("AMON_EXPORT_WORKERS")
+    try:
+        workers = int(raw) if raw and raw.strip() else min(4, os.cpu_count() or 1)
+    except ValueError:
+        workers = min(4, os.cpu_count() or 1)
+    return max(1, workers)
+
+
+def load_export_manifest(path: Path) -> dict[str, Any]:
+    """Manifest of an earlier export, read from its archive or from a saved manifest JSON."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if name.rsplit("/", 1)[-1] == MANIFEST_NAME]
+            if not names:
+                raise ValueError(f"匯出檔缺少 manifest：{path}")
+            payload = json.loads(archive.read(names[0]).decode("utf-8"))
+    else:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(payload, dict) or payload.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"不支援的匯出 manifest 版本：{path}")
+    return payload
+
+
+@dataclass
+class ExportFile:
+    relative: str
+    path: Path
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+
+
+@dataclass
+class _Packed:
+    file: ExportFile
+    compress_type: int
+    crc: int
+    data: IO[bytes]
+    compress_size: int
+
+
+@dataclass
+class _CentralEntry:
+    zinfo: zipfile.ZipInfo
+    offset: int
+
+
+def _dos_datetime(zinfo: zipfile.ZipInfo) -> tuple[int, int]:
+    year, month, day, hour, minute, second = zinfo.date_time
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+class ZipStreamWriter:
+    """Write a ZIP archive strictly front to back, so the output may be a pipe.
+
+    Members arrive already compressed with their CRC and sizes known, which
+    lets every local header carry the final values: no seeking back and no
+    data descriptors. ZIP64 records are added only when a size, an offset or
+    the member count needs them.
+    """
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self._fileobj = fileobj
+        self._offset = 0
+        self._entries: list[_CentralEntry] = []
+
+    def add_directory(self, arcname: str, mtime: float) -> None:
+        zinfo = self._zinfo(arcname.rstrip("/") + "/", mtime)
+        zinfo.external_attr = (0o40775 << 16) | 0x10
+        self._write_member(zinfo, b"", 0)
+
+    def add_bytes(self, arcname: str, data: bytes, mtime: float) -> None:
+        zinfo = self._zinfo(arcname, mtime)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        zinfo.CRC = zlib.crc32(data)
+        zinfo.file_size = len(data)
+        self._write_member(zinfo, payload, len(payload))
+
+    def add_packed(self, arcname: str, packed: _Packed) -> None:
+        zinfo = self._zinfo(arcname, packed.file.mtime_ns / 1e9)
+        zinfo.compress_type = packed.compress_type
+        zinfo.CRC = packed.crc
+        zinfo.file_size = packed.file.size
+        zinfo.external_attr = 0o100644 << 16
+        packed.data.seek(0)
+        self._write_member(zinfo, packed.data, packed.compress_size)
+
+    def close(self) -> None:
+        central_offset = self._offset
+        for entry in self._entries:
+            self._write(self._central_header(entry))
+        central_size = self._offset - central_offset
+        count = len(self._entries)
+        if count >= _ZIP_FILECOUNT_LIMIT or central_offset >= _ZIP64_LIMIT or central_size >= _ZIP64_LIMIT:
+            zip64_offset = self._offset
+            self._write(
+                struct.pack("<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, central_size, central_offset)
+            )
+            self._write(struct.pack("<4sLQL", b"PK\x06\x07", 0, zip64_offset, 1))
+            count = min(count, _ZIP_FILECOUNT_LIMIT)
+            central_size = min(central_size, _ZIP64_LIMIT)
+            central_offset = min(central_offset, _ZIP64_LIMIT)
+        self._write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, count, count, central_size, central_offset, 0))
+        self._fileobj.flush()
+
+    @staticmethod
+    def _zinfo(arcname: str, mtime: float) -> zipfile.ZipInfo:
+        date_time = datetime.fromtimestamp(mtime).timetuple()[:6]
+        if date_time[0] < 1980:
+            date_time = (1980, 1, 1, 0, 0, 0)
+        zinfo = zipfile.ZipInfo(arcname, date_time=date_time)
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.CRC = 0
+        zinfo.flag_bits |= _UTF8_FLAG
+        return zinfo
+
+    def _write_member(self, zinfo: zipfile.ZipInfo, payload: bytes | IO[bytes], compress_size: int) -> None:
+        zinfo.compress_size = compress_size
+        offset = self._offset
+        zip64 = zinfo.file_size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT
+        name = zinfo.filename.encode("utf-8")
+        extra = struct.pack("<2H2Q", 1, 16, zinfo.file_size, compress_size) if zip64 else b""
+        dos_time, dos_date = _dos_datetime(zinfo)
+        self._write(
+            struct.pack(
+                "<4s2B4HL2L2H",
+                b"PK\x03\x04",
+                45 if zip64 else 20,
+                0,
+                zinfo.flag_bits,
+                zinfo.compress_type,
+                dos_time,
+                dos_date,
+                zinfo.CRC,
+                _ZIP64_LIMIT if zip64 else compress_size,
+                _ZIP64_LIMIT if zip64 else zinfo.file_size,
+                len(name),
+                len(extra),
+            )
+        )
+        self._write(name + extra)
+        if isinstance(payload, bytes):
+            self._write(payload)
+        else:
+            while True:
+                chunk = payload.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                self._write(chunk)
+        self._entries.append(_CentralEntry(zinfo, offset))
+
+    def _central_header(self, entry: _CentralEntry) -> bytes:
+        zinfo = entry.zinfo
+        zip64_fields = [
+            value
+            for value in (zinfo.file_size, zinfo.compress_size, entry.offset)
+            if value >= _ZIP64_LIMIT
+        ]
+        extra = struct.pack(f"<2H{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b""
+        name = zinfo.filename.encode("utf-8")
+        dos_time, dos_date = _dos_datetime(zinfo)
+        version = 45 if zip64_fields else 20
+        return (
+            struct.pack(
+                "<4s4B4HL2L5H2L",
+                b"PK\x01\x02",
+                version,
+                3,  # made by: Unix, so external_attr carries the mode
+                version,
+                0,
+                zinfo.flag_bits,
+                zinfo.compress_type,
+                dos_time,
+                dos_date,
+                zinfo.CRC,
+                min(zinfo.compress_size, _ZIP64_LIMIT),
+                min(zinfo.file_size, _ZIP64_LIMIT),
+                len(name),
+                len(extra),
+                0,
+                0,
+                0,
+                zinfo.external_attr,
+                min(entry.offset, _ZIP64_LIMIT),
+            )
+            + name
+            + extra
+        )
+
+    def _write(self, data: bytes) -> None:
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+
+def _pack(file: ExportFile, level: int) -> _Packed:
+    """Read ``file`` once, hashing and compressing it into a spool that overflows to disk."""
+    stored = file.path.suffix.lower() in STORED_SUFFIXES
+    compressor = None if stored else zlib.compressobj(level, zlib.DEFLATED, -15)
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+    digest = hashlib.sha256()
+    crc = 0
+    size = 0
+    try:
+        with file.path.open("rb") as handle:
+            # Files still being appended to (e.g. logs) are cut at the size seen when listing.
+            while size < file.size:
+                chunk = handle.read(min(_READ_CHUNK, file.size - size))
+                if not chunk:
+                    break
+                size += len(chunk)
+                digest.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                spool.write(compressor.compress(chunk) if compressor else chunk)
+        if compressor:
+            spool.write(compressor.flush())
+    except BaseException:
+        spool.close()
+        raise
+    file.size = size
+    file.sha256 = digest.hexdigest()
+    return _Packed(
+        file=file,
+        compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+        crc=crc,
+        data=spool,
+        compress_size=spool.tell(),
+    )
+
+
+def _file_sha256(path: Path, size: int) -> str:
+    digest = hashlib.sha256()
+    remaining = size
+    with path.open("rb") as handle:
+        while remaining > 0:
+            chunk = handle.read(min(_READ_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _packed_in_order(files: list[ExportFile], level: int, workers: int) -> Iterator[_Packed]:
+    """Compress ``files`` on ``workers`` threads (zlib releases the GIL), yielding them in order.
+
+    At most ``2 * workers`` files are in flight, which bounds memory to that
+    many spools regardless of project size.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="amon-export") as executor:
+        pending: deque[Future[_Packed]] = deque()
+        try:
+            for file in files:
+                pending.append(executor.submit(_pack, file, level))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    future.result().data.close()
+
+
+@dataclass
+class ExportSummary:
+    files: int = 0
+    packed: int = 0
+    unchanged: int = 0
+    stored: int = 0
+    deleted: list[str] = field(default_factory=list)
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "files": self.files,
+            "packed": self.packed,
+            "unchanged": self.unchanged,
+            "stored": self.stored,
+            "deleted": len(self.deleted),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+def collect_export_files(project_path: Path, payload_paths: Iterable[Path]) -> tuple[list[ExportFile], list[str]]:
+    """Files under ``payload_paths`` in archive order, plus payload directories that are empty."""
+    files: list[ExportFile] = []
+    empty_dirs: list[str] = []
+
+    def add(path: Path) -> None:
+        stat = path.stat()
+        files.append(ExportFile(path.relative_to(project_path).as_posix(), path, stat.st_size, stat.st_mtime_ns))
+
+    for path in payload_paths:
+        if not path.exists():
+            continue
+        if path.is_dir():
+            entries = sorted(path.rglob("*"))
+            if not entries:
+                empty_dirs.append(path.relative_to(project_path).as_posix())
+            for entry in entries:
+                if entry.is_file():
+                    add(entry)
+        else:
+            add(path)
+    return files, empty_dirs
+
+
+def write_project_export(
+    fileobj: BinaryIO,
+    project_path: Path,
+    payload_paths: Iterable[Path],
+    *,
+    project_id: str,
+    base_manifest: dict[str, Any] | None = None,
+    workers: int | None = None,
+    level: int = 6,
+) -> ExportSummary:
+    """Stream an export archive of ``payload_paths`` to ``fileobj``.
+
+    Members are named ``<project_id>/<path relative to the project>``. The
+    archive ends with a manifest holding the size, mtime and SHA-256 of every
+    exported file. With ``base_manifest`` only files that are new or whose
+    size, mtime and content differ from it are packed; the new manifest still
+    lists every file, so it can be the base of the next incremental export.
+    """
+    if base_manifest is not None and base_manifest.get("project_id") != project_id:
+        raise ValueError("增量匯出的基準 manifest 不屬於此專案")
+    files, empty_dirs = collect_export_files(project_path, payload_paths)
+    previous: dict[str, dict[str, Any]] = (base_manifest or {}).get("files") or {}
+    summary = ExportSummary(files=len(files))
+    changed: list[ExportFile] = []
+    for file in files:
+        before = previous.get(file.relative)
+        if before is not None and before.get("size") == file.size:
+            if before.get("mtime_ns") == file.mtime_ns or before.get("sha256") == _file_sha256(file.path, file.size):
+                file.sha256 = before.get("sha256")
+                summary.unchanged += 1
+                continue
+        changed.append(file)
+    current = {file.relative for file in files}
+    summary.deleted = sorted(relative for relative in previous if relative not in current)
+
+    writer = ZipStreamWriter(fileobj)
+    now = datetime.now().timestamp()
+    for relative in empty_dirs:
+        writer.add_directory(f"{project_id}/{relative}/", now)
+    for packed in _packed_in_order(changed, level, workers or export_workers()):
+        try:
+            writer.add_packed(f"{project_id}/{packed.file.relative}", packed)
+        finally:
+            packed.data.close()
+        summary.packed += 1
+        if packed.compress_type == zipfile.ZIP_STORED:
+            summary.stored += 1
+        summary.bytes_in += packed.file.size
+        summary.bytes_out += packed.compress_size
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "project_id": project_id,
+        "created_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "incremental": base_manifest is not None,
+        "base_created_at": (base_manifest or {}).get("created_at"),
+        "files": {
+            file.relative: {"size": file.size, "mtime_ns": file.mtime_ns, "sha256": file.sha256} for file in files
+        },
+        "packed": sorted(file.relative for file in changed),
+        "deleted": summary.deleted,
+    }
+    writer.add_bytes(
+        f"{project_id}/{MANIFEST_NAME}",
+        json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"),
+        now,
+    )
+    writer.close()
+    return summary
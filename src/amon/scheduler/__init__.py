@@ -1,5 +1,5 @@
 """Scheduler utilities for Amon."""
 
-from .engine import tick
+from .engine import ScheduleLoop, tick
 
-__all__ = ["tick"]
+__all__ = ["ScheduleLoop", "tick"]
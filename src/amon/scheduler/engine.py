@@ -2,10 +2,15 @@
 
 from __future__ import annotations
 
+import heapq
+import itertools
 import json
 import logging
 import os
 import random
+import threading
+import time
+import weakref
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -19,6 +24,8 @@ logger = logging.getLogger(__name__)
 
 
 _EVENT_EMITTER = Callable[[dict[str, Any]], str]
+_CRON_SEARCH_DAYS = 366
+_ACTIVE_LOOPS: "weakref.WeakSet[ScheduleLoop]" = weakref.WeakSet()
 
 
 @dataclass
@@ -75,6 +82,163 @@ def write_schedules(payload: dict[str, Any], *, data_dir: Path | None = None) ->
     except OSError as exc:
         logger.error("寫入排程資料失敗：%s", exc, exc_info=True)
         raise
+    for loop in list(_ACTIVE_LOOPS):
+        loop.notify_changed()
+
+
+class ScheduleLoop:
+    """Sleep-until-due scheduler backed by a min-heap of next fire times.
+
+    Unlike ``tick``, which evaluates every schedule on each call, the loop keeps
+    schedules.json in memory and only processes schedules whose due time has
+    passed; each fire costs one heap pop/push. It reloads the file when it
+    changes on disk or when ``write_schedules`` is called in this process.
+    """
+
+    def __init__(
+        self,
+        *,
+        data_dir: Path | None = None,
+        event_emitter: _EVENT_EMITTER | None = None,
+        change_check_seconds: float = 1.0,
+    ) -> None:
+        self.data_dir = data_dir
+        self.event_emitter = event_emitter or emit_event
+        self.change_check_seconds = change_check_seconds
+        self._payload: dict[str, Any] = {"schedules": []}
+        self._schedules: dict[str, dict[str, Any]] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._due_by_id: dict[str, float] = {}
+        self._counter = itertools.count()
+        self._file_signature: tuple[int, int] | None = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._loaded = False
+        _ACTIVE_LOOPS.add(self)
+
+    def notify_changed(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+
+    def next_due_at(self) -> datetime | None:
+        with self._lock:
+            self._ensure_loaded()
+            self._discard_stale_heap_entries()
+            if not self._heap:
+                return None
+            return datetime.fromtimestamp(self._heap[0][0]).astimezone()
+
+    def run_pending(self, now: datetime | None = None) -> list[dict[str, Any]]:
+        current_time = (now or datetime.now().astimezone()).astimezone()
+        with self._lock:
+            self._ensure_loaded()
+            if self._file_changed():
+                self._reload()
+            fired_events: list[dict[str, Any]] = []
+            updated = False
+            current_ts = current_time.timestamp()
+            while self._heap and self._heap[0][0] <= current_ts:
+                due_ts, _, schedule_id = heapq.heappop(self._heap)
+                if self._due_by_id.get(schedule_id) != due_ts:
+                    continue
+                self._due_by_id.pop(schedule_id, None)
+                schedule = self._schedules.get(schedule_id)
+                if schedule is None:
+                    continue
+                try:
+                    result = _process_schedule(schedule, current_time, self.event_emitter)
+                except Exception as exc:  # noqa: BLE001
+                    logger.error("排程 tick 失敗：%s", exc, exc_info=True)
+                    continue
+                fired_events.extend(result.fired)
+                updated = updated or result.updated
+                self._push(schedule, current_time)
+            if updated:
+                self._persist()
+            return fired_events
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Block until the next schedule is due, schedules change, or ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + max(timeout, 0)
+        while not self._stopped.is_set():
+            next_due = self.next_due_at()
+            remaining: float | None = None
+            if next_due is not None:
+                remaining = next_due.timestamp() - time.time()
+            if deadline is not None:
+                until_deadline = deadline - time.monotonic()
+                remaining = until_deadline if remaining is None else min(remaining, until_deadline)
+            if remaining is not None and remaining <= 0:
+                return
+            slice_seconds = self.change_check_seconds if remaining is None else min(remaining, self.change_check_seconds)
+            if self._wake.wait(slice_seconds):
+                self._wake.clear()
+                return
+            with self._lock:
+                if self._file_changed():
+                    return
+
+    def serve_forever(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.run_pending()
+            except Exception as exc:  # noqa: BLE001
+                logger.error("排程迴圈執行失敗：%s", exc, exc_info=True)
+            self.wait()
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._reload()
+
+    def _reload(self) -> None:
+        self._payload = load_schedules(data_dir=self.data_dir)
+        self._file_signature = self._read_signature()
+        self._schedules = {}
+        self._heap = []
+        self._due_by_id = {}
+        now = datetime.now().astimezone()
+        for schedule in self._payload.get("schedules", []):
+            if not isinstance(schedule, dict):
+                continue
+            schedule_id = str(schedule.get("schedule_id", "")).strip()
+            if not schedule_id:
+                continue
+            self._schedules[schedule_id] = schedule
+            self._push(schedule, now)
+        self._loaded = True
+
+    def _push(self, schedule: dict[str, Any], now: datetime) -> None:
+        schedule_id = str(schedule.get("schedule_id", "")).strip()
+        due_at = _schedule_due_at(schedule, now)
+        if due_at is None:
+            self._due_by_id.pop(schedule_id, None)
+            return
+        due_ts = due_at.timestamp()
+        self._due_by_id[schedule_id] = due_ts
+        heapq.heappush(self._heap, (due_ts, next(self._counter), schedule_id))
+
+    def _discard_stale_heap_entries(self) -> None:
+        while self._heap and self._due_by_id.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _persist(self) -> None:
+        write_schedules(self._payload, data_dir=self.data_dir)
+        self._file_signature = self._read_signature()
+        self._wake.clear()
+
+    def _read_signature(self) -> tuple[int, int] | None:
+        try:
+            stat = _resolve_schedules_path(self.data_dir).stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _file_changed(self) -> bool:
+        return self._loaded and self._read_signature() != self._file_signature
 
 
 def _resolve_schedules_path(data_dir: Path | None = None) -> Path:
@@ -114,6 +278,42 @@ def _process_schedule(
     return ScheduleTickResult(fired=[], updated=False)
 
 
+def _schedule_due_at(schedule: dict[str, Any], current_time: datetime) -> datetime | None:
+    """Return when ``_process_schedule`` would next act on ``schedule``, if ever."""
+    if not schedule.get("enabled", True):
+        return None
+    schedule_type = str(schedule.get("type") or schedule.get("schedule_type") or "").strip().lower()
+    if not schedule_type:
+        schedule_type = _infer_schedule_type(schedule)
+
+    if schedule_type == "interval":
+        interval_seconds = _read_number(schedule.get("interval_seconds"))
+        if not interval_seconds or interval_seconds <= 0:
+            return None
+        return _resolve_next_fire_at(schedule, current_time, interval_seconds)
+    if schedule_type in {"one_shot", "oneshot", "one-shot"}:
+        if schedule.get("status") in {"completed", "misfired"}:
+            return None
+        return (
+            _parse_datetime(schedule.get("run_at"))
+            or _parse_datetime(schedule.get("next_fire_at"))
+            or _parse_datetime(schedule.get("created_at"))
+            or current_time
+        )
+    if schedule_type == "cron":
+        if schedule.get("status") == "invalid" or not str(schedule.get("cron", "")).strip():
+            return None
+        next_fire = _parse_datetime(schedule.get("next_fire_at"))
+        if next_fire:
+            return next_fire
+        try:
+            return _next_cron_after(str(schedule.get("cron")), current_time - timedelta(minutes=1))
+        except ValueError:
+            # Let _process_cron record the invalid status on the next run.
+            return current_time
+    return None
+
+
 def _infer_schedule_type(schedule: dict[str, Any]) -> str:
     if schedule.get("interval_seconds") is not None:
         return "interval"
@@ -328,21 +528,53 @@ def _read_number(value: Any) -> float | None:
 
 
 def _next_cron_after(expr: str, base: datetime) -> datetime:
+    """Find the first matching minute after ``base``.
+
+    Mismatching fields are skipped in one step (a wrong month jumps to the next
+    allowed month, a wrong day to the next day, and so on) instead of testing
+    every minute, so even sparse expressions resolve in a few dozen iterations.
+    """
     minute_set, hour_set, dom_set, month_set, dow_set = _parse_cron_expression(expr)
+    minutes = sorted(minute_set)
+    hours = sorted(hour_set)
     candidate = base.replace(second=0, microsecond=0) + timedelta(minutes=1)
-    for _ in range(60 * 24 * 366):
-        if (
-            candidate.minute in minute_set
-            and candidate.hour in hour_set
-            and candidate.day in dom_set
-            and candidate.month in month_set
-            and _cron_weekday(candidate) in dow_set
-        ):
-            return candidate
-        candidate += timedelta(minutes=1)
+    limit = candidate + timedelta(days=_CRON_SEARCH_DAYS)
+    while candidate < limit:
+        if candidate.month not in month_set:
+            candidate = _next_cron_month(candidate, month_set)
+            continue
+        if candidate.day not in dom_set or _cron_weekday(candidate) not in dow_set:
+            candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if candidate.hour not in hour_set:
+            next_hour = next((hour for hour in hours if hour > candidate.hour), None)
+            if next_hour is None:
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            else:
+                candidate = candidate.replace(hour=next_hour, minute=0)
+            continue
+        if candidate.minute not in minute_set:
+            next_minute = next((minute for minute in minutes if minute > candidate.minute), None)
+            if next_minute is None:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            else:
+                candidate = candidate.replace(minute=next_minute)
+            continue
+        return candidate
     raise ValueError("找不到下一次 cron 時間")
 
 
+def _next_cron_month(candidate: datetime, month_set: set[int]) -> datetime:
+    year, month = candidate.year, candidate.month
+    for _ in range(12):
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+        if month in month_set:
+            break
+    return candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+
+
 def _parse_cron_expression(expr: str) -> tuple[set[int], set[int], set[int], set[int], set[int]]:
     parts = [part for part in expr.split() if part.strip()]
     if len(parts) != 5:
@@ -3,15 +3,30 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Mapping
+from dataclasses import dataclass
 from pathlib import Path
 from string import Template
-from typing import Any
+from typing import Any, Callable
 
 from amon.artifacts.store import ingest_artifacts
 from amon.sandbox.service import run_sandbox_step
 
+from .context import ContextView
 from .schema import TaskNode
 
+PayloadRenderer = Callable[[Mapping[str, Any]], Any]
+
+
+@dataclass(frozen=True)
+class _NodeRenderPlan:
+    """Templates of one node, compiled once and reused for every item."""
+
+    prompt: Template | None = None
+    tool_payloads: tuple[tuple[str, PayloadRenderer], ...] = ()
+    command: Template | None = None
+    workdir: Template | None = None
+
 
 class AmonNodeRunner:
     _CONTEXT_HISTORY_LIMIT = 3
@@ -35,8 +50,9 @@ class AmonNodeRunner:
         self.stream_handler = stream_handler
         self.request_id = request_id
         self.thread_id = thread_id
+        self._render_plans: dict[str, tuple[Any, _NodeRenderPlan]] = {}
 
-    def run_task(self, node: TaskNode, context: dict[str, Any]) -> dict[str, Any]:
+    def run_task(self, node: TaskNode, context: Mapping[str, Any]) -> dict[str, Any]:
         if not node.task_spec.runnable:
             raise ValueError(node.task_spec.non_runnable_reason or f"node={node.id} task_spec not runnable")
         executor = node.task_spec.executor
@@ -48,12 +64,11 @@ class AmonNodeRunner:
             return self._run_sandbox(node, context)
         raise ValueError(f"node={node.id} unsupported executor={executor}")
 
-    def _run_agent(self, node: TaskNode, context: dict[str, Any]) -> dict[str, Any]:
+    def _run_agent(self, node: TaskNode, context: Mapping[str, Any]) -> dict[str, Any]:
         agent = node.task_spec.agent
         assert agent is not None
         render_ctx = self._render_context(node, context)
-        prompt_template = agent.prompt or agent.instructions or ""
-        prompt = Template(prompt_template).safe_substitute(render_ctx)
+        prompt = self._render_plan(node).prompt.safe_substitute(render_ctx)
         conversation_history = self._build_conversation_history(node, render_ctx, context)
         response = self.core.run_agent_task(
             prompt,
@@ -79,19 +94,19 @@ class AmonNodeRunner:
             "ingest_summary": ingest_summary,
         }
 
-    def _run_tool(self, node: TaskNode, context: dict[str, Any]) -> dict[str, Any]:
+    def _run_tool(self, node: TaskNode, context: Mapping[str, Any]) -> dict[str, Any]:
         tool_cfg = node.task_spec.tool
         assert tool_cfg is not None
         render_ctx = self._render_context(node, context)
         call_results: list[dict[str, Any]] = []
         primary_path = ""
         project_id, _ = self.core.resolve_project_identity(self.project_path)
-        for spec in tool_cfg.tools:
-            payload = self._render_payload(spec.args, render_ctx)
+        for name, render_payload in self._render_plan(node).tool_payloads:
+            payload = render_payload(render_ctx)
             if not primary_path and isinstance(payload, dict) and isinstance(payload.get("path"), str):
                 primary_path = str(payload.get("path") or "")
             result = self.core.run_tool(
-                spec.name,
+                name,
                 payload,
                 project_id=project_id,
                 project_path=self.project_path,
@@ -102,21 +117,22 @@ class AmonNodeRunner:
                 request_id=self.request_id,
             )
             if bool(result.get("is_error", False)):
-                raise RuntimeError(result.get("text") or f"tool={spec.name} execution failed")
-            call_results.append({"name": spec.name, "payload": payload, "result": result})
+                raise RuntimeError(result.get("text") or f"tool={name} execution failed")
+            call_results.append({"name": name, "payload": payload, "result": result})
         return {
             "raw_output": json.dumps(call_results, ensure_ascii=False),
             "tool_calls": call_results,
             "path": primary_path or None,
         }
 
-    def _run_sandbox(self, node: TaskNode, context: dict[str, Any]) -> dict[str, Any]:
+    def _run_sandbox(self, node: TaskNode, context: Mapping[str, Any]) -> dict[str, Any]:
         config = self.core.load_config(self.project_path)
         run_cfg = node.task_spec.sandbox_run
         assert run_cfg is not None
         render_ctx = self._render_context(node, context)
-        command = Template(run_cfg.command or "").safe_substitute(render_ctx)
-        workdir = Template(run_cfg.workdir or "").safe_substitute(render_ctx)
+        plan = self._render_plan(node)
+        command = plan.command.safe_substitute(render_ctx)
+        workdir = plan.workdir.safe_substitute(render_ctx)
         language = "bash"
         code = command
         if (run_cfg.shell or "").strip().lower() == "python":
@@ -137,16 +153,41 @@ class AmonNodeRunner:
         )
         return {"raw_output": json.dumps(result, ensure_ascii=False), **result}
 
-    def _render_context(self, node: TaskNode, context: dict[str, Any]) -> dict[str, Any]:
-        render_ctx = {**self.variables, **context, "run_id": self.run_id}
-        render_ctx.update(self._resolve_input_bindings(node, render_ctx, context))
-        return render_ctx
+    def _render_context(self, node: TaskNode, context: Mapping[str, Any]) -> ContextView:
+        # Layered lookup (bindings > run_id > runtime context > variables) instead
+        # of merging everything into a fresh dict for every map item.
+        render_ctx = ContextView({"run_id": self.run_id}, context, self.variables)
+        resolved = self._resolve_input_bindings(node, render_ctx, context)
+        return render_ctx.new_child(resolved) if resolved else render_ctx
+
+    def _render_plan(self, node: TaskNode) -> _NodeRenderPlan:
+        cached = self._render_plans.get(node.id)
+        if cached is not None and cached[0] is node.task_spec:
+            return cached[1]
+        plan = self._compile_render_plan(node)
+        self._render_plans[node.id] = (node.task_spec, plan)
+        return plan
+
+    def _compile_render_plan(self, node: TaskNode) -> _NodeRenderPlan:
+        spec = node.task_spec
+        if spec.executor == "agent" and spec.agent is not None:
+            return _NodeRenderPlan(prompt=Template(spec.agent.prompt or spec.agent.instructions or ""))
+        if spec.executor == "tool" and spec.tool is not None:
+            return _NodeRenderPlan(
+                tool_payloads=tuple((item.name, self._compile_payload(item.args)) for item in spec.tool.tools)
+            )
+        if spec.executor == "sandbox_run" and spec.sandbox_run is not None:
+            return _NodeRenderPlan(
+                command=Template(spec.sandbox_run.command or ""),
+                workdir=Template(spec.sandbox_run.workdir or ""),
+            )
+        return _NodeRenderPlan()
 
     def _resolve_input_bindings(
         self,
         node: TaskNode,
-        render_ctx: dict[str, Any],
-        runtime_context: dict[str, Any],
+        render_ctx: Mapping[str, Any],
+        runtime_context: Mapping[str, Any],
     ) -> dict[str, Any]:
         resolved: dict[str, Any] = {}
         for binding in node.task_spec.input_bindings:
@@ -162,7 +203,7 @@ class AmonNodeRunner:
         return resolved
 
     @staticmethod
-    def _resolve_upstream_binding(runtime_context: dict[str, Any], from_node: str, port: str) -> Any:
+    def _resolve_upstream_binding(runtime_context: Mapping[str, Any], from_node: str, port: str) -> Any:
         nodes = runtime_context.get("nodes")
         if not isinstance(nodes, dict):
             return None
@@ -184,20 +225,29 @@ class AmonNodeRunner:
             return ports.get(port)
         return output.get(port)
 
-    def _render_payload(self, payload: Any, context: dict[str, Any]) -> Any:
+    def _render_payload(self, payload: Any, context: Mapping[str, Any]) -> Any:
+        return self._compile_payload(payload)(context)
+
+    @classmethod
+    def _compile_payload(cls, payload: Any) -> PayloadRenderer:
+        """Turn a payload tree into a renderer; literal strings skip templating."""
         if isinstance(payload, str):
-            return Template(payload).safe_substitute(context)
+            if "$" not in payload:
+                return lambda _context: payload
+            return Template(payload).safe_substitute
         if isinstance(payload, list):
-            return [self._render_payload(item, context) for item in payload]
+            items = [cls._compile_payload(item) for item in payload]
+            return lambda context: [render(context) for render in items]
         if isinstance(payload, dict):
-            return {key: self._render_payload(value, context) for key, value in payload.items()}
-        return payload
+            fields = [(key, cls._compile_payload(value)) for key, value in payload.items()]
+            return lambda context: {key: render(context) for key, render in fields}
+        return lambda _context: payload
 
     def _build_conversation_history(
         self,
         node: TaskNode,
-        render_ctx: dict[str, Any],
-        runtime_context: dict[str, Any],
+        render_ctx: Mapping[str, Any],
+        runtime_context: Mapping[str, Any],
     ) -> list[dict[str, str]]:
         base_history = self._normalize_conversation_history(render_ctx.get("conversation_history"))
         enriched = list(base_history)
@@ -0,0 +1,52 @@
+"""Read-only layered context views for TaskGraph v3 node execution."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+
+class ContextView(Mapping[str, Any]):
+    """Layered, read-only mapping; earlier layers shadow later ones.
+
+    Map items and recursive iterations only add a handful of keys on top of the
+    run state, so they get a small overlay over the shared state instead of a
+    full copy per item. Layers are referenced, not copied.
+    """
+
+    __slots__ = ("_layers",)
+
+    def __init__(self, *layers: Mapping[str, Any]) -> None:
+        self._layers = tuple(layer for layer in layers if layer is not None)
+
+    def new_child(self, overlay: Mapping[str, Any]) -> "ContextView":
+        return ContextView(overlay, *self._layers)
+
+    def __getitem__(self, key: str) -> Any:
+        for layer in self._layers:
+            if key in layer:
+                return layer[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return any(key in layer for layer in self._layers)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        for layer in self._layers:
+            if key in layer:
+                return layer[key]
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        seen: set[str] = set()
+        for layer in self._layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"ContextView({', '.join(repr(layer) for layer in self._layers)})"
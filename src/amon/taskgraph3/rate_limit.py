@@ -0,0 +1,160 @@
+"""Shared, reservation-based rate limiting for TaskGraph v3 runtimes."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+_MIN_ADAPTIVE_FACTOR = 0.1
+_ADAPTIVE_DECREASE = 0.5
+_ADAPTIVE_RECOVERY_STEP = 0.05
+_DEFAULT_THROTTLE_PAUSE_S = 1.0
+
+
+@dataclass
+class _Bucket:
+    rate: float | None
+    tokens: float
+    last_refill: float
+    factor: float = 1.0
+    blocked_until: float = 0.0
+    acquired: int = 0
+    waited: int = 0
+    wait_s_total: float = 0.0
+    wait_s_max: float = 0.0
+    throttled: int = 0
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary budget name.
+
+    ``reserve`` only computes the wait under the lock and books the token, so
+    callers sleep outside of it and one waiting worker never blocks another.
+    Keys are free-form (``provider:openai``, ``model:gpt-4o``, ``tool:web.search``,
+    ``mcp:server``); every node that uses the same key draws from one budget.
+    When several callers pass different rates for one key, the lowest applies.
+    Throttling responses halve the effective rate and pause the key for the
+    ``Retry-After`` period; successful calls recover the rate gradually.
+    """
+
+    def __init__(self, *, time_func: Callable[[], float] | None = None) -> None:
+        self._time = time_func or time.monotonic
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _Bucket] = {}
+
+    def reserve(self, key: str, rate_limit: float | None) -> float:
+        """Book one call for ``key`` and return how long the caller must wait."""
+        with self._lock:
+            if not (rate_limit and rate_limit > 0) and key not in self._buckets:
+                return 0.0
+            now = self._time()
+            bucket = self._bucket(key, rate_limit, now)
+            wait_s = max(0.0, bucket.blocked_until - now)
+            if bucket.rate:
+                rate = bucket.rate * bucket.factor
+                elapsed = max(0.0, now - bucket.last_refill)
+                bucket.tokens = min(rate, bucket.tokens + elapsed * rate)
+                bucket.last_refill = now
+                bucket.tokens -= 1.0
+                if bucket.tokens < 0:
+                    wait_s = max(wait_s, -bucket.tokens / rate)
+            bucket.acquired += 1
+            if wait_s > 0:
+                bucket.waited += 1
+                bucket.wait_s_total += wait_s
+                bucket.wait_s_max = max(bucket.wait_s_max, wait_s)
+            return wait_s
+
+    def observe_throttle(self, key: str, retry_after_s: float | None = None) -> None:
+        with self._lock:
+            now = self._time()
+            bucket = self._bucket(key, None, now)
+            pause = retry_after_s if retry_after_s is not None and retry_after_s >= 0 else _DEFAULT_THROTTLE_PAUSE_S
+            bucket.blocked_until = max(bucket.blocked_until, now + pause)
+            bucket.factor = max(_MIN_ADAPTIVE_FACTOR, bucket.factor * _ADAPTIVE_DECREASE)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.throttled += 1
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.factor < 1.0:
+                bucket.factor = min(1.0, bucket.factor + _ADAPTIVE_RECOVERY_STEP)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {
+                    "rate_limit": bucket.rate,
+                    "effective_rate": round(bucket.rate * bucket.factor, 6) if bucket.rate else None,
+                    "acquired": bucket.acquired,
+                    "waited": bucket.waited,
+                    "wait_s_total": round(bucket.wait_s_total, 6),
+                    "wait_s_max": round(bucket.wait_s_max, 6),
+                    "throttled": bucket.throttled,
+                }
+                for key, bucket in sorted(self._buckets.items())
+            }
+
+    def _bucket(self, key: str, rate_limit: float | None, now: float) -> _Bucket:
+        rate = float(rate_limit) if rate_limit and rate_limit > 0 else None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(rate=rate, tokens=rate or 0.0, last_refill=now)
+            self._buckets[key] = bucket
+        elif rate is not None and (bucket.rate is None or rate < bucket.rate):
+            if bucket.rate is None:
+                bucket.tokens = rate
+                bucket.last_refill = now
+            bucket.rate = rate
+        return bucket
+
+
+def throttle_retry_after(exc: BaseException) -> float | None:
+    """Return the pause requested by a 429-style error, or ``None`` if it is not one.
+
+    Recognizes ``status_code``/``status``/``code`` attributes (including on a
+    ``response`` attribute) and reads ``retry_after`` or a ``Retry-After``
+    header when present. A 429 without a hint yields the default pause.
+    """
+    candidates = [exc, getattr(exc, "response", None)]
+    is_throttle = False
+    retry_after: float | None = None
+    for candidate in candidates:
+        if candidate is None:
+            continue
+        for attr in ("status_code", "status", "code"):
+            if getattr(candidate, attr, None) == 429:
+                is_throttle = True
+        explicit = getattr(candidate, "retry_after", None)
+        if isinstance(explicit, (int, float)) and not isinstance(explicit, bool):
+            retry_after = float(explicit)
+            is_throttle = True
+        headers = getattr(candidate, "headers", None)
+        header_value = None
+        if headers is not None and hasattr(headers, "get"):
+            header_value = headers.get("Retry-After") or headers.get("retry-after")
+        if header_value and retry_after is None:
+            retry_after = _parse_retry_after(str(header_value))
+    if not is_throttle:
+        return None
+    return retry_after if retry_after is not None else _DEFAULT_THROTTLE_PAUSE_S
+
+
+def _parse_retry_after(value: str) -> float | None:
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        target = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if target.tzinfo is None:
+        target = target.replace(tzinfo=timezone.utc)
+    return max(0.0, (target - datetime.now(timezone.utc)).total_seconds())
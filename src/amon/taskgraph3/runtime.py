@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
-import threading
+import random
 import time
 import uuid
 from collections import deque
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Callable
@@ -16,6 +18,8 @@ from amon.fs.atomic import append_jsonl, atomic_write_text
 
 from amon.artifacts.store import ingest_artifacts
 
+from .context import ContextView
+from .rate_limit import RateLimiter, throttle_retry_after
 from .schema import ArtifactNode, GateNode, GraphDefinition, GraphEdge, GroupNode, TaskNode, validate_graph_definition
 from .serialize import dumps_graph_definition
 
@@ -42,6 +46,7 @@ class TaskGraph3Runtime:
         run_id: str | None = None,
         time_func: Callable[[], float] | None = None,
         sleep_func: Callable[[float], None] | None = None,
+        rate_limiter: RateLimiter | None = None,
     ) -> None:
         validate_graph_definition(graph)
         self.project_path = Path(project_path)
@@ -49,11 +54,12 @@ class TaskGraph3Runtime:
         self.run_id = run_id
         self._time = time_func or time.monotonic
         self._sleep = sleep_func or time.sleep
-        self._bucket_state: dict[str, dict[str, float]] = {}
+        self._rate_limiter = rate_limiter or RateLimiter(time_func=self._time)
         self._stream_state: dict[str, dict[str, float]] = {}
-        self._rate_lock = threading.Lock()
+        self._run_dir: Path | None = None
+        self._events_path: Path | None = None
 
-    def run(self, node_runner: Callable[[TaskNode, dict[str, Any]], Any]) -> TaskGraph3RunResult:
+    def run(self, node_runner: Callable[[TaskNode, Mapping[str, Any]], Any]) -> TaskGraph3RunResult:
         run_id = self.run_id or uuid.uuid4().hex
         run_dir = self.project_path / ".amon" / "runs" / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
@@ -61,6 +67,8 @@ class TaskGraph3Runtime:
         state_path = run_dir / "state.json"
         events_path = run_dir / "events.jsonl"
         resolved_path = run_dir / "graph.resolved.json"
+        self._run_dir = run_dir
+        self._events_path = events_path
 
         nodes = {node.id: node for node in self.graph.nodes}
         adjacency, incoming = self._compile_control_graph(self.graph.edges)
@@ -185,6 +193,7 @@ class TaskGraph3Runtime:
 
         if state["status"] == "running":
             state["status"] = "succeeded"
+        state["metrics"]["rate_limits"] = self._rate_limiter.snapshot()
 
         self._emit_event(
             events_path,
@@ -198,57 +207,179 @@ class TaskGraph3Runtime:
         self,
         node: TaskNode,
         state: dict[str, Any],
-        node_runner: Callable[[TaskNode, dict[str, Any]], Any],
+        node_runner: Callable[[TaskNode, Mapping[str, Any]], Any],
     ) -> dict[str, Any]:
         mode = node.execution
         if mode == "PARALLEL_MAP":
             return self._run_parallel_map(node, state, node_runner)
         if mode == "RECURSIVE":
             return self._run_recursive(node, state, node_runner)
-        self._acquire_rate_limit(node.id, node.policy.rate_limit)
-        return self._normalize_runner_output(node_runner(node, state))
+        return self._call_node_runner(node, state, node_runner)
 
     def _run_parallel_map(
         self,
         node: TaskNode,
         state: dict[str, Any],
-        node_runner: Callable[[TaskNode, dict[str, Any]], Any],
+        node_runner: Callable[[TaskNode, Mapping[str, Any]], Any],
     ) -> dict[str, Any]:
+        """Run one item per call with a sliding submission window.
+
+        At most ``window`` items (default ``2 * maxConcurrency``) are submitted at
+        a time. Each finished item is appended to ``map/<node>.jsonl`` in the run
+        dir, and a rerun with the same run_id reuses items that already
+        succeeded. Failed items are retried per ``policy.retry``. With
+        ``continueOnError`` they are reported in ``failed_items`` until more than
+        ``maxFailures`` items have failed.
+        """
         config = node.execution_config or {}
         items = self._resolve_parallel_items(node, state, config)
         max_concurrency = int(config.get("maxConcurrency") or 1)
         if max_concurrency <= 0:
             raise ValueError(f"node={node.id} maxConcurrency must be > 0")
+        window = int(config.get("window") or max_concurrency * 2)
+        if window < max_concurrency:
+            raise ValueError(f"node={node.id} window must be >= maxConcurrency")
+        continue_on_error = bool(config.get("continueOnError", False))
+        max_failures_raw = config.get("maxFailures")
+        max_failures = int(max_failures_raw) if max_failures_raw is not None else None
         result_parser = str(config.get("resultParser") or "").strip().lower()
+        stream_limit = node.policy.stream_limit
 
+        fingerprints = [self._map_item_fingerprint(item) for item in items]
+        results_path = self._map_results_path(node.id)
         results: dict[int, str] = {}
-
-        def _worker(index: int, item: Any) -> tuple[int, str]:
-            ctx = dict(state)
-            ctx["map_item"] = item
-            ctx["map_index"] = index
-            ctx.update(self._expand_map_item_context(item))
-            self._acquire_rate_limit(node.id, node.policy.rate_limit)
-            normalized = self._normalize_runner_output(node_runner(node, ctx))
-            return index, str(normalized.get("raw_output") or "")
-
+        if results_path is not None:
+            for index, output in self._load_map_results(results_path, fingerprints).items():
+                results[index] = output
+        reused = len(results)
+        failures: dict[int, str] = {}
+        total = len(items)
+
+        def _worker(index: int, item: Any) -> tuple[str, int]:
+            # Items share the run state through a read-only view; only the
+            # per-item keys are materialized.
+            overlay: dict[str, Any] = {"map_item": item, "map_index": index}
+            overlay.update(self._expand_map_item_context(item))
+            return self._call_map_item_with_retry(node, ContextView(overlay, state), node_runner)
+
+        pending = deque(index for index in range(total) if index not in results)
+        in_flight: dict[Future, int] = {}
+        aborted: Exception | None = None
         with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
-            futures = [executor.submit(_worker, idx, item) for idx, item in enumerate(items)]
-            for future in as_completed(futures):
-                idx, output = future.result()
-                results[idx] = output
-
-        ordered = [results[idx] for idx in range(len(items))]
+            while pending or in_flight:
+                while pending and aborted is None and len(in_flight) < window:
+                    index = pending.popleft()
+                    in_flight[executor.submit(_worker, index, items[index])] = index
+                if not in_flight:
+                    break
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    try:
+                        output, attempts = future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        failures[index] = str(exc)
+                        record = {"index": index, "status": "failed", "error": str(exc)}
+                        if not continue_on_error or (max_failures is not None and len(failures) > max_failures):
+                            aborted = aborted or exc
+                    else:
+                        results[index] = output
+                        record = {"index": index, "status": "succeeded", "output": output, "attempts": attempts}
+                    record["fingerprint"] = fingerprints[index]
+                    if results_path is not None:
+                        append_jsonl(results_path, record)
+                    if self._events_path is not None:
+                        self._emit_event(
+                            self._events_path,
+                            {
+                                "event": "map_item_status",
+                                "node_id": node.id,
+                                "index": index,
+                                "status": record["status"],
+                                "completed": len(results),
+                                "failed": len(failures),
+                                "total": total,
+                            },
+                            stream_limit=stream_limit,
+                        )
+                if aborted is not None:
+                    pending.clear()
+
+        if aborted is not None:
+            raise aborted
+
+        ordered: list[Any] = [results.get(idx) for idx in range(total)]
         if result_parser == "json":
-            parsed = [self._extract_json(item) if isinstance(item, str) else item for item in ordered]
-            return {"raw_output": json.dumps(parsed, ensure_ascii=False), "items": parsed}
-        return {"raw_output": json.dumps(ordered, ensure_ascii=False), "items": ordered}
+            ordered = [self._extract_json(item) if isinstance(item, str) else item for item in ordered]
+        payload: dict[str, Any] = {"raw_output": json.dumps(ordered, ensure_ascii=False), "items": ordered}
+        if failures:
+            payload["failed_items"] = [{"index": idx, "error": failures[idx]} for idx in sorted(failures)]
+        if reused:
+            payload["reused_items"] = reused
+        return payload
+
+    def _call_map_item_with_retry(
+        self,
+        node: TaskNode,
+        ctx: Mapping[str, Any],
+        node_runner: Callable[[TaskNode, Mapping[str, Any]], Any],
+    ) -> tuple[str, int]:
+        retry = node.policy.retry
+        max_attempts = max(1, int(retry.max_attempts or 1))
+        for attempt in range(1, max_attempts + 1):
+            try:
+                normalized = self._call_node_runner(node, ctx, node_runner)
+                return str(normalized.get("raw_output") or ""), attempt
+            except Exception:
+                if attempt >= max_attempts:
+                    raise
+                delay = float(retry.backoff_s or 0.0) * (2 ** (attempt - 1))
+                if retry.jitter_s:
+                    delay += random.uniform(0, float(retry.jitter_s))
+                if delay > 0:
+                    self._sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _map_results_path(self, node_id: str) -> Path | None:
+        if self._run_dir is None:
+            return None
+        safe_id = "".join(ch if ch.isalnum() or ch in {"_", "-", "."} else "_" for ch in node_id) or "node"
+        return self._run_dir / "map" / f"{safe_id}.jsonl"
+
+    @staticmethod
+    def _map_item_fingerprint(item: Any) -> str:
+        encoded = json.dumps(item, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    @staticmethod
+    def _load_map_results(path: Path, fingerprints: list[str]) -> dict[int, str]:
+        if not path.exists():
+            return {}
+        reusable: dict[int, str] = {}
+        try:
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or record.get("status") != "succeeded":
+                continue
+            index = record.get("index")
+            if not isinstance(index, int) or not 0 <= index < len(fingerprints):
+                continue
+            if record.get("fingerprint") != fingerprints[index]:
+                continue
+            reusable[index] = str(record.get("output") or "")
+        return reusable
 
     def _run_recursive(
         self,
         node: TaskNode,
         state: dict[str, Any],
-        node_runner: Callable[[TaskNode, dict[str, Any]], Any],
+        node_runner: Callable[[TaskNode, Mapping[str, Any]], Any],
     ) -> dict[str, Any]:
         config = node.execution_config or {}
         max_iters = int(config.get("maxIters") or 1)
@@ -258,10 +389,8 @@ class TaskGraph3Runtime:
 
         latest = ""
         for iteration in range(max_iters):
-            ctx = dict(state)
-            ctx["recursive_iter"] = iteration
-            self._acquire_rate_limit(node.id, node.policy.rate_limit)
-            normalized = self._normalize_runner_output(node_runner(node, ctx))
+            ctx = ContextView({"recursive_iter": iteration}, state)
+            normalized = self._call_node_runner(node, ctx, node_runner)
             latest = str(normalized.get("raw_output") or "")
             if self._is_recursive_stop(latest, stop_condition):
                 break
@@ -429,23 +558,34 @@ class TaskGraph3Runtime:
             incoming[edge.to_node] += 1
         return adjacency, incoming
 
-    def _acquire_rate_limit(self, node_id: str, rate_limit: int | None) -> None:
-        if not rate_limit or rate_limit <= 0:
-            return
-        with self._rate_lock:
-            rate = float(rate_limit)
-            bucket = self._bucket_state.setdefault(node_id, {"tokens": rate, "last_refill": self._time()})
-            now = self._time()
-            elapsed = max(0.0, now - bucket["last_refill"])
-            bucket["tokens"] = min(rate, bucket["tokens"] + elapsed * rate)
-            bucket["last_refill"] = now
-            if bucket["tokens"] >= 1.0:
-                bucket["tokens"] -= 1.0
-                return
-            wait_s = (1.0 - bucket["tokens"]) / rate
+    def _call_node_runner(
+        self,
+        node: TaskNode,
+        ctx: Mapping[str, Any],
+        node_runner: Callable[[TaskNode, Mapping[str, Any]], Any],
+    ) -> dict[str, Any]:
+        key = self._rate_limit_key(node)
+        self._acquire_rate_limit(key, node.policy.rate_limit)
+        try:
+            output = node_runner(node, ctx)
+        except Exception as exc:
+            retry_after = throttle_retry_after(exc)
+            if retry_after is not None:
+                self._rate_limiter.observe_throttle(key, retry_after)
+            raise
+        self._rate_limiter.record_success(key)
+        return self._normalize_runner_output(output)
+
+    @staticmethod
+    def _rate_limit_key(node: TaskNode) -> str:
+        return node.policy.rate_limit_key or node.id
+
+    def _acquire_rate_limit(self, key: str, rate_limit: int | None) -> None:
+        # Only the reservation happens under the limiter lock; waiting happens
+        # here so other workers (and other nodes) keep making progress.
+        wait_s = self._rate_limiter.reserve(key, rate_limit)
+        if wait_s > 0:
             self._sleep(wait_s)
-            bucket["tokens"] = 0.0
-            bucket["last_refill"] = self._time()
 
     def _emit_event(self, events_path: Path, payload: dict[str, Any], *, stream_limit: int | None) -> None:
         node_id = str(payload.get("node_id") or "")
@@ -142,6 +142,7 @@ class TimeoutPolicy:
 class Policy:
     rate_limit: int | None = None
     stream_limit: int | None = None
+    rate_limit_key: str | None = None
     retry: RetryPolicy = field(default_factory=RetryPolicy)
     budget: BudgetPolicy = field(default_factory=BudgetPolicy)
     timeout: TimeoutPolicy = field(default_factory=TimeoutPolicy)
@@ -166,6 +166,8 @@ def _node_to_payload(node: BaseNode) -> dict[str, Any]:
             "rateLimit": node.policy.rate_limit,
             "streamLimit": node.policy.stream_limit,
         }
+        if node.policy.rate_limit_key:
+            payload["policy"]["rateLimitKey"] = node.policy.rate_limit_key
         if node.guardrails is not None:
             payload["guardrails"] = node.guardrails
         if node.task_boundaries is not None:
@@ -370,6 +370,7 @@ def _extract_policy(payload: dict[str, Any]):
     return Policy(
         rate_limit=_to_optional_int(source.get("rateLimit") or source.get("rate_limit")),
         stream_limit=_to_optional_int(source.get("streamLimit") or source.get("stream_limit")),
+        rate_limit_key=str(source.get("rateLimitKey") or source.get("rate_limit_key") or "").strip() or None,
         retry=RetryPolicy(
             max_attempts=int(retry_raw.get("maxAttempts") or retry_raw.get("max_attempts") or 1),
             backoff_s=float(retry_raw.get("backoffSeconds") or retry_raw.get("backoff_s") or 1.0),
@@ -27,6 +27,7 @@ DEFAULT_ALLOW = (
     "filesystem.grep",
     "memory.get",
     "memory.search",
+    "memory.list",
     "artifacts.write_text",
     "artifacts.write_file",
     "web.fetch",
@@ -100,7 +101,10 @@ def build_default_registry(workspace_root: Path, config: dict[str, Any] | None =
         ),
     )
     memory_dir = config.get("memory_dir")
-    store = MemoryStore(base_dir=Path(memory_dir) if memory_dir else _default_memory_dir())
+    store = MemoryStore(
+        base_dir=Path(memory_dir) if memory_dir else _default_memory_dir(),
+        backend=str(config.get("memory_backend") or "sqlite"),
+    )
     register_memory_tools(registry, store=store)
     register_artifacts_tools(registry, guard=guard)
     register_audit_tools(registry, log_path=audit_path, guard=guard)
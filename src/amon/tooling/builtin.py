@@ -26,6 +26,7 @@ def build_registry(workspace_root: Path) -> ToolRegistry:
                 "filesystem.grep",
                 "filesystem.glob",
                 "memory.search",
+                "memory.list",
                 "web.fetch",
                 "web.search",
                 "web.better_search",
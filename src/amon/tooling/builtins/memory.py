@@ -2,28 +2,74 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 import json
 from pathlib import Path
-from typing import Any
+import sqlite3
+import threading
+from typing import Any, Iterator, Protocol
+
+from amon.fs.atomic import atomic_write_text
 
 from ..types import ToolCall, ToolResult, ToolSpec
 
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+MEMORY_DB_NAME = "memory.sqlite3"
+_KEY_RANGE_SENTINEL = "\U0010ffff"
 
-@dataclass(frozen=True)
-class MemoryStore:
-    base_dir: Path
+
+class MemoryBackend(Protocol):
+    location: Path
+
+    def put(self, namespace: str, key: str, value: Any) -> Path: ...
+
+    def get(self, namespace: str, key: str) -> Any: ...
+
+    def delete(self, namespace: str, key: str) -> None: ...
+
+    def search(self, namespace: str, query: str, *, limit: int) -> list[dict[str, Any]]: ...
+
+    def list_keys(
+        self,
+        namespace: str,
+        *,
+        prefix: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int | None = None,
+    ) -> list[str]: ...
+
+
+def _safe_namespace(namespace: str) -> str:
+    return namespace.replace("/", "_")
+
+
+def _key_in_range(key: str, *, prefix: str | None, start: str | None, end: str | None) -> bool:
+    if prefix and not key.startswith(prefix):
+        return False
+    if start is not None and key < start:
+        return False
+    if end is not None and key >= end:
+        return False
+    return True
+
+
+class FileMemoryBackend:
+    """Legacy layout: one JSON file per key under ``<base_dir>/<namespace>/``."""
+
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = base_dir
+        self.location = base_dir
 
     def _namespace_dir(self, namespace: str) -> Path:
-        safe_namespace = namespace.replace("/", "_")
-        return self.base_dir / safe_namespace
+        return self.base_dir / _safe_namespace(namespace)
 
     def put(self, namespace: str, key: str, value: Any) -> Path:
-        directory = self._namespace_dir(namespace)
-        directory.mkdir(parents=True, exist_ok=True)
-        path = directory / f"{key}.json"
-        with path.open("w", encoding="utf-8") as handle:
-            json.dump({"key": key, "value": value}, handle, ensure_ascii=False)
+        path = self._namespace_dir(namespace) / f"{key}.json"
+        atomic_write_text(path, json.dumps({"key": key, "value": value}, ensure_ascii=False))
         return path
 
     def get(self, namespace: str, key: str) -> Any:
@@ -36,20 +82,293 @@ class MemoryStore:
         path = self._namespace_dir(namespace) / f"{key}.json"
         path.unlink()
 
-    def search(self, namespace: str, query: str) -> list[dict[str, Any]]:
+    def iter_records(self, namespace: str) -> Iterator[dict[str, Any]]:
         directory = self._namespace_dir(namespace)
         if not directory.exists():
-            return []
-        results: list[dict[str, Any]] = []
-        for path in directory.glob("*.json"):
+            return
+        for path in sorted(directory.glob("*.json")):
             try:
                 data = json.loads(path.read_text(encoding="utf-8"))
             except (OSError, json.JSONDecodeError):
                 continue
+            if isinstance(data, dict) and isinstance(data.get("key"), str):
+                yield data
+
+    def search(self, namespace: str, query: str, *, limit: int) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for data in self.iter_records(namespace):
             if query in json.dumps(data, ensure_ascii=False):
                 results.append({"key": data.get("key"), "value": data.get("value")})
+                if len(results) >= limit:
+                    break
         return results
 
+    def list_keys(
+        self,
+        namespace: str,
+        *,
+        prefix: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        directory = self._namespace_dir(namespace)
+        if not directory.exists():
+            return []
+        keys = sorted(path.stem for path in directory.glob("*.json"))
+        matched = [key for key in keys if _key_in_range(key, prefix=prefix, start=start, end=end)]
+        return matched[:limit] if limit is not None else matched
+
+
+class SqliteMemoryBackend:
+    """Single-file SQLite store with an FTS5 full-text index.
+
+    All namespaces share ``memory.sqlite3``; the FTS table carries the namespace
+    as an unindexed column so each search only ranks rows of one namespace.
+    Namespaces that still have a per-file directory from ``FileMemoryBackend``
+    are imported the first time they are touched.
+    """
+
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = base_dir
+        self.location = base_dir / MEMORY_DB_NAME
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._fts_tokenizer = "trigram"
+        self._migrated: set[str] = set()
+
+    def put(self, namespace: str, key: str, value: Any) -> Path:
+        value_json = json.dumps(value, ensure_ascii=False)
+        with self._transaction(namespace) as conn:
+            self._upsert(conn, namespace, key, value_json)
+        return self.location
+
+    def get(self, namespace: str, key: str) -> Any:
+        with self._transaction(namespace) as conn:
+            row = conn.execute(
+                "SELECT value_json FROM memory_items WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"找不到記錄：{namespace}/{key}")
+        return json.loads(row[0])
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._transaction(namespace) as conn:
+            row = conn.execute(
+                "SELECT id FROM memory_items WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"找不到記錄：{namespace}/{key}")
+            conn.execute("DELETE FROM memory_fts WHERE rowid = ?", (row[0],))
+            conn.execute("DELETE FROM memory_items WHERE id = ?", (row[0],))
+
+    def search(self, namespace: str, query: str, *, limit: int) -> list[dict[str, Any]]:
+        with self._transaction(namespace) as conn:
+            if self._fts_tokenizer == "trigram" and len(query) < 3:
+                # The trigram tokenizer cannot match shorter strings; LIKE keeps
+                # the previous substring semantics for them.
+                rows = conn.execute(
+                    "SELECT memory_items.key, memory_items.value_json, 0.0 FROM memory_fts "
+                    "JOIN memory_items ON memory_items.id = memory_fts.rowid "
+                    "WHERE memory_fts.namespace = ? AND memory_fts.body LIKE ? ESCAPE '\\' "
+                    "ORDER BY memory_items.updated_at DESC LIMIT ?",
+                    (namespace, f"%{_escape_like(query)}%", limit),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT memory_items.key, memory_items.value_json, bm25(memory_fts) AS score FROM memory_fts "
+                    "JOIN memory_items ON memory_items.id = memory_fts.rowid "
+                    "WHERE memory_fts MATCH ? AND memory_fts.namespace = ? "
+                    "ORDER BY score LIMIT ?",
+                    (_fts_phrase(query), namespace, limit),
+                ).fetchall()
+        return [
+            {"key": key, "value": json.loads(value_json), "score": round(-float(score), 6)}
+            for key, value_json, score in rows
+        ]
+
+    def list_keys(
+        self,
+        namespace: str,
+        *,
+        prefix: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        clauses = ["namespace = ?"]
+        params: list[Any] = [namespace]
+        if prefix:
+            clauses.append("key >= ? AND key < ?")
+            params.extend([prefix, prefix + _KEY_RANGE_SENTINEL])
+        if start is not None:
+            clauses.append("key >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("key < ?")
+            params.append(end)
+        sql = f"SELECT key FROM memory_items WHERE {' AND '.join(clauses)} ORDER BY key"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._transaction(namespace) as conn:
+            return [row[0] for row in conn.execute(sql, params).fetchall()]
+
+    def migrate_file_layout(self, namespace: str | None = None) -> int:
+        """Import per-file records into SQLite; existing SQLite rows win."""
+        if namespace is not None:
+            namespaces = [namespace]
+        elif self.base_dir.exists():
+            namespaces = [path.name for path in self.base_dir.iterdir() if path.is_dir()]
+        else:
+            namespaces = []
+        imported = 0
+        for item in namespaces:
+            with self._transaction(item, migrate=False) as conn:
+                imported += self._migrate_namespace(conn, item)
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self, namespace: str, *, migrate: bool = True) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            try:
+                conn = self._connection()
+                if migrate and namespace not in self._migrated:
+                    with conn:
+                        self._migrate_namespace(conn, namespace)
+                with conn:
+                    yield conn
+            except sqlite3.Error as exc:
+                raise OSError(f"記憶資料庫錯誤：{exc}") from exc
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        self.location.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.location), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_items ("
+                "id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "value_json TEXT NOT NULL, updated_at TEXT NOT NULL, UNIQUE(namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_migrations (namespace TEXT PRIMARY KEY, migrated_at TEXT NOT NULL)"
+            )
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts "
+                    "USING fts5(namespace UNINDEXED, body, tokenize='trigram')"
+                )
+            except sqlite3.OperationalError:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(namespace UNINDEXED, body)")
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'memory_fts'").fetchone()
+        self._fts_tokenizer = "trigram" if row and "trigram" in str(row[0]) else "unicode61"
+        self._conn = conn
+        return conn
+
+    def _upsert(self, conn: sqlite3.Connection, namespace: str, key: str, value_json: str) -> None:
+        conn.execute(
+            "INSERT INTO memory_items (namespace, key, value_json, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(namespace, key) DO UPDATE SET value_json = excluded.value_json, updated_at = excluded.updated_at",
+            (namespace, key, value_json, datetime.now(timezone.utc).isoformat(timespec="microseconds")),
+        )
+        row_id = conn.execute(
+            "SELECT id FROM memory_items WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()[0]
+        conn.execute("DELETE FROM memory_fts WHERE rowid = ?", (row_id,))
+        conn.execute(
+            "INSERT INTO memory_fts (rowid, namespace, body) VALUES (?, ?, ?)",
+            (row_id, namespace, _search_body(key, value_json)),
+        )
+
+    def _migrate_namespace(self, conn: sqlite3.Connection, namespace: str) -> int:
+        self._migrated.add(namespace)
+        done = conn.execute("SELECT 1 FROM memory_migrations WHERE namespace = ?", (namespace,)).fetchone()
+        if done:
+            return 0
+        imported = 0
+        for data in FileMemoryBackend(self.base_dir).iter_records(namespace):
+            key = data["key"]
+            exists = conn.execute(
+                "SELECT 1 FROM memory_items WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if exists:
+                continue
+            self._upsert(conn, namespace, key, json.dumps(data.get("value"), ensure_ascii=False))
+            imported += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO memory_migrations (namespace, migrated_at) VALUES (?, ?)",
+            (namespace, datetime.now(timezone.utc).isoformat(timespec="seconds")),
+        )
+        return imported
+
+
+def _search_body(key: str, value_json: str) -> str:
+    return f"{key}\n{value_json}"
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_memory_backend(backend: str, base_dir: Path) -> MemoryBackend:
+    normalized = (backend or "sqlite").strip().lower()
+    if normalized == "sqlite":
+        return SqliteMemoryBackend(base_dir)
+    if normalized in {"files", "file"}:
+        return FileMemoryBackend(base_dir)
+    raise ValueError(f"不支援的 memory backend：{backend}")
+
+
+@dataclass(frozen=True)
+class MemoryStore:
+    base_dir: Path
+    backend: str = "sqlite"
+    _impl: MemoryBackend = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_impl", build_memory_backend(self.backend, self.base_dir))
+
+    def put(self, namespace: str, key: str, value: Any) -> Path:
+        return self._impl.put(namespace, key, value)
+
+    def get(self, namespace: str, key: str) -> Any:
+        return self._impl.get(namespace, key)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._impl.delete(namespace, key)
+
+    def search(self, namespace: str, query: str, *, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict[str, Any]]:
+        return self._impl.search(namespace, query, limit=max(1, min(int(limit), MAX_SEARCH_LIMIT)))
+
+    def list_keys(
+        self,
+        namespace: str,
+        *,
+        prefix: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        return self._impl.list_keys(namespace, prefix=prefix, start=start, end=end, limit=limit)
+
 
 def spec_memory_put() -> ToolSpec:
     return ToolSpec(
@@ -147,12 +466,13 @@ def handle_memory_get(call: ToolCall, *, store: MemoryStore) -> ToolResult:
 def spec_memory_search() -> ToolSpec:
     return ToolSpec(
         name="memory.search",
-        description="Search stored values by substring.",
+        description="Search stored values by substring; results are ranked by relevance.",
         input_schema={
             "type": "object",
             "properties": {
                 "namespace": {"type": "string", "default": "default"},
                 "query": {"type": "string"},
+                "limit": {"type": "integer", "minimum": 1, "maximum": MAX_SEARCH_LIMIT, "default": DEFAULT_SEARCH_LIMIT},
             },
             "required": ["query"],
             "additionalProperties": False,
@@ -171,8 +491,15 @@ def handle_memory_search(call: ToolCall, *, store: MemoryStore) -> ToolResult:
             is_error=True,
             meta={"status": "invalid_args"},
         )
+    limit = call.args.get("limit", DEFAULT_SEARCH_LIMIT)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+        return ToolResult(
+            content=[{"type": "text", "text": "limit 需為正整數。"}],
+            is_error=True,
+            meta={"status": "invalid_args"},
+        )
     try:
-        results = store.search(namespace, query)
+        results = store.search(namespace, query, limit=limit)
     except OSError as exc:
         return ToolResult(
             content=[{"type": "text", "text": f"搜尋記憶失敗：{exc}"}],
@@ -185,6 +512,59 @@ def handle_memory_search(call: ToolCall, *, store: MemoryStore) -> ToolResult:
     )
 
 
+def spec_memory_list() -> ToolSpec:
+    return ToolSpec(
+        name="memory.list",
+        description="List stored keys in order, optionally by prefix or [start, end) range.",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "namespace": {"type": "string", "default": "default"},
+                "prefix": {"type": "string"},
+                "start": {"type": "string"},
+                "end": {"type": "string"},
+                "limit": {"type": "integer", "minimum": 1},
+            },
+            "additionalProperties": False,
+        },
+        risk="low",
+        annotations={"builtin": True},
+    )
+
+
+def handle_memory_list(call: ToolCall, *, store: MemoryStore) -> ToolResult:
+    namespace = str(call.args.get("namespace", "default"))
+    bounds: dict[str, str | None] = {}
+    for name in ("prefix", "start", "end"):
+        raw = call.args.get(name)
+        if raw is not None and not isinstance(raw, str):
+            return ToolResult(
+                content=[{"type": "text", "text": f"{name} 需為字串。"}],
+                is_error=True,
+                meta={"status": "invalid_args"},
+            )
+        bounds[name] = raw
+    limit = call.args.get("limit")
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0):
+        return ToolResult(
+            content=[{"type": "text", "text": "limit 需為正整數。"}],
+            is_error=True,
+            meta={"status": "invalid_args"},
+        )
+    try:
+        keys = store.list_keys(namespace, limit=limit, **bounds)
+    except OSError as exc:
+        return ToolResult(
+            content=[{"type": "text", "text": f"列出記憶失敗：{exc}"}],
+            is_error=True,
+            meta={"status": "io_error"},
+        )
+    return ToolResult(
+        content=[{"type": "text", "text": json.dumps(keys, ensure_ascii=False)}],
+        meta={"count": len(keys)},
+    )
+
+
 def spec_memory_delete() -> ToolSpec:
     return ToolSpec(
         name="memory.delete",
@@ -233,4 +613,5 @@ def register_memory_tools(registry: Any, *, store: MemoryStore) -> None:
     registry.register(spec_memory_put(), lambda call: handle_memory_put(call, store=store))
     registry.register(spec_memory_get(), lambda call: handle_memory_get(call, store=store))
     registry.register(spec_memory_search(), lambda call: handle_memory_search(call, store=store))
+    registry.register(spec_memory_list(), lambda call: handle_memory_list(call, store=store))
     registry.register(spec_memory_delete(), lambda call: handle_memory_delete(call, store=store))
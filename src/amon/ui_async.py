@@ -0,0 +1,508 @@
+"""Asyncio serving layer for the UI: bounded executor, SSE fan-out hub, HTTP front end."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Protocol
+
+from .logging import log_event
+
+_CLIENT_DISCONNECT_ERRORS = (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+_MAX_HEADER_BYTES = 64 * 1024
+_WRITE_HIGH_WATER = 64 * 1024
+
+
+def env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(int(raw), 0)
+    except ValueError:
+        return default
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a bounded executor has no free worker or queue slot."""
+
+
+class BoundedExecutor:
+    """Thread pool that admits at most ``max_workers + max_queue`` pending calls.
+
+    ``submit`` never blocks: once every worker is busy and the queue is full it
+    raises :class:`ExecutorSaturatedError`, so callers can shed load instead of
+    piling up threads or memory.
+    """
+
+    def __init__(self, *, max_workers: int, max_queue: int, name: str) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturatedError(f"{self.name} 已滿載（workers={self.max_workers}, queue={self.max_queue}）")
+        with self._lock:
+            self._queued += 1
+
+        def run() -> Any:
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                self._slots.release()
+
+        try:
+            return self._pool.submit(run)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_capacity": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, *, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class PollingSource(Protocol):
+    """Produces SSE events for one hub topic; both calls run on an executor thread."""
+
+    interval_s: float
+    retained_events: frozenset[str]
+
+    def initial(self) -> list[tuple[str, dict[str, Any]]]: ...
+
+    def poll(self) -> list[tuple[str, dict[str, Any]]]: ...
+
+
+@dataclass(frozen=True)
+class HubStream:
+    topic: str
+    open_source: Callable[[], PollingSource]
+
+
+class _Topic:
+    def __init__(self) -> None:
+        self.subscribers: set[asyncio.Queue] = set()
+        self.retained: dict[str, dict[str, Any]] = {}
+        self.task: asyncio.Task | None = None
+        self.published = 0
+        self.dropped = 0
+
+
+class EventHub:
+    """Fan one event source out to every SSE subscriber of a topic.
+
+    The first subscriber of a topic starts its source; later subscribers share
+    it and are replayed the retained (latest-value) events first. When the last
+    subscriber leaves, the source stops. Each subscriber owns a bounded queue;
+    a slow client loses its oldest events rather than stalling the others.
+    ``publish`` is safe to call from any thread once the hub is bound to a loop.
+    """
+
+    def __init__(self, *, subscriber_queue: int = 256) -> None:
+        self._subscriber_queue = max(1, subscriber_queue)
+        self._topics: dict[str, _Topic] = {}
+        # Topics change on the loop; the lock only guards reads from stats().
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._executor: BoundedExecutor | None = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop, executor: BoundedExecutor) -> None:
+        self._loop = loop
+        self._executor = executor
+
+    def subscribe(self, stream: HubStream) -> asyncio.Queue:
+        with self._lock:
+            topic = self._topics.setdefault(stream.topic, _Topic())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._subscriber_queue)
+        for event, payload in topic.retained.items():
+            queue.put_nowait((event, payload))
+        with self._lock:
+            topic.subscribers.add(queue)
+        if topic.task is None or topic.task.done():
+            topic.task = asyncio.get_running_loop().create_task(self._run_source(stream.topic, stream.open_source))
+        return queue
+
+    def unsubscribe(self, topic_name: str, queue: asyncio.Queue) -> None:
+        topic = self._topics.get(topic_name)
+        if topic is None:
+            return
+        with self._lock:
+            topic.subscribers.discard(queue)
+            if topic.subscribers:
+                return
+            self._topics.pop(topic_name, None)
+        if topic.task is not None:
+            topic.task.cancel()
+
+    def publish(self, topic_name: str, event: str, payload: dict[str, Any], *, retain: bool = False) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(topic_name, event, payload, retain)
+        else:
+            loop.call_soon_threadsafe(self._deliver, topic_name, event, payload, retain)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            topics = list(self._topics.values())
+            return {
+                "topics": len(topics),
+                "subscribers": sum(len(topic.subscribers) for topic in topics),
+                "published": sum(topic.published for topic in topics),
+                "dropped": sum(topic.dropped for topic in topics),
+            }
+
+    def _deliver(self, topic_name: str, event: str, payload: dict[str, Any], retain: bool) -> None:
+        topic = self._topics.get(topic_name)
+        if topic is None:
+            return
+        topic.published += 1
+        if retain:
+            topic.retained[event] = payload
+        for queue in topic.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                topic.dropped += 1
+            queue.put_nowait((event, payload))
+
+    async def _run_source(self, topic_name: str, open_source: Callable[[], PollingSource]) -> None:
+        source: PollingSource | None = None
+        while True:
+            try:
+                if source is None:
+                    opened = await self._call(open_source)
+                    events = await self._call(opened.initial)
+                    source = opened
+                else:
+                    await asyncio.sleep(source.interval_s)
+                    events = await self._call(source.poll)
+            except asyncio.CancelledError:
+                raise
+            except ExecutorSaturatedError:
+                await asyncio.sleep(source.interval_s if source else 1.0)
+                continue
+            except Exception as exc:  # noqa: BLE001
+                log_event({"level": "WARNING", "event": "ui_event_hub_source_failed", "topic": topic_name, "message": str(exc)})
+                await asyncio.sleep(source.interval_s if source else 1.0)
+                continue
+            for event, payload in events:
+                self._deliver(topic_name, event, payload, event in source.retained_events)
+
+    async def _call(self, fn: Callable[[], Any]) -> Any:
+        if self._executor is None:
+            return fn()
+        return await asyncio.wrap_future(self._executor.submit(fn))
+
+
+class _BridgedConnection:
+    """Socket stand-in that lets a blocking ``BaseHTTPRequestHandler`` run on a worker.
+
+    The already-read request bytes are served from memory; writes are queued onto
+    the event loop in order, and the worker only waits for a drain once more than
+    ``_WRITE_HIGH_WATER`` bytes are in flight.
+    """
+
+    def __init__(self, request_bytes: bytes, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter, *, write_timeout_s: float) -> None:
+        self._request_bytes = request_bytes
+        self._loop = loop
+        self._writer = writer
+        self._write_timeout_s = write_timeout_s
+        self._unflushed = 0
+        self._broken = threading.Event()
+
+    def makefile(self, mode: str, buffering: int = -1) -> io.BufferedIOBase:
+        _ = buffering
+        if "r" in mode:
+            return io.BytesIO(self._request_bytes)
+        raise io.UnsupportedOperation("bridged connection only supports unbuffered writes")
+
+    def sendall(self, data: bytes) -> None:
+        if self._broken.is_set():
+            raise BrokenPipeError("client disconnected")
+        chunk = bytes(data)
+        self._loop.call_soon_threadsafe(self._write, chunk)
+        self._unflushed += len(chunk)
+        if self._unflushed >= _WRITE_HIGH_WATER:
+            self.drain()
+
+    def drain(self) -> None:
+        self._unflushed = 0
+        future = asyncio.run_coroutine_threadsafe(self._drain(), self._loop)
+        try:
+            future.result(timeout=self._write_timeout_s)
+        except TimeoutError as exc:
+            future.cancel()
+            self._broken.set()
+            raise BrokenPipeError("client stopped reading") from exc
+        if self._broken.is_set():
+            raise BrokenPipeError("client disconnected")
+
+    def settimeout(self, timeout: float | None) -> None:
+        _ = timeout
+
+    def setsockopt(self, *args: Any) -> None:
+        _ = args
+
+    def _write(self, chunk: bytes) -> None:
+        if self._broken.is_set():
+            return
+        if self._writer.is_closing():
+            self._broken.set()
+            return
+        self._writer.write(chunk)
+
+    async def _drain(self) -> None:
+        if self._writer.is_closing():
+            self._broken.set()
+            return
+        try:
+            await self._writer.drain()
+        except _CLIENT_DISCONNECT_ERRORS:
+            self._broken.set()
+
+
+@dataclass(frozen=True)
+class _RequestHead:
+    method: str
+    target: str
+    headers: dict[str, str]
+
+
+def _parse_request_head(raw: bytes) -> _RequestHead | None:
+    try:
+        text = raw.decode("iso-8859-1")
+    except UnicodeDecodeError:
+        return None
+    lines = text.split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3:
+        return None
+    headers: dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return _RequestHead(method=parts[0].upper(), target=parts[1], headers=headers)
+
+
+class AsyncUIServer:
+    """HTTP/1.x front end on ``asyncio.start_server``.
+
+    Accepting connections and reading request heads happens on the event loop,
+    so idle or slow clients cost no thread. Requests whose route resolves to a
+    :class:`HubStream` are served entirely on the loop from the shared
+    :class:`EventHub`; everything else runs the existing blocking handler class
+    on the bounded executor, and a saturated executor answers ``503`` at once.
+    Responses are one per connection, matching the HTTP/1.0 handler.
+    """
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        handler_factory: Callable[..., Any],
+        *,
+        executor: BoundedExecutor,
+        hub: EventHub,
+        stream_resolver: Callable[[str, str], HubStream | None] | None = None,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        header_timeout_s: float = 30.0,
+        write_timeout_s: float = 60.0,
+    ) -> None:
+        self.server_address = server_address
+        self.handler_factory = handler_factory
+        self.executor = executor
+        self.hub = hub
+        self.stream_resolver = stream_resolver
+        self.max_body_bytes = max_body_bytes
+        self.header_timeout_s = header_timeout_s
+        self.write_timeout_s = write_timeout_s
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.base_events.Server | None = None
+        self._stopped: asyncio.Event | None = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._open_connections = 0
+        self._hub_streams = 0
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    def wait_started(self, timeout: float | None = None) -> bool:
+        return self._started.wait(timeout)
+
+    def shutdown(self) -> None:
+        loop, stopped = self._loop, self._stopped
+        if loop is not None and stopped is not None:
+            loop.call_soon_threadsafe(stopped.set)
+
+    def server_close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            connections = {"open_connections": self._open_connections, "hub_streams": self._hub_streams}
+        return {**connections, "executor": self.executor.stats(), "event_hub": self.hub.stats()}
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.hub.bind(self._loop, self.executor)
+        host, port = self.server_address
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=_MAX_HEADER_BYTES)
+        sockname = self._server.sockets[0].getsockname()
+        self.server_address = (sockname[0], sockname[1])
+        self._started.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        with self._lock:
+            self._open_connections += 1
+        try:
+            await self._serve_request(reader, writer)
+        except _CLIENT_DISCONNECT_ERRORS:
+            pass
+        finally:
+            with self._lock:
+                self._open_connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except _CLIENT_DISCONNECT_ERRORS:
+                pass
+
+    async def _serve_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            raw_head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=self.header_timeout_s)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            return
+        head = _parse_request_head(raw_head)
+        if head is None:
+            await self._send_simple(writer, 400, {"message": "無效的 HTTP 請求"})
+            return
+        if self.stream_resolver is not None:
+            stream = self.stream_resolver(head.method, head.target)
+            if stream is not None:
+                await self._serve_hub_stream(reader, writer, stream)
+                return
+        if "transfer-encoding" in head.headers:
+            await self._send_simple(writer, 411, {"message": "請提供 Content-Length"})
+            return
+        try:
+            content_length = int(head.headers.get("content-length", "0") or 0)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            await self._send_simple(writer, 400, {"message": "Content-Length 無效"})
+            return
+        if content_length > self.max_body_bytes:
+            await self._send_simple(writer, 413, {"message": "Payload 過大"})
+            return
+        body = await reader.readexactly(content_length) if content_length else b""
+        connection = _BridgedConnection(raw_head + body, asyncio.get_running_loop(), writer, write_timeout_s=self.write_timeout_s)
+        peer = writer.get_extra_info("peername") or ("unknown", 0)
+        try:
+            future = self.executor.submit(self._run_handler, connection, peer[:2])
+        except ExecutorSaturatedError:
+            await self._send_simple(writer, 503, {"message": "伺服器忙碌中，請稍後再試"}, retry_after=1)
+            return
+        await asyncio.wrap_future(future)
+        await writer.drain()
+
+    def _run_handler(self, connection: _BridgedConnection, client_address: tuple[str, int]) -> None:
+        try:
+            self.handler_factory(connection, client_address, self)
+            connection.drain()
+        except _CLIENT_DISCONNECT_ERRORS:
+            log_event({"level": "INFO", "event": "ui_client_disconnected", "client": client_address[0]})
+        except Exception as exc:  # noqa: BLE001
+            log_event({"level": "ERROR", "event": "ui_async_handler_failed", "message": str(exc), "client": client_address[0]})
+
+    async def _serve_hub_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, stream: HubStream) -> None:
+        writer.write(
+            b"HTTP/1.0 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        await writer.drain()
+        queue = self.hub.subscribe(stream)
+        # A client hang-up shows up as EOF on the read side.
+        disconnected = asyncio.ensure_future(reader.read())
+        with self._lock:
+            self._hub_streams += 1
+        try:
+            while True:
+                next_event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    next_event.cancel()
+                    return
+                event, payload = next_event.result()
+                writer.write(f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await asyncio.wait_for(writer.drain(), timeout=self.write_timeout_s)
+        except asyncio.TimeoutError:
+            return
+        finally:
+            with self._lock:
+                self._hub_streams -= 1
+            disconnected.cancel()
+            self.hub.unsubscribe(stream.topic, queue)
+
+    async def _send_simple(self, writer: asyncio.StreamWriter, status: int, payload: dict[str, Any], *, retry_after: int | None = None) -> None:
+        reasons = {400: "Bad Request", 411: "Length Required", 413: "Payload Too Large", 503: "Service Unavailable"}
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [
+            f"HTTP/1.0 {status} {reasons.get(status, 'Error')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if retry_after is not None:
+            head.append(f"Retry-After: {retry_after}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("utf-8") + body)
+        await writer.drain()
+
@@ -5,30 +5,35 @@ from __future__ import annotations
 import functools
 import json
 import mimetypes
+import os
 import re
 import sys
 import threading
 import time
 import traceback
 import uuid
-from collections import deque
+from collections import OrderedDict, deque
 from datetime import date, datetime, timezone
 
 import yaml
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import parse_qs, quote, unquote, urlparse
 
 from amon.chat.cli import _build_plan_from_message
 from amon.chat.continuation import assemble_chat_turn, is_short_continuation_message
+from amon.chat.decision_cache import get_decision_cache
 from amon.chat.project_bootstrap import (
     bootstrap_project_if_needed,
     resolve_project_id_from_message,
 )
 from amon.chat.router import route_intent
 from amon.chat.execution_mode import decide_execution_mode
+from amon.chat.message_cache import ThreadMessageCache
+from amon.chat.preroute import match_fast_path, preroute_turn
 from amon.chat.router_llm import should_continue_run_with_llm
+from amon.chat.stream_batching import TokenCoalescer
 from amon.chat.router_types import RouterResult
 from amon.chat.thread_store import (
     append_event,
@@ -53,6 +58,8 @@ from .core import AmonCore, ProjectRecord
 from .logging import log_event
 from .models import decode_reasoning_chunk, decode_stream_event
 from .skills import build_skill_injection_preview
+from .ui_async import AsyncUIServer, BoundedExecutor, EventHub, HubStream, env_int
+from .ui_tasks import DEFAULT_LANES, TaskRejectedError, TaskScheduler, lane_config_from_env
 from .token_counter import TokenCountResult, count_non_dialogue_tokens, estimate_dialogue_tokens, extract_dialogue_input_tokens
 
 
@@ -93,10 +100,66 @@ def _consume_thread_stream_token(token: str) -> dict[str, Any] | None:
 
 
 class _TaskManager:
-    def __init__(self) -> None:
+    """Track UI background tasks and run them on the lanes of a ``TaskScheduler``.
+
+    Finished statuses stay queryable for ``status_ttl_s`` seconds and at most
+    ``max_finished`` of them are kept, oldest dropped first.
+    """
+
+    def __init__(
+        self,
+        *,
+        scheduler: TaskScheduler | None = None,
+        status_ttl_s: float | None = None,
+        max_finished: int | None = None,
+        time_func: Callable[[], float] | None = None,
+    ) -> None:
         self._lock = threading.Lock()
         self._tasks: dict[str, dict[str, Any]] = {}
         self._run_cancel: dict[str, threading.Event] = {}
+        self._finished_at: OrderedDict[str, float] = OrderedDict()
+        self._scheduler = scheduler or TaskScheduler(tuple(lane_config_from_env(config) for config in DEFAULT_LANES))
+        self._status_ttl_s = status_ttl_s if status_ttl_s is not None else env_int("AMON_UI_TASK_STATUS_TTL_S", 3600)
+        self._max_finished = max_finished if max_finished is not None else env_int("AMON_UI_TASK_MAX_FINISHED", 1000)
+        self._time = time_func or time.time
+
+    def _dispatch(self, request_id: str, run: Callable[[], None], *, lane: str, run_id: str | None = None) -> None:
+        def _tracked() -> None:
+            try:
+                run()
+            finally:
+                with self._lock:
+                    if run_id:
+                        self._run_cancel.pop(run_id, None)
+                    self._finished_at[request_id] = self._time()
+                    self._finished_at.move_to_end(request_id)
+                    self._purge_finished_locked()
+
+        with self._lock:
+            self._purge_finished_locked()
+            if request_id in self._tasks:
+                self._tasks[request_id]["lane"] = lane
+        try:
+            self._scheduler.submit(lane, _tracked)
+        except TaskRejectedError:
+            with self._lock:
+                self._tasks.pop(request_id, None)
+                if run_id:
+                    self._run_cancel.pop(run_id, None)
+            raise
+
+    def _purge_finished_locked(self) -> None:
+        cutoff = self._time() - self._status_ttl_s
+        while self._finished_at:
+            request_id, finished_at = next(iter(self._finished_at.items()))
+            if finished_at > cutoff and len(self._finished_at) <= self._max_finished:
+                break
+            self._finished_at.popitem(last=False)
+            self._tasks.pop(request_id, None)
+
+    def run_interactive(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run an interactive request (chat turn) on the chat lane and wait for it."""
+        return self._scheduler.run("chat", fn, *args)
 
     def submit_run(
         self,
@@ -140,7 +203,7 @@ class _TaskManager:
                     self._tasks[request_id]["status"] = "failed"
                     self._tasks[request_id]["error"] = str(exc)
 
-        threading.Thread(target=_run, daemon=True).start()
+        self._dispatch(request_id, _run, lane="run", run_id=run_id)
         return request_id
 
     def submit_tool(
@@ -173,7 +236,7 @@ class _TaskManager:
                     self._tasks[request_id]["status"] = "failed"
                     self._tasks[request_id]["error"] = str(exc)
 
-        threading.Thread(target=_run, daemon=True).start()
+        self._dispatch(request_id, _run, lane="tool")
         return request_id
 
     def submit_job(
@@ -204,7 +267,7 @@ class _TaskManager:
                     self._tasks[request_id]["status"] = "failed"
                     self._tasks[request_id]["error"] = str(exc)
 
-        threading.Thread(target=_run, daemon=True).start()
+        self._dispatch(request_id, _run, lane="run")
         return request_id
 
     def submit_schedule_tick(self, *, request_id: str | None, core: AmonCore) -> str:
@@ -230,11 +293,12 @@ class _TaskManager:
                     self._tasks[request_id]["status"] = "failed"
                     self._tasks[request_id]["error"] = str(exc)
 
-        threading.Thread(target=_run, daemon=True).start()
+        self._dispatch(request_id, _run, lane="schedule")
         return request_id
 
     def get_status(self, request_id: str) -> dict[str, Any] | None:
         with self._lock:
+            self._purge_finished_locked()
             status = self._tasks.get(request_id)
             return dict(status) if status else None
 
@@ -244,6 +308,18 @@ class _TaskManager:
         if cancel_event:
             cancel_event.set()
 
+    def stats(self) -> dict[str, Any]:
+        lanes = self._scheduler.stats()
+        with self._lock:
+            tracked = len(self._tasks)
+        return {
+            "queued": sum(lane["queued"] for lane in lanes.values()),
+            "active": sum(lane["active"] for lane in lanes.values()),
+            "rejected": sum(lane["rejected"] for lane in lanes.values()),
+            "tracked_statuses": tracked,
+            "lanes": lanes,
+        }
+
 
 _TASK_MANAGER = _TaskManager()
 
@@ -292,14 +368,28 @@ class _HealthMetrics:
 
 
 _HEALTH_METRICS = _HealthMetrics()
+_THREAD_MESSAGE_CACHE = ThreadMessageCache()
+_EVENT_HUB = EventHub()
+# Set by serve_ui when the asyncio front end is in use.
+_ASYNC_UI_SERVER: AsyncUIServer | None = None
+
+
+def _task_queue_summary() -> dict[str, Any]:
+    stats = _TASK_MANAGER.stats()
+    stats["lanes"] = {
+        name: {key: lane[key] for key in ("priority", "workers", "queue_capacity", "queued", "active", "rejected")}
+        for name, lane in stats["lanes"].items()
+    }
+    return stats
 
 
 def _build_health_payload() -> dict[str, Any]:
     metrics = _HEALTH_METRICS.summary()
-    return {
+    payload: dict[str, Any] = {
         "status": "ok",
         "service": "amon-ui-server",
         "queue_depth": get_queue_depth(),
+        "task_queue": _task_queue_summary(),
         "recent_error_rate": metrics,
         "observability": {
             "schema_version": "v0.1",
@@ -309,6 +399,9 @@ def _build_health_payload() -> dict[str, Any]:
             },
         },
     }
+    if _ASYNC_UI_SERVER is not None:
+        payload["ui_server"] = _ASYNC_UI_SERVER.stats()
+    return payload
 
 
 def _build_metrics_text() -> str:
@@ -327,8 +420,69 @@ def _build_metrics_text() -> str:
         "# HELP amon_ui_error_rate Recent HTTP error rate in the rolling window.",
         "# TYPE amon_ui_error_rate gauge",
         f"amon_ui_error_rate {summary['error_rate']}",
-        "",
     ]
+    lanes = _TASK_MANAGER.stats()["lanes"]
+    for name, kind, help_text, key in (
+        ("amon_ui_task_queue_depth", "gauge", "Tasks waiting for a worker, per lane.", "queued"),
+        ("amon_ui_task_active", "gauge", "Tasks currently running, per lane.", "active"),
+        ("amon_ui_task_completed_total", "counter", "Tasks finished, per lane.", "completed"),
+        ("amon_ui_task_rejected_total", "counter", "Tasks refused by admission control (HTTP 429), per lane.", "rejected"),
+    ):
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        lines.extend(f'{name}{{lane="{lane}"}} {stats[key]}' for lane, stats in lanes.items())
+    for name, help_text, key in (
+        ("amon_ui_task_queue_wait_seconds", "Time tasks spent queued before a worker picked them up.", "queue_wait_seconds"),
+        ("amon_ui_task_run_seconds", "Time tasks spent running on a worker.", "run_seconds"),
+    ):
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} histogram"])
+        for lane, stats in lanes.items():
+            histogram = stats[key]
+            for upper, count in histogram["buckets"]:
+                lines.append(f'{name}_bucket{{lane="{lane}",le="{upper:g}"}} {count}')
+            lines.append(f'{name}_bucket{{lane="{lane}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{lane="{lane}"}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{lane="{lane}"}} {histogram["count"]}')
+    if _ASYNC_UI_SERVER is not None:
+        server_stats = _ASYNC_UI_SERVER.stats()
+        lines.extend(
+            [
+                "# HELP amon_ui_executor_queue_depth HTTP requests waiting for a handler worker.",
+                "# TYPE amon_ui_executor_queue_depth gauge",
+                f"amon_ui_executor_queue_depth {server_stats['executor']['queued']}",
+                "# HELP amon_ui_executor_active HTTP requests currently held by a handler worker.",
+                "# TYPE amon_ui_executor_active gauge",
+                f"amon_ui_executor_active {server_stats['executor']['active']}",
+                "# HELP amon_ui_executor_rejected_total HTTP requests answered 503 because every worker was busy.",
+                "# TYPE amon_ui_executor_rejected_total counter",
+                f"amon_ui_executor_rejected_total {server_stats['executor']['rejected']}",
+                "# HELP amon_ui_open_connections Client connections currently open.",
+                "# TYPE amon_ui_open_connections gauge",
+                f"amon_ui_open_connections {server_stats['open_connections']}",
+                "# HELP amon_ui_sse_subscribers SSE clients served from the event hub.",
+                "# TYPE amon_ui_sse_subscribers gauge",
+                f"amon_ui_sse_subscribers {server_stats['event_hub']['subscribers']}",
+            ]
+        )
+    decision_cache = get_decision_cache().stats()
+    lines.extend(
+        [
+            "# HELP amon_router_cache_hits_total Classifier decisions served from the decision cache.",
+            "# TYPE amon_router_cache_hits_total counter",
+            "# HELP amon_router_cache_misses_total Classifier decisions that required a model call.",
+            "# TYPE amon_router_cache_misses_total counter",
+        ]
+    )
+    for kind, counters in decision_cache["by_kind"].items():
+        lines.append(f'amon_router_cache_hits_total{{kind="{kind}"}} {counters["hits"]}')
+        lines.append(f'amon_router_cache_misses_total{{kind="{kind}"}} {counters["misses"]}')
+    lines.extend(
+        [
+            "# HELP amon_router_cache_entries Decisions currently held by the decision cache.",
+            "# TYPE amon_router_cache_entries gauge",
+            f"amon_router_cache_entries {decision_cache['entries']}",
+            "",
+        ]
+    )
     return "\n".join(lines)
 
 
@@ -463,6 +617,13 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
         self.core = core
         super().__init__(*args, **kwargs)
 
+    @classmethod
+    def detached(cls, core: AmonCore) -> "AmonUIHandler":
+        """Return a handler bound to no connection, for reusing its read-only helpers."""
+        handler = cls.__new__(cls)
+        handler.core = core
+        return handler
+
     def handle(self) -> None:
         try:
             super().handle()
@@ -766,7 +927,10 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             self._send_json(200, {"request": status})
             return
         if parsed.path == "/v1/threads/stream":
-            self._handle_chat_stream(parsed)
+            try:
+                _TASK_MANAGER.run_interactive(self._handle_chat_stream, parsed)
+            except TaskRejectedError as exc:
+                self._send_task_rejected(exc)
             return
         if parsed.path == "/v1/billing/summary":
             params = parse_qs(parsed.query)
@@ -1285,14 +1449,18 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                 self._handle_error(exc, status=404)
                 return
             run_id = payload.get("run_id") or uuid.uuid4().hex
-            request_id = _TASK_MANAGER.submit_run(
-                request_id=None,
-                core=self.core,
-                project_path=project_path,
-                graph_path=graph_path,
-                variables=variables,
-                run_id=run_id,
-            )
+            try:
+                request_id = _TASK_MANAGER.submit_run(
+                    request_id=None,
+                    core=self.core,
+                    project_path=project_path,
+                    graph_path=graph_path,
+                    variables=variables,
+                    run_id=run_id,
+                )
+            except TaskRejectedError as exc:
+                self._send_task_rejected(exc)
+                return
             self._send_json(202, {"request_id": request_id, "run_id": run_id})
             return
         if parsed.path == "/v1/runs/cancel":
@@ -1328,13 +1496,17 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             if not isinstance(args, dict):
                 self._send_json(400, {"message": "args 需為物件"})
                 return
-            request_id = _TASK_MANAGER.submit_tool(
-                request_id=None,
-                core=self.core,
-                tool_name=tool_name,
-                args=args,
-                project_id=project_id,
-            )
+            try:
+                request_id = _TASK_MANAGER.submit_tool(
+                    request_id=None,
+                    core=self.core,
+                    tool_name=tool_name,
+                    args=args,
+                    project_id=project_id,
+                )
+            except TaskRejectedError as exc:
+                self._send_task_rejected(exc)
+                return
             self._send_json(202, {"request_id": request_id})
             return
         if parsed.path == "/v1/jobs/start":
@@ -1345,7 +1517,11 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             if not job_id:
                 self._send_json(400, {"message": "請提供 job_id"})
                 return
-            request_id = _TASK_MANAGER.submit_job(request_id=None, core=self.core, job_id=job_id)
+            try:
+                request_id = _TASK_MANAGER.submit_job(request_id=None, core=self.core, job_id=job_id)
+            except TaskRejectedError as exc:
+                self._send_task_rejected(exc)
+                return
             self._send_json(202, {"request_id": request_id, "job_id": job_id})
             return
         if parsed.path == "/v1/hooks/dispatch":
@@ -1363,7 +1539,11 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             self._send_json(202, {"event_id": event_id})
             return
         if parsed.path == "/v1/schedules/tick":
-            request_id = _TASK_MANAGER.submit_schedule_tick(request_id=None, core=self.core)
+            try:
+                request_id = _TASK_MANAGER.submit_schedule_tick(request_id=None, core=self.core)
+            except TaskRejectedError as exc:
+                self._send_task_rejected(exc)
+                return
             self._send_json(202, {"request_id": request_id})
             return
         if parsed.path == "/v1/threads/stream/init":
@@ -1898,6 +2078,16 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
         )
         self._send_json(status, {"message": str(exc)})
 
+    def _send_task_rejected(self, exc: TaskRejectedError) -> None:
+        _HEALTH_METRICS.record_error()
+        body = json.dumps({"message": "任務佇列已滿，請稍後再試", "lane": exc.lane, "reason": exc.reason}, ensure_ascii=False).encode("utf-8")
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
     def _handle_chat_stream(self, parsed) -> None:
         params = parse_qs(parsed.query)
         project_id = params.get("project_id", [""])[0].strip() or None
@@ -1933,7 +2123,14 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             except ValueError:
                 event_seq = 0
 
+        # Token batches may be flushed from the coalescer timer thread.
+        send_lock = threading.Lock()
+
         def send_event(event: str, data: dict[str, Any] | str, *, run_id: str | None = None, thread_id_override: str | None = None) -> None:
+            with send_lock:
+                _send_event_locked(event, data, run_id=run_id, thread_id_override=thread_id_override)
+
+        def _send_event_locked(event: str, data: dict[str, Any] | str, *, run_id: str | None, thread_id_override: str | None) -> None:
             nonlocal event_seq
             event_seq += 1
             payload_obj = {"text": data} if isinstance(data, str) else dict(data)
@@ -1970,18 +2167,26 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             if project_id is None and not thread_id:
                 send_event("notice", {"text": "Amon：已收到你的需求，正在判斷意圖與專案。"})
                 sent_initial_notice = True
+            stage_ms: dict[str, int] = {}
             if project_id is None:
+                stage_started_at = time.monotonic()
                 inferred_project_id = resolve_project_id_from_message(self.core, message)
+                stage_ms["project_resolve_ms"] = int((time.monotonic() - stage_started_at) * 1000)
                 if inferred_project_id:
                     project_id = inferred_project_id
             created_project: ProjectRecord | None = None
+            bootstrap_router: RouterResult | None = None
             if project_id is None:
-                bootstrap_router = route_intent(
+                stage_started_at = time.monotonic()
+                fast_path = match_fast_path(message)
+                bootstrap_router = fast_path[1] if fast_path else route_intent(
                     message,
                     project_id=project_id,
                     run_id=None,
                     context=None,
                 )
+                stage_ms["bootstrap_route_ms"] = int((time.monotonic() - stage_started_at) * 1000)
+                stage_started_at = time.monotonic()
                 created_project = bootstrap_project_if_needed(
                     core=self.core,
                     project_id=project_id,
@@ -1990,6 +2195,7 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                     build_plan_from_message=_build_plan_from_message,
                     is_slash_command=message.startswith("/"),
                 )
+                stage_ms["project_bootstrap_ms"] = int((time.monotonic() - stage_started_at) * 1000)
                 if created_project:
                     project_id = created_project.project_id
                     log_event(
@@ -2021,14 +2227,39 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                     send_event("done", {"status": "project_required"})
                     return
             incoming_thread_id = thread_id
+            stage_started_at = time.monotonic()
             turn_bundle = assemble_chat_turn(project_id=project_id, thread_id=thread_id, message=message)
+            stage_ms["turn_assemble_ms"] = int((time.monotonic() - stage_started_at) * 1000)
             thread_id = turn_bundle.thread_id
-            thread_id = thread_id
             history = turn_bundle.history
             should_emit_bootstrap_notices = turn_bundle.thread_id_source == "new"
             run_context = turn_bundle.run_context
             if should_emit_bootstrap_notices and not sent_initial_notice:
                 send_event("notice", {"text": "Amon：已收到你的需求，正在判斷意圖與專案。"})
+            active_run_context_id = str(run_context.get("run_id") or "") or None
+            # A project created from this very message starts an empty thread, so
+            # the bootstrap routing already answers the question; do not ask twice.
+            reused_router = (
+                bootstrap_router
+                if created_project and should_emit_bootstrap_notices and not history and not active_run_context_id
+                else None
+            )
+            preroute = preroute_turn(
+                message,
+                route=route_intent,
+                decide_mode=decide_execution_mode,
+                project_id=project_id,
+                run_id=active_run_context_id,
+                thread_id=thread_id,
+                last_router_type=run_context.get("last_router_type"),
+                context=turn_bundle.router_context,
+                short_continuation=turn_bundle.short_continuation,
+                router_result=reused_router,
+            )
+            stage_ms.update(preroute.stage_ms)
+            router_result = preroute.router_result
+            route_intent_ms = preroute.stage_ms.get("route_intent_ms", 0)
+            execution_mode_ms = preroute.stage_ms.get("execution_mode_ms", 0)
             log_event(
                 {
                     "level": "INFO",
@@ -2038,32 +2269,15 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                     "effective_thread_id": thread_id,
                     "history_count": len(history),
                     "thread_id_source": turn_bundle.thread_id_source,
+                    "router_type": router_result.type,
+                    "fast_path": preroute.fast_path or ("bootstrap_router" if reused_router else None),
+                    "execution_mode": preroute.execution_mode,
+                    "execution_mode_source": preroute.execution_mode_source,
+                    "cancelled_stages": preroute.cancelled,
+                    "timed_out_stages": preroute.timed_out,
+                    "stage_ms": stage_ms,
                 }
             )
-            route_started_at = time.monotonic()
-            router_result = route_intent(
-                message,
-                project_id=project_id,
-                run_id=str(run_context.get("run_id") or "") or None,
-                context=turn_bundle.router_context,
-            )
-            route_intent_ms = int((time.monotonic() - route_started_at) * 1000)
-            execution_mode_ms = 0
-            if turn_bundle.short_continuation and router_result.type not in {
-                "chat_response",
-                "command_plan",
-                "graph_patch_plan",
-            }:
-                log_event(
-                    {
-                        "level": "INFO",
-                        "event": "ui_chat_force_continuation",
-                        "project_id": project_id,
-                        "thread_id": thread_id,
-                        "original_router_type": router_result.type,
-                    }
-                )
-                router_result = RouterResult(type="chat_response", confidence=1.0, reason="short_continuation")
             append_event(thread_id, {"type": "user", "text": message, "project_id": project_id})
             append_event(
                 thread_id,
@@ -2184,13 +2398,8 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
             if router_result.type == "chat_response":
                 if should_emit_bootstrap_notices:
                     send_event("notice", {"text": "Amon：正在分析需求並進入執行流程。"})
-                execution_mode = str(router_result.execution_mode or "").strip().lower()
-                execution_mode_from_router = bool(execution_mode)
-                if not execution_mode:
-                    mode_started_at = time.monotonic()
-                    execution_mode = decide_execution_mode(message, project_id=project_id, context=turn_bundle.router_context)
-                    execution_mode_ms = int((time.monotonic() - mode_started_at) * 1000)
-                else:
+                execution_mode = preroute.execution_mode or "graph"
+                if preroute.execution_mode_source == "router":
                     execution_mode_ms = route_intent_ms
                 coerced_from_single = execution_mode == "single"
                 if coerced_from_single:
@@ -2211,10 +2420,25 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                 streamed_text_buffer: list[str] = []
                 active_run_id: str | None = None
 
+                def emit_token_batch(text: str) -> None:
+                    send_event("token", {"text": text}, run_id=active_run_id)
+                    append_event(
+                        thread_id,
+                        {
+                            "type": "assistant_chunk",
+                            "text": text,
+                            "project_id": project_id,
+                            "run_id": active_run_id or None,
+                        },
+                    )
+
+                token_batcher = TokenCoalescer(emit_token_batch)
+
                 def stream_handler(token: str) -> None:
                     nonlocal streamed_token_count
                     is_runtime_event, runtime_payload = decode_stream_event(token)
                     if is_runtime_event:
+                        token_batcher.flush()
                         event_name = str(runtime_payload.get("event") or "").strip() or "notice"
                         runtime_payload.setdefault("project_id", project_id)
                         runtime_payload.setdefault("thread_id", thread_id)
@@ -2259,6 +2483,7 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                     if is_reasoning:
                         if not isinstance(reasoning_text, str) or reasoning_text == "":
                             return
+                        token_batcher.flush()
                         send_event("reasoning", {"text": reasoning_text}, run_id=active_run_id)
                         append_event(
                             thread_id,
@@ -2274,20 +2499,12 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                         return
                     streamed_token_count += 1
                     streamed_text_buffer.append(token)
-                    send_event("token", {"text": token}, run_id=active_run_id)
-                    append_event(
-                        thread_id,
-                        {
-                            "type": "assistant_chunk",
-                            "text": token,
-                            "project_id": project_id,
-                            "run_id": active_run_id or None,
-                        },
-                        )
+                    token_batcher.push(token)
 
                 def todo_handler(markdown: str) -> None:
                     if not isinstance(markdown, str) or not markdown.strip():
                         return
+                    token_batcher.flush()
                     send_event(
                         "todo",
                         {
@@ -2300,57 +2517,62 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
 
                 response_text = ""
                 plan_result = None
-                if execution_mode == "self_critique":
-                    active_run_id = uuid.uuid4().hex
-                    send_event("notice", {"text": "Amon：偵測為專業文件撰寫，改用 self_critique 流程。"}, run_id=active_run_id)
-                    response_text = self.core.run_self_critique(
-                        prompt_with_history,
-                        project_path=self.core.get_project_path(project_id),
-                        stream_handler=stream_handler,
-                        run_id=active_run_id,
-                        thread_id=thread_id,
-                        request_id=request_id,
-                    )
-                elif execution_mode == "team":
-                    active_run_id = uuid.uuid4().hex
-                    send_event("notice", {"text": "Amon：這題我會改用 team 流程分工處理，完成後用自然語氣一次整理回覆給你。"}, run_id=active_run_id)
-                    response_text = self.core.run_team(
-                        prompt_with_history,
-                        project_path=self.core.get_project_path(project_id),
-                        stream_handler=stream_handler,
-                        run_id=active_run_id,
-                        thread_id=thread_id,
-                        request_id=request_id,
-                    )
-                else:
-                    active_run_id = uuid.uuid4().hex
-                    if should_emit_bootstrap_notices:
-                        send_event("notice", {"text": "Amon：已路由到 graph，將先產生 TaskGraph v3 並執行。"}, run_id=active_run_id)
-                    plan_result, response_text = self.core.run_graph_stream(
-                        prompt_with_history,
-                        project_path=self.core.get_project_path(project_id),
-                        project_id=project_id,
-                        stream_handler=stream_handler,
-                        todo_handler=todo_handler,
-                        run_id=active_run_id,
-                        thread_id=thread_id,
-                        conversation_history=history,
-                        request_id=request_id,
-                    )
-                    active_run_id = plan_result.run_id
-                    if getattr(plan_result, "execution_route", "") == "single_fallback":
-                        fallback_reason = str(getattr(plan_result, "fallback_reason", "planner disabled -> fallback single"))
-                        fallback_hint = str(getattr(plan_result, "fallback_hint", "請將 amon.planner.enabled 設為 true（可在設定頁切換）"))
-                        send_event(
-                            "warning",
-                            {
-                                "kind": "planner_disabled_fallback",
-                                "message": f"Amon：{fallback_reason}。{fallback_hint}",
-                                "project_id": project_id,
-                                "thread_id": thread_id,
-                            },
+                try:
+                    if execution_mode == "self_critique":
+                        active_run_id = uuid.uuid4().hex
+                        send_event("notice", {"text": "Amon：偵測為專業文件撰寫，改用 self_critique 流程。"}, run_id=active_run_id)
+                        response_text = self.core.run_self_critique(
+                            prompt_with_history,
+                            project_path=self.core.get_project_path(project_id),
+                            stream_handler=stream_handler,
                             run_id=active_run_id,
+                            thread_id=thread_id,
+                            request_id=request_id,
                         )
+                    elif execution_mode == "team":
+                        active_run_id = uuid.uuid4().hex
+                        send_event("notice", {"text": "Amon：這題我會改用 team 流程分工處理，完成後用自然語氣一次整理回覆給你。"}, run_id=active_run_id)
+                        response_text = self.core.run_team(
+                            prompt_with_history,
+                            project_path=self.core.get_project_path(project_id),
+                            stream_handler=stream_handler,
+                            run_id=active_run_id,
+                            thread_id=thread_id,
+                            request_id=request_id,
+                        )
+                    else:
+                        active_run_id = uuid.uuid4().hex
+                        if should_emit_bootstrap_notices:
+                            send_event("notice", {"text": "Amon：已路由到 graph，將先產生 TaskGraph v3 並執行。"}, run_id=active_run_id)
+                        plan_result, response_text = self.core.run_graph_stream(
+                            prompt_with_history,
+                            project_path=self.core.get_project_path(project_id),
+                            project_id=project_id,
+                            stream_handler=stream_handler,
+                            todo_handler=todo_handler,
+                            run_id=active_run_id,
+                            thread_id=thread_id,
+                            conversation_history=history,
+                            request_id=request_id,
+                        )
+                        # Pending tokens belong to the run id the stream started with.
+                        token_batcher.close()
+                        active_run_id = plan_result.run_id
+                        if getattr(plan_result, "execution_route", "") == "single_fallback":
+                            fallback_reason = str(getattr(plan_result, "fallback_reason", "planner disabled -> fallback single"))
+                            fallback_hint = str(getattr(plan_result, "fallback_hint", "請將 amon.planner.enabled 設為 true（可在設定頁切換）"))
+                            send_event(
+                                "warning",
+                                {
+                                    "kind": "planner_disabled_fallback",
+                                    "message": f"Amon：{fallback_reason}。{fallback_hint}",
+                                    "project_id": project_id,
+                                    "thread_id": thread_id,
+                                },
+                                run_id=active_run_id,
+                            )
+                finally:
+                    token_batcher.close()
 
                 streamed_response_text = "".join(streamed_text_buffer)
                 normalized_response_text = response_text if isinstance(response_text, str) else ""
@@ -2406,9 +2628,11 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                         merged_phase_metrics = dict(phase_metrics)
                         merged_phase_metrics["route_intent_ms"] = route_intent_ms
                         merged_phase_metrics["execution_mode_ms"] = execution_mode_ms
-                        merged_phase_metrics["total_ms"] = int(phase_metrics.get("total_ms", 0) or 0) + route_intent_ms
-                        if not execution_mode_from_router:
-                            merged_phase_metrics["total_ms"] += execution_mode_ms
+                        # Router and mode classifier overlap, so charge their wall time once.
+                        merged_phase_metrics["preroute_ms"] = preroute.stage_ms.get("preroute_ms", 0)
+                        merged_phase_metrics["total_ms"] = (
+                            int(phase_metrics.get("total_ms", 0) or 0) + merged_phase_metrics["preroute_ms"]
+                        )
                         done_payload["phase_metrics"] = merged_phase_metrics
                     if route == "single_fallback":
                         done_payload["fallback_reason"] = str(getattr(plan_result, "fallback_reason", "planner disabled -> fallback single"))
@@ -2424,6 +2648,19 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
                         done_payload["artifacts"] = []
                 if streamed_token_count == 0 and normalized_response_text:
                     done_payload["final_text"] = normalized_response_text
+                token_batching = token_batcher.stats()
+                if token_batching["batches"]:
+                    done_payload["token_batching"] = token_batching
+                    log_event(
+                        {
+                            "level": "INFO",
+                            "event": "ui_chat_stream_token_batches",
+                            "project_id": normalize_project_id(project_id),
+                            "thread_id": thread_id or None,
+                            "run_id": active_run_id or None,
+                            **token_batching,
+                        }
+                    )
                 if isinstance(artifact_ingest_summary, dict):
                     done_payload["stream_ingest"] = {
                         "total": int(artifact_ingest_summary.get("total", 0)),
@@ -2565,77 +2802,14 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
         return project_path / ".amon" / "context" / "chat_messages" / f"{safe_thread_id}.json"
 
     def _read_thread_session_messages(self, project_path: Path, session_path: Path) -> list[dict[str, Any]]:
-        try:
-            session_stat = session_path.stat()
-        except OSError:
-            return []
         session_id = session_path.parent.name if session_path.name == "events.jsonl" else session_path.stem
         cache_path = self._chat_messages_cache_path(project_path, session_id)
         try:
-            if cache_path.exists():
-                cached = json.loads(cache_path.read_text(encoding="utf-8"))
-                if isinstance(cached, dict):
-                    cache_mtime_ns = int(cached.get("source_mtime_ns") or 0)
-                    cache_size = int(cached.get("source_size") or -1)
-                    cache_messages = cached.get("messages")
-                    if (
-                        cache_mtime_ns == int(session_stat.st_mtime_ns)
-                        and cache_size == int(session_stat.st_size)
-                        and isinstance(cache_messages, list)
-                    ):
-                        return [item for item in cache_messages if isinstance(item, dict)]
-        except (OSError, ValueError, json.JSONDecodeError) as exc:
-            self.logger.warning("讀取 chat messages cache 失敗：%s", exc)
-
-        parsed_messages: list[dict[str, Any]] = []
-        try:
-            for raw_line in session_path.read_text(encoding="utf-8").splitlines():
-                line = raw_line.strip()
-                if not line:
-                    continue
-                try:
-                    payload = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                event_type = str(payload.get("type") or "").strip()
-                text = payload.get("text")
-                if not isinstance(text, str) or not text.strip():
-                    continue
-                if event_type == "assistant_reasoning":
-                    parsed_messages.append(
-                        {
-                            "role": "status",
-                            "kind": "assistant_reasoning",
-                            "text": text.strip(),
-                            "ts": str(payload.get("ts") or "").strip(),
-                        }
-                    )
-                    continue
-                if event_type not in {"user", "assistant"}:
-                    continue
-                parsed_messages.append(
-                    {
-                        "role": "user" if event_type == "user" else "assistant",
-                        "text": text.strip(),
-                        "ts": str(payload.get("ts") or "").strip(),
-                    }
-                )
+            return _THREAD_MESSAGE_CACHE.read(session_path, cache_path)
         except OSError as exc:
             self.logger.warning("讀取 thread 失敗：%s", exc)
             return []
 
-        cache_payload = {
-            "source_mtime_ns": int(session_stat.st_mtime_ns),
-            "source_size": int(session_stat.st_size),
-            "messages": parsed_messages,
-        }
-        try:
-            cache_path.parent.mkdir(parents=True, exist_ok=True)
-            cache_path.write_text(json.dumps(cache_payload, ensure_ascii=False), encoding="utf-8")
-        except OSError as exc:
-            self.logger.warning("寫入 chat messages cache 失敗：%s", exc)
-        return parsed_messages
-
     def _build_project_context(self, project_id: str, thread_id: str | None = None) -> dict[str, Any]:
         project_path = self.core.get_project_path(project_id)
         selected_thread_id = self._resolve_thread_id(project_id, thread_id)
@@ -3397,49 +3571,19 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
         self.send_header("Connection", "keep-alive")
         self.end_headers()
 
-        project_path = self.core.get_project_path(project_id) if project_id else None
-        billing_log = project_path / ".amon" / "billing" / "usage.jsonl" if project_path else self.core.data_dir / "logs" / "billing.log"
-        amon_log = self.core.data_dir / "logs" / "amon.log"
-
         def emit(event_type: str, payload: dict[str, Any]) -> None:
             body = f"event: {event_type}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
             self.wfile.write(body.encode("utf-8"))
             self.wfile.flush()
 
         try:
-            last_billing_mtime = billing_log.stat().st_mtime if billing_log.exists() else 0.0
-            last_amon_mtime = amon_log.stat().st_mtime if amon_log.exists() else 0.0
-            known_budget_count = len(
-                [
-                    item
-                    for item in self._read_jsonl_records(amon_log)
-                    if str(item.get("event") or "") == "budget_exceeded"
-                    and (not project_id or str(item.get("project_id") or "") == project_id)
-                ]
-            )
-            emit("usage_updated", self._build_billing_summary(project_id=project_id))
+            watcher = _BillingStreamWatcher(self, project_id=project_id)
+            for event_type, payload in watcher.initial():
+                emit(event_type, payload)
             while True:
-                time.sleep(2)
-                current_billing_mtime = billing_log.stat().st_mtime if billing_log.exists() else 0.0
-                if current_billing_mtime != last_billing_mtime:
-                    last_billing_mtime = current_billing_mtime
-                    emit("usage_updated", self._build_billing_summary(project_id=project_id))
-
-                current_amon_mtime = amon_log.stat().st_mtime if amon_log.exists() else 0.0
-                if current_amon_mtime == last_amon_mtime:
-                    continue
-                last_amon_mtime = current_amon_mtime
-                budget_events = [
-                    item
-                    for item in self._read_jsonl_records(amon_log)
-                    if str(item.get("event") or "") == "budget_exceeded"
-                    and (not project_id or str(item.get("project_id") or "") == project_id)
-                ]
-                if len(budget_events) > known_budget_count:
-                    for item in budget_events[known_budget_count:]:
-                        emit("budget_exceeded", item)
-                    known_budget_count = len(budget_events)
-                    emit("usage_updated", self._build_billing_summary(project_id=project_id))
+                time.sleep(watcher.interval_s)
+                for event_type, payload in watcher.poll():
+                    emit(event_type, payload)
         except _CLIENT_DISCONNECT_ERRORS:
             return
 
@@ -3854,14 +3998,107 @@ class AmonUIHandler(SimpleHTTPRequestHandler):
 
 
 
+class _BillingStreamWatcher:
+    """Detect billing and budget changes for one project between polls."""
+
+    interval_s = 2.0
+    retained_events = frozenset({"usage_updated"})
+
+    def __init__(self, handler: "AmonUIHandler", *, project_id: str | None) -> None:
+        self._handler = handler
+        self._project_id = project_id
+        core = handler.core
+        project_path = core.get_project_path(project_id) if project_id else None
+        self._billing_log = project_path / ".amon" / "billing" / "usage.jsonl" if project_path else core.data_dir / "logs" / "billing.log"
+        self._amon_log = core.data_dir / "logs" / "amon.log"
+        self._last_billing_mtime = 0.0
+        self._last_amon_mtime = 0.0
+        self._known_budget_count = 0
+
+    def initial(self) -> list[tuple[str, dict[str, Any]]]:
+        self._last_billing_mtime = self._mtime(self._billing_log)
+        self._last_amon_mtime = self._mtime(self._amon_log)
+        self._known_budget_count = len(self._budget_events())
+        return [("usage_updated", self._summary())]
+
+    def poll(self) -> list[tuple[str, dict[str, Any]]]:
+        events: list[tuple[str, dict[str, Any]]] = []
+        current_billing_mtime = self._mtime(self._billing_log)
+        if current_billing_mtime != self._last_billing_mtime:
+            self._last_billing_mtime = current_billing_mtime
+            events.append(("usage_updated", self._summary()))
+
+        current_amon_mtime = self._mtime(self._amon_log)
+        if current_amon_mtime == self._last_amon_mtime:
+            return events
+        self._last_amon_mtime = current_amon_mtime
+        budget_events = self._budget_events()
+        if len(budget_events) > self._known_budget_count:
+            events.extend(("budget_exceeded", item) for item in budget_events[self._known_budget_count :])
+            self._known_budget_count = len(budget_events)
+            events.append(("usage_updated", self._summary()))
+        return events
+
+    def _summary(self) -> dict[str, Any]:
+        return self._handler._build_billing_summary(project_id=self._project_id)
+
+    def _budget_events(self) -> list[dict[str, Any]]:
+        return [
+            item
+            for item in self._handler._read_jsonl_records(self._amon_log)
+            if str(item.get("event") or "") == "budget_exceeded"
+            and (not self._project_id or str(item.get("project_id") or "") == self._project_id)
+        ]
+
+    @staticmethod
+    def _mtime(path: Path) -> float:
+        return path.stat().st_mtime if path.exists() else 0.0
+
+
+def _build_hub_stream_resolver(core: AmonCore) -> Callable[[str, str], HubStream | None]:
+    """Map SSE routes that only relay shared state onto event-hub topics."""
+
+    def resolve(method: str, target: str) -> HubStream | None:
+        parsed = urlparse(target)
+        if method != "GET" or parsed.path != "/v1/billing/stream":
+            return None
+        project_id = parse_qs(parsed.query).get("project_id", [""])[0].strip()
+        if not project_id:
+            # Let the handler answer the 400.
+            return None
+        return HubStream(
+            topic=f"billing:{project_id}",
+            open_source=lambda: _BillingStreamWatcher(AmonUIHandler.detached(core), project_id=project_id),
+        )
+
+    return resolve
+
+
 def serve_ui(port: int = 8000, data_dir: Path | None = None) -> None:
+    global _ASYNC_UI_SERVER
     ui_dir = Path(__file__).resolve().parent / "ui"
     if not ui_dir.exists():
         raise FileNotFoundError(f"找不到 UI 資料夾：{ui_dir}")
     core = AmonCore(data_dir=data_dir)
     core.ensure_base_structure()
     handler = functools.partial(AmonUIHandler, directory=str(ui_dir), core=core)
-    server = AmonThreadingHTTPServer(("0.0.0.0", port), handler)
+    server: AsyncUIServer | AmonThreadingHTTPServer
+    if os.environ.get("AMON_UI_SERVER", "").strip().lower() == "threading":
+        server = AmonThreadingHTTPServer(("0.0.0.0", port), handler)
+    else:
+        server = AsyncUIServer(
+            ("0.0.0.0", port),
+            handler,
+            executor=BoundedExecutor(
+                max_workers=env_int("AMON_UI_WORKERS", 32),
+                max_queue=env_int("AMON_UI_WORKER_QUEUE_MAX", 64),
+                name="amon-ui-http",
+            ),
+            hub=_EVENT_HUB,
+            stream_resolver=_build_hub_stream_resolver(core),
+            max_body_bytes=AmonUIHandler._MAX_BODY_BYTES,
+        )
+        _ASYNC_UI_SERVER = server
     print(f"UI 已啟動：http://localhost:{port}")
     try:
         server.serve_forever()
@@ -3869,3 +4106,4 @@ def serve_ui(port: int = 8000, data_dir: Path | None = None) -> None:
         print("已停止 UI 伺服器")
     finally:
         server.server_close()
+        _ASYNC_UI_SERVER = None
@@ -0,0 +1,196 @@
+"""Priority lanes with fixed-size worker pools for UI background work."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .ui_async import env_int
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class TaskRejectedError(RuntimeError):
+    """Raised by admission control when a lane cannot take more work."""
+
+    def __init__(self, lane: str, reason: str) -> None:
+        super().__init__(f"{lane} 任務佇列已滿（{reason}）")
+        self.lane = lane
+        self.reason = reason
+
+
+@dataclass(frozen=True)
+class LaneConfig:
+    name: str
+    priority: int
+    workers: int
+    queue_max: int
+
+
+DEFAULT_LANES = (
+    LaneConfig(name="chat", priority=0, workers=4, queue_max=16),
+    LaneConfig(name="run", priority=1, workers=4, queue_max=32),
+    LaneConfig(name="tool", priority=2, workers=4, queue_max=64),
+    LaneConfig(name="schedule", priority=3, workers=1, queue_max=4),
+)
+
+
+def lane_config_from_env(config: LaneConfig) -> LaneConfig:
+    prefix = f"AMON_UI_LANE_{config.name.upper()}"
+    return LaneConfig(
+        name=config.name,
+        priority=config.priority,
+        workers=max(1, env_int(f"{prefix}_WORKERS", config.workers)),
+        queue_max=env_int(f"{prefix}_QUEUE_MAX", config.queue_max),
+    )
+
+
+class LatencyHistogram:
+    """Cumulative Prometheus-style histogram; callers hold the owning lock."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_S) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.total += seconds
+        self.count += 1
+        for index, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                self.counts[index] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "buckets": list(zip(self.buckets, self.counts)),
+            "sum": round(self.total, 6),
+            "count": self.count,
+        }
+
+
+class _Lane:
+    def __init__(self, config: LaneConfig) -> None:
+        self.config = config
+        self.heap: list[tuple[int, int, float, Future, Callable[[], Any]]] = []
+        self.threads: list[threading.Thread] = []
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait = LatencyHistogram()
+        self.run_time = LatencyHistogram()
+
+
+class TaskScheduler:
+    """Run callables on per-lane worker pools with priority-ordered admission.
+
+    Every lane owns ``workers`` threads, started on demand, that take queued
+    items lowest ``priority`` first (FIFO within a priority). A lane rejects new
+    work once ``queue_max`` items are waiting. When the queues of all lanes
+    together hold ``global_queue_max`` items, only the lane(s) with the best
+    priority are still admitted, so interactive work keeps flowing while
+    batch-like lanes shed load first.
+    """
+
+    def __init__(self, lanes: tuple[LaneConfig, ...] = DEFAULT_LANES, *, global_queue_max: int | None = None) -> None:
+        self._cond = threading.Condition()
+        self._lanes = {config.name: _Lane(config) for config in lanes}
+        self._seq = itertools.count()
+        self._top_priority = min(config.priority for config in lanes)
+        self.global_queue_max = (
+            global_queue_max if global_queue_max is not None else env_int("AMON_UI_TASK_GLOBAL_QUEUE_MAX", 64)
+        )
+        self._closed = False
+
+    def submit(self, lane_name: str, fn: Callable[..., Any], *args: Any, priority: int | None = None, **kwargs: Any) -> Future:
+        future: Future = Future()
+        with self._cond:
+            lane = self._lanes[lane_name]
+            self._admit(lane)
+            item_priority = lane.config.priority if priority is None else priority
+            call = (lambda: fn(*args, **kwargs)) if args or kwargs else fn
+            heapq.heappush(lane.heap, (item_priority, next(self._seq), time.monotonic(), future, call))
+            if len(lane.threads) < lane.config.workers and len(lane.heap) > len(lane.threads) - lane.active:
+                self._start_worker(lane)
+            self._cond.notify_all()
+        return future
+
+    def run(self, lane_name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Submit to ``lane_name`` and block until the call returns or raises."""
+        return self.submit(lane_name, fn, *args, **kwargs).result()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._cond:
+            return {
+                name: {
+                    "priority": lane.config.priority,
+                    "workers": lane.config.workers,
+                    "queue_capacity": lane.config.queue_max,
+                    "queued": len(lane.heap),
+                    "active": lane.active,
+                    "completed": lane.completed,
+                    "failed": lane.failed,
+                    "rejected": lane.rejected,
+                    "queue_wait_seconds": lane.queue_wait.snapshot(),
+                    "run_seconds": lane.run_time.snapshot(),
+                }
+                for name, lane in self._lanes.items()
+            }
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _admit(self, lane: _Lane) -> None:
+        if self._closed:
+            raise TaskRejectedError(lane.config.name, "scheduler closed")
+        if len(lane.heap) >= lane.config.queue_max and lane.active >= lane.config.workers:
+            lane.rejected += 1
+            raise TaskRejectedError(lane.config.name, f"queue_max={lane.config.queue_max}")
+        backlog = sum(len(other.heap) for other in self._lanes.values())
+        if self.global_queue_max and backlog >= self.global_queue_max and lane.config.priority > self._top_priority:
+            lane.rejected += 1
+            raise TaskRejectedError(lane.config.name, f"global backlog={backlog}")
+
+    def _start_worker(self, lane: _Lane) -> None:
+        thread = threading.Thread(
+            target=self._work,
+            args=(lane,),
+            name=f"amon-lane-{lane.config.name}-{len(lane.threads)}",
+            daemon=True,
+        )
+        lane.threads.append(thread)
+        thread.start()
+
+    def _work(self, lane: _Lane) -> None:
+        while True:
+            with self._cond:
+                while not lane.heap and not self._closed:
+                    self._cond.wait()
+                if not lane.heap:
+                    return
+                _, _, enqueued_at, future, call = heapq.heappop(lane.heap)
+                lane.active += 1
+                lane.queue_wait.observe(time.monotonic() - enqueued_at)
+            started_at = time.monotonic()
+            failed = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(call())
+                except BaseException as exc:  # noqa: BLE001
+                    failed = True
+                    future.set_exception(exc)
+            with self._cond:
+                lane.active -= 1
+                lane.run_time.observe(time.monotonic() - started_at)
+                if failed:
+                    lane.failed += 1
+                else:
+                    lane.completed += 1
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 from amon.artifacts.store import ingest_artifacts, ingest_response_artifacts
+from amon.fs.atomic import atomic_write_text
 
 
 class ArtifactsStoreTests(unittest.TestCase):
@@ -73,5 +76,34 @@ class ArtifactsStoreTests(unittest.TestCase):
             self.assertEqual(summary["artifacts"][0]["node_id"], "writer")
 
 
+    def test_batch_ingest_rewrites_manifest_once_and_links_history(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="amon-artifacts-store-") as tmpdir:
+            project_path = Path(tmpdir)
+            target = project_path / "workspace" / "notes" / "a.md"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text("old\n", encoding="utf-8")
+            target.chmod(0o640)
+            response = "".join(f"```markdown file=workspace/notes/{name}.md\n# {name}\n```\n" for name in ("a", "b", "c"))
+
+            with patch("amon.artifacts.manifest.atomic_write_text", wraps=atomic_write_text) as write:
+                summary = ingest_artifacts(response_text=response, project_path=project_path)
+
+            self.assertEqual((summary["created"], summary["updated"]), (2, 1))
+            self.assertEqual(write.call_count, 1)
+            manifest = json.loads((project_path / ".amon" / "artifacts" / "manifest.json").read_text(encoding="utf-8"))
+            for name in ("a", "b", "c"):
+                path = project_path / "workspace" / "notes" / f"{name}.md"
+                self.assertEqual(
+                    manifest["files"][f"workspace/notes/{name}.md"]["sha256"],
+                    hashlib.sha256(path.read_bytes()).hexdigest(),
+                )
+
+            backup = project_path / summary["results"][0]["backup_path"]
+            self.assertEqual(target.stat().st_mode & 0o777, 0o640)
+            # Editing the artifact in place must not reach the history copy.
+            target.write_text("edited\n", encoding="utf-8")
+            self.assertEqual(backup.read_text(encoding="utf-8"), "old\n")
+
+
 if __name__ == "__main__":
     unittest.main()
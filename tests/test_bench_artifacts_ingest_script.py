@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class BenchArtifactsIngestScriptTests(unittest.TestCase):
+    def test_bench_artifacts_ingest_reports_manifest_rewrites(self) -> None:
+        script = Path(__file__).resolve().parents[1] / "scripts" / "bench_artifacts_ingest.py"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = Path(temp_dir) / "bench.json"
+            result = subprocess.run(
+                [sys.executable, str(script), "--files", "12", "--size", "256", "--output", str(output)],
+                check=False,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                self.fail(result.stdout + "\n" + result.stderr)
+            report = json.loads(output.read_text(encoding="utf-8"))
+            self.assertEqual(report["modes"]["per_block"]["update"]["manifest_rewrites"], 12)
+            for round_name in ("create", "update"):
+                self.assertEqual(report["modes"]["batched"][round_name]["manifest_rewrites"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class BenchMemoryScriptTests(unittest.TestCase):
+    def test_bench_memory_writes_report_and_compares(self) -> None:
+        script = Path(__file__).resolve().parents[1] / "scripts" / "bench_memory.py"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = Path(temp_dir) / "bench.json"
+            args = [sys.executable, str(script), "--sessions", "2", "--turns", "6", "--queries", "3"]
+            result = subprocess.run([*args, "--output", str(output)], check=False, capture_output=True, text=True)
+            if result.returncode != 0:
+                self.fail(result.stdout + "\n" + result.stderr)
+            report = json.loads(output.read_text(encoding="utf-8"))
+            self.assertEqual(report["phases"]["ingest"]["chunks"], 12)
+            self.assertEqual(report["phases"]["ingest"]["stages"]["index"]["records"], 12)
+            self.assertEqual(report["phases"]["compact"]["rows"], 12)
+            for phase in ("search_jsonl", "search_segments"):
+                self.assertEqual(report["phases"][phase]["queries"], 3)
+                self.assertLessEqual(report["phases"][phase]["p50_ms"], report["phases"][phase]["p95_ms"])
+
+            compared = subprocess.run(
+                [*args, "--output", str(Path(temp_dir) / "next.json"), "--compare", str(output)],
+                check=False,
+                capture_output=True,
+                text=True,
+            )
+            if compared.returncode != 0:
+                self.fail(compared.stdout + "\n" + compared.stderr)
+            self.assertIn("search_segments.p95_ms", compared.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
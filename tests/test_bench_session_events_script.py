@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class BenchSessionEventsScriptTests(unittest.TestCase):
+    def test_bench_session_events_reports_both_modes(self) -> None:
+        script = Path(__file__).resolve().parents[1] / "scripts" / "bench_session_events.py"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = Path(temp_dir) / "bench.json"
+            result = subprocess.run(
+                [sys.executable, str(script), "--tokens", "300", "--reasoning-every", "50", "--output", str(output)],
+                check=False,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                self.fail(result.stdout + "\n" + result.stderr)
+            report = json.loads(output.read_text(encoding="utf-8"))
+            self.assertTrue(report["identical_output"])
+            per_event, buffered = report["modes"]["per_event"], report["modes"]["buffered"]
+            # prompt + 300 chunks + 6 reasoning chunks + final
+            self.assertEqual(per_event["session_opens"], 308)
+            self.assertEqual(buffered["session_opens"], 1)
+            self.assertEqual(per_event["bytes"], buffered["bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.chat.preroute import is_acknowledgement_reply, match_fast_path, preroute_turn
+from amon.chat.router_types import RouterResult
+
+
+class _Recorder:
+    def __init__(self, result, delay: float = 0.0) -> None:
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self.done = threading.Event()
+
+    def __call__(self, message, **kwargs):  # type: ignore[no-untyped-def]
+        self.calls += 1
+        time.sleep(self.delay)
+        self.done.set()
+        return self.result
+
+
+class ChatPreRouteTests(unittest.TestCase):
+    def test_slash_command_skips_llm_routing(self) -> None:
+        route = _Recorder(RouterResult(type="chat_response"))
+        decide = _Recorder("graph")
+        outcome = preroute_turn("/projects list", route=route, decide_mode=decide)
+        self.assertEqual(outcome.fast_path, "slash_command")
+        self.assertEqual(outcome.router_result.type, "command_plan")
+        self.assertEqual(outcome.router_result.api, "projects.list")
+        self.assertEqual(route.calls, 0)
+        self.assertEqual(decide.calls, 0)
+        self.assertIsNone(match_fast_path("/no_such_command"))
+
+    def test_acknowledgement_in_thread_only_needs_mode_classifier(self) -> None:
+        route = _Recorder(RouterResult(type="command_plan", confidence=1.0, api="projects.list"))
+        decide = _Recorder("team")
+        outcome = preroute_turn("好的，繼續", route=route, decide_mode=decide, short_continuation=True)
+        self.assertEqual(outcome.fast_path, "short_continuation")
+        self.assertEqual(outcome.router_result.type, "chat_response")
+        self.assertEqual((outcome.execution_mode, outcome.execution_mode_source), ("team", "classifier"))
+        self.assertEqual(route.calls, 0)
+        self.assertTrue(is_acknowledgement_reply("OK!"))
+        self.assertFalse(is_acknowledgement_reply("請幫我建立新專案"))
+
+    def test_router_and_mode_classifier_run_concurrently(self) -> None:
+        route = _Recorder(RouterResult(type="chat_response", confidence=0.9), delay=0.2)
+        decide = _Recorder("self_critique", delay=0.2)
+        started_at = time.monotonic()
+        outcome = preroute_turn("幫我寫一份完整的上線報告", route=route, decide_mode=decide)
+        elapsed = time.monotonic() - started_at
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(outcome.execution_mode, "self_critique")
+        self.assertGreaterEqual(outcome.stage_ms["route_intent_ms"], 150)
+        self.assertGreaterEqual(outcome.stage_ms["execution_mode_ms"], 150)
+        self.assertIn("preroute_ms", outcome.stage_ms)
+
+    def test_router_mode_wins_and_classifier_is_dropped(self) -> None:
+        route = _Recorder(RouterResult(type="chat_response", confidence=0.9, execution_mode="Team"))
+        decide = _Recorder("single", delay=0.3)
+        started_at = time.monotonic()
+        outcome = preroute_turn("請分工研究三家競品", route=route, decide_mode=decide)
+        self.assertLess(time.monotonic() - started_at, 0.25)
+        self.assertEqual((outcome.execution_mode, outcome.execution_mode_source), ("team", "router"))
+        self.assertEqual(outcome.cancelled, ["execution_mode"])
+
+    def test_deadlines_fall_back_to_safe_mode(self) -> None:
+        route = _Recorder(RouterResult(type="command_plan", confidence=1.0), delay=0.3)
+        decide = _Recorder("single", delay=0.3)
+        outcome = preroute_turn(
+            "整理這週的會議紀錄",
+            route=route,
+            decide_mode=decide,
+            route_deadline_s=0.05,
+            mode_deadline_s=0.05,
+        )
+        self.assertEqual(outcome.router_result.type, "chat_response")
+        self.assertEqual((outcome.execution_mode, outcome.execution_mode_source), ("graph", "router"))
+        self.assertEqual(outcome.timed_out, ["route_intent"])
+
+    def test_short_continuation_overrides_unexpected_router_type(self) -> None:
+        route = _Recorder(RouterResult(type="unknown", confidence=0.9))
+        decide = _Recorder("graph")
+        outcome = preroute_turn("那第二點呢", route=route, decide_mode=decide, short_continuation=True)
+        self.assertIsNone(outcome.fast_path)
+        self.assertEqual(outcome.router_result.reason, "short_continuation")
+        self.assertEqual(outcome.execution_mode, "graph")
+
+    def test_precomputed_router_result_skips_routing(self) -> None:
+        route = _Recorder(RouterResult(type="command_plan"))
+        decide = _Recorder("graph")
+        outcome = preroute_turn(
+            "幫我規劃上線",
+            route=route,
+            decide_mode=decide,
+            router_result=RouterResult(type="chat_response", confidence=0.9),
+        )
+        self.assertEqual(route.calls, 0)
+        self.assertEqual(outcome.execution_mode, "graph")
+
+
+if __name__ == "__main__":
+    unittest.main()
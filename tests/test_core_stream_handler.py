@@ -12,7 +12,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 from amon.core import AmonCore
-from amon.models import decode_reasoning_chunk
+from amon.models import decode_reasoning_chunk, encode_reasoning_chunk
 from amon.taskgraph3.payloads import AgentTaskConfig, TaskDisplayMetadata, TaskSpec
 from amon.taskgraph3.schema import GraphDefinition, GraphEdge, TaskNode
 
@@ -188,6 +188,45 @@ class CoreStreamHandlerTests(unittest.TestCase):
             finally:
                 os.environ.pop("AMON_HOME", None)
 
+    def test_stream_and_collect_writes_one_session_event_per_token(self) -> None:
+        class _Provider:
+            def generate_stream(self, messages, model=None):
+                yield encode_reasoning_chunk("思考")
+                yield from ("你好", "，", "world")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            core = AmonCore(data_dir=Path(temp_dir) / "data")
+            session_path = Path(temp_dir) / "project" / "sessions" / "session-1.jsonl"
+            session_path.parent.mkdir(parents=True)
+            with patch("builtins.print"):
+                reply = core._stream_and_collect(
+                    _Provider(),
+                    "mock",
+                    "mock-model",
+                    [{"role": "user", "content": "hi"}],
+                    session_path,
+                    "session-1",
+                    "draft",
+                    {"billing": {"enabled": False}},
+                    "hi",
+                    None,
+                )
+
+            self.assertEqual(reply, "你好，world")
+            events = [json.loads(line) for line in session_path.read_text(encoding="utf-8").splitlines()]
+            self.assertEqual(
+                [(event["event"], event.get("index"), event["content"]) for event in events],
+                [
+                    ("prompt", None, "hi"),
+                    ("reasoning_chunk", 0, "思考"),
+                    ("chunk", 1, "你好"),
+                    ("chunk", 2, "，"),
+                    ("chunk", 3, "world"),
+                    ("final", None, "你好，world"),
+                ],
+            )
+            self.assertTrue(all(event["session_id"] == "session-1" and event["stage"] == "draft" for event in events))
+
     def test_run_self_critique_forwards_stream_handler_to_run_graph(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
             os.environ["AMON_HOME"] = temp_dir
@@ -0,0 +1,93 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Iterable
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.chat.decision_cache import DecisionCache
+from amon.chat.execution_mode import decide_execution_mode
+from amon.chat.router_llm import route_with_llm
+
+
+class CountingLLM:
+    def __init__(self, response: str) -> None:
+        self.response = response
+        self.calls = 0
+
+    def generate_stream(self, messages: list[dict[str, str]], model: str | None = None) -> Iterable[str]:
+        _ = messages, model
+        self.calls += 1
+        return [self.response]
+
+
+class DecisionCacheTests(unittest.TestCase):
+    def test_lookup_respects_signature_ttl_and_persistence(self) -> None:
+        clock = [1000.0]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = DecisionCache(data_dir=Path(temp_dir), ttl_s=60, max_entries=8, time_func=lambda: clock[0])
+            stored = cache.store("router", "列出專案 ", {"type": "command_plan"}, confidence=0.95, project_id="proj-a", run_id="run-1")
+            self.assertTrue(stored)
+
+            self.assertEqual(cache.lookup("router", "列出專案。", project_id="proj-a", run_id="run-1"), {"type": "command_plan"})
+            self.assertIsNone(cache.lookup("router", "列出專案", project_id="proj-a", run_id="run-2"))
+            self.assertIsNone(cache.lookup("router", "列出專案", project_id="proj-a", run_id="run-1", last_router_type="chat_response"))
+
+            reloaded = DecisionCache(data_dir=Path(temp_dir), ttl_s=60, time_func=lambda: clock[0])
+            self.assertEqual(reloaded.lookup("router", "列出專案", project_id="proj-a", run_id="run-1"), {"type": "command_plan"})
+            self.assertFalse((Path(temp_dir) / "cache" / "router_decisions" / "proj-a.json").read_text(encoding="utf-8").count("列出專案"))
+
+            clock[0] += 61
+            self.assertIsNone(cache.lookup("router", "列出專案", project_id="proj-a", run_id="run-1"))
+            totals = cache.stats()["totals"]
+            self.assertEqual((totals["hits"], totals["misses"], totals["expired"]), (1, 3, 1))
+
+    def test_low_confidence_bypasses_and_size_is_bounded(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = DecisionCache(data_dir=Path(temp_dir), ttl_s=60, max_entries=2, min_confidence=0.8)
+            self.assertFalse(cache.store("router", "不確定", {"type": "chat_response"}, confidence=0.5))
+            for index in range(3):
+                cache.store("router", f"指令 {index}", {"index": index}, confidence=0.9)
+            self.assertIsNone(cache.lookup("router", "指令 0"))
+            self.assertEqual(cache.lookup("router", "指令 2"), {"index": 2})
+            counters = cache.stats()["by_kind"]["router"]
+            self.assertEqual((counters["bypassed"], counters["evicted"]), (1, 1))
+
+    def test_route_with_llm_serves_repeated_message_from_cache(self) -> None:
+        llm = CountingLLM('{"type":"command_plan","confidence":0.95,"api":"projects.list","args":{}}')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = DecisionCache(data_dir=Path(temp_dir), ttl_s=60)
+            with (
+                patch("amon.chat.router_llm._build_default_client", return_value=(llm, None)),
+                patch("amon.chat.router_llm.get_decision_cache", return_value=cache),
+            ):
+                first = route_with_llm("列出專案", {"run_id": "run-1"}, [], project_id="proj-a")
+                second = route_with_llm("  列出專案 ", {"run_id": "run-1"}, [], project_id="proj-a")
+                third = route_with_llm("列出專案", {"run_id": "run-2"}, [], project_id="proj-a")
+        self.assertEqual(first, second)
+        self.assertEqual(third.api, "projects.list")
+        self.assertEqual(llm.calls, 2)
+
+    def test_execution_mode_cache_skips_injected_clients(self) -> None:
+        response = '{"mode":"team","confidence":0.9,"rationale":["分工"],"requires_planning":true}'
+        default_llm = CountingLLM(response)
+        injected_llm = CountingLLM(response)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = DecisionCache(data_dir=Path(temp_dir), ttl_s=60)
+            with (
+                patch("amon.chat.execution_mode._build_default_client", return_value=(default_llm, None)),
+                patch("amon.chat.execution_mode.get_decision_cache", return_value=cache),
+            ):
+                modes = [decide_execution_mode("請分工研究競品", project_id="proj-a") for _ in range(3)]
+                decide_execution_mode("請分工研究競品", project_id="proj-a", llm_client=injected_llm)
+                decide_execution_mode("請分工研究競品", project_id="proj-a", llm_client=injected_llm)
+        self.assertEqual(modes, ["team"] * 3)
+        self.assertEqual(default_llm.calls, 1)
+        self.assertEqual(injected_llm.calls, 2)
+        self.assertEqual(cache.stats()["by_kind"]["execution_mode"]["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,5 @@
+import io
+import json
 import os
 import tempfile
 import unittest
@@ -9,6 +11,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 from amon.core import AmonCore
+from amon.project_export import MANIFEST_NAME, load_export_manifest
 
 
 class ExportEvalTests(unittest.TestCase):
@@ -35,6 +38,63 @@ class ExportEvalTests(unittest.TestCase):
             self.assertIn(f"{base_prefix}/docs/notes.md", names)
             self.assertIn(f"{base_prefix}/tasks/tasks.json", names)
 
+    def test_incremental_export_packs_only_changed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.environ["AMON_HOME"] = temp_dir
+            try:
+                core = AmonCore()
+                core.initialize()
+                project = core.create_project("測試專案")
+                project_path = Path(project.path)
+                notes_path = project_path / "docs" / "notes.md"
+                notes_path.write_text("測試內容" * 200, encoding="utf-8")
+                image_path = project_path / "docs" / "chart.png"
+                image_path.write_bytes(os.urandom(4096))
+                log_path = project_path / "logs" / "run.jsonl"
+                log_path.parent.mkdir(parents=True, exist_ok=True)
+                log_path.write_text('{"event": "start"}\n', encoding="utf-8")
+
+                full_path = Path(temp_dir) / "full.zip"
+                core.export_project(project.project_id, full_path, workers=3)
+
+                with log_path.open("a", encoding="utf-8") as handle:
+                    handle.write('{"event": "end"}\n')
+                os.utime(notes_path, ns=(notes_path.stat().st_atime_ns, notes_path.stat().st_mtime_ns + 10**9))
+                image_path.unlink()
+                stream = io.BytesIO()
+                result = core.export_project_stream(project.project_id, stream, since=full_path, workers=2)
+            finally:
+                os.environ.pop("AMON_HOME", None)
+
+            prefix = project.project_id
+            with zipfile.ZipFile(full_path) as archive:
+                self.assertIsNone(archive.testzip())
+                infos = {info.filename: info for info in archive.infolist()}
+                self.assertEqual(archive.read(f"{prefix}/docs/notes.md").decode("utf-8"), "測試內容" * 200)
+            self.assertEqual(infos[f"{prefix}/docs/notes.md"].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(infos[f"{prefix}/docs/chart.png"].compress_type, zipfile.ZIP_STORED)
+            self.assertIn(f"{prefix}/{MANIFEST_NAME}", infos)
+
+            # notes.md was touched but kept its content; the exports' own log lines do change logs/.
+            self.assertEqual(result["deleted"], 1)
+            stream.seek(0)
+            with zipfile.ZipFile(stream) as archive:
+                self.assertIsNone(archive.testzip())
+                self.assertEqual(
+                    archive.read(f"{prefix}/logs/run.jsonl").decode("utf-8"),
+                    '{"event": "start"}\n{"event": "end"}\n',
+                )
+                manifest = json.loads(archive.read(f"{prefix}/{MANIFEST_NAME}"))
+            self.assertEqual(result["packed"], len(manifest["packed"]))
+            self.assertIn("logs/run.jsonl", manifest["packed"])
+            self.assertFalse([name for name in manifest["packed"] if name.startswith("docs/")])
+            self.assertEqual(manifest["deleted"], ["docs/chart.png"])
+            self.assertIn("docs/notes.md", manifest["files"])
+            self.assertEqual(
+                load_export_manifest(full_path)["files"]["docs/notes.md"]["sha256"],
+                manifest["files"]["docs/notes.md"]["sha256"],
+            )
+
     def test_eval_basic_runs(self) -> None:
         if not os.getenv("OPENAI_API_KEY"):
             self.skipTest("需要設定 OPENAI_API_KEY 才能執行 LLM 評測")
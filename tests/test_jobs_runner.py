@@ -11,7 +11,8 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 import yaml
 
-from amon.jobs.runner import start_job, stop_job
+from amon.jobs.runner import start_job, status_job, stop_job
+from amon.jobs.watchers import InotifyWatcher, PollingWatcher, build_watcher, coalesce_events
 
 
 class JobRunnerTests(unittest.TestCase):
@@ -69,6 +70,46 @@ class JobRunnerTests(unittest.TestCase):
                 self._wait_for_file(state_path, timeout=3)
                 state = json.loads(state_path.read_text(encoding="utf-8"))
                 self.assertIsNotNone(state.get("last_event_id"))
+                metrics = status_job(job_id).watch_metrics
+                self.assertIsNotNone(metrics)
+                self.assertGreaterEqual(metrics["events_emitted"], 1)
+                self.assertEqual(
+                    metrics["events_seen"],
+                    metrics["events_emitted"] + metrics["events_suppressed"],
+                )
+            finally:
+                stop_job(job_id)
+                os.environ.pop("AMON_HOME", None)
+
+    def test_polling_backend_emits_doc_updated(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.environ["AMON_HOME"] = temp_dir
+            job_id = "watch-poll-job"
+            watch_dir = Path(temp_dir) / "watched"
+            watch_dir.mkdir(parents=True, exist_ok=True)
+            target_file = watch_dir / "sample.txt"
+            target_file.write_text("hello", encoding="utf-8")
+            jobs_dir = Path(temp_dir) / "jobs"
+            jobs_dir.mkdir(parents=True, exist_ok=True)
+            (jobs_dir / f"{job_id}.yaml").write_text(
+                yaml.safe_dump(
+                    {
+                        "watch_paths": [str(watch_dir)],
+                        "watch_interval_seconds": 1,
+                        "watch_backend": "polling",
+                    }
+                ),
+                encoding="utf-8",
+            )
+
+            try:
+                start_job(job_id, heartbeat_interval_seconds=1)
+                time.sleep(0.2)
+                target_file.write_text("hello again, longer", encoding="utf-8")
+                events_path = Path(temp_dir) / "events" / "events.jsonl"
+                self._wait_for_file(events_path, timeout=4)
+                self._wait_for_event(events_path, "doc.updated", timeout=4)
+                self.assertEqual(status_job(job_id).watch_metrics["backend"], "polling")
             finally:
                 stop_job(job_id)
                 os.environ.pop("AMON_HOME", None)
@@ -96,5 +137,55 @@ class JobRunnerTests(unittest.TestCase):
         raise AssertionError(f"找不到事件：{event_type}")
 
 
+class WatcherBackendTests(unittest.TestCase):
+    def test_coalesce_events_matches_snapshot_semantics(self) -> None:
+        events = [
+            ("doc.created", "a"),
+            ("doc.updated", "a"),
+            ("doc.created", "b"),
+            ("doc.deleted", "b"),
+            ("doc.deleted", "c"),
+            ("doc.created", "c"),
+            ("doc.updated", "d"),
+            ("doc.updated", "d"),
+        ]
+        self.assertEqual(
+            coalesce_events(events),
+            [("doc.created", "a"), ("doc.updated", "c"), ("doc.updated", "d")],
+        )
+
+    def test_build_watcher_rejects_unknown_backend(self) -> None:
+        with self.assertRaises(ValueError):
+            build_watcher([], backend="fsevents")
+
+    def test_polling_watcher_reports_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            watcher = build_watcher([root], backend="polling", interval_seconds=0.01)
+            self.assertIsInstance(watcher, PollingWatcher)
+            (root / "new.txt").write_text("x", encoding="utf-8")
+            self.assertEqual(watcher.poll(0.01), [("doc.created", str(root / "new.txt"))])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify 僅支援 Linux")
+    def test_inotify_watcher_tracks_new_subdirectories(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            try:
+                watcher = InotifyWatcher([root])
+            except OSError as exc:
+                self.skipTest(f"inotify 不可用：{exc}")
+            try:
+                nested = root / "nested"
+                nested.mkdir()
+                self.assertEqual(watcher.poll(1), [])
+                (nested / "doc.md").write_text("hello", encoding="utf-8")
+                events = coalesce_events(watcher.poll(1))
+                self.assertEqual(events, [("doc.created", str(nested / "doc.md"))])
+                (nested / "doc.md").unlink()
+                self.assertEqual(coalesce_events(watcher.poll(1)), [("doc.deleted", str(nested / "doc.md"))])
+            finally:
+                watcher.close()
+
+
 if __name__ == "__main__":
     unittest.main()
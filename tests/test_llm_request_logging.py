@@ -10,6 +10,13 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 from amon.core import AmonCore
+from amon.llm_request_log import (
+    append_llm_request,
+    build_llm_request_payload,
+    list_llm_request_segments,
+    llm_request_blob_dir,
+    load_recent_llm_requests,
+)
 
 
 class _FakeProvider:
@@ -69,11 +76,15 @@ class LLMRequestLoggingTests(unittest.TestCase):
                 trace_path = project_path / ".amon" / "runs" / "run-ctx-001" / "llm_requests.jsonl"
                 self.assertTrue(trace_path.exists())
 
-                payloads = [
+                raw_records = [
                     json.loads(line)
                     for line in trace_path.read_text(encoding="utf-8").splitlines()
                     if line.strip()
                 ]
+                self.assertEqual(len(raw_records), 1)
+                self.assertNotIn("openai_messages", raw_records[0])
+
+                payloads = load_recent_llm_requests(project_path, run_id="run-ctx-001")
                 self.assertEqual(len(payloads), 1)
                 payload = payloads[0]
                 self.assertEqual(payload["source"], "run_agent_task")
@@ -158,5 +169,76 @@ class LLMRequestLoggingTests(unittest.TestCase):
                 os.environ.pop("AMON_HOME", None)
 
 
+def _payload(index: int, *, system_prompt: str, run_id: str | None = "run-seg") -> dict:
+    return build_llm_request_payload(
+        source="test",
+        provider="mock",
+        model="mock-model",
+        project_id="p1",
+        run_id=run_id,
+        thread_id=None,
+        node_id=None,
+        request_id=f"req-{index:04d}",
+        stage=None,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"question {index}"},
+        ],
+    )
+
+
+class LLMRequestLogStorageTests(unittest.TestCase):
+    def test_large_content_is_stored_once_and_expanded_on_read(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_path = Path(temp_dir)
+            system_prompt = "系統提示" * 600
+            for index in range(3):
+                append_llm_request(project_path, _payload(index, system_prompt=system_prompt))
+
+            blob_files = [item for item in llm_request_blob_dir(project_path).rglob("*.txt")]
+            self.assertEqual(len(blob_files), 1)
+            log_text = (project_path / ".amon" / "runs" / "run-seg" / "llm_requests.jsonl").read_text(encoding="utf-8")
+            self.assertNotIn(system_prompt, log_text)
+
+            payloads = load_recent_llm_requests(project_path, run_id="run-seg", limit=2)
+            self.assertEqual([item["request_id"] for item in payloads], ["req-0002", "req-0001"])
+            self.assertEqual(payloads[0]["chat_messages"][0]["content"], system_prompt)
+            self.assertEqual(payloads[0]["openai_messages"][0]["content"][0]["text"], system_prompt)
+
+    def test_rotation_archives_segments_and_tail_read_spans_them(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_path = Path(temp_dir)
+            for index in range(40):
+                append_llm_request(
+                    project_path,
+                    _payload(index, system_prompt="short prompt"),
+                    max_segment_bytes=2048,
+                    keep_uncompressed_segments=1,
+                    compression="gzip",
+                )
+
+            log_path = project_path / ".amon" / "runs" / "run-seg" / "llm_requests.jsonl"
+            segments = list_llm_request_segments(log_path)
+            self.assertGreaterEqual(len(segments), 3)
+            self.assertTrue(all(item.name.endswith(".gz") for item in segments[:-1]))
+            self.assertTrue(segments[-1].name.endswith(".jsonl"))
+
+            payloads = load_recent_llm_requests(project_path, run_id="run-seg", limit=40)
+            self.assertEqual(
+                [item["request_id"] for item in payloads],
+                [f"req-{index:04d}" for index in reversed(range(40))],
+            )
+
+    def test_legacy_records_are_returned_unchanged(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_path = Path(temp_dir)
+            log_path = project_path / ".amon" / "context" / "llm_requests.jsonl"
+            log_path.parent.mkdir(parents=True)
+            legacy = {"schema_version": 1, "request_id": "legacy", "chat_messages": [], "openai_messages": []}
+            log_path.write_text(json.dumps(legacy) + "\n", encoding="utf-8")
+
+            self.assertEqual(load_recent_llm_requests(project_path), [legacy])
+
+
 if __name__ == "__main__":
     unittest.main()
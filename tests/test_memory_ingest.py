@@ -2,6 +2,7 @@ import json
 import os
 import tempfile
 import unittest
+from unittest import mock
 from pathlib import Path
 
 import sys
@@ -9,6 +10,8 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 from amon.core import AmonCore
+from amon.memory import count_jsonl_records, iter_stage_records
+from amon.memory.aliases import EntityAliasStore
 
 
 class MemoryIngestTests(unittest.TestCase):
@@ -49,6 +52,40 @@ class MemoryIngestTests(unittest.TestCase):
                 self.assertIn("created_at", chunk)
                 self.assertEqual(chunk["lang"], "zh-TW")
 
+    def test_background_ingest_drains_session_and_reports_progress(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_dir = Path(temp_dir) / "data"
+            project_path = Path(temp_dir) / "project"
+            sessions_dir = project_path / "sessions"
+            sessions_dir.mkdir(parents=True, exist_ok=True)
+            with (sessions_dir / "session-bg.jsonl").open("w", encoding="utf-8") as handle:
+                for index in range(620):
+                    event = {"event": "prompt" if index % 2 else "final", "content": f"王小明第 {index} 次回報"}
+                    handle.write(json.dumps(event, ensure_ascii=False))
+                    handle.write("\n")
+
+            with mock.patch.dict(os.environ, {"AMON_HOME": str(data_dir)}):
+                core = AmonCore(data_dir=data_dir)
+                service = core.memory_ingest_service()
+                try:
+                    chunk_count = core.ingest_session_memory(project_path, "session-bg", project_id="proj-bg", background=True)
+                    self.assertEqual(chunk_count, 620)
+                    self.assertTrue(service.drain(project_path, timeout=60))
+                    progress = service.progress(project_path)
+                    self.assertEqual(progress["status"], "idle")
+                    self.assertEqual(progress["processed"]["index"], 620)
+                    self.assertEqual(progress["lag_s"], 0.0)
+                    self.assertGreaterEqual(progress["runs"], 3)
+
+                    flushed = service.flush(project_path)
+                    self.assertEqual(flushed["processed"]["index"], 620)
+                    self.assertEqual(flushed["runs"], progress["runs"] + 1)
+                finally:
+                    service.stop()
+
+            index_lines = (project_path / "memory" / "index.jsonl").read_text(encoding="utf-8").splitlines()
+            self.assertEqual(len(index_lines), 620)
+
     def test_normalize_relative_date_yesterday(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
             data_dir = Path(temp_dir) / "data"
@@ -197,6 +234,61 @@ class MemoryIngestTests(unittest.TestCase):
             self.assertIn("昨天到台北開會。", embedding_text)
             self.assertIn("## AMON_MEMORY_TAGS", embedding_text)
 
+    def test_generate_tags_rebuilds_only_dirty_chunks(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_dir = Path(temp_dir) / "data"
+            project_path = Path(temp_dir) / "project"
+            memory_dir = project_path / "memory"
+            memory_dir.mkdir(parents=True, exist_ok=True)
+            chunks_path = memory_dir / "chunks.jsonl"
+            texts = ["王小明昨天到台北開會。", "他說這家公司很好。", "林美華公司成立了。"]
+            chunks = [
+                {
+                    "chunk_id": f"chunk-dirty-{index}",
+                    "project_id": "proj-dirty",
+                    "session_id": "session-dirty",
+                    "source_path": "sessions/session-dirty.jsonl",
+                    "text": texts[index % len(texts)],
+                    "created_at": "2026-02-03T10:00:00+08:00",
+                    "lang": "zh-TW",
+                }
+                for index in range(9)
+            ]
+            with chunks_path.open("w", encoding="utf-8") as handle:
+                for chunk in chunks:
+                    handle.write(json.dumps(chunk, ensure_ascii=False))
+                    handle.write("\n")
+
+            core = AmonCore(data_dir=data_dir)
+            core.run_memory_ingest_pipeline(project_path, batch_size=50)
+            tags_path = memory_dir / "tags.jsonl"
+            pipeline_tags = tags_path.read_bytes()
+            inode = tags_path.stat().st_ino
+
+            from amon.memory import tags as memory_tags
+
+            with mock.patch.object(memory_tags, "build_tag_record", wraps=memory_tags.build_tag_record) as build:
+                self.assertEqual(core.generate_memory_tags(project_path), 9)
+                self.assertEqual(build.call_count, 0)
+                self.assertEqual(tags_path.stat().st_ino, inode)
+
+                chunks[4]["text"] = "陳大文明天去台北。"
+                with chunks_path.open("w", encoding="utf-8") as handle:
+                    for chunk in chunks:
+                        handle.write(json.dumps(chunk, ensure_ascii=False))
+                        handle.write("\n")
+                core.normalize_memory_dates(project_path)
+
+            rebuilt_ids = [call.args[0]["chunk_id"] for call in build.call_args_list]
+            self.assertIn("chunk-dirty-4", rebuilt_ids)
+            self.assertLess(len(rebuilt_ids), 9)
+            old_lines = pipeline_tags.splitlines()
+            new_lines = tags_path.read_bytes().splitlines()
+            self.assertEqual(len(new_lines), 9)
+            self.assertEqual(new_lines[:4], old_lines[:4])
+            self.assertIn("陳大文明天去台北。", json.loads(new_lines[4])["embedding_text"])
+            self.assertEqual(list(memory_dir.glob(".tags.jsonl.*")), [])
+
     def test_memory_ingest_pipeline_batches_and_resume(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
             data_dir = Path(temp_dir) / "data"
@@ -241,6 +333,157 @@ class MemoryIngestTests(unittest.TestCase):
             finally:
                 os.environ.pop("AMON_HOME", None)
 
+    def test_stage_cursor_resumes_by_offset_and_recovers_from_rewrite(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "chunks.jsonl"
+            lines = [json.dumps({"chunk_id": f"c{index}"}) + "\n" for index in range(5)]
+            path.write_text("".join(lines[:3]) + "\n" + '{"chunk_id": "partial"', encoding="utf-8")
+            cursor: dict = {"last_chunk_id": None, "processed": 0}
+
+            first = [record["chunk_id"] for record in iter_stage_records(path, cursor, limit=2)]
+            self.assertEqual(first, ["c0", "c1"])
+            self.assertEqual(cursor["offset"], len(lines[0]) + len(lines[1]))
+            rest = [record["chunk_id"] for record in iter_stage_records(path, cursor)]
+            self.assertEqual(rest, ["c2"])
+
+            # The rewritten file shifts every offset; the checksum guard notices
+            # and the cursor re-synchronises on last_chunk_id.
+            path.write_text("\n" + "".join(lines), encoding="utf-8")
+            rest = [record["chunk_id"] for record in iter_stage_records(path, cursor)]
+            self.assertEqual(rest, ["c3", "c4"])
+            self.assertEqual(cursor["processed"], 5)
+
+            tally: dict = {}
+            self.assertEqual(count_jsonl_records(path, tally), 5)
+            with path.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps({"chunk_id": "c5"}) + "\n" + '{"chunk_id": "c6"')
+            self.assertEqual(count_jsonl_records(path, tally), 7)
+            self.assertEqual(tally["offset"], path.stat().st_size - len('{"chunk_id": "c6"'))
+            path.write_text(lines[0], encoding="utf-8")
+            self.assertEqual(count_jsonl_records(path, tally), 1)
+
+    def test_memory_ingest_pipeline_tags_use_entity_cursor(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_dir = Path(temp_dir) / "data"
+            project_path = Path(temp_dir) / "project"
+            memory_dir = project_path / "memory"
+            memory_dir.mkdir(parents=True, exist_ok=True)
+            chunks_path = memory_dir / "chunks.jsonl"
+            texts = ["王小明到台北開會。", "內容", "他說會準時交付。"]
+            with chunks_path.open("w", encoding="utf-8") as handle:
+                for index in range(9):
+                    chunk = {
+                        "chunk_id": f"chunk-{index}",
+                        "project_id": "proj-cursor",
+                        "session_id": "session-cursor",
+                        "source_path": "sessions/session-cursor.jsonl",
+                        "text": texts[index % 3],
+                        "created_at": "2026-02-03T10:00:00+08:00",
+                        "lang": "zh-TW",
+                    }
+                    handle.write(json.dumps(chunk, ensure_ascii=False))
+                    handle.write("\n")
+            os.environ["AMON_HOME"] = str(data_dir)
+            try:
+                core = AmonCore(data_dir=data_dir)
+                for _ in range(3):
+                    result = core.run_memory_ingest_pipeline(project_path, batch_size=4, max_queue_size=100)
+                self.assertEqual(result["processed"]["tags"], 1)
+            finally:
+                os.environ.pop("AMON_HOME", None)
+
+            state = json.loads((memory_dir / "ingest_state.json").read_text(encoding="utf-8"))
+            entities_size = (memory_dir / "entities.jsonl").stat().st_size
+            self.assertEqual(state["stages"]["tags"]["entities"]["offset"], entities_size)
+            self.assertEqual(state["chunks_tally"]["lines"], 9)
+            tags = [json.loads(line) for line in (memory_dir / "tags.jsonl").read_text(encoding="utf-8").splitlines()]
+            self.assertEqual(len(tags), 9)
+            self.assertIn("王小明", tags[6]["tags_markdown"])
+            self.assertIn("王小明", tags[8]["tags_markdown"])
+
+    def test_memory_ingest_pipeline_micro_batches_match_single_batch(self) -> None:
+        texts = ["王小明到台北開會。", "陳大文公司成立了。", "他說該公司明天上線。", "她們下週一去臺北。"]
+        outputs = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for run, micro_batch in enumerate(["2", "100"]):
+                data_dir = Path(temp_dir) / f"data-{run}"
+                project_path = Path(temp_dir) / f"project-{run}"
+                memory_dir = project_path / "memory"
+                memory_dir.mkdir(parents=True, exist_ok=True)
+                with (memory_dir / "chunks.jsonl").open("w", encoding="utf-8") as handle:
+                    for index in range(30):
+                        chunk = {
+                            "chunk_id": f"chunk-{index}",
+                            "project_id": "proj-pipe",
+                            "session_id": f"session-{index % 3}",
+                            "source_path": "sessions/session.jsonl",
+                            "text": texts[index % 4],
+                            "created_at": "2026-02-03T10:00:00+08:00",
+                            "lang": "zh-TW",
+                        }
+                        handle.write(json.dumps(chunk, ensure_ascii=False))
+                        handle.write("\n")
+                env = {
+                    "AMON_HOME": str(data_dir),
+                    "AMON_MEMORY_INGEST_MICRO_BATCH": micro_batch,
+                    "AMON_MEMORY_INGEST_WORKERS": "0",
+                }
+                with mock.patch.dict(os.environ, env):
+                    core = AmonCore(data_dir=data_dir)
+                    first = core.run_memory_ingest_pipeline(project_path, batch_size=20, max_queue_size=100)
+                    second = core.run_memory_ingest_pipeline(project_path, batch_size=20, max_queue_size=100)
+                self.assertEqual(first["processed"], {name: 20 for name in first["processed"]})
+                self.assertEqual(second["processed"]["index"], 10)
+                throughput = first["throughput"]["entities"]
+                self.assertEqual(throughput["records"], 20)
+                self.assertEqual(throughput["batches"], 10 if micro_batch == "2" else 1)
+                self.assertIn("records_per_s", throughput)
+                outputs.append(
+                    {
+                        name: (memory_dir / name).read_text(encoding="utf-8")
+                        for name in (
+                            "normalized.jsonl",
+                            "entities.jsonl",
+                            "tags.jsonl",
+                            "index.jsonl",
+                            "entity_aliases.journal.jsonl",
+                        )
+                    }
+                )
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("resolved_to_canonical_id", outputs[0]["entities.jsonl"])
+
+    def test_entity_alias_store_journals_and_compacts(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_path = Path(temp_dir) / "entity_aliases.json"
+            store = EntityAliasStore(snapshot_path, compact_min_bytes=10_000)
+            store.load()
+            full_id = store.resolve("王小明", "person")
+            self.assertEqual(store.resolve("小明", "person"), full_id)
+            self.assertEqual(store.resolve("明", "person"), full_id)
+            self.assertIsNone(store.find_merge_candidate("小明", "org"))
+            org_id = store.resolve("小明公司", "org")
+            self.assertNotEqual(org_id, full_id)
+            store.flush()
+            self.assertFalse(snapshot_path.exists())
+            self.assertEqual(len(store.journal_path.read_text(encoding="utf-8").splitlines()), 1)
+
+            # A torn append is skipped; later flushes start on a new line.
+            with store.journal_path.open("a", encoding="utf-8") as handle:
+                handle.write('{"aliases": {"x"')
+            reloaded = EntityAliasStore(snapshot_path, compact_min_bytes=0)
+            reloaded.load()
+            self.assertEqual(reloaded.payload, store.payload)
+            self.assertEqual(reloaded.resolve("張三", "person"), "person:張三")
+            reloaded.flush()
+            self.assertTrue(snapshot_path.exists())
+            self.assertFalse(reloaded.journal_path.exists())
+
+            compacted = EntityAliasStore(snapshot_path)
+            compacted.load()
+            self.assertEqual(compacted.payload, reloaded.payload)
+            self.assertEqual(compacted.find_merge_candidate("小明", "person"), full_id)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -109,6 +109,114 @@ class MemorySearchTests(unittest.TestCase):
             self.assertEqual(len(results), 2)
             self.assertEqual(results[0]["chunk_id"], "chunk-2")
 
+    def test_compacted_segments_match_jsonl_search(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_dir = Path(temp_dir) / "data"
+            project_path = Path(temp_dir) / "project"
+            memory_dir = project_path / "memory"
+            memory_dir.mkdir(parents=True, exist_ok=True)
+            texts = ["決議：採用 A 方案。", "王小明昨天到台北開會。", "林美華公司成立了。", "下週 review plan {index}"]
+            with (memory_dir / "chunks.jsonl").open("w", encoding="utf-8") as handle:
+                for index in range(40):
+                    chunk = {
+                        "chunk_id": f"chunk-{index}",
+                        "project_id": "proj-segment",
+                        "session_id": "session-segment",
+                        "source_path": "sessions/session-segment.jsonl",
+                        "text": texts[index % len(texts)].format(index=index),
+                        "created_at": f"2026-02-{1 + index % 20:02d}T10:00:00+08:00",
+                        "lang": "zh-TW",
+                    }
+                    handle.write(json.dumps(chunk, ensure_ascii=False))
+                    handle.write("\n")
+
+            core = AmonCore(data_dir=data_dir)
+            core.run_memory_ingest_pipeline(project_path, batch_size=100)
+            queries = [
+                ("採用 A", None),
+                ("台北 開會", {"start": "2026-02-03", "end": "2026-02-08"}),
+                ("review plan", {"end": "2026-02-05"}),
+            ]
+
+            def snapshot() -> tuple[list[list[dict]], bytes]:
+                results = [core.search_memory(project_path, query, time_range=time_range, top_k=6) for query, time_range in queries]
+                core.generate_memory_tags(project_path)
+                return results, (memory_dir / "tags.jsonl").read_bytes()
+
+            baseline = snapshot()
+            first = core.compact_memory(project_path, max_rows=25)
+            self.assertEqual(first["status"], "ok")
+            self.assertEqual(first["rows"], 25)
+            self.assertEqual(snapshot(), baseline)
+
+            second = core.compact_memory(project_path)
+            self.assertEqual((second["rows"], second["segments"]), (15, 2))
+            self.assertEqual(core.compact_memory(project_path)["status"], "skipped")
+            self.assertEqual(snapshot(), baseline)
+
+            # Rewriting the JSONL files invalidates the segments until they are rebuilt.
+            chunks_path = memory_dir / "chunks.jsonl"
+            chunks_path.write_text(
+                chunks_path.read_text(encoding="utf-8").replace("決議：採用 A 方案。", "決議：改採 C 方案。", 1),
+                encoding="utf-8",
+            )
+            core.normalize_memory_dates(project_path)
+            core.generate_memory_tags(project_path)
+            rewritten = snapshot()
+            self.assertNotEqual(rewritten, baseline)
+            rebuilt = core.compact_memory(project_path)
+            self.assertEqual((rebuilt["rows"], rebuilt["segments"]), (40, 1))
+            self.assertEqual(snapshot(), rewritten)
+    def test_bm25_ranking_and_boosts(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_dir = Path(temp_dir) / "data"
+            project_path = Path(temp_dir) / "project"
+            memory_dir = project_path / "memory"
+            memory_dir.mkdir(parents=True, exist_ok=True)
+            texts = ["例行會議紀錄，討論進度。"] * 10 + [
+                "例行會議紀錄，王小明報告預算。",
+                "陳大文說預算超支。",
+                "例行會議紀錄，陳大文補充。",
+            ]
+            with (memory_dir / "chunks.jsonl").open("w", encoding="utf-8") as handle:
+                for index, text in enumerate(texts):
+                    chunk = {
+                        "chunk_id": f"chunk-{index}",
+                        "project_id": "proj-bm25",
+                        "session_id": "session-bm25",
+                        "source_path": "sessions/session-bm25.jsonl",
+                        "text": text,
+                        "created_at": f"2026-02-{1 + index:02d}T10:00:00+08:00",
+                        "lang": "zh-TW",
+                    }
+                    handle.write(json.dumps(chunk, ensure_ascii=False))
+                    handle.write("\n")
+
+            core = AmonCore(data_dir=data_dir)
+            core._now = lambda: "2026-02-13T09:00:00+08:00"
+            core.run_memory_ingest_pipeline(project_path, batch_size=100)
+
+            # The rare term outweighs the one every meeting note shares.
+            ranked = core.search_memory(project_path, "會議紀錄 預算", top_k=3)
+            self.assertEqual([hit["chunk_id"] for hit in ranked[:2]], ["chunk-10", "chunk-11"])
+
+            plain = {hit["chunk_id"]: hit["score"] for hit in core.search_memory(project_path, "王小明", top_k=13, entity_boost=0)}
+            boosted = {hit["chunk_id"]: hit["score"] for hit in core.search_memory(project_path, "王小明", top_k=13)}
+            self.assertAlmostEqual(boosted["chunk-10"] - plain["chunk-10"], 1.0)
+            self.assertEqual(boosted["chunk-11"], plain["chunk-11"])
+
+            # 昨天 resolves to 2026-02-12, the day chunk-11 was created on.
+            by_day = core.search_memory(project_path, "昨天", top_k=2, time_boost=0.5)
+            self.assertEqual([(hit["chunk_id"], hit["score"]) for hit in by_day], [("chunk-11", 0.5), ("chunk-0", 0.0)])
+
+            queries = ["會議紀錄 預算", "陳大文 補充", "王小明 昨天"]
+            baseline = [core.search_memory(project_path, query, top_k=13) for query in queries]
+            core.compact_memory(project_path, max_rows=7)
+            self.assertEqual([core.search_memory(project_path, query, top_k=13) for query in queries], baseline)
+            # MaxScore pruning keeps exactly the head of the exhaustive ranking.
+            for query, full in zip(queries, baseline):
+                self.assertEqual(core.search_memory(project_path, query, top_k=3), full[:3])
+
 
 class EntityAliasTests(unittest.TestCase):
     def test_alias_merge_uses_existing_canonical_id(self) -> None:
@@ -156,5 +264,6 @@ class EntityAliasTests(unittest.TestCase):
             self.assertEqual(alias_map[key_full], alias_map[key_short])
 
 
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from amon.tooling.builtins.memory import (
+    MemoryStore,
+    handle_memory_list,
+    handle_memory_search,
+)
+from amon.tooling.types import ToolCall
+
+
+class SqliteMemoryStoreTests(unittest.TestCase):
+    def test_put_get_delete_roundtrip(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MemoryStore(base_dir=Path(temp_dir))
+            path = store.put("notes", "alpha", {"text": "第一筆"})
+            self.assertEqual(path.name, "memory.sqlite3")
+            store.put("notes", "alpha", {"text": "覆寫後"})
+            self.assertEqual(store.get("notes", "alpha"), {"text": "覆寫後"})
+            store.delete("notes", "alpha")
+            with self.assertRaises(FileNotFoundError):
+                store.get("notes", "alpha")
+            with self.assertRaises(FileNotFoundError):
+                store.delete("notes", "alpha")
+
+    def test_search_is_ranked_limited_and_namespaced(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MemoryStore(base_dir=Path(temp_dir))
+            store.put("notes", "k1", "release checklist for amon")
+            store.put("notes", "k2", "release release release notes")
+            store.put("notes", "k3", "unrelated")
+            store.put("other", "k4", "release in another namespace")
+
+            results = store.search("notes", "release", limit=1)
+            self.assertEqual([item["key"] for item in results], ["k2"])
+            all_results = store.search("notes", "release")
+            self.assertEqual(sorted(item["key"] for item in all_results), ["k1", "k2"])
+            self.assertEqual(store.search("notes", "記憶"), [])
+
+    def test_short_queries_fall_back_to_substring_match(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MemoryStore(base_dir=Path(temp_dir))
+            store.put("notes", "k1", "台北會議")
+            store.put("notes", "k2", "高雄出差")
+            self.assertEqual([item["key"] for item in store.search("notes", "台北")], ["k1"])
+
+    def test_list_keys_supports_prefix_and_range(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MemoryStore(base_dir=Path(temp_dir))
+            for key in ["task:1", "task:2", "task:3", "todo:1", "z"]:
+                store.put("default", key, key)
+            self.assertEqual(store.list_keys("default", prefix="task:"), ["task:1", "task:2", "task:3"])
+            self.assertEqual(store.list_keys("default", start="task:2", end="todo:1"), ["task:2", "task:3"])
+            self.assertEqual(store.list_keys("default", limit=2), ["task:1", "task:2"])
+
+    def test_migrates_per_file_layout_on_first_access(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            base_dir = Path(temp_dir)
+            legacy = MemoryStore(base_dir=base_dir, backend="files")
+            legacy.put("notes", "old", {"text": "legacy value"})
+            legacy.put("notes/team", "shared", 42)
+
+            store = MemoryStore(base_dir=base_dir)
+            self.assertEqual(store.get("notes", "old"), {"text": "legacy value"})
+            self.assertEqual([item["key"] for item in store.search("notes", "legacy")], ["old"])
+            self.assertEqual(store.get("notes_team", "shared"), 42)
+
+            legacy.put("notes", "late", "written after migration")
+            self.assertEqual(store.list_keys("notes"), ["old"])
+
+
+class MemoryToolHandlerTests(unittest.TestCase):
+    def test_search_and_list_handlers(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MemoryStore(base_dir=Path(temp_dir))
+            store.put("default", "a", "alpha memo")
+            store.put("default", "b", "alpha memo again alpha")
+
+            result = handle_memory_search(ToolCall(tool="memory.search", args={"query": "alpha", "limit": 1}), store=store)
+            self.assertFalse(result.is_error)
+            self.assertEqual(result.meta["count"], 1)
+            self.assertEqual(json.loads(result.as_text())[0]["key"], "b")
+
+            invalid = handle_memory_search(ToolCall(tool="memory.search", args={"query": "alpha", "limit": 0}), store=store)
+            self.assertTrue(invalid.is_error)
+
+            listed = handle_memory_list(ToolCall(tool="memory.list", args={"prefix": "a"}), store=store)
+            self.assertEqual(json.loads(listed.as_text()), ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.core import AmonCore
+from amon.planning.pass_pipeline import PlannerGraphIndex, PlannerPassPipeline
+from amon.taskgraph3.payloads import AgentTaskConfig, TaskDisplayMetadata, TaskSpec
+from amon.taskgraph3.schema import ArtifactNode, GraphDefinition, GraphEdge, TaskNode
+
+
+def _task(node_id: str, title: str) -> TaskNode:
+    return TaskNode(
+        id=node_id,
+        title=title,
+        task_spec=TaskSpec(
+            executor="agent",
+            agent=AgentTaskConfig(prompt=f"完成{title}"),
+            display=TaskDisplayMetadata(label=title, summary=title, todo_hint=title),
+        ),
+    )
+
+
+class PlannerGraphIndexTests(unittest.TestCase):
+    def test_adjacency_follows_incremental_mutations(self) -> None:
+        nodes = [_task("a", "A"), _task("b", "B"), _task("c", "C")]
+        edges = [
+            GraphEdge(from_node="a", to_node="b", edge_type="CONTROL", kind="DEPENDS_ON"),
+            GraphEdge(from_node="b", to_node="c", edge_type="DATA", kind="FEEDS"),
+            GraphEdge(from_node="a", to_node="c", edge_type="EVENT", kind="NOTIFY"),
+        ]
+        calls: list[str] = []
+
+        def identity(node: TaskNode) -> str:
+            calls.append(node.id)
+            return node.title.lower()
+
+        index = PlannerGraphIndex(nodes, edges, identity=identity)
+        self.assertEqual(index.predecessors("c"), ["b"])
+        self.assertEqual(index.control_pairs(), {("a", "b")})
+
+        index.append_edges([GraphEdge(from_node="a", to_node="c", edge_type="CONTROL", kind="DEPENDS_ON")])
+        self.assertEqual(index.predecessors("c"), ["b", "a"])
+        self.assertIn(("a", "c"), index.control_pairs())
+
+        index.rename_node("a", "root", clone_edge=AmonCore._clone_edge_with_nodes)
+        self.assertEqual([edge.from_node for edge in index.edges], ["root", "b", "root", "root"])
+        self.assertIs(index.edges[1], edges[1])
+        self.assertEqual(index.position("root"), 0)
+        self.assertEqual(index.predecessors("b"), ["root"])
+        self.assertEqual(index.control_pairs(), {("root", "b"), ("root", "c")})
+        self.assertEqual(index.outgoing("a"), [])
+
+        index.identity(nodes[1])
+        index.identity(nodes[1])
+        nodes[1].title = "Beta"
+        self.assertEqual(index.identity(nodes[1]), "beta")
+        self.assertEqual(calls, ["b", "b"])
+
+    def test_pipeline_records_each_pass(self) -> None:
+        index = PlannerGraphIndex([_task("a", "A")], [], identity=lambda node: node.id)
+        pipeline = PlannerPassPipeline(index)
+        pipeline.run("noop", lambda graph_index: None)
+        pipeline.run("add_node", lambda graph_index, node: graph_index.set_nodes([*graph_index.nodes, node]), _task("b", "B"))
+        self.assertEqual([(item["pass"], item["changed"], item["nodes"]) for item in pipeline.timings], [("noop", False, 1), ("add_node", True, 2)])
+        self.assertGreaterEqual(pipeline.total_ms(), 0.0)
+
+
+class PostprocessPlannerPassTimingTests(unittest.TestCase):
+    def test_large_graph_runs_through_pipeline_and_logs_pass_timings(self) -> None:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            core = AmonCore(data_dir=Path(temp_dir))
+            nodes = []
+            edges = []
+            for index in range(300):
+                nodes.append(_task(f"step_{index}", f"實作步驟 {index}"))
+                nodes.append(ArtifactNode(id=f"artifact_{index}", title=f"step_{index}.md"))
+                edges.append(GraphEdge(from_node=f"step_{index}", to_node=f"artifact_{index}", edge_type="DATA", kind="PRODUCES"))
+                if index:
+                    edges.append(
+                        GraphEdge(from_node=f"artifact_{index - 1}", to_node=f"step_{index}", edge_type="DATA", kind="CONSUMES")
+                    )
+            graph = GraphDefinition(id="large-plan", version="taskgraph.v3", nodes=nodes, edges=edges)
+            with patch("amon.core.log_event") as log_event:
+                processed = core._postprocess_planner_graph(graph, message="大型規劃", available_tools=[{"name": "web.search"}])
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.assertFalse(any(isinstance(node, ArtifactNode) for node in processed.nodes))
+        self.assertEqual(processed.nodes[0].id, "concept_alignment")
+        control_pairs = {(edge.from_node, edge.to_node) for edge in processed.edges if edge.edge_type == "CONTROL"}
+        self.assertIn(("concept_alignment", "step_0"), control_pairs)
+        self.assertIn(("step_298", "step_299"), control_pairs)
+        self.assertEqual(processed.nodes[-1].task_spec.artifacts[0].name, "step_299")
+
+        events = [call.args[0] for call in log_event.call_args_list if call.args[0].get("event") == "planner_postprocess_passes"]
+        self.assertEqual(len(events), 1)
+        payload = events[0]["payload"]
+        self.assertEqual(
+            [item["pass"] for item in payload["passes"]],
+            [
+                "deduplicate_concepts",
+                "ensure_concept_alignment",
+                "merge_spec_cluster",
+                "normalize_edge_directions",
+                "collapse_artifacts",
+                "promote_concept_entry",
+                "stabilize_roots",
+                "finalize_agent_nodes",
+            ],
+        )
+        self.assertEqual((payload["nodes"], payload["edges"]), (301, len(processed.edges)))
+
+
+if __name__ == "__main__":
+    unittest.main()
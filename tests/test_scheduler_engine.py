@@ -10,7 +10,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
 from amon.core import AmonCore
-from amon.scheduler.engine import tick, write_schedules
+from amon.scheduler.engine import ScheduleLoop, _next_cron_after, load_schedules, tick, write_schedules
 
 
 class SchedulerEngineTests(unittest.TestCase):
@@ -46,6 +46,62 @@ class SchedulerEngineTests(unittest.TestCase):
         self.assertEqual(len(fired), 1)
         self.assertEqual(fired[0]["payload"]["schedule_id"], "sc_interval")
 
+    def test_schedule_loop_fires_only_due_schedules(self) -> None:
+        data_dir = Path(self.temp_dir.name)
+        now = datetime.now().astimezone()
+        schedules = [
+            {
+                "schedule_id": f"sc_{index}",
+                "template_id": "tpl_001",
+                "type": "interval",
+                "interval_seconds": 3600,
+                "next_fire_at": (now + timedelta(hours=1 + index)).isoformat(timespec="seconds"),
+            }
+            for index in range(50)
+        ]
+        schedules[7]["next_fire_at"] = (now - timedelta(seconds=1)).isoformat(timespec="seconds")
+        write_schedules({"schedules": schedules}, data_dir=data_dir)
+        emitted: list[dict] = []
+
+        def _emitter(event: dict) -> str:
+            emitted.append(event)
+            return f"evt-{len(emitted)}"
+
+        loop = ScheduleLoop(data_dir=data_dir, event_emitter=_emitter)
+        fired = loop.run_pending(now=now)
+
+        self.assertEqual([item["schedule_id"] for item in fired], ["sc_7"])
+        self.assertEqual(len(emitted), 1)
+        self.assertGreater(loop.next_due_at(), now)
+        stored = {item["schedule_id"]: item for item in load_schedules(data_dir=data_dir)["schedules"]}
+        self.assertIn("last_fire_at", stored["sc_7"])
+        self.assertEqual(loop.run_pending(now=now), [])
+
+    def test_schedule_loop_wakes_on_schedule_change(self) -> None:
+        data_dir = Path(self.temp_dir.name)
+        write_schedules({"schedules": []}, data_dir=data_dir)
+        loop = ScheduleLoop(data_dir=data_dir, event_emitter=lambda event: "evt")
+        self.assertIsNone(loop.next_due_at())
+
+        start = datetime.now().astimezone()
+        due = (start - timedelta(seconds=1)).isoformat(timespec="seconds")
+        write_schedules(
+            {"schedules": [{"schedule_id": "sc_new", "type": "one_shot", "run_at": due}]},
+            data_dir=data_dir,
+        )
+        loop.wait(timeout=5)
+        self.assertLess((datetime.now().astimezone() - start).total_seconds(), 2)
+        self.assertEqual([item["schedule_id"] for item in loop.run_pending()], ["sc_new"])
+        self.assertIsNone(loop.next_due_at())
+
+    def test_next_cron_after_jumps_across_fields(self) -> None:
+        base = datetime(2024, 3, 15, 10, 30, tzinfo=timezone.utc)
+        self.assertEqual(_next_cron_after("0 9 1 1 *", base), datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc))
+        self.assertEqual(_next_cron_after("*/15 * * * *", base), datetime(2024, 3, 15, 10, 45, tzinfo=timezone.utc))
+        self.assertEqual(_next_cron_after("5 23 * * 0", base), datetime(2024, 3, 17, 23, 5, tzinfo=timezone.utc))
+        with self.assertRaises(ValueError):
+            _next_cron_after("0 0 31 2 *", base)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.chat.stream_batching import SessionEventWriter, TokenCoalescer
+
+
+class TokenCoalescerTests(unittest.TestCase):
+    def test_barrier_and_size_flushes_keep_production_order(self) -> None:
+        sink: list[tuple[str, str]] = []
+        batcher = TokenCoalescer(lambda text: sink.append(("token", text)), window_ms=10_000, max_chars=6)
+        for token in ("你", "好", "，"):
+            batcher.push(token)
+        self.assertEqual(sink, [])
+        batcher.flush()
+        sink.append(("reasoning", "思考中"))
+        for token in ("abc", "def", "g"):
+            batcher.push(token)
+        batcher.close()
+        self.assertEqual(sink, [("token", "你好，"), ("reasoning", "思考中"), ("token", "abcdef"), ("token", "g")])
+        stats = batcher.stats()
+        self.assertEqual((stats["batches"], stats["tokens"], stats["chars"]), (3, 6, 10))
+        self.assertEqual(stats["flush_reasons"], {"size": 1, "window": 0, "barrier": 1, "final": 1})
+        with self.assertRaises(RuntimeError):
+            batcher.push("late")
+
+    def test_window_flushes_idle_buffer_from_timer(self) -> None:
+        flushed = threading.Event()
+        sink: list[str] = []
+
+        def emit(text: str) -> None:
+            sink.append(text)
+            flushed.set()
+
+        batcher = TokenCoalescer(emit, window_ms=20, max_chars=0)
+        batcher.push("第一")
+        batcher.push("段")
+        self.assertTrue(flushed.wait(1.0))
+        batcher.close()
+        self.assertEqual(sink, ["第一段"])
+        stats = batcher.stats()
+        self.assertEqual(stats["flush_reasons"]["window"], 1)
+        self.assertGreaterEqual(stats["max_hold_ms"], 15)
+
+    def test_timer_sink_error_is_raised_to_producer(self) -> None:
+        def emit(text: str) -> None:
+            raise BrokenPipeError(text)
+
+        batcher = TokenCoalescer(emit, window_ms=5)
+        batcher.push("x")
+        time.sleep(0.1)
+        with self.assertRaises(BrokenPipeError):
+            batcher.push("y")
+
+    def test_zero_window_passes_tokens_through(self) -> None:
+        sink: list[str] = []
+        batcher = TokenCoalescer(sink.append, window_ms=0)
+        for token in ("a", "b", "c"):
+            batcher.push(token)
+        self.assertEqual(sink, ["a", "b", "c"])
+        self.assertEqual(batcher.stats()["max_batch_tokens"], 1)
+
+
+class SessionEventWriterTests(unittest.TestCase):
+    def test_events_are_written_as_whole_lines_in_batches(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            session_path = Path(temp_dir) / "session-1.jsonl"
+            session_path.write_text('{"event": "earlier"}\n', encoding="utf-8")
+            writer = SessionEventWriter(
+                session_path,
+                "session-1",
+                now=lambda: "2026-02-01T10:00:00",
+                window_ms=10_000,
+                max_chars=400,
+            )
+            with writer:
+                on_disk = []
+                for index in range(6):
+                    writer.append({"event": "chunk", "index": index, "content": "字"})
+                    text = session_path.read_text(encoding="utf-8")
+                    self.assertTrue(text.endswith("\n"))
+                    on_disk.append(len(text.splitlines()))
+                # Four ~105-character lines fill the 400-character batch.
+                self.assertEqual(on_disk, [1, 1, 1, 5, 5, 5])
+                writer.append({"event": "final", "content": "字" * 6})
+            lines = session_path.read_text(encoding="utf-8").splitlines()
+            events = [json.loads(line) for line in lines]
+            self.assertEqual(events[0], {"event": "earlier"})
+            self.assertEqual([event.get("index") for event in events[1:7]], list(range(6)))
+            self.assertEqual(
+                events[-1],
+                {"timestamp": "2026-02-01T10:00:00", "session_id": "session-1", "event": "final", "content": "字" * 6},
+            )
+            stats = writer.stats()
+            self.assertEqual(stats["tokens"], 7)
+            self.assertGreaterEqual(stats["flush_reasons"]["size"], 1)
+            self.assertEqual(stats["flush_reasons"]["final"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
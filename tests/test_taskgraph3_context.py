@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from amon.taskgraph3.amon_node_runner import AmonNodeRunner
+from amon.taskgraph3.context import ContextView
+from amon.taskgraph3.payloads import InputBinding, TaskSpec, ToolCallSpec, ToolTaskConfig
+from amon.taskgraph3.runtime import TaskGraph3Runtime
+from amon.taskgraph3.schema import GraphDefinition, TaskNode
+
+
+class ContextViewTests(unittest.TestCase):
+    def test_layers_shadow_in_order_without_copying(self) -> None:
+        state = {"run_id": "state", "nodes": {}, "shared": 1}
+        view = ContextView({"map_item": "a"}, state)
+        child = view.new_child({"shared": 2})
+
+        self.assertEqual(view["shared"], 1)
+        self.assertEqual(child["shared"], 2)
+        self.assertEqual(child["map_item"], "a")
+        self.assertIsNone(child.get("missing"))
+        self.assertNotIn("missing", child)
+        self.assertEqual(sorted(child), ["map_item", "nodes", "run_id", "shared"])
+        self.assertEqual(len(child), 4)
+        self.assertEqual(dict(child)["shared"], 2)
+
+        state["late"] = True
+        self.assertTrue(view["late"])
+        with self.assertRaises(KeyError):
+            view["missing"]
+        with self.assertRaises(TypeError):
+            view["map_item"] = "b"  # type: ignore[index]
+
+
+class _CountingRunner(AmonNodeRunner):
+    def __init__(self, **kwargs) -> None:  # type: ignore[no-untyped-def]
+        super().__init__(**kwargs)
+        self.compiled = 0
+
+    def _compile_render_plan(self, node):  # type: ignore[no-untyped-def]
+        self.compiled += 1
+        return super()._compile_render_plan(node)
+
+
+class NodeRenderPlanTests(unittest.TestCase):
+    def test_map_items_share_one_compiled_plan(self) -> None:
+        lock = threading.Lock()
+        payloads: list[dict[str, object]] = []
+
+        def run_tool(name, payload, **kwargs):  # type: ignore[no-untyped-def]
+            with lock:
+                payloads.append(payload)
+            return {"text": "ok", "is_error": False}
+
+        graph = GraphDefinition(
+            nodes=[
+                TaskNode(
+                    id="fetch",
+                    execution="PARALLEL_MAP",
+                    execution_config={"items": [{"city": "台北"}, {"city": "高雄"}], "maxConcurrency": 2},
+                    task_spec=TaskSpec(
+                        executor="tool",
+                        tool=ToolTaskConfig(
+                            tools=[
+                                ToolCallSpec(
+                                    name="web.search",
+                                    args={"query": "${map_item_city} ${topic}", "tags": ["$region", "static"], "limit": 3},
+                                )
+                            ]
+                        ),
+                        input_bindings=[InputBinding(source="literal", key="region", value="tw")],
+                    ),
+                )
+            ]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            project_path = Path(tmp)
+            core = SimpleNamespace(resolve_project_identity=lambda path: ("p1", path), run_tool=run_tool)
+            runner = _CountingRunner(core=core, project_path=project_path, run_id="run-ctx", variables={"topic": "天氣"})
+            result = TaskGraph3Runtime(project_path=project_path, graph=graph, run_id="run-ctx").run(runner.run_task)
+
+        self.assertEqual(result.state["status"], "succeeded")
+        self.assertEqual(runner.compiled, 1)
+        self.assertEqual(sorted(item["query"] for item in payloads), ["台北 天氣", "高雄 天氣"])
+        self.assertEqual([item["tags"] for item in payloads], [["tw", "static"], ["tw", "static"]])
+        self.assertEqual({item["limit"] for item in payloads}, {3})
+        self.assertIsNot(payloads[0]["tags"], payloads[1]["tags"])
+
+
+if __name__ == "__main__":
+    unittest.main()
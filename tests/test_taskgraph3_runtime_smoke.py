@@ -7,8 +7,9 @@ import time
 import unittest
 from pathlib import Path
 
+from amon.taskgraph3.rate_limit import RateLimiter, throttle_retry_after
 from amon.taskgraph3.runtime import TaskGraph3Runtime
-from amon.taskgraph3.schema import ArtifactNode, GateNode, GateRoute, GraphDefinition, GraphEdge, GroupNode, OutputContract, OutputPort, Policy, TaskNode
+from amon.taskgraph3.schema import ArtifactNode, GateNode, GateRoute, GraphDefinition, GraphEdge, GroupNode, OutputContract, OutputPort, Policy, RetryPolicy, TaskNode
 
 
 class FakeClock:
@@ -174,6 +175,95 @@ class TaskGraph3RuntimeSmokeTests(unittest.TestCase):
             self.assertEqual(result.state["nodes"]["map"]["status"], "succeeded")
             self.assertGreaterEqual(len(invoked), 3)
 
+    def test_parallel_map_persists_items_and_reuses_them_on_resume(self) -> None:
+        items = [f"item-{idx}" for idx in range(8)]
+        graph = GraphDefinition(
+            nodes=[
+                TaskNode(
+                    id="map",
+                    execution="PARALLEL_MAP",
+                    execution_config={"items": items, "maxConcurrency": 1, "window": 1},
+                )
+            ]
+        )
+        calls: list[str] = []
+
+        def failing_runner(_: TaskNode, ctx: dict[str, object]) -> str:
+            calls.append(str(ctx["map_item"]))
+            if ctx["map_item"] == "item-5":
+                raise RuntimeError("boom")
+            return str(ctx["map_item"]).upper()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            first = TaskGraph3Runtime(project_path=Path(tmp), graph=graph, run_id="run-resume").run(failing_runner)
+            self.assertEqual(first.state["status"], "failed")
+            self.assertEqual(calls, items[:6])
+            records = [
+                json.loads(line)
+                for line in (first.run_dir / "map" / "map.jsonl").read_text(encoding="utf-8").splitlines()
+            ]
+            self.assertEqual([record["status"] for record in records], ["succeeded"] * 5 + ["failed"])
+            events = [json.loads(line) for line in (first.run_dir / "events.jsonl").read_text(encoding="utf-8").splitlines()]
+            progress = [event for event in events if event.get("event") == "map_item_status"]
+            self.assertEqual(progress[-1]["completed"], 5)
+            self.assertEqual(progress[-1]["total"], 8)
+
+            calls.clear()
+            second = TaskGraph3Runtime(project_path=Path(tmp), graph=graph, run_id="run-resume").run(
+                lambda _node, ctx: str(ctx["map_item"]).upper()
+            )
+            self.assertEqual(second.state["status"], "succeeded")
+            output = second.state["nodes"]["map"]["output"]
+            self.assertEqual(json.loads(output["raw"]), [item.upper() for item in items])
+            self.assertEqual(output["reused_items"], 5)
+
+    def test_parallel_map_retries_and_continue_on_error_policy(self) -> None:
+        clock = FakeClock()
+        attempts: dict[str, int] = {}
+        lock = threading.Lock()
+
+        def flaky_runner(_: TaskNode, ctx: dict[str, object]) -> str:
+            item = str(ctx["map_item"])
+            with lock:
+                attempts[item] = attempts.get(item, 0) + 1
+                count = attempts[item]
+            if item == "flaky" and count == 1:
+                raise RuntimeError("transient")
+            if item.startswith("bad"):
+                raise RuntimeError(f"{item} failed")
+            return item
+
+        def _graph(max_failures: int) -> GraphDefinition:
+            return GraphDefinition(
+                nodes=[
+                    TaskNode(
+                        id="map",
+                        execution="PARALLEL_MAP",
+                        execution_config={
+                            "items": ["ok", "flaky", "bad-1", "bad-2"],
+                            "maxConcurrency": 2,
+                            "continueOnError": True,
+                            "maxFailures": max_failures,
+                        },
+                        policy=Policy(retry=RetryPolicy(max_attempts=2, backoff_s=0.5)),
+                    )
+                ]
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            runtime = TaskGraph3Runtime(project_path=Path(tmp), graph=_graph(2), run_id="run-partial", time_func=clock.time, sleep_func=clock.sleep)
+            result = runtime.run(flaky_runner)
+            self.assertEqual(result.state["status"], "succeeded")
+            output = result.state["nodes"]["map"]["output"]
+            self.assertEqual(json.loads(output["raw"]), ["ok", "flaky", None, None])
+            self.assertEqual([item["index"] for item in output["failed_items"]], [2, 3])
+            self.assertEqual(attempts["bad-1"], 2)
+            self.assertIn(0.5, clock.sleeps)
+
+            attempts.clear()
+            strict = TaskGraph3Runtime(project_path=Path(tmp), graph=_graph(1), run_id="run-strict", time_func=clock.time, sleep_func=clock.sleep)
+            self.assertEqual(strict.run(flaky_runner).state["status"], "failed")
+
     def test_parallel_map_supports_upstream_items_json_path_and_json_result_parser(self) -> None:
         graph = GraphDefinition(
             nodes=[
@@ -267,6 +357,72 @@ class TaskGraph3RuntimeSmokeTests(unittest.TestCase):
             ]
             self.assertTrue(any(event.get("coalesced", 0) > 0 for event in events))
 
+    def test_shared_rate_limit_key_spans_nodes_and_is_reported(self) -> None:
+        clock = FakeClock()
+        graph = GraphDefinition(
+            nodes=[
+                TaskNode(id="first", policy=Policy(rate_limit=1, rate_limit_key="provider:mock")),
+                TaskNode(id="second", policy=Policy(rate_limit=1, rate_limit_key="provider:mock")),
+            ],
+            edges=[GraphEdge(from_node="first", to_node="second", edge_type="CONTROL", kind="next")],
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            runtime = TaskGraph3Runtime(project_path=Path(tmp), graph=graph, run_id="run-shared", time_func=clock.time, sleep_func=clock.sleep)
+            result = runtime.run(lambda *_: "ok")
+
+        self.assertEqual(result.state["status"], "succeeded")
+        self.assertEqual(clock.sleeps, [1.0])
+        metrics = result.state["metrics"]["rate_limits"]
+        self.assertEqual(list(metrics), ["provider:mock"])
+        self.assertEqual(metrics["provider:mock"]["acquired"], 2)
+        self.assertEqual(metrics["provider:mock"]["wait_s_total"], 1.0)
+
+    def test_rate_limit_wait_does_not_block_other_keys(self) -> None:
+        graph = GraphDefinition(nodes=[TaskNode(id="noop")])
+        with tempfile.TemporaryDirectory() as tmp:
+            runtime = TaskGraph3Runtime(project_path=Path(tmp), graph=graph, run_id="run-nonblocking")
+            runtime._acquire_rate_limit("slow", 1)
+            waiting = threading.Thread(target=runtime._acquire_rate_limit, args=("slow", 1))
+            waiting.start()
+            time.sleep(0.05)
+            self.assertTrue(waiting.is_alive())
+            begin = time.monotonic()
+            runtime._acquire_rate_limit("fast", 100)
+            self.assertLess(time.monotonic() - begin, 0.2)
+            waiting.join()
+
+    def test_throttle_response_pauses_key_and_lowers_rate(self) -> None:
+        class _Throttled(Exception):
+            status_code = 429
+            headers = {"Retry-After": "5"}
+
+        clock = FakeClock()
+        limiter = RateLimiter(time_func=clock.time)
+        self.assertEqual(throttle_retry_after(_Throttled()), 5.0)
+        self.assertIsNone(throttle_retry_after(ValueError("boom")))
+
+        graph = GraphDefinition(nodes=[TaskNode(id="api", policy=Policy(rate_limit=4, rate_limit_key="tool:web.search"))])
+        with tempfile.TemporaryDirectory() as tmp:
+            runtime = TaskGraph3Runtime(
+                project_path=Path(tmp),
+                graph=graph,
+                run_id="run-429",
+                time_func=clock.time,
+                sleep_func=clock.sleep,
+                rate_limiter=limiter,
+            )
+
+            def _raise(*_: object) -> str:
+                raise _Throttled()
+
+            result = runtime.run(_raise)
+
+        self.assertEqual(result.state["status"], "failed")
+        snapshot = limiter.snapshot()["tool:web.search"]
+        self.assertEqual(snapshot["throttled"], 1)
+        self.assertEqual(snapshot["effective_rate"], 2.0)
+        self.assertGreaterEqual(limiter.reserve("tool:web.search", 4), 5.0)
+
     def test_gate_node_routes_and_marks_unselected_as_skipped(self) -> None:
         graph = GraphDefinition(
             nodes=[
@@ -0,0 +1,81 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import amon.chat.message_cache as message_cache
+from amon.chat.message_cache import ThreadMessageCache
+
+
+def _line(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+class ThreadMessageCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.session_path = root / "threads" / "t1" / "events.jsonl"
+        self.session_path.parent.mkdir(parents=True)
+        self.cache_path = root / "context" / "chat_messages" / "t1.json"
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _append(self, *payloads: dict) -> None:
+        with self.session_path.open("a", encoding="utf-8") as handle:
+            for payload in payloads:
+                handle.write(_line(payload))
+
+    def test_only_appended_events_are_parsed_and_reasoning_chunks_fold(self) -> None:
+        cache = ThreadMessageCache()
+        self._append({"type": "user", "text": "幫我規劃"}, {"type": "router", "text": "chat_response"})
+        self.assertEqual([item["role"] for item in cache.read(self.session_path, self.cache_path)], ["user"])
+
+        folded: list[str] = []
+        original = message_cache._fold_event
+
+        def counting_fold(state, payload):  # type: ignore[no-untyped-def]
+            folded.append(str(payload.get("type")))
+            original(state, payload)
+
+        self._append(
+            {"type": "assistant_reasoning", "text": "先確認"},
+            {"type": "assistant_reasoning", "text": " 需求範圍"},
+            {"type": "assistant_chunk", "text": "好的"},
+            {"type": "assistant", "text": "好的，開始規劃。"},
+        )
+        with patch.object(message_cache, "_fold_event", counting_fold):
+            messages = cache.read(self.session_path, self.cache_path)
+            self.assertEqual(cache.read(self.session_path, self.cache_path), messages)
+        self.assertEqual(folded, ["assistant_reasoning", "assistant_reasoning", "assistant_chunk", "assistant"])
+        self.assertEqual([item["role"] for item in messages], ["user", "status", "assistant"])
+        self.assertEqual(messages[1]["text"], "先確認 需求範圍")
+
+    def test_snapshot_resumes_from_offset_and_truncation_rebuilds(self) -> None:
+        self._append({"type": "user", "text": "第一句"}, {"type": "assistant", "text": "第一句回覆"})
+        ThreadMessageCache().read(self.session_path, self.cache_path)
+        snapshot = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        self.assertEqual(snapshot["offset"], self.session_path.stat().st_size)
+
+        self._append({"type": "user", "text": "第二句"})
+        cold = ThreadMessageCache()
+        self.assertEqual([item["text"] for item in cold.read(self.session_path, self.cache_path)], ["第一句", "第一句回覆", "第二句"])
+
+        self.session_path.write_text(_line({"type": "user", "text": "重寫後的內容，長度與原本不同但仍然夠長"}) * 3, encoding="utf-8")
+        rebuilt = cold.read(self.session_path, self.cache_path)
+        self.assertEqual(len(rebuilt), 3)
+        self.assertTrue(all(item["text"].startswith("重寫後") for item in rebuilt))
+
+    def test_unterminated_last_line_is_shown_but_not_committed(self) -> None:
+        cache = ThreadMessageCache()
+        self.session_path.write_text(_line({"type": "user", "text": "第一句"}) + json.dumps({"type": "assistant", "text": "回覆"}, ensure_ascii=False), encoding="utf-8")
+        self.assertEqual(len(cache.read(self.session_path, self.cache_path)), 2)
+        with self.session_path.open("a", encoding="utf-8") as handle:
+            handle.write("\n" + _line({"type": "user", "text": "第二句"}))
+        self.assertEqual([item["text"] for item in cache.read(self.session_path, self.cache_path)], ["第一句", "回覆", "第二句"])
+
+
+if __name__ == "__main__":
+    unittest.main()
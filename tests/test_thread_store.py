@@ -341,12 +341,14 @@ class ThreadSessionStoreTests(unittest.TestCase):
                         "run_id": "run-123",
                     },
                 )
+                append_event(thread_id, {"type": "router", "text": "chat_response", "project_id": project_id})
                 context = load_latest_run_context(project_id, thread_id)
             finally:
                 os.environ.pop("AMON_HOME", None)
 
         self.assertEqual(context["run_id"], "run-123")
         self.assertEqual(context["last_assistant_text"], "好的，請問你想先做 UI 還是 API？")
+        self.assertEqual(context["last_router_type"], "chat_response")
 
     def test_rejects_invalid_thread_id_path_traversal(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
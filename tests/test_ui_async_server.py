@@ -0,0 +1,135 @@
+import json
+import sys
+import threading
+import time
+import unittest
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.ui_async import AsyncUIServer, BoundedExecutor, EventHub, HubStream
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:  # type: ignore[no-untyped-def]
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    release = threading.Event()
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/slow":
+            self.release.wait(2)
+        self._reply({"path": self.path})
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self._reply({"echo": body.decode("utf-8")})
+
+    def _reply(self, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        _ = format, args
+
+
+class _CountingSource:
+    interval_s = 0.05
+    retained_events = frozenset({"snapshot"})
+    opened = 0
+
+    def __init__(self) -> None:
+        type(self).opened += 1
+        self.ticks = 0
+
+    def initial(self):
+        return [("snapshot", {"value": 0})]
+
+    def poll(self):
+        self.ticks += 1
+        return [("tick", {"value": self.ticks})]
+
+
+class AsyncUIServerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        _EchoHandler.release.clear()
+        _CountingSource.opened = 0
+        streams = {"/stream": HubStream(topic="counter", open_source=_CountingSource)}
+        self.server = AsyncUIServer(
+            ("127.0.0.1", 0),
+            _EchoHandler,
+            executor=BoundedExecutor(max_workers=1, max_queue=0, name="test-ui"),
+            hub=EventHub(),
+            stream_resolver=lambda method, target: streams.get(target) if method == "GET" else None,
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.assertTrue(self.server.wait_started(5))
+        self.port = self.server.server_address[1]
+
+    def tearDown(self) -> None:
+        _EchoHandler.release.set()
+        self.server.shutdown()
+        self.thread.join(5)
+        self.server.server_close()
+
+    def _request(self, method: str, path: str, body: str | None = None):
+        conn = HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request(method, path, body=body.encode("utf-8") if body is not None else None)
+        response = conn.getresponse()
+        return response.status, response.getheader("Retry-After"), response.read()
+
+    def test_blocking_handler_runs_on_executor(self) -> None:
+        status, _, body = self._request("GET", "/hello")
+        self.assertEqual((status, json.loads(body)), (200, {"path": "/hello"}))
+        # The worker slot frees up just after the client has the full response.
+        _wait_for(lambda: self.server.executor.stats()["active"] == 0)
+        status, _, body = self._request("POST", "/echo", "哈囉")
+        self.assertEqual(json.loads(body), {"echo": "哈囉"})
+        self.assertEqual(self.server.executor.stats()["completed"], 2)
+
+    def test_saturated_executor_answers_503(self) -> None:
+        slow = threading.Thread(target=self._request, args=("GET", "/slow"), daemon=True)
+        slow.start()
+        _wait_for(lambda: self.server.executor.stats()["active"] == 1)
+        status, retry_after, _ = self._request("GET", "/hello")
+        self.assertEqual((status, retry_after), (503, "1"))
+        _EchoHandler.release.set()
+        slow.join(5)
+        self.assertEqual(self.server.executor.stats()["rejected"], 1)
+
+    def test_hub_stream_shares_one_source_without_workers(self) -> None:
+        readers = []
+        for _ in range(2):
+            conn = HTTPConnection("127.0.0.1", self.port, timeout=5)
+            conn.request("GET", "/stream")
+            response = conn.getresponse()
+            self.assertEqual(response.getheader("Content-Type"), "text/event-stream; charset=utf-8")
+            readers.append((conn, response))
+        for _, response in readers:
+            events = []
+            while len(events) < 2:
+                line = response.fp.readline().decode("utf-8").strip()
+                if line.startswith("event: "):
+                    events.append(line.split(": ", 1)[1])
+            self.assertEqual(events[0], "snapshot")
+            self.assertEqual(events[1], "tick")
+        self.assertEqual(_CountingSource.opened, 1)
+        stats = self.server.stats()
+        self.assertEqual((stats["hub_streams"], stats["event_hub"]["subscribers"]), (2, 2))
+        self.assertEqual(stats["executor"]["active"], 0)
+        for conn, _ in readers:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from amon.ui_server import _TaskManager
+from amon.ui_tasks import LaneConfig, TaskRejectedError, TaskScheduler
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> None:  # type: ignore[no-untyped-def]
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TaskSchedulerTests(unittest.TestCase):
+    def test_lane_runs_queued_items_by_priority(self) -> None:
+        scheduler = TaskScheduler((LaneConfig(name="run", priority=1, workers=1, queue_max=8),), global_queue_max=0)
+        gate = threading.Event()
+        order: list[str] = []
+        blocker = scheduler.submit("run", gate.wait, 2)
+        _wait_until(lambda: scheduler.stats()["run"]["active"] == 1)
+        futures = [
+            scheduler.submit("run", order.append, "low", priority=5),
+            scheduler.submit("run", order.append, "high", priority=0),
+            scheduler.submit("run", order.append, "low-2", priority=5),
+        ]
+        gate.set()
+        for future in [blocker, *futures]:
+            future.result(timeout=2)
+        self.assertEqual(order, ["high", "low", "low-2"])
+        stats = scheduler.stats()["run"]
+        self.assertEqual(stats["completed"], 4)
+        self.assertEqual(stats["queue_wait_seconds"]["count"], 4)
+        self.assertGreaterEqual(stats["run_seconds"]["sum"], 0.0)
+
+    def test_admission_rejects_full_lane_and_sheds_low_priority_first(self) -> None:
+        scheduler = TaskScheduler(
+            (
+                LaneConfig(name="chat", priority=0, workers=1, queue_max=4),
+                LaneConfig(name="tool", priority=2, workers=1, queue_max=1),
+            ),
+            global_queue_max=2,
+        )
+        gate = threading.Event()
+        scheduler.submit("chat", gate.wait, 2)
+        scheduler.submit("tool", gate.wait, 2)
+        _wait_until(lambda: all(lane["active"] == 1 for lane in scheduler.stats().values()))
+        scheduler.submit("tool", gate.wait, 2)
+        with self.assertRaises(TaskRejectedError) as lane_full:
+            scheduler.submit("tool", gate.wait, 2)
+        self.assertEqual(lane_full.exception.lane, "tool")
+        scheduler.submit("chat", gate.wait, 2)
+        # Backlog is now at the global limit: chat is still admitted, tool is not.
+        scheduler.submit("chat", gate.wait, 2)
+        gate.set()
+        stats = scheduler.stats()
+        self.assertEqual((stats["tool"]["rejected"], stats["chat"]["rejected"]), (1, 0))
+
+
+class TaskManagerLaneTests(unittest.TestCase):
+    def test_rejected_task_is_not_tracked_and_finished_status_expires(self) -> None:
+        clock = [1000.0]
+        scheduler = TaskScheduler((LaneConfig(name="tool", priority=2, workers=1, queue_max=0),), global_queue_max=0)
+        manager = _TaskManager(scheduler=scheduler, status_ttl_s=60, time_func=lambda: clock[0])
+        release = threading.Event()
+
+        class _Core:
+            def run_tool(self, tool_name, args, project_id=None):  # type: ignore[no-untyped-def]
+                release.wait(2)
+                return {"tool": tool_name}
+
+        first = manager.submit_tool(request_id="first", core=_Core(), tool_name="echo", args={}, project_id=None)
+        _wait_until(lambda: manager.get_status(first)["status"] == "running")
+        with self.assertRaises(TaskRejectedError):
+            manager.submit_tool(request_id="second", core=_Core(), tool_name="echo", args={}, project_id=None)
+        self.assertIsNone(manager.get_status("second"))
+        release.set()
+        _wait_until(lambda: manager.stats()["lanes"]["tool"]["completed"] == 1)
+        self.assertEqual(manager.get_status(first)["lane"], "tool")
+        self.assertEqual(manager.get_status(first)["result"], {"tool": "echo"})
+        clock[0] += 61
+        self.assertIsNone(manager.get_status(first))
+        self.assertEqual(manager.stats()["tracked_statuses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()